@@ -0,0 +1,659 @@
+#!/usr/bin/env python3
+"""
+异步工具函数模块
+speaker_validation_tools 中身份检查和预审流程的异步版本：直接在事件循环中执行，
+通过 aiobotocore（S3 / Bedrock）和 httpx（EXA）发起外部调用，等待期间不占用线程，
+一个进程可同时处理大量进行中的验证
+
+结果结构、时间预算、弹性层、请求合并、用量记录和审计与同步版本完全一致（共用同一组辅助函数）；
+未安装 aiobotocore 或 httpx、或录制/回放模式下，对应的外部调用回退到有界线程池中执行同步客户端，
+任务被取消时关闭进行中调用的连接
+"""
+
+import asyncio
+import hashlib
+import inspect
+import io
+import threading
+import time
+import weakref
+from contextlib import AsyncExitStack
+from typing import Any, Callable, Dict, Optional
+
+import speaker_validation_tools as tools
+from cassette import MODE_OFF, get_cassette
+from cloudwatch_logger import get_cloudwatch_logger
+from config_service import config_section, get_config_service, pinned_snapshot
+from cost_ledger import get_cost_ledger, record_usage, track_usage
+from deadline import Deadline, DeadlineExceeded, RequestCancelled, ensure_deadline, run_blocking_call
+from folder_index import get_folder_index
+from folder_profiler import get_folder_profiler
+from pdf_text import get_pdf_text_extractor
+from audit_store import get_audit_store
+from preaudit_planner import Stage, get_stage_planner
+from preaudit_result import PreauditResult
+from profiling import traced
+from resilience import get_dependency_guard
+from singleflight import get_single_flight, normalize_input
+
+try:
+    from aiobotocore.config import AioConfig
+    from aiobotocore.session import get_session
+    AIOBOTOCORE_AVAILABLE = True
+except ImportError:
+    AIOBOTOCORE_AVAILABLE = False
+
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+logger = get_cloudwatch_logger("async_tools")
+
+async_config = config_section('async')
+
+# 凭证变更后旧客户端延迟关闭的时间（秒），保证进行中的调用在自身超时内完成
+CLIENT_CLOSE_GRACE_SECONDS = 30.0
+
+
+def async_tools_enabled() -> bool:
+    """MCP server 是否直接在事件循环中执行工具（[ASYNC] ENABLED）"""
+    return bool(async_config['enabled'])
+
+
+# ---- 客户端 ----
+
+def _call_and_read_body(method: Callable[..., Any], kwargs: Dict[str, Any]) -> Any:
+    """在线程中调用同步客户端，响应体在线程中读完（事件循环中读取不阻塞）"""
+    response = method(**kwargs)
+    if not isinstance(response, dict):
+        return response
+    # invoke_model 的响应体为 body，get_object 为 Body
+    for name in ('body', 'Body'):
+        body = response.get(name)
+        if body is not None and hasattr(body, 'read'):
+            response = dict(response, **{name: io.BytesIO(body.read())})
+    return response
+
+
+class ThreadedClient:
+    """
+    同步 boto3 客户端的异步适配：每次调用在外部调用的有界线程池中执行，任务被取消时中止调用
+
+    未安装 aiobotocore 或录制/回放模式下使用（经过录制层包装的同步客户端）
+    """
+
+    def __init__(self, client: Any):
+        self._client = client
+
+    def __getattr__(self, name: str):
+        method = getattr(self._client, name)
+
+        async def call(**kwargs):
+            return await run_blocking_call(_call_and_read_body, method, kwargs)
+
+        return call
+
+
+async def _read_body(body: Any) -> bytes:
+    """读取响应体（aiobotocore 的流式响应体需要 await，线程适配的响应体已读入内存）"""
+    data = body.read()
+    if inspect.isawaitable(data):
+        data = await data
+    return data
+
+
+async def _md5_body(body: Any, chunk_size: int = 1024 * 1024) -> str:
+    """分块读取响应体并计算 MD5"""
+    digest = hashlib.md5()
+    while True:
+        chunk = body.read(chunk_size)
+        if inspect.isawaitable(chunk):
+            chunk = await chunk
+        if not chunk:
+            return digest.hexdigest()
+        digest.update(chunk)
+
+
+class _LoopClients:
+    """单个事件循环的异步客户端池（aiobotocore 和 httpx 客户端绑定创建时的事件循环）"""
+
+    def __init__(self):
+        self._clients: Dict[Any, Any] = {}
+        self._lock = asyncio.Lock()
+        self._stack = AsyncExitStack()
+        self._http = None
+
+    async def aws_client(self, service_name: str, timeout: Optional[float]):
+        """获取复用的 aiobotocore 客户端（与同步客户端池一样按超时分档）"""
+        timeout = tools._timeout_bucket(timeout)
+        key = (service_name, timeout)
+        client = self._clients.get(key)
+        if client is None:
+            async with self._lock:
+                client = self._clients.get(key)
+                if client is None:
+                    client = await self._stack.enter_async_context(get_session().create_client(
+                        service_name,
+                        aws_access_key_id=tools.aws_config['access_key_id'],
+                        aws_secret_access_key=tools.aws_config['secret_access_key'],
+                        region_name=tools.aws_config['region'],
+                        config=tools._timeout_client_config(timeout, AioConfig)
+                    ))
+                    self._clients[key] = client
+        return client
+
+    def http_client(self):
+        """获取复用的 httpx 异步客户端（EXA 请求共享 keep-alive 连接池）"""
+        if self._http is None:
+            max_connections = async_config['max_connections']
+            self._http = httpx.AsyncClient(limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=min(max_connections, tools.CLIENT_MAX_POOL_CONNECTIONS)
+            ))
+        return self._http
+
+    async def aclose(self, delay: float = 0.0):
+        """关闭池中的客户端（delay 秒后，等待进行中的调用完成）"""
+        if delay > 0:
+            await asyncio.sleep(delay)
+        try:
+            await self._stack.aclose()
+            if self._http is not None:
+                await self._http.aclose()
+        except Exception as e:
+            logger.debug(f"关闭异步客户端失败: {str(e)}")
+
+
+_loop_pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopClients]" = weakref.WeakKeyDictionary()
+_loop_pools_lock = threading.Lock()
+# 正在延迟关闭的客户端池（保留任务引用，避免被回收）
+_closing = set()
+
+
+def _loop_clients() -> _LoopClients:
+    """当前事件循环的客户端池"""
+    loop = asyncio.get_running_loop()
+    with _loop_pools_lock:
+        pool = _loop_pools.get(loop)
+        if pool is None:
+            pool = _loop_pools[loop] = _LoopClients()
+    return pool
+
+
+def _schedule_close(pool: _LoopClients):
+    task = asyncio.ensure_future(pool.aclose(CLIENT_CLOSE_GRACE_SECONDS))
+    _closing.add(task)
+    task.add_done_callback(_closing.discard)
+
+
+def reset_async_client_pool():
+    """丢弃各事件循环复用的异步客户端（凭证或地域变更后调用，旧客户端在进行中的调用结束后关闭）"""
+    with _loop_pools_lock:
+        pools = list(_loop_pools.items())
+        _loop_pools.clear()
+    for loop, pool in pools:
+        if loop.is_closed():
+            continue
+        try:
+            loop.call_soon_threadsafe(_schedule_close, pool)
+        except RuntimeError:
+            # 事件循环已停止，客户端随事件循环一起释放
+            pass
+
+
+def _on_config_change(snapshot, changed):
+    if 'aws' in changed:
+        reset_async_client_pool()
+
+get_config_service().subscribe(_on_config_change)
+
+
+def get_async_metrics() -> Dict[str, Any]:
+    """异步执行状态：是否启用、外部调用使用的客户端类型和持有客户端池的事件循环数"""
+    with _loop_pools_lock:
+        loops = len(_loop_pools)
+    return {
+        "enabled": async_tools_enabled(),
+        "aws_client": "aiobotocore" if _use_native_clients(AIOBOTOCORE_AVAILABLE) else "threaded",
+        "http_client": "httpx" if _use_native_clients(HTTPX_AVAILABLE) else "threaded",
+        "event_loops": loops
+    }
+
+
+def _use_native_clients(available: bool) -> bool:
+    """是否使用原生异步客户端（录制/回放模式下经过录制层的同步客户端）"""
+    return available and get_cassette().mode == MODE_OFF
+
+
+async def create_async_s3_client(timeout: Optional[float] = None):
+    """获取异步 S3 客户端（按超时分档、按事件循环复用）"""
+    if not _use_native_clients(AIOBOTOCORE_AVAILABLE):
+        return ThreadedClient(tools.create_s3_client(timeout))
+    return await _loop_clients().aws_client('s3', timeout)
+
+
+async def create_async_bedrock_client(timeout: Optional[float] = None):
+    """获取异步 Bedrock Runtime 客户端（按超时分档、按事件循环复用）"""
+    if not _use_native_clients(AIOBOTOCORE_AVAILABLE):
+        return ThreadedClient(tools.create_bedrock_client(timeout))
+    return await _loop_clients().aws_client('bedrock-runtime', timeout)
+
+
+async def _post_json(url: str, payload: Dict[str, Any], headers: Dict[str, str], timeout: Optional[float]):
+    """发送 JSON POST 请求（未安装 httpx 或录制/回放模式下在有界线程池中经过录制层发送）"""
+    if _use_native_clients(HTTPX_AVAILABLE):
+        return await _loop_clients().http_client().post(url, json=payload, headers=headers, timeout=timeout)
+    return await run_blocking_call(
+        get_cassette().http_post, "exa", url, tools._get_http_session().post, payload, headers, timeout
+    )
+
+
+# ---- S3 ----
+
+async def list_s3_files_with_prefix(bucket_name: str = None, prefix: str = "",
+                                    deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+    """
+    检查指定前缀下的S3文件（异步版本；与同步调用方共享同一次 LIST）
+    """
+    if bucket_name is None:
+        bucket_name = tools.s3_config['bucket_name']
+
+    deadline = ensure_deadline(deadline)
+    try:
+        return await get_single_flight("s3_prefix").do_async(
+            (bucket_name, prefix),
+            _list_s3_files_with_prefix, bucket_name, prefix, deadline,
+            wait_timeout=tools._wait_timeout(deadline)
+        )
+    except TimeoutError:
+        raise DeadlineExceeded("s3_list")
+
+
+@traced("s3_list")
+async def _list_s3_files_with_prefix(bucket_name: str, prefix: str, deadline: Deadline) -> Dict[str, Any]:
+    """实际执行前缀下的S3文件检查"""
+    start_time = time.time()
+
+    logger.info(f"开始检查 S3 存储桶: {bucket_name}, 前缀: {prefix}")
+
+    s3_timeout = None
+    if deadline.budget_seconds is not None:
+        s3_timeout = deadline.timeout_for("s3_list", tools.S3_TIMEOUT_CAP)
+
+    try:
+        s3_client = await create_async_s3_client(s3_timeout)
+        params = {"Bucket": bucket_name}
+        if prefix:
+            params["Prefix"] = prefix
+        response = await deadline.call_async("s3_list", s3_client.list_objects_v2, **params)
+        return tools._s3_listing_result(response, bucket_name, prefix, start_time)
+
+    except Exception as e:
+        return tools._s3_listing_error(e, bucket_name, prefix, start_time, deadline)
+
+
+async def _fetch_object_head(bucket_name: str, key: str, head_bytes: int, deadline: Deadline) -> bytes:
+    """用 Range GET 读取对象开头 head_bytes 字节"""
+    s3_timeout = None
+    if deadline.budget_seconds is not None:
+        s3_timeout = deadline.timeout_for("document_profile", tools.S3_TIMEOUT_CAP)
+    s3_client = await create_async_s3_client(s3_timeout)
+    response = await deadline.call_async(
+        "document_profile", s3_client.get_object,
+        Bucket=bucket_name, Key=key, Range=f"bytes=0-{head_bytes - 1}"
+    )
+    head = await _read_body(response['Body'])
+    record_usage(s3_get_calls=1, s3_bytes_read=len(head))
+    return head
+
+
+@traced("document_profile")
+async def _profile_listed_folder(bucket_name: str, s3_result: Dict[str, Any], deadline: Deadline):
+    """为已列出的文件夹生成内容画像（只读取 ETag 未缓存的文件头）"""
+    return await get_folder_profiler().profile_async(
+        s3_result["objects"],
+        lambda key, head_bytes: _fetch_object_head(bucket_name, key, head_bytes, deadline)
+    )
+
+
+async def _hash_object(bucket_name: str, key: str, deadline: Deadline) -> str:
+    """读取对象全部内容并计算 MD5（用于比较分段上传文件）"""
+    s3_timeout = None
+    if deadline.budget_seconds is not None:
+        s3_timeout = deadline.timeout_for("duplicate_hashing", tools.S3_TIMEOUT_CAP)
+    s3_client = await create_async_s3_client(s3_timeout)
+    response = await deadline.call_async("duplicate_hashing", s3_client.get_object, Bucket=bucket_name, Key=key)
+    digest = await _md5_body(response['Body'])
+    record_usage(s3_get_calls=1, s3_bytes_read=response.get('ContentLength', 0))
+    return digest
+
+
+@traced("duplicate_hashing")
+async def _hash_listed_duplicates(bucket_name: str, s3_result: Dict[str, Any], deadline: Deadline):
+    """读取可能重复的分段上传文件内容，按内容 MD5 重新统计重复文档"""
+    return await get_folder_index().deduplicate_async(
+        bucket_name, s3_result["prefix"], s3_result["objects"],
+        lambda key: _hash_object(bucket_name, key, deadline)
+    )
+
+
+@traced("document_evidence")
+async def collect_document_evidence(extracted_info: Dict[str, str], bucket_name: str = None,
+                                    deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+    """
+    在讲者文件夹的 PDF 中查找讲者姓名和医院（异步版本：LIST 在事件循环中执行，
+    按块读取和逐页解析是 CPU 密集的工作，在线程中执行）
+    """
+    start_time = time.time()
+    if bucket_name is None:
+        bucket_name = tools.s3_config['bucket_name']
+    deadline = ensure_deadline(deadline)
+    folder_prefix = tools._select_folder(False, extracted_info).prefix
+
+    s3_result = await list_s3_files_with_prefix(bucket_name, folder_prefix, deadline=deadline)
+    evidence = None
+    if s3_result["success"]:
+        evidence = await asyncio.to_thread(
+            get_pdf_text_extractor().find_evidence,
+            s3_result["objects"],
+            lambda key, start, end: tools._read_object_range(bucket_name, key, start, end, deadline),
+            tools._evidence_terms(extracted_info),
+            tools.pdf_evidence_config['max_documents']
+        )
+    return tools._evidence_result(folder_prefix, s3_result, evidence, start_time)
+
+
+# ---- Bedrock ----
+
+@traced("extraction")
+async def extract_doctor_info(text: str, deadline: Optional[Deadline] = None) -> Dict[str, str]:
+    """
+    使用Bedrock LLM从文本中提取医生信息（异步版本）
+    """
+    bedrock_timeout = None
+    if deadline is not None:
+        if not deadline.has_time_for(tools.BEDROCK_MIN_SECONDS + tools.S3_RESERVE_SECONDS):
+            deadline.skip("bedrock_extraction")
+            return tools.extract_doctor_info_fallback(text)
+        bedrock_timeout = deadline.timeout_for("bedrock_extraction", tools.BEDROCK_TIMEOUT_CAP,
+                                               tools.S3_RESERVE_SECONDS)
+
+    try:
+        bedrock_client = await create_async_bedrock_client(bedrock_timeout)
+
+        response = await get_dependency_guard("bedrock").call_async(
+            ensure_deadline(deadline).call_async,
+            "bedrock_extraction",
+            bedrock_client.invoke_model,
+            max_wait=bedrock_timeout,
+            budget_limited=bedrock_timeout is not None and bedrock_timeout < tools.BEDROCK_TIMEOUT_CAP,
+            modelId=tools.BEDROCK_EXTRACTION_MODEL_ID,
+            body=tools._extraction_request_body(text)
+        )
+
+        return tools._parse_extraction_response(await _read_body(response['body']))
+
+    except Exception as e:
+        return tools._extraction_fallback(text, e)
+
+
+# ---- EXA ----
+
+async def search_doctor_with_exa(doctor_name: str, hospital: str, department: str,
+                                 deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+    """
+    使用EXA API搜索医生信息验证身份真实性（异步版本；与同步调用方共享同一次EXA调用）
+    """
+    deadline = ensure_deadline(deadline)
+    key = (normalize_input(doctor_name), normalize_input(hospital), normalize_input(department))
+    try:
+        return await get_single_flight("exa_search").do_async(
+            key,
+            _search_doctor_with_exa, doctor_name, hospital, department, deadline,
+            wait_timeout=tools._wait_timeout(deadline),
+            reusable=tools._unless_truncated(deadline, tools._exa_search_skipped,
+                                             tools.EXA_MIN_SECONDS + tools.S3_RESERVE_SECONDS)
+        )
+    except TimeoutError:
+        deadline.skip("exa_search", "等待进行中的EXA搜索超时")
+        return {"success": False, "skipped": True, "error": "时间预算不足，跳过EXA网络搜索"}
+
+
+@traced("exa_search")
+async def _search_doctor_with_exa(doctor_name: str, hospital: str, department: str,
+                                  deadline: Deadline) -> Dict[str, Any]:
+    """实际执行EXA搜索"""
+    exa_timeout = tools.EXA_TIMEOUT_CAP
+    if deadline.budget_seconds is not None:
+        if not deadline.has_time_for(tools.EXA_MIN_SECONDS + tools.S3_RESERVE_SECONDS):
+            deadline.skip("exa_search")
+            return {"success": False, "skipped": True, "error": "时间预算不足，跳过EXA网络搜索"}
+        exa_timeout = deadline.timeout_for("exa_search", tools.EXA_TIMEOUT_CAP, tools.S3_RESERVE_SECONDS)
+
+    try:
+        request = tools._exa_search_request(doctor_name, hospital, department)
+        if request is None:
+            return {"success": False, "error": "EXA API key not found"}
+        url, payload, headers = request
+
+        async def _post_exa_search():
+            response = await deadline.call_async("exa_search", _post_json, url, payload, headers, exa_timeout)
+            return tools._check_exa_response(response)
+
+        response = await get_dependency_guard("exa").call_async(_post_exa_search, max_wait=exa_timeout,
+                                                                budget_limited=exa_timeout < tools.EXA_TIMEOUT_CAP)
+        return tools._exa_search_result(response, doctor_name, hospital, department, payload["query"])
+
+    except Exception as e:
+        return tools._exa_search_error(e)
+
+
+# ---- 身份检查 ----
+
+async def check_string_content(input_string: str, target_word: str = None,
+                               deadline: Optional[Deadline] = None,
+                               extracted_info: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """
+    检查讲者身份信息的真实性和完整性（异步版本；与同步调用方共享同一次检查）
+    """
+    with pinned_snapshot() as snapshot:
+        if target_word is None:
+            target_word = tools.preaudit_config['target_word']
+        if deadline is None:
+            deadline = Deadline.from_timeout(tools.preaudit_config['timeout_seconds'])
+
+        try:
+            return await get_single_flight("check_string_content").do_async(
+                tools._identity_flight_key(input_string, target_word, snapshot.version, extracted_info),
+                _check_string_content, input_string, target_word, deadline, extracted_info,
+                wait_timeout=tools._wait_timeout(deadline),
+                reusable=tools._unless_truncated(deadline, tools._identity_truncated, tools.S3_RESERVE_SECONDS)
+            )
+        except TimeoutError:
+            return tools._coalesced_wait_identity_result(input_string, target_word)
+
+
+async def _check_string_content(input_string: str, target_word: str, deadline: Deadline,
+                                extracted_info: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """实际执行讲者身份检查"""
+    start_time = time.time()
+
+    logger.info(f"开始检查内容合规标识: {target_word}")
+
+    try:
+        result = tools._new_identity_result(input_string, target_word)
+
+        if result["contains_target"]:
+            if extracted_info is None:
+                extracted_info = await extract_doctor_info(input_string, deadline)
+            tools._mark_direct_pass(result, extracted_info)
+        else:
+            logger.info("讲者验证：未包含特殊标识，开始提取医生信息")
+            if extracted_info is None:
+                extracted_info = await extract_doctor_info(input_string, deadline)
+            result["extracted_info"] = extracted_info
+
+            if extracted_info['name']:
+                logger.info(f"开始EXA网络搜索验证医生身份: {extracted_info['name']}")
+                exa_results = await search_doctor_with_exa(
+                    extracted_info['name'],
+                    extracted_info['hospital'],
+                    extracted_info['department'],
+                    deadline
+                )
+                tools._apply_exa_verification(result, extracted_info, exa_results, deadline)
+                if tools._should_collect_document_evidence(extracted_info, deadline):
+                    result["document_evidence"] = await collect_document_evidence(extracted_info, deadline=deadline)
+            else:
+                tools._mark_name_missing(result)
+
+        return tools._identity_check_finished(result, start_time)
+
+    except Exception as e:
+        tools._identity_check_failed(e, start_time)
+        raise
+
+
+# ---- 预审 ----
+
+async def run_preaudit(user_input: str, bucket_name: str = None,
+                       deadline: Optional[Deadline] = None) -> PreauditResult:
+    """
+    执行完整预审流程，返回结构化结果（异步版本；与同步调用方共享同一次预审计算）
+    """
+    with pinned_snapshot() as snapshot:
+        if bucket_name is None:
+            bucket_name = tools.s3_config['bucket_name']
+        if deadline is None:
+            deadline = Deadline.from_timeout(tools.preaudit_config['timeout_seconds'])
+
+        try:
+            return await get_single_flight("perform_preaudit").do_async(
+                (normalize_input(user_input), bucket_name, snapshot.version),
+                _run_preaudit, user_input, bucket_name, deadline,
+                wait_timeout=tools._wait_timeout(deadline),
+                reusable=tools._unless_truncated(deadline, tools._preaudit_truncated, tools.S3_RESERVE_SECONDS)
+            )
+        except TimeoutError:
+            logger.warning("预审：等待进行中的相同提交超时，返回部分结果")
+            return tools._build_incomplete_result("coalesced_wait", deadline, {})
+
+
+async def perform_preaudit(user_input: str, bucket_name: str = None,
+                           deadline: Optional[Deadline] = None, style: str = "default") -> str:
+    """
+    执行完整预审流程并返回人类可读的报告（异步版本）
+    """
+    return (await run_preaudit(user_input, bucket_name, deadline)).render(style)
+
+
+async def _run_preaudit(user_input: str, bucket_name: str, deadline: Deadline) -> PreauditResult:
+    """实际执行完整预审流程，记录本次预审的调用用量和审计记录"""
+    with track_usage() as usage:
+        try:
+            result = await _execute_preaudit(user_input, bucket_name, deadline)
+        except (RequestCancelled, asyncio.CancelledError):
+            get_cost_ledger().record_preaudit("cancelled", usage)
+            raise
+    tools._record_skipped_stages(result, deadline)
+    result.cost = usage.to_dict()
+    get_cost_ledger().record_preaudit(result.verdict, usage)
+    get_audit_store().record(result)
+    return result
+
+
+async def _execute_preaudit(user_input: str, bucket_name: str, deadline: Deadline) -> PreauditResult:
+    """预审流程各阶段（阶段划分和规划与同步版本相同）"""
+    start_time = time.time()
+
+    logger.info(f"开始执行完整预审流程，内容长度: {len(user_input)}")
+
+    extracted_info = {}
+    folder = None
+    stage_timings = {}
+    target_word = tools.preaudit_config['target_word']
+    min_file_count = tools.preaudit_config['min_file_count']
+
+    try:
+        contains_target = target_word in user_input
+        confirmed_extraction = None
+        if not contains_target and tools._registry_covers_preaudit():
+            # 登记表查找读取本地 SQLite（可能等待写入锁或读取磁盘），在线程中执行，不阻塞事件循环
+            stage_started = time.monotonic()
+            record, needs_confirmation = await asyncio.to_thread(tools._registry_lookup, user_input, bucket_name)
+            stage_timings["registry_lookup"] = round(time.monotonic() - stage_started, 4)
+            if needs_confirmation:
+                stage_started = time.monotonic()
+                confirmed_extraction = await extract_doctor_info(user_input, deadline)
+                stage_timings["extraction"] = round(time.monotonic() - stage_started, 4)
+                if not tools._registry_confirms(record, confirmed_extraction):
+                    record = None
+            if record is not None:
+                extracted_info, folder, stage_results = tools._registry_stage_results(
+                    record, user_input, target_word, deadline, confirmed_extraction
+                )
+                return tools._finish_preaudit(user_input, target_word, contains_target, extracted_info, folder,
+                                              True, min_file_count, stage_results, stage_timings, start_time)
+        if confirmed_extraction is not None:
+            extracted_info = confirmed_extraction
+        else:
+            stage_started = time.monotonic()
+            extracted_info = await extract_doctor_info(user_input, deadline)
+            stage_timings["extraction"] = round(time.monotonic() - stage_started, 4)
+        folder, needs_exa = tools._plan_folder_check(contains_target, extracted_info)
+        stage_results = {}
+
+        async def run_folder_listing() -> bool:
+            stage_started = time.monotonic()
+            s3_result = await list_s3_files_with_prefix(bucket_name, folder.prefix, deadline=deadline)
+            stage_timings["s3_folder_listing"] = round(time.monotonic() - stage_started, 4)
+            if tools._should_hash_duplicates(s3_result, deadline):
+                stage_started = time.monotonic()
+                duplicates = await _hash_listed_duplicates(bucket_name, s3_result, deadline)
+                s3_result = tools._with_duplicates(s3_result, duplicates)
+                stage_timings["duplicate_hashing"] = round(time.monotonic() - stage_started, 4)
+            if tools._should_profile_documents(s3_result, deadline):
+                stage_started = time.monotonic()
+                profile = await _profile_listed_folder(bucket_name, s3_result, deadline)
+                s3_result = tools._with_document_profile(s3_result, profile)
+                stage_timings["document_profile"] = round(time.monotonic() - stage_started, 4)
+            if tools._should_check_photo_reuse(s3_result, deadline):
+                # 计算感知哈希是 CPU 密集的工作，在线程中执行
+                stage_started = time.monotonic()
+                check = await asyncio.to_thread(tools._check_photo_reuse, bucket_name, s3_result, deadline)
+                s3_result = tools._with_photo_reuse(s3_result, check)
+                stage_timings["photo_reuse"] = round(time.monotonic() - stage_started, 4)
+            stage_results["s3_result"] = s3_result
+            return tools._folder_listing_decides(s3_result, folder, needs_exa, min_file_count)
+
+        async def run_identity_verification() -> bool:
+            stage_started = time.monotonic()
+            string_result = await check_string_content(
+                user_input, target_word, deadline=deadline, extracted_info=extracted_info
+            )
+            stage_timings["identity_verification"] = round(time.monotonic() - stage_started, 4)
+            stage_results["string_result"] = string_result
+            tools._report_identity_progress(string_result)
+            return False
+
+        if needs_exa:
+            await get_stage_planner().execute_async([
+                Stage("s3_folder_listing", run_folder_listing),
+                Stage("exa_search", run_identity_verification)
+            ])
+        else:
+            await run_identity_verification()
+            await run_folder_listing()
+
+        return tools._finish_preaudit(user_input, target_word, contains_target, extracted_info, folder, needs_exa,
+                                      min_file_count, stage_results, stage_timings, start_time)
+
+    except DeadlineExceeded as e:
+        return tools._preaudit_deadline_result(e, user_input, deadline, extracted_info, folder, stage_timings,
+                                               start_time)
+
+    except (RequestCancelled, Exception) as e:
+        tools._preaudit_aborted(e, start_time)
+        raise
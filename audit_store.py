@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+预审审计记录存储模块
+将每次预审的结构化结果写入本地 SQLite（WAL 模式），由后台线程批量写入，不占用请求路径；
+按讲者姓名、医院、文件夹、结论和时间建立索引，历史查询在毫秒级返回
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Union
+
+from preaudit_result import PreauditResult
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS preaudits (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    speaker_name TEXT,
+    hospital TEXT,
+    department TEXT,
+    title TEXT,
+    folder TEXT,
+    verdict TEXT NOT NULL,
+    outcome TEXT NOT NULL,
+    headline TEXT,
+    file_count INTEGER,
+    contains_target INTEGER,
+    verification_passed INTEGER,
+    result_json TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_preaudits_speaker ON preaudits (speaker_name, created_at);
+CREATE INDEX IF NOT EXISTS idx_preaudits_hospital ON preaudits (hospital, created_at);
+CREATE INDEX IF NOT EXISTS idx_preaudits_folder ON preaudits (folder, created_at);
+CREATE INDEX IF NOT EXISTS idx_preaudits_verdict ON preaudits (verdict, created_at);
+CREATE INDEX IF NOT EXISTS idx_preaudits_created_at ON preaudits (created_at);
+"""
+
+COLUMNS = (
+    "created_at", "speaker_name", "hospital", "department", "title", "folder", "verdict",
+    "outcome", "headline", "file_count", "contains_target", "verification_passed", "result_json"
+)
+
+INSERT_SQL = f"INSERT INTO preaudits ({', '.join(COLUMNS)}) VALUES ({', '.join('?' for _ in COLUMNS)})"
+
+# 可用于过滤的列（均有索引）
+FILTER_COLUMNS = ("speaker_name", "hospital", "folder", "verdict")
+
+MAX_QUERY_LIMIT = 500
+
+_STOP = object()
+
+
+def build_row(result: PreauditResult, created_at: Optional[float] = None) -> Dict[str, Any]:
+    """将预审结果转换为一行审计记录"""
+    extraction = result.extraction or {}
+    verification_passed = (result.verification or {}).get("verification_passed")
+    return {
+        "created_at": created_at if created_at is not None else time.time(),
+        "speaker_name": extraction.get("name") or None,
+        "hospital": extraction.get("hospital") or None,
+        "department": extraction.get("department") or None,
+        "title": extraction.get("title") or None,
+        "folder": result.folder.prefix if result.folder else None,
+        "verdict": result.verdict,
+        "outcome": result.outcome,
+        "headline": result.headline,
+        "file_count": result.file_count,
+        "contains_target": int(result.contains_target),
+        "verification_passed": None if verification_passed is None else int(bool(verification_passed)),
+        "result_json": json.dumps(result.to_dict(), ensure_ascii=False, default=str)
+    }
+
+
+def _to_timestamp(value: Union[str, float, int, None]) -> Optional[float]:
+    """将 epoch 秒数或 ISO 日期/时间（如 2024-05-01、2024-05-01T10:00:00）转换为时间戳"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return datetime.fromisoformat(str(value).strip()).timestamp()
+    except ValueError:
+        raise ValueError(f"无法解析的时间: {value}（请使用 ISO 格式，如 2024-05-01 或 2024-05-01T10:00:00）")
+
+
+class AuditStore:
+    """预审审计记录存储"""
+
+    def __init__(self, enabled: bool = False, path: str = "audit/preaudit_history.db",
+                 batch_size: int = 50, flush_interval_ms: float = 500, queue_size: int = 10000):
+        """
+        Args:
+            enabled: 是否记录预审结果
+            path: SQLite 数据库文件路径
+            batch_size: 每个写入事务的最大记录数
+            flush_interval_ms: 批量写入的最长等待时间（毫秒）
+            queue_size: 待写入队列长度上限，队列满时丢弃新记录而不阻塞请求
+        """
+        self.enabled = enabled
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = max(0.0, flush_interval_ms / 1000.0)
+        self.queue_size = max(1, queue_size)
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=self.queue_size)
+        self._lock = threading.Lock()
+        self._initialized = False
+        self._writer: Optional[threading.Thread] = None
+        self._closed = False
+        self._local = threading.local()
+        self._metrics = {"queued": 0, "written": 0, "dropped": 0, "failed": 0, "batches": 0}
+
+    # ---- 连接 ----
+
+    def _connect(self) -> sqlite3.Connection:
+        """创建连接（首次连接时创建目录、表和索引）"""
+        with self._lock:
+            if not self._initialized:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                conn = sqlite3.connect(self.path)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(SCHEMA)
+                conn.commit()
+                conn.close()
+                self._initialized = True
+        conn = sqlite3.connect(self.path, timeout=5.0)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        """当前线程的只读查询连接（WAL 模式下读取不阻塞后台写入）"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+        return conn
+
+    # ---- 写入 ----
+
+    def record(self, result: PreauditResult) -> bool:
+        """
+        将预审结果加入写入队列（不阻塞；队列满时丢弃并计数）
+
+        Returns:
+            是否已加入队列
+        """
+        if not self.enabled or self._closed:
+            return False
+        row = build_row(result)
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            with self._lock:
+                self._metrics["dropped"] += 1
+                dropped = self._metrics["dropped"]
+            # 持续积压时只按间隔告警，避免日志放大写入压力
+            if dropped % 1000 == 1:
+                logger.warning(f"审计记录队列已满，已丢弃 {dropped} 条预审记录")
+            return False
+        with self._lock:
+            self._metrics["queued"] += 1
+        return True
+
+    def _ensure_writer(self):
+        with self._lock:
+            if self._writer is not None:
+                return
+            self._writer = threading.Thread(target=self._writer_loop, name="audit-store-writer", daemon=True)
+            self._writer.start()
+        atexit.register(self.close)
+
+    def _writer_loop(self):
+        conn = self._connect()
+        stopping = False
+        while not stopping:
+            batch: List[Dict[str, Any]] = []
+            waiters: List[threading.Event] = []
+            item = self._queue.get()
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is _STOP:
+                    stopping = True
+                    break
+                if isinstance(item, threading.Event):
+                    # flush 请求：立即写入已收集的记录
+                    waiters.append(item)
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if batch:
+                self._write_batch(conn, batch)
+            for waiter in waiters:
+                waiter.set()
+        conn.close()
+
+    def _write_batch(self, conn: sqlite3.Connection, batch: List[Dict[str, Any]]):
+        try:
+            with conn:
+                conn.executemany(INSERT_SQL, [tuple(row[column] for column in COLUMNS) for row in batch])
+            with self._lock:
+                self._metrics["written"] += len(batch)
+                self._metrics["batches"] += 1
+        except sqlite3.Error as e:
+            with self._lock:
+                self._metrics["failed"] += len(batch)
+            logger.error(f"写入审计记录失败（{len(batch)} 条）: {str(e)}")
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """等待已加入队列的记录写入完成"""
+        if self._writer is None or not self._writer.is_alive():
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 5.0):
+        """写入剩余记录并停止后台线程"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._writer is not None and self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join(timeout)
+
+    # ---- 查询 ----
+
+    def query_history(self, speaker_name: Optional[str] = None, hospital: Optional[str] = None,
+                      folder: Optional[str] = None, verdict: Optional[str] = None,
+                      since: Union[str, float, None] = None, until: Union[str, float, None] = None,
+                      limit: int = 20, include_result: bool = False) -> List[Dict[str, Any]]:
+        """
+        查询预审历史（按时间倒序）
+
+        Args:
+            speaker_name: 讲者姓名（精确匹配）
+            hospital: 医院（精确匹配）
+            folder: 讲者文件夹前缀（精确匹配）
+            verdict: 结论（pass、partial_pass、fail、incomplete）
+            since: 起始时间（含），epoch 秒数或 ISO 格式
+            until: 截止时间（不含），epoch 秒数或 ISO 格式
+            limit: 返回记录数上限
+            include_result: 是否包含完整的结构化结果
+
+        Returns:
+            审计记录列表
+        """
+        filters = {"speaker_name": speaker_name, "hospital": hospital, "folder": folder, "verdict": verdict}
+        clauses = [f"{column} = ?" for column in FILTER_COLUMNS if filters[column]]
+        params: List[Any] = [filters[column] for column in FILTER_COLUMNS if filters[column]]
+        since_ts, until_ts = _to_timestamp(since), _to_timestamp(until)
+        if since_ts is not None:
+            clauses.append("created_at >= ?")
+            params.append(since_ts)
+        if until_ts is not None:
+            clauses.append("created_at < ?")
+            params.append(until_ts)
+
+        columns = ["id"] + [column for column in COLUMNS if include_result or column != "result_json"]
+        sql = f"SELECT {', '.join(columns)} FROM preaudits"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY created_at DESC, id DESC LIMIT ?"
+        params.append(max(1, min(int(limit), MAX_QUERY_LIMIT)))
+
+        records = []
+        for row in self._reader().execute(sql, params):
+            record = dict(row)
+            record["created_at"] = datetime.fromtimestamp(record["created_at"]).isoformat(timespec="seconds")
+            for flag in ("contains_target", "verification_passed"):
+                if record[flag] is not None:
+                    record[flag] = bool(record[flag])
+            if include_result:
+                record["result"] = json.loads(record.pop("result_json") or "{}")
+            records.append(record)
+        return records
+
+    def get_last_result(self, speaker_name: str, verdict: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """讲者最近一次（指定结论的）预审记录"""
+        records = self.query_history(speaker_name=speaker_name, verdict=verdict, limit=1)
+        return records[0] if records else None
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """获取写入统计"""
+        with self._lock:
+            return dict(self._metrics, enabled=self.enabled, path=self.path, queue_depth=self._queue.qsize())
+
+
+# 全局审计存储实例（默认关闭）
+_audit_store = AuditStore()
+
+
+def configure_audit_store(enabled: bool = False, path: str = "audit/preaudit_history.db",
+                          batch_size: int = 50, flush_interval_ms: float = 500,
+                          queue_size: int = 10000) -> AuditStore:
+    """配置全局审计存储实例（写入并关闭之前的实例）"""
+    global _audit_store
+    _audit_store.close()
+    _audit_store = AuditStore(enabled, path, batch_size, flush_interval_ms, queue_size)
+    if enabled:
+        logger.info(f"预审审计记录: {path}")
+    return _audit_store
+
+
+def get_audit_store() -> AuditStore:
+    """获取全局审计存储实例"""
+    return _audit_store
@@ -0,0 +1,594 @@
+#!/usr/bin/env python3
+"""
+基准测试用的本地替身服务
+进程内 S3 模拟器、可配置延迟的 Bedrock 替身和本地 EXA HTTP 服务，
+用于在没有 AWS 凭证、网络和费用的情况下测量预审流程性能
+"""
+
+import bisect
+import hashlib
+import io
+import json
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+
+SURNAMES = ["张", "王", "李", "赵", "刘", "陈", "杨", "黄", "周", "吴", "徐", "孙"]
+GIVEN_NAMES = ["伟", "芳", "娜", "敏", "静", "强", "磊", "洋", "艳", "勇", "军", "杰", "涛", "明"]
+HOSPITALS = ["北京协和医院", "上海瑞金医院", "长海医院", "华西医院", "中山医院", "湘雅医院"]
+DEPARTMENTS = ["心内科", "神经内科", "肿瘤科", "内分泌科", "呼吸科", "消化科"]
+TITLES = ["主任医师", "副主任医师", "主治医师"]
+
+# 真实 S3 单次 LIST 最多返回 1000 个键
+S3_MAX_KEYS = 1000
+
+# 未写入内容的对象按扩展名生成的文件头（其余字节填充到 SYNTHETIC_OBJECT_SIZE）
+SYNTHETIC_HEADERS = {
+    ".pdf": b"%PDF-1.7\n",
+    ".jpg": b"\xff\xd8\xff\xe0\x00\x10JFIF",
+    ".jpeg": b"\xff\xd8\xff\xe0\x00\x10JFIF",
+    ".png": b"\x89PNG\r\n\x1a\n",
+}
+SYNTHETIC_OBJECT_SIZE = 1024
+
+
+def make_doctors(count: int, seed: int = 7) -> List[Dict[str, str]]:
+    """
+    生成确定性的讲者列表（姓名唯一）
+
+    Args:
+        count: 讲者数量
+        seed: 随机种子
+
+    Returns:
+        讲者信息列表，字段与 extract_doctor_info 的返回一致
+    """
+    rng = random.Random(seed)
+    doctors = []
+    used = set()
+    while len(doctors) < count:
+        name = rng.choice(SURNAMES) + rng.choice(GIVEN_NAMES) + rng.choice(GIVEN_NAMES)
+        if name in used:
+            name = f"{name}{len(doctors)}"
+        used.add(name)
+        doctors.append({
+            "name": name,
+            "hospital": rng.choice(HOSPITALS),
+            "department": rng.choice(DEPARTMENTS),
+            "title": rng.choice(TITLES)
+        })
+    return doctors
+
+
+def doctor_folder_prefix(doctor: Dict[str, str]) -> str:
+    """讲者专属文件夹前缀（与预审流程的文件夹命名一致）"""
+    return f"{doctor['name']}-{doctor['hospital']}-{doctor['department']}/"
+
+
+class FakeS3Error(Exception):
+    """模拟 botocore ClientError 的错误结构"""
+
+    def __init__(self, code: str, message: str):
+        super().__init__(f"An error occurred ({code}): {message}")
+        self.response = {"Error": {"Code": code, "Message": message}}
+
+
+class FakeS3Client:
+    """
+    进程内 S3 模拟器，实现预审流程用到的 list_objects_v2 和 get_object
+    （按字典序存储键，支持 Prefix、Delimiter、MaxKeys、分页、文件夹占位对象和 Range 读取）
+    """
+
+    def __init__(self, latency: float = 0.0):
+        """
+        Args:
+            latency: 每次请求的模拟延迟（秒）
+        """
+        self.latency = latency
+        self.calls = 0
+        self.get_calls = 0
+        self._buckets: Dict[str, List[str]] = {}
+        self._bodies: Dict[tuple, bytes] = {}
+        self._lock = threading.Lock()
+
+    def put_object(self, Bucket: str, Key: str, Body: Optional[bytes] = None, **kwargs):
+        """写入一个对象（未提供内容时只记录键，读取时按扩展名生成内容）"""
+        with self._lock:
+            keys = self._buckets.setdefault(Bucket, [])
+            index = bisect.bisect_left(keys, Key)
+            if index == len(keys) or keys[index] != Key:
+                keys.insert(index, Key)
+            if Body is not None:
+                self._bodies[(Bucket, Key)] = Body
+            else:
+                self._bodies.pop((Bucket, Key), None)
+
+    def get_object(self, Bucket: str, Key: str, Range: Optional[str] = None, **kwargs) -> Dict[str, Any]:
+        """读取对象内容，支持 bytes=start-end 形式的 Range"""
+        with self._lock:
+            self.calls += 1
+            self.get_calls += 1
+            keys = self._buckets.get(Bucket)
+            if keys is None:
+                raise FakeS3Error("NoSuchBucket", "The specified bucket does not exist")
+            index = bisect.bisect_left(keys, Key)
+            if index == len(keys) or keys[index] != Key:
+                raise FakeS3Error("NoSuchKey", "The specified key does not exist")
+            body = self._body(Bucket, Key)
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        if Range:
+            start, _, end = Range[len("bytes="):].partition("-")
+            body = body[int(start):int(end) + 1 if end else None]
+        return {"Body": io.BytesIO(body), "ContentLength": len(body), "ETag": self._etag(Bucket, Key)}
+
+    def _body(self, bucket: str, key: str) -> bytes:
+        body = self._bodies.get((bucket, key))
+        if body is not None:
+            return body
+        if key.endswith("/"):
+            return b""
+        extension = key[key.rfind("."):].lower() if "." in key else ""
+        header = SYNTHETIC_HEADERS.get(extension, b"")
+        return header + b"\x00" * (SYNTHETIC_OBJECT_SIZE - len(header))
+
+    def _etag(self, bucket: str, key: str) -> str:
+        body = self._bodies.get((bucket, key))
+        digest = hashlib.md5(body if body is not None else key.encode("utf-8")).hexdigest()
+        return '"%s"' % digest
+
+    def list_objects_v2(self, Bucket: str, Prefix: str = "", MaxKeys: int = S3_MAX_KEYS,
+                        ContinuationToken: Optional[str] = None, StartAfter: Optional[str] = None,
+                        Delimiter: str = "", **kwargs) -> Dict[str, Any]:
+        """按前缀列出对象（指定 Delimiter 时下一级合并为 CommonPrefixes），返回结构与 boto3 一致"""
+        with self._lock:
+            self.calls += 1
+            if Bucket not in self._buckets:
+                raise FakeS3Error("NoSuchBucket", "The specified bucket does not exist")
+            keys = self._buckets[Bucket]
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        start_key = ContinuationToken or StartAfter or ""
+        start = bisect.bisect_left(keys, Prefix)
+        if start_key:
+            if Delimiter and start_key.endswith(Delimiter) and len(start_key) > len(Prefix):
+                # 上一页以 CommonPrefixes 结束：跳过该前缀下的全部对象
+                start_key += "\U0010ffff"
+            start = max(start, bisect.bisect_right(keys, start_key))
+
+        max_keys = min(MaxKeys, S3_MAX_KEYS)
+        contents, common_prefixes = [], []
+        last = ""
+        index = start
+        while index < len(keys) and keys[index].startswith(Prefix):
+            if len(contents) + len(common_prefixes) >= max_keys:
+                break
+            key = keys[index]
+            position = key.find(Delimiter, len(Prefix)) if Delimiter else -1
+            if position < 0:
+                contents.append(self._object(Bucket, key))
+                last = key
+                index += 1
+                continue
+            # 同一前缀下的对象合并为一个 CommonPrefixes，跳到该前缀之后
+            common = key[:position + len(Delimiter)]
+            common_prefixes.append({"Prefix": common})
+            last = common
+            index = bisect.bisect_left(keys, common + "\U0010ffff")
+        is_truncated = index < len(keys) and keys[index].startswith(Prefix)
+
+        response = {
+            "Name": Bucket,
+            "Prefix": Prefix,
+            "MaxKeys": MaxKeys,
+            "KeyCount": len(contents) + len(common_prefixes),
+            "IsTruncated": is_truncated
+        }
+        if contents:
+            response["Contents"] = contents
+        if common_prefixes:
+            response["CommonPrefixes"] = common_prefixes
+        if is_truncated:
+            response["NextContinuationToken"] = last
+        return response
+
+    def _object(self, bucket: str, key: str) -> Dict[str, Any]:
+        body = self._bodies.get((bucket, key))
+        return {
+            "Key": key,
+            "Size": len(body) if body is not None else (0 if key.endswith("/") else SYNTHETIC_OBJECT_SIZE),
+            "ETag": self._etag(bucket, key),
+            "LastModified": datetime(2024, 1, 1, tzinfo=timezone.utc),
+            "StorageClass": "STANDARD"
+        }
+
+
+def make_pdf(pages: List[str], padding: int = 0, compress: bool = True) -> bytes:
+    """
+    生成带文本层的 PDF（Type0 字体 + ToUnicode 映射），用于测试文本提取
+
+    Args:
+        pages: 每页的文本（按行分隔）
+        padding: 每页之后插入的填充对象字节数（模拟扫描图片等大对象）
+        compress: 内容流是否使用 FlateDecode 压缩
+    """
+    import zlib
+    codes = {char: index + 1 for index, char in enumerate(sorted(set("".join(pages)) - {"\n"}))}
+    mappings = "".join(f"<{code:04X}> <{ord(char):04X}>\n" for char, code in codes.items())
+    cmap = (f"/CIDInit /ProcSet findresource begin\n12 dict begin\nbegincmap\n"
+            f"1 begincodespacerange\n<0000> <FFFF>\nendcodespacerange\n"
+            f"{len(codes)} beginbfchar\n{mappings}endbfchar\nendcmap\nend\nend\n").encode("ascii")
+
+    objects: List[bytes] = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        ("<< /Type /Pages /Kids [%s] /Count %d >>" % (
+            " ".join(f"{5 + 3 * i} 0 R" for i in range(len(pages))), len(pages))).encode("ascii"),
+        b"<< /Type /Font /Subtype /Type0 /BaseFont /SimSun /Encoding /Identity-H /ToUnicode 4 0 R >>",
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(cmap), cmap),
+    ]
+    for i, text in enumerate(pages):
+        lines = []
+        for line in text.split("\n"):
+            hex_codes = "".join(f"{codes[char]:04X}" for char in line)
+            lines.append(f"<{hex_codes}> Tj T*")
+        content = ("BT /F1 12 Tf 14 TL 72 800 Td\n" + "\n".join(lines) + "\nET").encode("ascii")
+        flate = b""
+        if compress:
+            content = zlib.compress(content)
+            flate = b" /Filter /FlateDecode"
+        objects.append(("<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                        "/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (6 + 3 * i)).encode("ascii"))
+        objects.append(b"<< /Length %d%s >>\nstream\n%s\nendstream" % (len(content), flate, content))
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (padding, b"\x00" * padding))
+
+    out = bytearray(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def photo_pixels(seed: int, width: int, height: int) -> List[int]:
+    """
+    生成确定性的“照片”灰度像素（随机粗网格双线性插值，不同尺寸下低频结构相同）
+
+    同一个 seed 在不同尺寸下得到同一张照片的缩放版本，不同 seed 得到不同的照片
+    """
+    rng = random.Random(seed)
+    grid = 7
+    coarse = [[rng.randint(0, 255) for _ in range(grid)] for _ in range(grid)]
+    pixels = []
+    for y in range(height):
+        gy = y * (grid - 1) / max(1, height - 1)
+        y0 = min(int(gy), grid - 2)
+        fy = gy - y0
+        for x in range(width):
+            gx = x * (grid - 1) / max(1, width - 1)
+            x0 = min(int(gx), grid - 2)
+            fx = gx - x0
+            top = coarse[y0][x0] * (1 - fx) + coarse[y0][x0 + 1] * fx
+            bottom = coarse[y0 + 1][x0] * (1 - fx) + coarse[y0 + 1][x0 + 1] * fx
+            pixels.append(int(round(top * (1 - fy) + bottom * fy)))
+    return pixels
+
+
+def make_png(width: int, height: int, pixels: List[int], color: bool = False) -> bytes:
+    """
+    将灰度像素编码为 8 位 PNG（逐行轮流使用五种过滤类型），用于测试图片解码
+
+    Args:
+        color: 是否写成 RGB（三个通道取相同的值）
+    """
+    import struct
+    import zlib
+    bpp = 3 if color else 1
+    stride = width * bpp
+    raw = bytearray()
+    previous = bytearray(stride)
+    for y in range(height):
+        row = bytearray()
+        for value in pixels[y * width:(y + 1) * width]:
+            row.extend([value] * bpp)
+        kind = y % 5
+        filtered = bytearray()
+        for i, value in enumerate(row):
+            left = row[i - bpp] if i >= bpp else 0
+            upper_left = previous[i - bpp] if i >= bpp else 0
+            if kind == 1:
+                predictor = left
+            elif kind == 2:
+                predictor = previous[i]
+            elif kind == 3:
+                predictor = (left + previous[i]) // 2
+            elif kind == 4:
+                p = left + previous[i] - upper_left
+                pa, pb, pc = abs(p - left), abs(p - previous[i]), abs(p - upper_left)
+                predictor = left if pa <= pb and pa <= pc else previous[i] if pb <= pc else upper_left
+            else:
+                predictor = 0
+            filtered.append((value - predictor) & 0xFF)
+        raw += bytes([kind]) + filtered
+        previous = row
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2 if color else 0, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(bytes(raw)))
+            + chunk(b"IEND", b""))
+
+
+def make_jpeg(width: int, height: int, pixels: List[int], color: bool = False, restart_interval: int = 0) -> bytes:
+    """
+    将灰度像素编码为基线 JPEG，用于测试图片解码
+
+    每个 8x8 块只编码平均亮度（DC）和少量 AC 系数（量化表全为 1，自定义哈夫曼表），
+    解码出的 DC 系数即各块的平均亮度
+
+    Args:
+        color: 是否写成 YCbCr 4:2:0（亮度 2x2 采样，色度为常数）
+        restart_interval: 重启间隔（MCU 数，0 表示不使用重启标记）
+    """
+    import struct
+    h = v = 2 if color else 1
+    mcus_x = -(-width // (8 * h))
+    mcus_y = -(-height // (8 * v))
+
+    def block_mean(bx: int, by: int) -> float:
+        total = 0
+        for y in range(by * 8, by * 8 + 8):
+            row = min(y, height - 1) * width
+            total += sum(pixels[row + min(x, width - 1)] for x in range(bx * 8, bx * 8 + 8))
+        return total / 64
+
+    dc_codes = {size: format(size, "04b") for size in range(12)}
+    ac_codes = {0x00: "00", 0x01: "01", 0x11: "10", 0xF0: "11"}
+    bits: List[str] = []
+    out = bytearray()
+
+    def put(code: str):
+        bits.append(code)
+
+    def put_value(value: int, size: int):
+        if size:
+            put(format(value if value >= 0 else value + (1 << size) - 1, f"0{size}b"))
+
+    def flush():
+        data = "".join(bits)
+        data += "1" * (-len(data) % 8)
+        for i in range(0, len(data), 8):
+            byte = int(data[i:i + 8], 2)
+            out.append(byte)
+            if byte == 0xFF:
+                out.append(0x00)
+        bits.clear()
+
+    predictions = [0, 0, 0]
+    block_index = 0
+    for mcu in range(mcus_x * mcus_y):
+        if restart_interval and mcu and mcu % restart_interval == 0:
+            flush()
+            out += bytes([0xFF, 0xD0 + (mcu // restart_interval - 1) % 8])
+            predictions = [0, 0, 0]
+        mcu_x, mcu_y = mcu % mcus_x, mcu // mcus_x
+        for by in range(v):
+            for bx in range(h):
+                dc = int(round(8 * (block_mean(mcu_x * h + bx, mcu_y * v + by) - 128)))
+                diff, predictions[0] = dc - predictions[0], dc
+                size = abs(diff).bit_length()
+                put(dc_codes[size])
+                put_value(diff, size)
+                pattern = block_index % 3
+                block_index += 1
+                if pattern == 1:
+                    put(ac_codes[0x01])
+                    put_value(-1 if block_index % 2 else 1, 1)
+                elif pattern == 2:
+                    put(ac_codes[0xF0])
+                    put(ac_codes[0x11])
+                    put_value(1, 1)
+                put(ac_codes[0x00])
+        if color:
+            for _ in range(2):
+                put(dc_codes[0])
+                put(ac_codes[0x00])
+    flush()
+
+    def segment(marker: int, data: bytes) -> bytes:
+        return bytes([0xFF, marker]) + struct.pack(">H", len(data) + 2) + data
+
+    components = [(1, (h << 4) | v)] + ([(2, 0x11), (3, 0x11)] if color else [])
+    frame = struct.pack(">BHHB", 8, height, width, len(components))
+    frame += b"".join(bytes([cid, sampling, 0]) for cid, sampling in components)
+    dc_table = bytes([0x00]) + bytes([0, 0, 0, 12] + [0] * 12) + bytes(range(12))
+    ac_table = bytes([0x10]) + bytes([0, 4] + [0] * 14) + bytes(sorted(ac_codes, key=ac_codes.get))
+    scan = bytes([len(components)]) + b"".join(bytes([cid, 0x00]) for cid, _ in components) + bytes([0, 63, 0])
+    header = b"\xff\xd8" + segment(0xDB, bytes([0]) + bytes([1] * 64)) + segment(0xC0, frame)
+    header += segment(0xC4, dc_table) + segment(0xC4, ac_table)
+    if restart_interval:
+        header += segment(0xDD, struct.pack(">H", restart_interval))
+    return header + segment(0xDA, scan) + bytes(out) + b"\xff\xd9"
+
+
+def seed_s3_emulator(client: FakeS3Client, bucket: str, doctors: List[Dict[str, str]],
+                     files_per_folder: int, folder_markers: bool = True):
+    """
+    为每位讲者创建专属文件夹并写入支撑文档
+
+    Args:
+        client: S3 模拟器
+        bucket: 存储桶名称
+        doctors: 讲者列表
+        files_per_folder: 每个文件夹的文档数量
+        folder_markers: 是否写入文件夹占位对象（以 '/' 结尾的键）
+    """
+    for doctor in doctors:
+        prefix = doctor_folder_prefix(doctor)
+        if folder_markers:
+            client.put_object(Bucket=bucket, Key=prefix)
+        for i in range(files_per_folder):
+            client.put_object(Bucket=bucket, Key=f"{prefix}document_{i:04d}.pdf")
+
+
+class FakeBedrockClient:
+    """Bedrock Runtime 替身，invoke_model 按配置的延迟返回 Claude 格式的响应"""
+
+    def __init__(self, doctors: List[Dict[str, str]], latency: float = 0.0,
+                 responder: Optional[Callable[[str], Dict[str, str]]] = None):
+        """
+        Args:
+            doctors: 已知讲者列表，默认响应返回提示词中出现的讲者信息
+            latency: 每次调用的模拟延迟（秒）
+            responder: 自定义响应函数，参数为提示词，返回提取结果字典
+        """
+        self.doctors = doctors
+        self.latency = latency
+        self.responder = responder or self._lookup_doctor
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _lookup_doctor(self, prompt: str) -> Dict[str, str]:
+        for doctor in self.doctors:
+            if doctor["name"] in prompt:
+                return doctor
+        return {"name": "", "hospital": "", "department": "", "title": ""}
+
+    def invoke_model(self, modelId: str, body: str, **kwargs) -> Dict[str, Any]:
+        """模拟 bedrock-runtime invoke_model"""
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        request = json.loads(body)
+        prompt = request["messages"][0]["content"]
+        text = json.dumps(self.responder(prompt), ensure_ascii=False)
+        payload = {
+            "id": "msg_fake",
+            "type": "message",
+            "role": "assistant",
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn",
+            "usage": {"input_tokens": len(prompt), "output_tokens": len(text)}
+        }
+        return {
+            "body": io.BytesIO(json.dumps(payload, ensure_ascii=False).encode("utf-8")),
+            "contentType": "application/json",
+            "ResponseMetadata": {"HTTPStatusCode": 200}
+        }
+
+
+class FakeExaServer:
+    """
+    本地 EXA HTTP 服务（POST /search），在后台线程中运行
+    默认返回包含查询内容的搜索结果，使已知讲者的匹配分数达到验证通过标准
+    """
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0,
+                 error_status: int = 429, num_results: int = 5, seed: int = 7):
+        """
+        Args:
+            latency: 每次请求的模拟延迟（秒）
+            error_rate: 返回错误状态码的请求比例（0-1）
+            error_status: 错误状态码（如 429、503）
+            num_results: 每次返回的结果数量
+            seed: 错误注入的随机种子
+        """
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.num_results = num_results
+        self.requests = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        """服务地址，可写入 [EXA] BASE_URL"""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _next_status(self) -> int:
+        with self._lock:
+            self.requests += 1
+            if self.error_rate and self._rng.random() < self.error_rate:
+                return self.error_status
+        return 200
+
+    def _search_response(self, query: str) -> Dict[str, Any]:
+        return {
+            "requestId": "fake",
+            "autopromptString": query,
+            "results": [
+                {
+                    "title": f"{query} - 医院专家介绍",
+                    "url": f"https://example.com/doctor/{i}",
+                    "text": f"{query}，擅长常见病和疑难病诊治，出诊时间见医院官网。"
+                }
+                for i in range(self.num_results)
+            ]
+        }
+
+    def start(self) -> "FakeExaServer":
+        """在随机端口启动服务"""
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                if fake.latency:
+                    time.sleep(fake.latency)
+
+                status = fake._next_status()
+                if self.path != "/search":
+                    status = 404
+                if status == 200:
+                    body = fake._search_response(request.get("query", ""))
+                else:
+                    body = {"error": f"fake status {status}"}
+                data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """停止服务"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "FakeExaServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
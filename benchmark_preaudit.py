@@ -0,0 +1,541 @@
+#!/usr/bin/env python3
+"""
+预审流程离线基准测试
+使用本地替身服务（benchmark_fakes.py）运行各场景，统计吞吐量、p50/p95/p99 延迟、
+每次调用的内存分配和外部调用次数，并与保存的基线比较
+
+用法:
+    python benchmark_preaudit.py                          # 运行全部场景
+    python benchmark_preaudit.py --save-baseline          # 保存为基线
+    python benchmark_preaudit.py --fail-on-regression     # 与基线比较，退化时返回非零退出码
+    python benchmark_preaudit.py --scenarios perform_preaudit --bedrock-latency 0.2
+    python benchmark_preaudit.py --cassette cassettes/traffic.jsonl --inputs inputs.txt \
+        --bucket pharma-documents-bucket --replay-latency   # 回放录制的真实流量
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from benchmark_fakes import (
+    FakeBedrockClient,
+    FakeExaServer,
+    FakeS3Client,
+    doctor_folder_prefix,
+    make_doctors,
+    seed_s3_emulator
+)
+from cost_ledger import estimate_cost, get_cost_ledger
+
+DEFAULT_BASELINE = "benchmark_baseline.json"
+BENCHMARK_BUCKET = "benchmark-documents-bucket"
+TARGET_DOCTOR = {"name": "鲍娜", "hospital": "长海医院", "department": "心内科", "title": "主任医师"}
+
+SCENARIOS = [
+    "list_s3_files_with_prefix",
+    "check_string_content",
+    "perform_preaudit",
+    "perform_preaudit_target",
+    "mcp_perform_preaudit",
+    "async_perform_preaudit"
+]
+# 回放录制流量的场景（需要 --cassette 和 --inputs）
+CASSETTE_SCENARIO = "cassette_replay"
+
+# 参与基线比较的指标 -> 是否越大越好
+COMPARED_METRICS = {
+    "throughput": True,
+    "p50_ms": False,
+    "p95_ms": False,
+    "p99_ms": False,
+    "alloc_kib_per_op": False,
+    "usd_per_op": False
+}
+
+# 基准测试配置：假凭证，弹性层限流放宽到不影响测量
+BENCHMARK_CONFIG = """[AWS]
+ACCESS_KEY_ID = AKIABENCHMARK
+SECRET_ACCESS_KEY = benchmark-secret
+REGION = us-east-1
+
+[EXA]
+EXA_API_KEY = benchmark-exa-key
+BASE_URL = {exa_base_url}
+
+[S3]
+BUCKET_NAME = {bucket}
+
+[PREAUDIT]
+TARGET_WORD = {target_word}
+MIN_FILE_COUNT = {min_file_count}
+TIMEOUT_SECONDS = {timeout_seconds}
+
+[RESILIENCE]
+BEDROCK_RATE = 100000
+BEDROCK_BURST = 100000
+EXA_RATE = 100000
+EXA_BURST = 100000
+MAX_ATTEMPTS = 3
+BASE_DELAY = 0.01
+MAX_DELAY = 0.1
+BREAKER_FAILURE_THRESHOLD = 1000
+BREAKER_RECOVERY_SECONDS = 1
+"""
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """最近秩百分位数"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(latencies: List[float], wall_seconds: float, errors: int) -> Dict[str, float]:
+    """汇总一个场景的延迟样本（秒）"""
+    return {
+        "ops": len(latencies),
+        "errors": errors,
+        "throughput": round(len(latencies) / wall_seconds, 2) if wall_seconds > 0 else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(max(latencies) * 1000, 3) if latencies else 0.0
+    }
+
+
+def compare_to_baseline(current: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+                        threshold: float) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    与基线比较
+
+    Args:
+        current: 本次结果（场景 -> 指标）
+        baseline: 基线结果
+        threshold: 允许的相对退化比例（如 0.1 表示 10%）
+
+    Returns:
+        (全部比较结果, 超过阈值的退化项)
+    """
+    comparisons = []
+    regressions = []
+    for scenario, metrics in current.items():
+        base_metrics = baseline.get(scenario)
+        if not base_metrics:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            base = base_metrics.get(metric)
+            value = metrics.get(metric)
+            if not base or value is None:
+                continue
+            change = (value - base) / base
+            worse = -change if higher_is_better else change
+            item = {
+                "scenario": scenario,
+                "metric": metric,
+                "baseline": base,
+                "current": value,
+                "change": round(change, 4),
+                "regression": worse > threshold
+            }
+            comparisons.append(item)
+            if item["regression"]:
+                regressions.append(item)
+    return comparisons, regressions
+
+
+class BenchmarkEnvironment:
+    """
+    基准测试环境：启动 EXA 替身服务，生成临时配置，并将预审模块的
+    S3 / Bedrock 客户端替换为本地替身
+    """
+
+    def __init__(self, doctors: int, files_per_folder: int, min_file_count: int = 3,
+                 s3_latency: float = 0.0, bedrock_latency: float = 0.0,
+                 exa_latency: float = 0.0, exa_error_rate: float = 0.0,
+                 timeout_seconds: float = 25.0, seed: int = 7,
+                 cassette_path: Optional[str] = None, replay_latency: bool = False,
+                 bucket: Optional[str] = None, inputs: Optional[List[str]] = None):
+        self.cassette_path = cassette_path
+        self.replay_latency = replay_latency
+        self.bucket = bucket or BENCHMARK_BUCKET
+        self.inputs = inputs or []
+        self.doctors = make_doctors(doctors, seed) + [TARGET_DOCTOR]
+        self.files_per_folder = files_per_folder
+        self.min_file_count = min_file_count
+        self.timeout_seconds = timeout_seconds
+        self.s3 = FakeS3Client(latency=s3_latency)
+        self.bedrock = FakeBedrockClient(self.doctors, latency=bedrock_latency)
+        self.exa = FakeExaServer(latency=exa_latency, error_rate=exa_error_rate, seed=seed)
+        self.tools = None
+        self._config_path = None
+        self._patched: List[Tuple[Any, str, Any]] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[threading.Thread] = None
+        self._previous_cassette = None
+        self._previous_audit = None
+        self._audit_dir = None
+
+    def __enter__(self) -> "BenchmarkEnvironment":
+        seed_s3_emulator(self.s3, BENCHMARK_BUCKET, self.doctors, self.files_per_folder)
+        self.exa.start()
+
+        settings = {
+            "exa_base_url": self.exa.base_url,
+            "bucket": self.bucket,
+            "target_word": TARGET_DOCTOR["name"],
+            "min_file_count": self.min_file_count,
+            "timeout_seconds": self.timeout_seconds
+        }
+        fd, self._config_path = tempfile.mkstemp(prefix="speaker_validation_bench_", suffix=".config")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(BENCHMARK_CONFIG.format(**settings))
+        os.environ["SPEAKER_VALIDATION_CONFIG"] = self._config_path
+
+        # 基准测试不向 CloudWatch 发送日志（假凭证下只会产生网络重试）
+        import cloudwatch_logger
+        cloudwatch_logger.WATCHTOWER_AVAILABLE = False
+
+        import speaker_validation_tools as tools
+        from cassette import MODE_REPLAY, configure_cassette, get_cassette
+        from resilience import configure_dependency_guard
+        self.tools = tools
+
+        # 模块已被提前导入时配置文件不会重新读取，这里通过配置覆盖值发布包含基准测试设置的快照
+        from config_service import get_config_service
+        config_service = get_config_service()
+        config_service.set_overrides("exa", api_key="benchmark-exa-key", base_url=self.exa.base_url)
+        config_service.set_overrides("s3", bucket_name=self.bucket)
+        config_service.set_overrides(
+            "preaudit",
+            target_word=TARGET_DOCTOR["name"],
+            min_file_count=self.min_file_count,
+            timeout_seconds=self.timeout_seconds
+        )
+        # 审计记录写入临时数据库（与生产一样在后台线程批量写入，计入测量）
+        from audit_store import configure_audit_store, get_audit_store
+        self._previous_audit = get_audit_store()
+        self._audit_dir = tempfile.mkdtemp(prefix="speaker_validation_bench_audit_")
+        configure_audit_store(enabled=True, path=os.path.join(self._audit_dir, "preaudit_history.db"))
+        for name in ("bedrock", "exa"):
+            configure_dependency_guard(name, rate=100000, burst=100000, max_attempts=3,
+                                       base_delay=0.01, max_delay=0.1,
+                                       failure_threshold=1000, recovery_timeout=1)
+
+        if self.cassette_path:
+            # 回放录制的真实流量：客户端和 EXA 请求均由录制文件提供
+            self._previous_cassette = get_cassette()
+            configure_cassette(MODE_REPLAY, self.cassette_path, simulate_latency=self.replay_latency)
+            return self
+
+        import async_tools
+        from async_tools import ThreadedClient
+
+        async def async_s3_client(timeout=None):
+            return ThreadedClient(self.s3)
+
+        async def async_bedrock_client(timeout=None):
+            return ThreadedClient(self.bedrock)
+
+        # 异步版本的替身客户端在线程中调用同一组替身（替身的延迟为阻塞等待）
+        self._patch(tools, "create_s3_client", lambda timeout=None: self.s3)
+        self._patch(tools, "create_bedrock_client", lambda timeout=None: self.bedrock)
+        self._patch(async_tools, "create_async_s3_client", async_s3_client)
+        self._patch(async_tools, "create_async_bedrock_client", async_bedrock_client)
+        return self
+
+    def _patch(self, module: Any, name: str, replacement: Any):
+        self._patched.append((module, name, getattr(module, name)))
+        setattr(module, name, replacement)
+
+    def __exit__(self, *exc):
+        for module, name, func in reversed(self._patched):
+            setattr(module, name, func)
+        from config_service import get_config_service
+        get_config_service().clear_overrides()
+        if self._previous_cassette is not None:
+            from cassette import configure_cassette
+            previous = self._previous_cassette
+            configure_cassette(previous.mode, previous.path, previous.simulate_latency, previous.latency_scale)
+        if self._previous_audit is not None:
+            from audit_store import configure_audit_store
+            previous = self._previous_audit
+            configure_audit_store(previous.enabled, previous.path, previous.batch_size,
+                                  previous.flush_interval * 1000, previous.queue_size)
+            shutil.rmtree(self._audit_dir, ignore_errors=True)
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop_thread.join(5)
+        self.exa.stop()
+        if self._config_path and os.path.exists(self._config_path):
+            os.remove(self._config_path)
+
+    def call_counts(self) -> Dict[str, int]:
+        """各替身服务的累计调用次数"""
+        return {"s3": self.s3.calls, "bedrock": self.bedrock.calls, "exa": self.exa.requests}
+
+    def submission(self, doctor: Dict[str, str]) -> str:
+        """医药代表提交的讲者信息文本"""
+        return (f"{doctor['name']}医生，{doctor['hospital']}{doctor['department']}{doctor['title']}，"
+                f"将在学术会议上分享诊疗经验")
+
+    def run_async(self, coro):
+        """在后台事件循环中执行协程（模拟 MCP server 的常驻事件循环）"""
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+            self._loop_thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+            self._loop_thread.start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def scenario(self, name: str, rng: random.Random) -> Optional[Callable[[], Any]]:
+        """构造场景的单次调用函数，依赖不可用时返回 None"""
+        tools = self.tools
+        regular = self.doctors[:-1]
+
+        if name == CASSETTE_SCENARIO:
+            if not self.cassette_path or not self.inputs:
+                print(f"⚠️  跳过场景 {name}: 需要 --cassette 和 --inputs")
+                return None
+            return lambda: tools.perform_preaudit(rng.choice(self.inputs))
+        if self.cassette_path:
+            print(f"⚠️  跳过场景 {name}: 回放模式下只运行 {CASSETTE_SCENARIO}")
+            return None
+        if name == "list_s3_files_with_prefix":
+            return lambda: tools.list_s3_files_with_prefix(
+                BENCHMARK_BUCKET, doctor_folder_prefix(rng.choice(regular)))
+        if name == "check_string_content":
+            return lambda: tools.check_string_content(self.submission(rng.choice(regular)))
+        if name == "perform_preaudit":
+            return lambda: tools.perform_preaudit(self.submission(rng.choice(regular)))
+        if name == "perform_preaudit_target":
+            return lambda: tools.perform_preaudit(self.submission(TARGET_DOCTOR))
+        if name == "mcp_perform_preaudit":
+            try:
+                import mcp_server
+            except ImportError as e:
+                print(f"⚠️  跳过场景 {name}: MCP 依赖不可用 ({e})")
+                return None
+            return lambda: self.run_async(mcp_server.handle_call_tool(
+                "perform_preaudit", {"user_input": self.submission(rng.choice(regular))}))
+        if name == "async_perform_preaudit":
+            import async_tools
+            return lambda: self.run_async(async_tools.perform_preaudit(self.submission(rng.choice(regular))))
+        raise ValueError(f"未知的场景: {name}")
+
+
+def run_scenario(env: BenchmarkEnvironment, op: Callable[[], Any], iterations: int,
+                 concurrency: int, warmup: int, alloc_iterations: int) -> Dict[str, float]:
+    """
+    运行一个场景：预热、计时（可并发）、内存分配统计（串行）
+
+    Returns:
+        场景指标
+    """
+    for _ in range(warmup):
+        op()
+
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+
+    def timed_op():
+        nonlocal errors
+        started = time.perf_counter()
+        try:
+            op()
+            failed = False
+        except Exception:
+            failed = True
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            if failed:
+                errors += 1
+
+    calls_before = env.call_counts()
+    usage_before = get_cost_ledger().get_metrics()["totals"]
+    wall_started = time.perf_counter()
+    if concurrency <= 1:
+        for _ in range(iterations):
+            timed_op()
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for _ in range(iterations):
+                pool.submit(timed_op)
+    wall = time.perf_counter() - wall_started
+    calls_after = env.call_counts()
+    usage_after = get_cost_ledger().get_metrics()["totals"]
+
+    result = summarize(latencies, wall, errors)
+    for dependency, count in calls_after.items():
+        result[f"{dependency}_calls_per_op"] = round((count - calls_before[dependency]) / max(iterations, 1), 3)
+    # 按 [COST] 单价估算的每次调用费用（含 token 数、搜索次数等，而非仅调用次数）
+    usage = {name: usage_after[name] - usage_before[name] for name in usage_after}
+    result["usd_per_op"] = round(estimate_cost(usage, get_cost_ledger().pricing)["total"] / max(iterations, 1), 8)
+
+    # 内存分配：每次调用期间的峰值增量（串行执行，避免并发调用互相干扰）
+    if alloc_iterations > 0:
+        tracemalloc.start()
+        start_current, _ = tracemalloc.get_traced_memory()
+        per_op = []
+        for _ in range(alloc_iterations):
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            op()
+            _, peak = tracemalloc.get_traced_memory()
+            per_op.append(peak - before)
+        end_current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result["alloc_kib_per_op"] = round(sum(per_op) / len(per_op) / 1024, 2)
+        result["retained_kib"] = round((end_current - start_current) / 1024, 2)
+
+    return result
+
+
+def print_results(results: Dict[str, Dict[str, float]]):
+    """打印结果表"""
+    header = f"{'场景':<28}{'ops/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'KiB/op':>10}{'S3/op':>8}{'LLM/op':>8}{'EXA/op':>8}"
+    print(header)
+    print("-" * len(header))
+    for name, m in results.items():
+        print(f"{name:<28}{m['throughput']:>10.1f}{m['p50_ms']:>10.2f}{m['p95_ms']:>10.2f}{m['p99_ms']:>10.2f}"
+              f"{m.get('alloc_kib_per_op', 0):>10.1f}{m['s3_calls_per_op']:>8.2f}"
+              f"{m['bedrock_calls_per_op']:>8.2f}{m['exa_calls_per_op']:>8.2f}")
+
+
+def print_comparisons(comparisons: List[Dict[str, Any]], threshold: float):
+    """打印与基线的比较"""
+    print(f"\n与基线比较（退化阈值 {threshold:.0%}）:")
+    for item in comparisons:
+        flag = "❌" if item["regression"] else "✅"
+        print(f"  {flag} {item['scenario']:<28}{item['metric']:<18}"
+              f"{item['baseline']:>10} -> {item['current']:<10} ({item['change']:+.1%})")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="预审流程离线基准测试")
+    parser.add_argument("--scenarios", help="逗号分隔的场景列表（默认全部合成场景；指定 --cassette 时为 cassette_replay）")
+    parser.add_argument("--doctors", type=int, default=50, help="S3 模拟器中的讲者文件夹数量")
+    parser.add_argument("--files", type=int, default=5, help="每个讲者文件夹的文档数量")
+    parser.add_argument("--min-file-count", type=int, default=3, help="支撑文档的最低数量要求")
+    parser.add_argument("--iterations", type=int, default=200, help="每个场景的计时调用次数")
+    parser.add_argument("--warmup", type=int, default=10, help="每个场景的预热调用次数")
+    parser.add_argument("--concurrency", type=int, default=1, help="并发调用数")
+    parser.add_argument("--alloc-iterations", type=int, default=20, help="内存分配统计的调用次数（0 表示不统计）")
+    parser.add_argument("--s3-latency", type=float, default=0.0, help="S3 模拟延迟（秒）")
+    parser.add_argument("--bedrock-latency", type=float, default=0.0, help="Bedrock 模拟延迟（秒）")
+    parser.add_argument("--exa-latency", type=float, default=0.0, help="EXA 模拟延迟（秒）")
+    parser.add_argument("--exa-error-rate", type=float, default=0.0, help="EXA 返回 429 的比例")
+    parser.add_argument("--timeout-seconds", type=float, default=25.0, help="单次预审的时间预算")
+    parser.add_argument("--seed", type=int, default=7, help="随机种子")
+    parser.add_argument("--cassette", help="回放的录制文件（见 cassette.py）")
+    parser.add_argument("--inputs", help="回放场景的提交内容文件（每行一条）")
+    parser.add_argument("--bucket", help="回放场景的 S3 存储桶名称（需与录制时一致）")
+    parser.add_argument("--replay-latency", action="store_true", help="回放时模拟录制的原始延迟")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="基线文件路径")
+    parser.add_argument("--save-baseline", action="store_true", help="将本次结果保存为基线")
+    parser.add_argument("--threshold", type=float, default=0.10, help="允许的相对退化比例")
+    parser.add_argument("--fail-on-regression", action="store_true", help="存在退化时返回非零退出码")
+    parser.add_argument("--output", help="将结果写入 JSON 文件")
+    parser.add_argument("--verbose", action="store_true", help="保留预审流程的日志输出")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    """主函数"""
+    args = parse_args(argv)
+    if not args.verbose:
+        # 日志输出会主导微秒级的测量结果
+        logging.disable(logging.CRITICAL)
+
+    default_scenarios = [CASSETTE_SCENARIO] if args.cassette else SCENARIOS
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()] \
+        if args.scenarios else default_scenarios
+    inputs = []
+    if args.inputs:
+        with open(args.inputs, encoding="utf-8") as f:
+            inputs = [line.strip() for line in f if line.strip()]
+    params = {key: value for key, value in vars(args).items()
+              if key not in ("baseline", "save_baseline", "threshold", "fail_on_regression", "output", "verbose")}
+
+    print("=" * 60)
+    print("预审流程离线基准测试")
+    print("=" * 60)
+    print(f"讲者文件夹: {args.doctors} × {args.files} 个文档, 迭代: {args.iterations}, 并发: {args.concurrency}")
+
+    results: Dict[str, Dict[str, float]] = {}
+    with BenchmarkEnvironment(
+        doctors=args.doctors,
+        files_per_folder=args.files,
+        min_file_count=args.min_file_count,
+        s3_latency=args.s3_latency,
+        bedrock_latency=args.bedrock_latency,
+        exa_latency=args.exa_latency,
+        exa_error_rate=args.exa_error_rate,
+        timeout_seconds=args.timeout_seconds,
+        seed=args.seed,
+        cassette_path=args.cassette,
+        replay_latency=args.replay_latency,
+        bucket=args.bucket,
+        inputs=inputs
+    ) as env:
+        for name in scenarios:
+            op = env.scenario(name, random.Random(args.seed))
+            if op is None:
+                continue
+            results[name] = run_scenario(env, op, args.iterations, args.concurrency,
+                                         args.warmup, args.alloc_iterations)
+
+    print()
+    print_results(results)
+
+    report = {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "params": params
+        },
+        "scenarios": results
+    }
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    exit_code = 0
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 基线已保存: {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("meta", {}).get("params") != params:
+            print("\n⚠️  基线的运行参数与本次不同，比较结果仅供参考")
+        comparisons, regressions = compare_to_baseline(results, baseline.get("scenarios", {}), args.threshold)
+        print_comparisons(comparisons, args.threshold)
+        if regressions and args.fail_on_regression:
+            exit_code = 1
+    else:
+        print(f"\n未找到基线文件 {args.baseline}，可使用 --save-baseline 保存")
+
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+外部调用录制/回放模块（cassette）
+在传输层录制 Bedrock invoke_model、S3 list_objects_v2 和 EXA HTTP 请求的请求/响应及耗时，
+回放模式下按录制顺序确定性地返回结果，可选模拟原始延迟，无需凭证、网络和费用
+"""
+
+import gzip
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+MODE_OFF = "off"
+MODE_RECORD = "record"
+MODE_REPLAY = "replay"
+MODES = (MODE_OFF, MODE_RECORD, MODE_REPLAY)
+
+# 各类客户端需要录制的操作
+RECORDED_OPERATIONS = {
+    "bedrock": ("invoke_model",),
+    "s3": ("list_objects_v2",),
+}
+
+
+class CassetteMiss(Exception):
+    """回放模式下找不到匹配的录制请求"""
+
+
+class CassetteTimeout(TimeoutError):
+    """模拟原始延迟时，录制耗时超过了本次调用的超时时间"""
+
+
+class RecordedError(Exception):
+    """回放录制时发生的调用异常（保留 botocore 风格的错误码，便于弹性层识别限流）"""
+
+    def __init__(self, message: str, error_type: str = "", code: Optional[str] = None,
+                 status_code: Optional[int] = None):
+        super().__init__(message)
+        self.error_type = error_type
+        if code or status_code:
+            self.response = {
+                "Error": {"Code": code or "", "Message": message},
+                "ResponseMetadata": {"HTTPStatusCode": status_code}
+            }
+
+
+class ReplayResponse:
+    """回放的 HTTP 响应（requests.Response 中预审流程用到的部分）"""
+
+    def __init__(self, status_code: int, text: str):
+        self.status_code = status_code
+        self.text = text
+
+    def json(self) -> Any:
+        return json.loads(self.text)
+
+
+def request_key(kind: str, operation: str, request: Dict[str, Any]) -> str:
+    """请求的匹配键（不包含凭证和超时等与结果无关的参数）"""
+    canonical = json.dumps([kind, operation, request], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()[:20]
+
+
+def _open(path: str, mode: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def _error_fields(exc: BaseException) -> Dict[str, Any]:
+    fields = {"message": str(exc), "type": type(exc).__name__}
+    response = getattr(exc, "response", None)
+    if isinstance(response, dict):
+        fields["code"] = response.get("Error", {}).get("Code")
+        fields["status_code"] = response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+    return fields
+
+
+class Cassette:
+    """一个录制文件（JSON Lines，每行一次交互；.gz 后缀时压缩）"""
+
+    def __init__(self, mode: str = MODE_OFF, path: str = "cassettes/traffic.jsonl",
+                 simulate_latency: bool = False, latency_scale: float = 1.0):
+        """
+        Args:
+            mode: off / record / replay
+            path: 录制文件路径
+            simulate_latency: 回放时是否按录制耗时等待
+            latency_scale: 模拟延迟的缩放比例
+        """
+        if mode not in MODES:
+            raise ValueError(f"未知的录制模式: {mode}")
+        self.mode = mode
+        self.path = path
+        self.simulate_latency = simulate_latency
+        self.latency_scale = latency_scale
+        self._lock = threading.Lock()
+        self._entries: Optional[Dict[str, List[Dict[str, Any]]]] = None
+        self._cursors: Dict[str, int] = {}
+        self._metrics = {"recorded": 0, "replayed": 0, "misses": 0}
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == MODE_RECORD
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == MODE_REPLAY
+
+    # ---- 录制 ----
+
+    def _append(self, entry: Dict[str, Any]):
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":"), default=str)
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with _open(self.path, "a") as f:
+                f.write(line + "\n")
+            self._metrics["recorded"] += 1
+
+    def _record(self, kind: str, operation: str, request: Dict[str, Any],
+                call: Callable[[], Any], encode: Callable[[Any], Any]) -> Any:
+        """执行真实调用并录制；encode 返回 (录制内容, 返回给调用方的结果)"""
+        entry = {
+            "kind": kind,
+            "operation": operation,
+            "key": request_key(kind, operation, request),
+            "request": request,
+            "recorded_at": time.time()
+        }
+        started = time.perf_counter()
+        try:
+            result = call()
+        except Exception as e:
+            entry["duration"] = round(time.perf_counter() - started, 6)
+            entry["error"] = _error_fields(e)
+            self._append(entry)
+            raise
+        stored, returned = encode(result)
+        entry["duration"] = round(time.perf_counter() - started, 6)
+        entry["response"] = stored
+        self._append(entry)
+        return returned
+
+    # ---- 回放 ----
+
+    def _load(self) -> Dict[str, List[Dict[str, Any]]]:
+        with self._lock:
+            if self._entries is None:
+                entries: Dict[str, List[Dict[str, Any]]] = {}
+                with _open(self.path, "r") as f:
+                    for line in f:
+                        if line.strip():
+                            entry = json.loads(line)
+                            entries.setdefault(entry["key"], []).append(entry)
+                self._entries = entries
+                logger.info(f"已加载录制文件 {self.path}: {sum(len(v) for v in entries.values())} 次交互")
+            return self._entries
+
+    def _next(self, kind: str, operation: str, request: Dict[str, Any]) -> Dict[str, Any]:
+        """按录制顺序取出下一次匹配的交互（用完后循环）"""
+        key = request_key(kind, operation, request)
+        entries = self._load().get(key)
+        with self._lock:
+            if not entries:
+                self._metrics["misses"] += 1
+                raise CassetteMiss(f"录制文件中没有匹配的 {kind}.{operation} 请求: {key}")
+            cursor = self._cursors.get(key, 0)
+            self._cursors[key] = cursor + 1
+            self._metrics["replayed"] += 1
+        return entries[cursor % len(entries)]
+
+    def _replay(self, kind: str, operation: str, request: Dict[str, Any],
+                timeout: Optional[float]) -> Any:
+        entry = self._next(kind, operation, request)
+        if self.simulate_latency:
+            delay = entry.get("duration", 0.0) * self.latency_scale
+            if timeout is not None and delay > timeout:
+                time.sleep(timeout)
+                raise CassetteTimeout(f"回放 {kind}.{operation} 超时（录制耗时 {delay:.2f}s > {timeout:.2f}s）")
+            time.sleep(delay)
+        if "error" in entry:
+            error = entry["error"]
+            raise RecordedError(error["message"], error.get("type", ""), error.get("code"), error.get("status_code"))
+        return entry["response"]
+
+    def reset(self):
+        """重置回放位置"""
+        with self._lock:
+            self._cursors.clear()
+
+    # ---- 传输层接入 ----
+
+    def wrap_client(self, kind: str, client: Any, timeout: Optional[float] = None) -> Any:
+        """
+        包装 boto3 客户端，录制/回放 RECORDED_OPERATIONS 中的操作
+
+        Args:
+            kind: 客户端类型（bedrock、s3）
+            client: 真实客户端，回放模式下可为 None
+            timeout: 本次客户端的读取超时（用于模拟延迟时判断超时）
+        """
+        if self.mode == MODE_OFF:
+            return client
+        return CassetteClient(self, kind, client, timeout)
+
+    def http_post(self, kind: str, url: str, send: Callable[..., Any], json_body: Dict[str, Any],
+                  headers: Dict[str, str], timeout: Optional[float]) -> Any:
+        """
+        录制/回放 HTTP POST（只按 URL 路径和请求体匹配，不录制请求头中的 API key）
+
+        Args:
+            kind: 依赖名称（如 exa）
+            url: 请求地址
+            send: 真实发送函数（requests.post）
+            json_body: JSON 请求体
+            headers: 请求头
+            timeout: 超时时间（秒）
+        """
+        if self.mode == MODE_OFF:
+            return send(url, json=json_body, headers=headers, timeout=timeout)
+
+        request = {"path": urlsplit(url).path, "json": json_body}
+        if self.replaying:
+            stored = self._replay(kind, "post", request, timeout)
+            return ReplayResponse(stored["status_code"], stored["text"])
+
+        def encode(response):
+            return {"status_code": response.status_code, "text": response.text}, response
+
+        return self._record(kind, "post", request,
+                            lambda: send(url, json=json_body, headers=headers, timeout=timeout), encode)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """获取录制/回放统计"""
+        with self._lock:
+            return dict(self._metrics, mode=self.mode, path=self.path)
+
+
+class CassetteClient:
+    """录制/回放 boto3 客户端的指定操作，其他属性直接转发给真实客户端"""
+
+    def __init__(self, cassette: Cassette, kind: str, client: Any, timeout: Optional[float]):
+        self._cassette = cassette
+        self._kind = kind
+        self._client = client
+        self._timeout = timeout
+
+    def __getattr__(self, name: str) -> Any:
+        if name in RECORDED_OPERATIONS.get(self._kind, ()):
+            return lambda **kwargs: self._call(name, kwargs)
+        if self._client is None:
+            raise AttributeError(f"回放模式下不支持 {self._kind}.{name}")
+        return getattr(self._client, name)
+
+    def _call(self, operation: str, kwargs: Dict[str, Any]) -> Any:
+        cassette = self._cassette
+        if cassette.replaying:
+            stored = cassette._replay(self._kind, operation, kwargs, self._timeout)
+            return _decode_response(operation, stored)
+        return cassette._record(self._kind, operation, kwargs,
+                                lambda: getattr(self._client, operation)(**kwargs),
+                                lambda response: _encode_response(operation, response))
+
+
+def _encode_response(operation: str, response: Dict[str, Any]):
+    """将 boto3 响应转换为可录制的内容，返回 (录制内容, 返回给调用方的响应)"""
+    if operation == "invoke_model":
+        body = response["body"].read()
+        stored = {"body": body.decode("utf-8"), "contentType": response.get("contentType")}
+        return stored, dict(response, body=io.BytesIO(body))
+    stored = {key: value for key, value in response.items() if key != "ResponseMetadata"}
+    # 录制内容中的时间等对象序列化为字符串
+    return json.loads(json.dumps(stored, default=str)), response
+
+
+def _decode_response(operation: str, stored: Dict[str, Any]) -> Dict[str, Any]:
+    if operation == "invoke_model":
+        return {"body": io.BytesIO(stored["body"].encode("utf-8")), "contentType": stored.get("contentType")}
+    return dict(stored)
+
+
+# 全局录制实例（默认关闭）
+_cassette = Cassette()
+
+
+def configure_cassette(mode: str = MODE_OFF, path: str = "cassettes/traffic.jsonl",
+                       simulate_latency: bool = False, latency_scale: float = 1.0) -> Cassette:
+    """配置全局录制实例"""
+    global _cassette
+    _cassette = Cassette(mode, path, simulate_latency, latency_scale)
+    if mode != MODE_OFF:
+        logger.info(f"外部调用录制模式: {mode}, 文件: {path}")
+    return _cassette
+
+
+def get_cassette() -> Cassette:
+    """获取全局录制实例"""
+    return _cassette
@@ -5,9 +5,12 @@ CloudWatch 日志处理模块
 """
 
 import logging
+import threading
+import time
 import boto3
-from typing import Optional
+from typing import Any, Callable, Dict, List, Optional
 from config_reader import get_config
+from cost_ledger import record_usage
 
 # 尝试导入 watchtower，如果失败则使用基本日志
 try:
@@ -18,6 +21,21 @@ except ImportError:
     print("警告: watchtower 模块未安装，CloudWatch 日志功能将被禁用")
     print("要启用 CloudWatch 日志，请运行: pip install watchtower")
 
+# CloudWatch Logs 按每条事件的 UTF-8 字节数加 26 字节计量
+CLOUDWATCH_EVENT_OVERHEAD_BYTES = 26
+
+class ShippedBytesFilter(logging.Filter):
+    """统计发送到 CloudWatch 的日志字节数（计入调用用量记账）"""
+    
+    def __init__(self, formatter: logging.Formatter):
+        super().__init__()
+        self.formatter = formatter
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        size = len(self.formatter.format(record).encode('utf-8')) + CLOUDWATCH_EVENT_OVERHEAD_BYTES
+        record_usage(cloudwatch_bytes=size)
+        return True
+
 class CloudWatchLogger:
     """CloudWatch 日志处理器"""
     
@@ -119,6 +137,7 @@ class CloudWatchLogger:
                         max_batch_count=100  # 最大批量数量
                     )
                     cloudwatch_handler.setFormatter(formatter)
+                    cloudwatch_handler.addFilter(ShippedBytesFilter(formatter))
                     logger.addHandler(cloudwatch_handler)
                     logger.info("CloudWatch 日志处理器已启用")
                 except Exception as e:
@@ -176,7 +195,42 @@ def get_cloudwatch_logger(logger_name: str, level: int = logging.INFO) -> loggin
         logger.addHandler(handler)
         return logger
 
-def log_preaudit_event(user_input: str, result: str, file_count: int, contains_target: bool):
+# 结构化事件订阅者（如列式导出），事件在写日志的同时传递给订阅者
+_event_sinks: List[Callable[[Dict[str, Any]], None]] = []
+_event_sinks_lock = threading.Lock()
+
+def register_event_sink(sink: Callable[[Dict[str, Any]], None]):
+    """
+    订阅预审和 MCP 工具调用事件
+    
+    Args:
+        sink: 接收事件字典的函数（在记录事件的线程中调用，应尽快返回）
+    """
+    with _event_sinks_lock:
+        if sink not in _event_sinks:
+            _event_sinks.append(sink)
+
+def unregister_event_sink(sink: Callable[[Dict[str, Any]], None]):
+    """取消订阅事件"""
+    with _event_sinks_lock:
+        if sink in _event_sinks:
+            _event_sinks.remove(sink)
+
+def _emit_event(event_data: Dict[str, Any]):
+    """将事件（附带时间戳）传递给订阅者，订阅者出错不影响日志记录"""
+    with _event_sinks_lock:
+        sinks = list(_event_sinks)
+    if not sinks:
+        return
+    event = dict(event_data, timestamp=time.time())
+    for sink in sinks:
+        try:
+            sink(event)
+        except Exception as e:
+            print(f"事件订阅者处理失败: {str(e)}")
+
+def log_preaudit_event(user_input: str, result: str, file_count: int, contains_target: bool,
+                       details: Optional[Dict[str, Any]] = None):
     """
     记录预审事件到 CloudWatch
     
@@ -185,6 +239,7 @@ def log_preaudit_event(user_input: str, result: str, file_count: int, contains_t
         result: 预审结果
         file_count: 文件数量
         contains_target: 是否包含目标标识
+        details: 结构化结果字段（结论、讲者医院和科室等），供分析使用
     """
     logger = get_cloudwatch_logger("speaker_validation_events")
     
@@ -195,8 +250,11 @@ def log_preaudit_event(user_input: str, result: str, file_count: int, contains_t
         "contains_target": contains_target,
         "result": "通过" if "预审通过" in result else "不通过"
     }
+    if details:
+        event_data.update(details)
     
     logger.info(f"预审事件: {event_data}")
+    _emit_event(event_data)
 
 def log_s3_access(bucket_name: str, success: bool, file_count: int = 0, error: str = None):
     """
@@ -249,3 +307,4 @@ def log_mcp_tool_call(tool_name: str, success: bool, execution_time: float = Non
     else:
         event_data["error"] = error
         logger.error(f"MCP 工具调用失败: {event_data}")
+    _emit_event(event_data)
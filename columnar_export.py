@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+"""
+审计和指标事件的列式导出模块
+订阅 log_preaudit_event 和 log_mcp_tool_call 产生的结构化事件，按事件类型和日期分区写入列式文件：
+安装 pyarrow 时写 Parquet，否则写纯 Python 实现的列式 JSON（gzip）；
+每次刷新追加新的分片文件，compact 将同一分区的分片合并为一个文件，分析时无需再扫描 CloudWatch
+"""
+
+import argparse
+import atexit
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 尝试导入 pyarrow，如果失败则使用纯 Python 列式格式
+try:
+    import pyarrow
+    import pyarrow.parquet
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# 事件类型 -> 列定义（列名, 类型）；date 列由事件时间戳生成，同时作为分区键
+EVENT_SCHEMAS: Dict[str, List[Tuple[str, str]]] = {
+    "preaudit": [
+        ("timestamp", "float"),
+        ("date", "string"),
+        ("verdict", "string"),
+        ("outcome", "string"),
+        ("result", "string"),
+        ("speaker_name", "string"),
+        ("hospital", "string"),
+        ("department", "string"),
+        ("title", "string"),
+        ("verification_method", "string"),
+        ("folder", "string"),
+        ("file_count", "int"),
+        ("contains_target", "bool"),
+        ("input_length", "int"),
+    ],
+    "mcp_tool_call": [
+        ("timestamp", "float"),
+        ("date", "string"),
+        ("tool_name", "string"),
+        ("success", "bool"),
+        ("execution_time", "float"),
+        ("error", "string"),
+    ],
+}
+
+_CASTS: Dict[str, Callable[[Any], Any]] = {"float": float, "int": int, "bool": bool, "string": str}
+
+TMP_SUFFIX = ".tmp"
+
+
+def _cast(value: Any, column_type: str) -> Any:
+    if value is None:
+        return None
+    try:
+        return _CASTS[column_type](value)
+    except (TypeError, ValueError):
+        return None
+
+
+# ---- 列式文件格式 ----
+
+class ColumnarWriter:
+    """列式文件格式（写入和读取一个文件）"""
+
+    name = ""
+    extension = ""
+
+    def write(self, path: str, schema: List[Tuple[str, str]], columns: Dict[str, List[Any]]):
+        raise NotImplementedError
+
+    def read(self, path: str) -> Dict[str, List[Any]]:
+        raise NotImplementedError
+
+
+class JsonColumnarWriter(ColumnarWriter):
+    """纯 Python 列式格式：按列存储的 gzip JSON，无第三方依赖"""
+
+    name = "json"
+    extension = ".columns.json.gz"
+
+    def write(self, path: str, schema: List[Tuple[str, str]], columns: Dict[str, List[Any]]):
+        num_rows = len(columns[schema[0][0]]) if schema else 0
+        document = {
+            "format": "columnar-json",
+            "version": 1,
+            "schema": [list(column) for column in schema],
+            "num_rows": num_rows,
+            "columns": {name: columns[name] for name, _ in schema}
+        }
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            json.dump(document, f, ensure_ascii=False, separators=(",", ":"))
+
+    def read(self, path: str) -> Dict[str, List[Any]]:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return json.load(f)["columns"]
+
+
+class ParquetWriter(ColumnarWriter):
+    """Parquet 格式（需要 pyarrow）"""
+
+    name = "parquet"
+    extension = ".parquet"
+
+    _TYPES = {"float": "float64", "int": "int64", "bool": "bool_", "string": "string"}
+
+    def __init__(self):
+        if not PYARROW_AVAILABLE:
+            raise RuntimeError("Parquet 导出需要 pyarrow，请运行: pip install pyarrow")
+
+    def write(self, path: str, schema: List[Tuple[str, str]], columns: Dict[str, List[Any]]):
+        arrow_schema = pyarrow.schema([
+            (name, getattr(pyarrow, self._TYPES[column_type])()) for name, column_type in schema
+        ])
+        table = pyarrow.Table.from_pydict({name: columns[name] for name, _ in schema}, schema=arrow_schema)
+        pyarrow.parquet.write_table(table, path, compression="zstd")
+
+    def read(self, path: str) -> Dict[str, List[Any]]:
+        return pyarrow.parquet.read_table(path).to_pydict()
+
+
+_WRITERS: Dict[str, Callable[[], ColumnarWriter]] = {
+    JsonColumnarWriter.name: JsonColumnarWriter,
+    ParquetWriter.name: ParquetWriter,
+}
+
+
+def register_writer(name: str, factory: Callable[[], ColumnarWriter]):
+    """注册自定义列式格式"""
+    _WRITERS[name] = factory
+
+
+def create_writer(name: str = "auto") -> ColumnarWriter:
+    """
+    创建列式格式
+
+    Args:
+        name: auto（有 pyarrow 时为 parquet，否则为 json）、parquet、json 或自定义格式名称
+    """
+    if name == "auto":
+        name = ParquetWriter.name if PYARROW_AVAILABLE else JsonColumnarWriter.name
+    if name not in _WRITERS:
+        raise ValueError(f"未知的导出格式: {name}，可用格式: {', '.join(sorted(_WRITERS))}")
+    return _WRITERS[name]()
+
+
+def _format_for(path: str) -> Optional[Callable[[], ColumnarWriter]]:
+    """根据文件扩展名选择读取格式（分区中可能有切换格式前写入的文件）"""
+    for factory in _WRITERS.values():
+        extension = getattr(factory, "extension", "")
+        if extension and path.endswith(extension):
+            return factory
+    return None
+
+
+# ---- 分区 ----
+
+def _partition_dir(root_dir: str, event_type: str, day: str) -> str:
+    return os.path.join(root_dir, event_type, f"date={day}")
+
+
+def list_partitions(root_dir: str, event_type: str) -> List[Tuple[str, str]]:
+    """列出事件类型的全部分区（日期, 目录），按日期排序"""
+    base = os.path.join(root_dir, event_type)
+    if not os.path.isdir(base):
+        return []
+    partitions = []
+    for entry in sorted(os.listdir(base)):
+        if entry.startswith("date="):
+            partitions.append((entry[len("date="):], os.path.join(base, entry)))
+    return partitions
+
+
+def list_part_files(partition_dir: str) -> List[str]:
+    """分区中已完成写入的文件（忽略写入中的临时文件）"""
+    return sorted(
+        os.path.join(partition_dir, name) for name in os.listdir(partition_dir)
+        if not name.endswith(TMP_SUFFIX) and _format_for(name) is not None
+    )
+
+
+def _write_atomic(writer: ColumnarWriter, directory: str, prefix: str,
+                  schema: List[Tuple[str, str]], columns: Dict[str, List[Any]]) -> str:
+    """先写临时文件再重命名，读取方不会看到写了一半的文件"""
+    os.makedirs(directory, exist_ok=True)
+    name = f"{prefix}-{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}{writer.extension}"
+    path = os.path.join(directory, name)
+    writer.write(path + TMP_SUFFIX, schema, columns)
+    os.replace(path + TMP_SUFFIX, path)
+    return path
+
+
+def _read_columns(path: str, schema: List[Tuple[str, str]]) -> Dict[str, List[Any]]:
+    """读取文件并按当前列定义对齐（缺少的列补 None）"""
+    data = _format_for(path)().read(path)
+    num_rows = len(next(iter(data.values()))) if data else 0
+    return {name: list(data.get(name, [None] * num_rows)) for name, _ in schema}
+
+
+def scan(root_dir: str, event_type: str, since: Optional[str] = None, until: Optional[str] = None,
+         columns: Optional[List[str]] = None) -> Dict[str, List[Any]]:
+    """
+    读取事件（按日期分区裁剪）
+
+    Args:
+        root_dir: 导出根目录
+        event_type: 事件类型（preaudit、mcp_tool_call）
+        since: 起始日期（含），如 2024-05-01
+        until: 截止日期（不含）
+        columns: 需要的列，默认全部
+
+    Returns:
+        列名 -> 值列表
+    """
+    schema = EVENT_SCHEMAS[event_type]
+    wanted = [(name, column_type) for name, column_type in schema if columns is None or name in columns]
+    result: Dict[str, List[Any]] = {name: [] for name, _ in wanted}
+    for day, directory in list_partitions(root_dir, event_type):
+        if (since and day < since) or (until and day >= until):
+            continue
+        for path in list_part_files(directory):
+            data = _read_columns(path, wanted)
+            for name, _ in wanted:
+                result[name].extend(data[name])
+    return result
+
+
+def compact(root_dir: str, writer: Optional[ColumnarWriter] = None, event_type: Optional[str] = None,
+            before: Optional[str] = None, min_files: int = 2) -> Dict[str, int]:
+    """
+    合并分区中的分片文件
+
+    Args:
+        root_dir: 导出根目录
+        writer: 合并后文件的格式，默认 auto
+        event_type: 只合并指定事件类型
+        before: 只合并该日期（不含）之前的分区，如当天分区仍在追加时传入今天
+        min_files: 分片数达到该值才合并
+
+    Returns:
+        合并的分区数、读取的文件数和写入的行数
+    """
+    writer = writer or create_writer()
+    stats = {"partitions": 0, "files_merged": 0, "rows": 0}
+    for name in ([event_type] if event_type else list(EVENT_SCHEMAS)):
+        schema = EVENT_SCHEMAS[name]
+        for day, directory in list_partitions(root_dir, name):
+            if before and day >= before:
+                continue
+            # 只处理开始时已存在的分片，合并期间新追加的分片保留到下次合并
+            parts = list_part_files(directory)
+            if len(parts) < max(2, min_files):
+                continue
+            merged: Dict[str, List[Any]] = {column: [] for column, _ in schema}
+            for path in parts:
+                data = _read_columns(path, schema)
+                for column, _ in schema:
+                    merged[column].extend(data[column])
+            _write_atomic(writer, directory, "compacted", schema, merged)
+            for path in parts:
+                os.remove(path)
+            stats["partitions"] += 1
+            stats["files_merged"] += len(parts)
+            stats["rows"] += len(merged["timestamp"])
+            logger.info(f"已合并分区 {name}/date={day}: {len(parts)} 个文件, {len(merged['timestamp'])} 行")
+    return stats
+
+
+# ---- 导出器 ----
+
+class ColumnarExporter:
+    """事件订阅者：在内存中按分区缓冲事件，由后台线程定期追加写入分片文件"""
+
+    def __init__(self, root_dir: str = "exports", writer: Optional[ColumnarWriter] = None,
+                 flush_rows: int = 1000, flush_interval_seconds: float = 60.0):
+        """
+        Args:
+            root_dir: 导出根目录
+            writer: 列式格式，默认 auto
+            flush_rows: 任一分区缓冲达到该行数时立即写入
+            flush_interval_seconds: 最长缓冲时间（秒）
+        """
+        self.root_dir = root_dir
+        self.writer = writer or create_writer()
+        self.flush_rows = max(1, flush_rows)
+        self.flush_interval = max(0.1, flush_interval_seconds)
+        self._lock = threading.Lock()
+        self._buffers: Dict[Tuple[str, str], Dict[str, List[Any]]] = {}
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._metrics = {"events": 0, "ignored": 0, "rows_written": 0, "files_written": 0, "failed_rows": 0}
+
+    def __call__(self, event: Dict[str, Any]):
+        """接收一个事件（由 cloudwatch_logger 在记录事件的线程中调用）"""
+        schema = EVENT_SCHEMAS.get(event.get("event_type"))
+        if schema is None or self._closed:
+            with self._lock:
+                self._metrics["ignored"] += 1
+            return
+        timestamp = event.get("timestamp") or time.time()
+        day = date.fromtimestamp(timestamp).isoformat()
+        row = dict(event, timestamp=timestamp, date=day)
+        key = (event["event_type"], day)
+        with self._lock:
+            buffer = self._buffers.get(key)
+            if buffer is None:
+                buffer = self._buffers[key] = {name: [] for name, _ in schema}
+            for name, column_type in schema:
+                buffer[name].append(_cast(row.get(name), column_type))
+            self._metrics["events"] += 1
+            full = len(buffer["timestamp"]) >= self.flush_rows
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="columnar-export", daemon=True)
+                self._thread.start()
+        if full:
+            self._wake.set()
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self) -> int:
+        """将全部缓冲写入新的分片文件，返回写入的行数"""
+        with self._lock:
+            buffers, self._buffers = self._buffers, {}
+        written = 0
+        for (event_type, day), columns in buffers.items():
+            rows = len(columns["timestamp"])
+            try:
+                _write_atomic(self.writer, _partition_dir(self.root_dir, event_type, day), "part",
+                              EVENT_SCHEMAS[event_type], columns)
+            except Exception as e:
+                logger.error(f"写入列式导出文件失败（{event_type}/{day}, {rows} 行）: {str(e)}")
+                with self._lock:
+                    self._metrics["failed_rows"] += rows
+                continue
+            written += rows
+            with self._lock:
+                self._metrics["rows_written"] += rows
+                self._metrics["files_written"] += 1
+        return written
+
+    def close(self):
+        """写入剩余缓冲并停止后台线程"""
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(5)
+        self.flush()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """获取导出统计"""
+        with self._lock:
+            buffered = sum(len(columns["timestamp"]) for columns in self._buffers.values())
+            return dict(self._metrics, buffered_rows=buffered, format=self.writer.name, root_dir=self.root_dir)
+
+
+# 全局导出器（默认关闭）
+_exporter: Optional[ColumnarExporter] = None
+
+
+def configure_columnar_export(enabled: bool = False, root_dir: str = "exports", format: str = "auto",
+                              flush_rows: int = 1000,
+                              flush_interval_seconds: float = 60.0) -> Optional[ColumnarExporter]:
+    """
+    配置全局导出器（关闭之前的导出器）
+
+    Returns:
+        启用时返回导出器（调用方将其注册为事件订阅者），否则返回 None
+    """
+    global _exporter
+    if _exporter is not None:
+        _exporter.close()
+        _exporter = None
+    if enabled:
+        _exporter = ColumnarExporter(root_dir, create_writer(format), flush_rows, flush_interval_seconds)
+        # 进程退出时写入剩余缓冲
+        atexit.register(_exporter.close)
+        logger.info(f"列式导出已启用: {root_dir}（{_exporter.writer.name}）")
+    return _exporter
+
+
+def get_columnar_exporter() -> Optional[ColumnarExporter]:
+    """获取全局导出器（未启用时为 None）"""
+    return _exporter
+
+
+# ---- 命令行 ----
+
+def pass_rates(root_dir: str, by: str = "hospital", since: Optional[str] = None,
+               until: Optional[str] = None) -> List[Dict[str, Any]]:
+    """按医院或科室统计预审通过率"""
+    data = scan(root_dir, "preaudit", since, until, columns=[by, "verdict"])
+    groups: Dict[str, Dict[str, int]] = {}
+    for key, verdict in zip(data[by], data["verdict"]):
+        counts = groups.setdefault(key or "（未知）", {"total": 0, "passed": 0})
+        counts["total"] += 1
+        if verdict == "pass":
+            counts["passed"] += 1
+    return sorted(
+        ({by: key, **counts, "pass_rate": round(counts["passed"] / counts["total"], 4)}
+         for key, counts in groups.items()),
+        key=lambda item: item["total"], reverse=True
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="预审事件列式导出：合并分片和统计通过率")
+    parser.add_argument("--root", default="exports", help="导出根目录")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    compact_parser = subparsers.add_parser("compact", help="合并分区中的分片文件")
+    compact_parser.add_argument("--event-type", choices=sorted(EVENT_SCHEMAS), help="只合并指定事件类型")
+    compact_parser.add_argument("--before", default=date.today().isoformat(),
+                                help="只合并该日期之前的分区（默认今天，即不合并仍在追加的当天分区）")
+    compact_parser.add_argument("--format", default="auto", help="合并后的文件格式")
+
+    rates_parser = subparsers.add_parser("pass-rates", help="按医院或科室统计预审通过率")
+    rates_parser.add_argument("--by", choices=["hospital", "department"], default="hospital")
+    rates_parser.add_argument("--since", help="起始日期（含）")
+    rates_parser.add_argument("--until", help="截止日期（不含）")
+
+    args = parser.parse_args(argv)
+    if args.command == "compact":
+        stats = compact(args.root, create_writer(args.format), args.event_type, args.before)
+        print(json.dumps(stats, ensure_ascii=False))
+    else:
+        for item in pass_rates(args.root, args.by, args.since, args.until):
+            print(f"{item[args.by]:<24}{item['passed']:>6}/{item['total']:<6}{item['pass_rate']:>8.1%}")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    raise SystemExit(main())
@@ -8,9 +8,13 @@ import os
 import configparser
 from typing import Dict, Any
 import logging
+from cost_ledger import DEFAULT_PRICING
 
 logger = logging.getLogger(__name__)
 
+# 默认 EXA API 地址（基准测试等场景可在 [EXA] BASE_URL 中指向本地替身服务）
+DEFAULT_EXA_BASE_URL = "https://api.exa.ai"
+
 class ConfigReader:
     """配置文件读取器"""
     
@@ -127,11 +131,12 @@ class ConfigReader:
         获取 EXA 配置信息
         
         Returns:
-            包含 EXA API key 的字典
+            包含 EXA API key 和 API 地址的字典
         """
         try:
             exa_config = {
-                'api_key': self.config.get('EXA', 'EXA_API_KEY')
+                'api_key': self.config.get('EXA', 'EXA_API_KEY'),
+                'base_url': self.config.get('EXA', 'BASE_URL', fallback=DEFAULT_EXA_BASE_URL)
             }
             
             if not exa_config['api_key'] or exa_config['api_key'].startswith('your_'):
@@ -144,7 +149,7 @@ class ConfigReader:
             # 如果配置文件中没有EXA配置，尝试从环境变量读取
             import os
             api_key = os.getenv('EXA_API_KEY', '')
-            return {'api_key': api_key}
+            return {'api_key': api_key, 'base_url': DEFAULT_EXA_BASE_URL}
 
     def get_preaudit_config(self) -> Dict[str, Any]:
         """
@@ -156,7 +161,9 @@ class ConfigReader:
         try:
             preaudit_config = {
                 'target_word': self.config.get('PREAUDIT', 'TARGET_WORD'),
-                'min_file_count': self.config.getint('PREAUDIT', 'MIN_FILE_COUNT')
+                'min_file_count': self.config.getint('PREAUDIT', 'MIN_FILE_COUNT'),
+                # 单次预审的整体时间预算（秒），<=0 表示不限时
+                'timeout_seconds': self.config.getfloat('PREAUDIT', 'TIMEOUT_SECONDS', fallback=25.0)
             }
             
             return preaudit_config
@@ -165,6 +172,541 @@ class ConfigReader:
             logger.error(f"预审配置读取失败: {str(e)}")
             raise
     
+    def get_resilience_config(self) -> Dict[str, Any]:
+        """
+        获取外部依赖弹性调用配置（限流、重试、熔断）
+        
+        Returns:
+            包含 Bedrock 和 EXA 弹性参数的字典，未配置时使用默认值
+        """
+        defaults = {
+            'bedrock_rate': 5.0,
+            'bedrock_burst': 10.0,
+            'exa_rate': 3.0,
+            'exa_burst': 5.0,
+            'max_attempts': 3,
+            'base_delay': 0.5,
+            'max_delay': 8.0,
+            'breaker_failure_threshold': 5,
+            'breaker_recovery_seconds': 30.0
+        }
+        
+        if not self.config.has_section('RESILIENCE'):
+            return defaults
+        
+        try:
+            return {
+                'bedrock_rate': self.config.getfloat('RESILIENCE', 'BEDROCK_RATE', fallback=defaults['bedrock_rate']),
+                'bedrock_burst': self.config.getfloat('RESILIENCE', 'BEDROCK_BURST', fallback=defaults['bedrock_burst']),
+                'exa_rate': self.config.getfloat('RESILIENCE', 'EXA_RATE', fallback=defaults['exa_rate']),
+                'exa_burst': self.config.getfloat('RESILIENCE', 'EXA_BURST', fallback=defaults['exa_burst']),
+                'max_attempts': self.config.getint('RESILIENCE', 'MAX_ATTEMPTS', fallback=defaults['max_attempts']),
+                'base_delay': self.config.getfloat('RESILIENCE', 'BASE_DELAY', fallback=defaults['base_delay']),
+                'max_delay': self.config.getfloat('RESILIENCE', 'MAX_DELAY', fallback=defaults['max_delay']),
+                'breaker_failure_threshold': self.config.getint('RESILIENCE', 'BREAKER_FAILURE_THRESHOLD', fallback=defaults['breaker_failure_threshold']),
+                'breaker_recovery_seconds': self.config.getfloat('RESILIENCE', 'BREAKER_RECOVERY_SECONDS', fallback=defaults['breaker_recovery_seconds'])
+            }
+            
+        except ValueError as e:
+            logger.error(f"弹性调用配置读取失败: {str(e)}，使用默认值")
+            return defaults
+    
+    def get_cassette_config(self) -> Dict[str, Any]:
+        """
+        获取外部调用录制/回放配置
+        
+        Returns:
+            包含录制模式、文件路径和延迟模拟参数的字典，未配置时关闭录制
+        """
+        defaults = {
+            'mode': 'off',
+            'path': 'cassettes/traffic.jsonl',
+            'simulate_latency': False,
+            'latency_scale': 1.0
+        }
+        
+        if not self.config.has_section('CASSETTE'):
+            return defaults
+        
+        try:
+            return {
+                'mode': self.config.get('CASSETTE', 'MODE', fallback=defaults['mode']).strip().lower(),
+                'path': self.config.get('CASSETTE', 'PATH', fallback=defaults['path']),
+                'simulate_latency': self.config.getboolean('CASSETTE', 'SIMULATE_LATENCY', fallback=defaults['simulate_latency']),
+                'latency_scale': self.config.getfloat('CASSETTE', 'LATENCY_SCALE', fallback=defaults['latency_scale'])
+            }
+            
+        except ValueError as e:
+            logger.error(f"录制配置读取失败: {str(e)}，关闭录制")
+            return defaults
+    
+    def get_profiling_config(self) -> Dict[str, Any]:
+        """
+        获取性能剖析配置
+        
+        Returns:
+            包含 span 开关、请求剖析采样率和剖析模式的字典，未配置时只记录 span
+        """
+        defaults = {
+            'enabled': True,
+            'sample_rate': 0.0,
+            'mode': 'cprofile',
+            'sampling_interval_ms': 5.0,
+            'max_profiles': 20,
+            'output_dir': ''
+        }
+        
+        if not self.config.has_section('PROFILING'):
+            return defaults
+        
+        try:
+            return {
+                'enabled': self.config.getboolean('PROFILING', 'ENABLED', fallback=defaults['enabled']),
+                'sample_rate': self.config.getfloat('PROFILING', 'SAMPLE_RATE', fallback=defaults['sample_rate']),
+                'mode': self.config.get('PROFILING', 'MODE', fallback=defaults['mode']).strip().lower(),
+                'sampling_interval_ms': self.config.getfloat('PROFILING', 'SAMPLING_INTERVAL_MS', fallback=defaults['sampling_interval_ms']),
+                'max_profiles': self.config.getint('PROFILING', 'MAX_PROFILES', fallback=defaults['max_profiles']),
+                'output_dir': self.config.get('PROFILING', 'OUTPUT_DIR', fallback=defaults['output_dir'])
+            }
+            
+        except ValueError as e:
+            logger.error(f"性能剖析配置读取失败: {str(e)}，使用默认值")
+            return defaults
+    
+    def get_cost_config(self) -> Dict[str, float]:
+        """
+        获取费用估算单价配置
+        
+        Returns:
+            各计量项的单价（美元），未配置时使用 cost_ledger.DEFAULT_PRICING 中的默认单价
+        """
+        defaults = dict(DEFAULT_PRICING)
+        
+        if not self.config.has_section('COST'):
+            return defaults
+        
+        try:
+            return {
+                key: self.config.getfloat('COST', key.upper(), fallback=value)
+                for key, value in defaults.items()
+            }
+            
+        except ValueError as e:
+            logger.error(f"费用单价配置读取失败: {str(e)}，使用默认值")
+            return defaults
+    
+    def get_audit_config(self) -> Dict[str, Any]:
+        """
+        获取预审审计记录存储配置
+        
+        Returns:
+            包含开关、SQLite 文件路径和批量写入参数的字典
+        """
+        defaults = {
+            'enabled': True,
+            'path': 'audit/preaudit_history.db',
+            'batch_size': 50,
+            'flush_interval_ms': 500.0,
+            'queue_size': 10000
+        }
+        
+        if not self.config.has_section('AUDIT'):
+            return defaults
+        
+        try:
+            return {
+                'enabled': self.config.getboolean('AUDIT', 'ENABLED', fallback=defaults['enabled']),
+                'path': self.config.get('AUDIT', 'PATH', fallback=defaults['path']),
+                'batch_size': self.config.getint('AUDIT', 'BATCH_SIZE', fallback=defaults['batch_size']),
+                'flush_interval_ms': self.config.getfloat('AUDIT', 'FLUSH_INTERVAL_MS', fallback=defaults['flush_interval_ms']),
+                'queue_size': self.config.getint('AUDIT', 'QUEUE_SIZE', fallback=defaults['queue_size'])
+            }
+            
+        except ValueError as e:
+            logger.error(f"审计记录配置读取失败: {str(e)}，使用默认值")
+            return defaults
+    
+    def get_export_config(self) -> Dict[str, Any]:
+        """
+        获取列式导出配置
+        
+        Returns:
+            包含开关、导出目录、文件格式和刷新参数的字典，未配置时不导出
+        """
+        defaults = {
+            'enabled': False,
+            'root_dir': 'exports',
+            'format': 'auto',
+            'flush_rows': 1000,
+            'flush_interval_seconds': 60.0
+        }
+        
+        if not self.config.has_section('EXPORT'):
+            return defaults
+        
+        try:
+            return {
+                'enabled': self.config.getboolean('EXPORT', 'ENABLED', fallback=defaults['enabled']),
+                'root_dir': self.config.get('EXPORT', 'ROOT_DIR', fallback=defaults['root_dir']),
+                'format': self.config.get('EXPORT', 'FORMAT', fallback=defaults['format']).strip().lower(),
+                'flush_rows': self.config.getint('EXPORT', 'FLUSH_ROWS', fallback=defaults['flush_rows']),
+                'flush_interval_seconds': self.config.getfloat('EXPORT', 'FLUSH_INTERVAL_SECONDS', fallback=defaults['flush_interval_seconds'])
+            }
+            
+        except ValueError as e:
+            logger.error(f"列式导出配置读取失败: {str(e)}，使用默认值")
+            return defaults
+    
+    def get_http_config(self) -> Dict[str, Any]:
+        """
+        获取 MCP HTTP 传输配置
+        
+        Returns:
+            包含监听地址、端口和优雅关闭等待时间的字典
+        """
+        defaults = {
+            'host': '127.0.0.1',
+            'port': 8080,
+            'drain_timeout_seconds': 30.0
+        }
+        
+        if not self.config.has_section('HTTP'):
+            return defaults
+        
+        try:
+            return {
+                'host': self.config.get('HTTP', 'HOST', fallback=defaults['host']),
+                'port': self.config.getint('HTTP', 'PORT', fallback=defaults['port']),
+                'drain_timeout_seconds': self.config.getfloat('HTTP', 'DRAIN_TIMEOUT_SECONDS', fallback=defaults['drain_timeout_seconds'])
+            }
+            
+        except ValueError as e:
+            logger.error(f"HTTP 传输配置读取失败: {str(e)}，使用默认值")
+            return defaults
+    
+    def get_reload_config(self) -> Dict[str, Any]:
+        """
+        获取配置热加载配置
+        
+        Returns:
+            包含开关和配置文件检查间隔的字典
+        """
+        defaults = {
+            'enabled': True,
+            'poll_interval_seconds': 5.0
+        }
+        
+        if not self.config.has_section('RELOAD'):
+            return defaults
+        
+        try:
+            return {
+                'enabled': self.config.getboolean('RELOAD', 'ENABLED', fallback=defaults['enabled']),
+                'poll_interval_seconds': self.config.getfloat('RELOAD', 'POLL_INTERVAL_SECONDS', fallback=defaults['poll_interval_seconds'])
+            }
+            
+        except ValueError as e:
+            logger.error(f"配置热加载配置读取失败: {str(e)}，使用默认值")
+            return defaults
+    
+    def get_async_config(self) -> Dict[str, Any]:
+        """
+        获取异步工具配置
+        
+        Returns:
+            包含开关和异步 HTTP 连接数上限的字典
+        """
+        defaults = {
+            'enabled': True,
+            'max_connections': 100
+        }
+        
+        if not self.config.has_section('ASYNC'):
+            return defaults
+        
+        try:
+            return {
+                'enabled': self.config.getboolean('ASYNC', 'ENABLED', fallback=defaults['enabled']),
+                'max_connections': self.config.getint('ASYNC', 'MAX_CONNECTIONS', fallback=defaults['max_connections'])
+            }
+            
+        except ValueError as e:
+            logger.error(f"异步工具配置读取失败: {str(e)}，使用默认值")
+            return defaults
+    
+    def get_documents_config(self) -> Dict[str, Any]:
+        """
+        获取文件夹内容画像配置
+        
+        Returns:
+            包含预审时是否画像、读取字节数、并发数、ETag 缓存大小，
+            以及重复文档检测是否读取分段上传文件内容、读取大小上限和文件夹索引大小的字典
+        """
+        defaults = {
+            'profile_in_preaudit': False,
+            'head_bytes': 4096,
+            'max_concurrency': 8,
+            'cache_size': 10000,
+            'hash_multipart_duplicates': False,
+            'hash_max_bytes': 104857600,
+            'index_size': 10000
+        }
+        
+        if not self.config.has_section('DOCUMENTS'):
+            return defaults
+        
+        try:
+            return {
+                'profile_in_preaudit': self.config.getboolean('DOCUMENTS', 'PROFILE_IN_PREAUDIT', fallback=defaults['profile_in_preaudit']),
+                'head_bytes': self.config.getint('DOCUMENTS', 'HEAD_BYTES', fallback=defaults['head_bytes']),
+                'max_concurrency': self.config.getint('DOCUMENTS', 'MAX_CONCURRENCY', fallback=defaults['max_concurrency']),
+                'cache_size': self.config.getint('DOCUMENTS', 'CACHE_SIZE', fallback=defaults['cache_size']),
+                'hash_multipart_duplicates': self.config.getboolean('DOCUMENTS', 'HASH_MULTIPART_DUPLICATES', fallback=defaults['hash_multipart_duplicates']),
+                'hash_max_bytes': self.config.getint('DOCUMENTS', 'HASH_MAX_BYTES', fallback=defaults['hash_max_bytes']),
+                'index_size': self.config.getint('DOCUMENTS', 'INDEX_SIZE', fallback=defaults['index_size'])
+            }
+            
+        except ValueError as e:
+            logger.error(f"文件夹内容画像配置读取失败: {str(e)}，使用默认值")
+            return defaults
+    
+    def get_pdf_evidence_config(self) -> Dict[str, Any]:
+        """
+        获取 PDF 文本证据配置
+        
+        Returns:
+            包含是否启用、每次读取字节数、单个文档读取上限、解压上限、最多读取文档数、线程数和缓存大小的字典
+        """
+        defaults = {
+            'enabled': False,
+            'chunk_bytes': 262144,
+            'max_bytes': 8388608,
+            'max_decoded_bytes': 67108864,
+            'max_documents': 10,
+            'workers': 4,
+            'cache_size': 1000
+        }
+        
+        if not self.config.has_section('PDF_EVIDENCE'):
+            return defaults
+        
+        try:
+            return {
+                'enabled': self.config.getboolean('PDF_EVIDENCE', 'ENABLED', fallback=defaults['enabled']),
+                'chunk_bytes': self.config.getint('PDF_EVIDENCE', 'CHUNK_BYTES', fallback=defaults['chunk_bytes']),
+                'max_bytes': self.config.getint('PDF_EVIDENCE', 'MAX_BYTES', fallback=defaults['max_bytes']),
+                'max_decoded_bytes': self.config.getint('PDF_EVIDENCE', 'MAX_DECODED_BYTES',
+                                                        fallback=defaults['max_decoded_bytes']),
+                'max_documents': self.config.getint('PDF_EVIDENCE', 'MAX_DOCUMENTS', fallback=defaults['max_documents']),
+                'workers': self.config.getint('PDF_EVIDENCE', 'WORKERS', fallback=defaults['workers']),
+                'cache_size': self.config.getint('PDF_EVIDENCE', 'CACHE_SIZE', fallback=defaults['cache_size'])
+            }
+            
+        except ValueError as e:
+            logger.error(f"PDF 文本证据配置读取失败: {str(e)}，使用默认值")
+            return defaults
+    
+    def get_photo_index_config(self) -> Dict[str, Any]:
+        """
+        获取照片索引（感知哈希）配置
+        
+        Returns:
+            包含是否启用后台索引、扫描间隔、预审时是否检查照片复用、近似距离上限、图片大小上限和缓存大小的字典
+        """
+        defaults = {
+            'enabled': False,
+            'interval_seconds': 3600.0,
+            'check_in_preaudit': False,
+            'max_distance': 8,
+            'max_image_bytes': 20971520,
+            'cache_size': 100000
+        }
+        
+        if not self.config.has_section('PHOTO_INDEX'):
+            return defaults
+        
+        try:
+            return {
+                'enabled': self.config.getboolean('PHOTO_INDEX', 'ENABLED', fallback=defaults['enabled']),
+                'interval_seconds': self.config.getfloat('PHOTO_INDEX', 'INTERVAL_SECONDS',
+                                                         fallback=defaults['interval_seconds']),
+                'check_in_preaudit': self.config.getboolean('PHOTO_INDEX', 'CHECK_IN_PREAUDIT',
+                                                            fallback=defaults['check_in_preaudit']),
+                'max_distance': self.config.getint('PHOTO_INDEX', 'MAX_DISTANCE', fallback=defaults['max_distance']),
+                'max_image_bytes': self.config.getint('PHOTO_INDEX', 'MAX_IMAGE_BYTES',
+                                                      fallback=defaults['max_image_bytes']),
+                'cache_size': self.config.getint('PHOTO_INDEX', 'CACHE_SIZE', fallback=defaults['cache_size'])
+            }
+            
+        except ValueError as e:
+            logger.error(f"照片索引配置读取失败: {str(e)}，使用默认值")
+            return defaults
+    
+    def get_registry_config(self) -> Dict[str, Any]:
+        """
+        获取讲者预验证登记表配置
+        
+        Returns:
+            包含预审时是否查找登记表、SQLite 文件路径、文档计数和验证结果的有效期、
+            是否在服务内定时刷新、刷新间隔和EXA验证限速的字典
+        """
+        defaults = {
+            'enabled': False,
+            'path': 'audit/speaker_registry.db',
+            'max_age_seconds': 129600.0,
+            'verify_max_age_seconds': 604800.0,
+            'schedule_in_server': False,
+            'interval_seconds': 86400.0,
+            'rate_per_second': 1.0,
+            'max_concurrency': 2
+        }
+        
+        if not self.config.has_section('REGISTRY'):
+            return defaults
+        
+        try:
+            return {
+                'enabled': self.config.getboolean('REGISTRY', 'ENABLED', fallback=defaults['enabled']),
+                'path': self.config.get('REGISTRY', 'PATH', fallback=defaults['path']),
+                'max_age_seconds': self.config.getfloat('REGISTRY', 'MAX_AGE_SECONDS',
+                                                        fallback=defaults['max_age_seconds']),
+                'verify_max_age_seconds': self.config.getfloat('REGISTRY', 'VERIFY_MAX_AGE_SECONDS',
+                                                               fallback=defaults['verify_max_age_seconds']),
+                'schedule_in_server': self.config.getboolean('REGISTRY', 'SCHEDULE_IN_SERVER',
+                                                             fallback=defaults['schedule_in_server']),
+                'interval_seconds': self.config.getfloat('REGISTRY', 'INTERVAL_SECONDS',
+                                                         fallback=defaults['interval_seconds']),
+                'rate_per_second': self.config.getfloat('REGISTRY', 'RATE_PER_SECOND',
+                                                        fallback=defaults['rate_per_second']),
+                'max_concurrency': self.config.getint('REGISTRY', 'MAX_CONCURRENCY',
+                                                      fallback=defaults['max_concurrency'])
+            }
+            
+        except ValueError as e:
+            logger.error(f"讲者登记表配置读取失败: {str(e)}，使用默认值")
+            return defaults
+    
+    def get_events_config(self) -> Dict[str, Any]:
+        """
+        获取 S3 对象事件消费配置
+        
+        Returns:
+            包含是否在服务内消费事件、事件源类型（sqs / file）、SQS 队列 URL、本地事件文件路径、
+            每次接收的消息数、长轮询等待时间和空闲等待时间的字典
+        """
+        defaults = {
+            'enabled': False,
+            'source': 'sqs',
+            'queue_url': '',
+            'file_path': 'events/s3_events.jsonl',
+            'max_messages': 10,
+            'wait_seconds': 20.0,
+            'idle_seconds': 1.0
+        }
+        
+        if not self.config.has_section('EVENTS'):
+            return defaults
+        
+        try:
+            return {
+                'enabled': self.config.getboolean('EVENTS', 'ENABLED', fallback=defaults['enabled']),
+                'source': self.config.get('EVENTS', 'SOURCE', fallback=defaults['source']).lower(),
+                'queue_url': self.config.get('EVENTS', 'QUEUE_URL', fallback=defaults['queue_url']),
+                'file_path': self.config.get('EVENTS', 'FILE_PATH', fallback=defaults['file_path']),
+                'max_messages': self.config.getint('EVENTS', 'MAX_MESSAGES', fallback=defaults['max_messages']),
+                'wait_seconds': self.config.getfloat('EVENTS', 'WAIT_SECONDS', fallback=defaults['wait_seconds']),
+                'idle_seconds': self.config.getfloat('EVENTS', 'IDLE_SECONDS', fallback=defaults['idle_seconds'])
+            }
+            
+        except ValueError as e:
+            logger.error(f"S3 对象事件配置读取失败: {str(e)}，使用默认值")
+            return defaults
+    
+    def get_inventory_config(self) -> Dict[str, Any]:
+        """
+        获取 S3 Inventory 清单配置
+        
+        Returns:
+            包含全量扫描存储桶时是否使用清单、存放清单的存储桶、清单配置路径、清单有效期和每块对象数量的字典
+        """
+        defaults = {
+            'enabled': False,
+            'bucket': '',
+            'prefix': '',
+            'max_age_seconds': 86400.0,
+            'chunk_size': 10000
+        }
+        
+        if not self.config.has_section('INVENTORY'):
+            return defaults
+        
+        try:
+            return {
+                'enabled': self.config.getboolean('INVENTORY', 'ENABLED', fallback=defaults['enabled']),
+                'bucket': self.config.get('INVENTORY', 'BUCKET', fallback=defaults['bucket']),
+                'prefix': self.config.get('INVENTORY', 'PREFIX', fallback=defaults['prefix']),
+                'max_age_seconds': self.config.getfloat('INVENTORY', 'MAX_AGE_SECONDS',
+                                                        fallback=defaults['max_age_seconds']),
+                'chunk_size': self.config.getint('INVENTORY', 'CHUNK_SIZE', fallback=defaults['chunk_size'])
+            }
+            
+        except ValueError as e:
+            logger.error(f"S3 Inventory 配置读取失败: {str(e)}，使用默认值")
+            return defaults
+    
+    def get_scheduler_config(self) -> Dict[str, Any]:
+        """
+        获取提交调度配置
+        
+        Returns:
+            包含是否调度、各优先级并发数和排队上限、每位提交人排队上限、Bedrock 和 EXA 并发名额及为 interactive 预留名额的字典
+        """
+        defaults = {
+            'enabled': False,
+            'max_concurrency': 16,
+            'batch_concurrency': 8,
+            'nightly_concurrency': 2,
+            'max_queue_interactive': 100,
+            'max_queue_batch': 2000,
+            'max_queue_nightly': 5000,
+            'max_queued_per_submitter': 500,
+            'bedrock_concurrency': 8,
+            'exa_concurrency': 4,
+            'reserved_interactive': 2
+        }
+        
+        if not self.config.has_section('SCHEDULER'):
+            return defaults
+        
+        try:
+            return {
+                'enabled': self.config.getboolean('SCHEDULER', 'ENABLED', fallback=defaults['enabled']),
+                'max_concurrency': self.config.getint('SCHEDULER', 'MAX_CONCURRENCY',
+                                                      fallback=defaults['max_concurrency']),
+                'batch_concurrency': self.config.getint('SCHEDULER', 'BATCH_CONCURRENCY',
+                                                        fallback=defaults['batch_concurrency']),
+                'nightly_concurrency': self.config.getint('SCHEDULER', 'NIGHTLY_CONCURRENCY',
+                                                          fallback=defaults['nightly_concurrency']),
+                'max_queue_interactive': self.config.getint('SCHEDULER', 'MAX_QUEUE_INTERACTIVE',
+                                                            fallback=defaults['max_queue_interactive']),
+                'max_queue_batch': self.config.getint('SCHEDULER', 'MAX_QUEUE_BATCH',
+                                                      fallback=defaults['max_queue_batch']),
+                'max_queue_nightly': self.config.getint('SCHEDULER', 'MAX_QUEUE_NIGHTLY',
+                                                        fallback=defaults['max_queue_nightly']),
+                'max_queued_per_submitter': self.config.getint('SCHEDULER', 'MAX_QUEUED_PER_SUBMITTER',
+                                                               fallback=defaults['max_queued_per_submitter']),
+                'bedrock_concurrency': self.config.getint('SCHEDULER', 'BEDROCK_CONCURRENCY',
+                                                          fallback=defaults['bedrock_concurrency']),
+                'exa_concurrency': self.config.getint('SCHEDULER', 'EXA_CONCURRENCY',
+                                                      fallback=defaults['exa_concurrency']),
+                'reserved_interactive': self.config.getint('SCHEDULER', 'RESERVED_INTERACTIVE_SLOTS',
+                                                           fallback=defaults['reserved_interactive'])
+            }
+            
+        except ValueError as e:
+            logger.error(f"提交调度配置读取失败: {str(e)}，使用默认值")
+            return defaults
+    
     def get_all_config(self) -> Dict[str, Dict[str, Any]]:
         """
         获取所有配置信息
@@ -177,7 +719,23 @@ class ConfigReader:
             's3': self.get_s3_config(),
             'preaudit': self.get_preaudit_config(),
             'cloudwatch': self.get_cloudwatch_config(),
-            'exa': self.get_exa_config()
+            'exa': self.get_exa_config(),
+            'resilience': self.get_resilience_config(),
+            'cassette': self.get_cassette_config(),
+            'profiling': self.get_profiling_config(),
+            'cost': self.get_cost_config(),
+            'audit': self.get_audit_config(),
+            'export': self.get_export_config(),
+            'http': self.get_http_config(),
+            'reload': self.get_reload_config(),
+            'async': self.get_async_config(),
+            'documents': self.get_documents_config(),
+            'pdf_evidence': self.get_pdf_evidence_config(),
+            'photo_index': self.get_photo_index_config(),
+            'registry': self.get_registry_config(),
+            'events': self.get_events_config(),
+            'inventory': self.get_inventory_config(),
+            'scheduler': self.get_scheduler_config()
         }
     
     def validate_config(self) -> bool:
@@ -212,8 +770,8 @@ class ConfigReader:
             logger.error(f"配置验证失败: {str(e)}")
             return False
 
-# 全局配置实例
-config_reader = ConfigReader()
+# 全局配置实例（可通过 SPEAKER_VALIDATION_CONFIG 环境变量指定配置文件路径）
+config_reader = ConfigReader(os.getenv('SPEAKER_VALIDATION_CONFIG', '.config'))
 
 def get_config():
     """获取全局配置实例"""
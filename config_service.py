@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+配置热加载模块
+监视 .config 文件（轮询文件修改时间和大小），新版本通过校验后发布为不可变快照：
+进行中的请求继续使用开始时的快照，新请求使用新快照；订阅者只按变化的配置段重建受影响的客户端和组件
+"""
+
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections.abc import Mapping
+from contextlib import contextmanager
+from types import MappingProxyType
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from config_reader import ConfigReader, get_config
+
+logger = logging.getLogger(__name__)
+
+# 订阅者：(新快照, 变化的配置段)
+ConfigSubscriber = Callable[["ConfigSnapshot", FrozenSet[str]], None]
+
+
+def _freeze(value: Any) -> Any:
+    """将配置值转换为不可变结构"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _file_fingerprint(path: str) -> Optional[Tuple[int, int]]:
+    """文件指纹（修改时间、大小），文件不存在时返回 None"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class ConfigSnapshot:
+    """某一版本的完整配置（只读）"""
+
+    def __init__(self, version: int, sections: Dict[str, Dict[str, Any]], path: str,
+                 fingerprint: Optional[Tuple[int, int]] = None):
+        self.version = version
+        self.path = path
+        self.fingerprint = fingerprint
+        self.loaded_at = time.time()
+        self.sections: Mapping = _freeze(sections)
+
+    def section(self, name: str) -> Mapping:
+        """获取配置段（只读映射）"""
+        return self.sections[name]
+
+    def changed_sections(self, other: Optional["ConfigSnapshot"]) -> FrozenSet[str]:
+        """与另一个快照相比发生变化的配置段"""
+        if other is None:
+            return frozenset(self.sections)
+        names = set(self.sections) | set(other.sections)
+        return frozenset(name for name in names if self.sections.get(name) != other.sections.get(name))
+
+
+class ConfigService:
+    """配置快照发布服务"""
+
+    def __init__(self, reader: ConfigReader, poll_interval: float = 5.0):
+        """
+        Args:
+            reader: 已加载的配置读取器（其配置作为第一个快照）
+            poll_interval: 轮询配置文件的间隔（秒）
+        """
+        self.path = reader.config_file_path
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._subscribers: List[ConfigSubscriber] = []
+        self._overrides: Dict[str, Dict[str, Any]] = {}
+        self._file_sections = reader.get_all_config()
+        self._snapshot = ConfigSnapshot(1, self._file_sections, self.path, _file_fingerprint(self.path))
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._metrics = {"reloads": 0, "rejected": 0, "checks": 0, "last_error": None}
+
+    # ---- 快照 ----
+
+    def current(self) -> ConfigSnapshot:
+        """最新发布的快照"""
+        return self._snapshot
+
+    def subscribe(self, callback: ConfigSubscriber):
+        """订阅快照变化（在发布新快照的线程中调用，只传入变化的配置段）"""
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def _publish(self, file_sections: Dict[str, Dict[str, Any]],
+                 fingerprint: Optional[Tuple[int, int]]) -> FrozenSet[str]:
+        """合并覆盖值后发布新快照，返回变化的配置段"""
+        with self._lock:
+            sections = {name: dict(values) for name, values in file_sections.items()}
+            for name, values in self._overrides.items():
+                sections.setdefault(name, {}).update(values)
+            previous = self._snapshot
+            snapshot = ConfigSnapshot(previous.version + 1, sections, self.path, fingerprint)
+            changed = snapshot.changed_sections(previous)
+            if not changed:
+                # 内容未变化（如只修改了注释）：只更新指纹，不发布新版本
+                previous.fingerprint = fingerprint
+                return changed
+            self._file_sections = file_sections
+            self._snapshot = snapshot
+            subscribers = list(self._subscribers)
+
+        logger.info(f"配置已更新到版本 {snapshot.version}，变化的配置段: {', '.join(sorted(changed))}")
+        for callback in subscribers:
+            try:
+                callback(snapshot, changed)
+            except Exception as e:
+                logger.error(f"配置变化处理失败（{getattr(callback, '__name__', callback)}）: {str(e)}")
+        return changed
+
+    # ---- 重新加载 ----
+
+    def reload(self, force: bool = False) -> Optional[FrozenSet[str]]:
+        """
+        重新读取配置文件，校验通过后发布新快照
+
+        Args:
+            force: 文件指纹未变化时也重新读取
+
+        Returns:
+            变化的配置段；文件未变化或新配置未通过校验时返回 None（继续使用当前快照）
+        """
+        with self._reload_lock:
+            with self._lock:
+                self._metrics["checks"] += 1
+            fingerprint = _file_fingerprint(self.path)
+            if not force and fingerprint == self._snapshot.fingerprint:
+                return None
+            try:
+                reader = ConfigReader(self.path)
+                if not reader.validate_config():
+                    raise ValueError("配置校验未通过（缺少必要的 AWS 或 S3 配置）")
+                file_sections = reader.get_all_config()
+            except Exception as e:
+                with self._lock:
+                    self._metrics["rejected"] += 1
+                    self._metrics["last_error"] = str(e)
+                    # 记录该版本的指纹，文件再次修改前不重复尝试
+                    self._snapshot.fingerprint = fingerprint
+                logger.error(f"新配置未通过校验，继续使用版本 {self._snapshot.version}: {str(e)}")
+                return None
+            changed = self._publish(file_sections, fingerprint)
+            if changed:
+                with self._lock:
+                    self._metrics["reloads"] += 1
+                    self._metrics["last_error"] = None
+            return changed
+
+    def set_overrides(self, section: str, **values: Any) -> FrozenSet[str]:
+        """
+        在文件配置之上覆盖某个配置段的值（重新加载文件后仍然保留），并发布新快照
+
+        用于基准测试等需要在运行时替换配置的场景
+        """
+        with self._lock:
+            self._overrides.setdefault(section, {}).update(values)
+            file_sections = self._file_sections
+            fingerprint = self._snapshot.fingerprint
+        return self._publish(file_sections, fingerprint)
+
+    def clear_overrides(self) -> FrozenSet[str]:
+        """清除所有覆盖值，并发布新快照"""
+        with self._lock:
+            self._overrides.clear()
+            file_sections = self._file_sections
+            fingerprint = self._snapshot.fingerprint
+        return self._publish(file_sections, fingerprint)
+
+    # ---- 监视 ----
+
+    def start_watching(self, poll_interval: Optional[float] = None):
+        """启动后台线程，按间隔检查配置文件是否变化"""
+        if poll_interval is not None:
+            self.poll_interval = poll_interval
+        with self._lock:
+            if self._watcher is not None and self._watcher.is_alive():
+                return
+            self._stop.clear()
+            self._watcher = threading.Thread(target=self._watch_loop, name="config-watcher", daemon=True)
+            self._watcher.start()
+        logger.info(f"开始监视配置文件: {self.path}（每 {self.poll_interval}s 检查一次）")
+
+    def stop_watching(self):
+        """停止监视"""
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join(self.poll_interval + 1)
+
+    def _watch_loop(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.reload()
+            except Exception as e:
+                logger.error(f"检查配置文件失败: {str(e)}")
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """获取配置版本和重新加载统计"""
+        with self._lock:
+            snapshot = self._snapshot
+            return dict(
+                self._metrics,
+                version=snapshot.version,
+                loaded_at=snapshot.loaded_at,
+                path=self.path,
+                watching=self._watcher is not None and self._watcher.is_alive(),
+                overrides=sorted(self._overrides)
+            )
+
+
+class ConfigSection(Mapping):
+    """
+    只读配置段视图：读取当前请求所用快照中的配置段
+
+    兼容原来的模块级配置字典（如 preaudit_config['min_file_count']），但每次读取都经过快照
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def _values(self) -> Mapping:
+        return current_snapshot().section(self.name)
+
+    def __getitem__(self, key: str) -> Any:
+        return self._values()[key]
+
+    def __iter__(self):
+        return iter(self._values())
+
+    def __len__(self) -> int:
+        return len(self._values())
+
+    def __repr__(self) -> str:
+        return f"ConfigSection({self.name!r}, {dict(self._values())!r})"
+
+
+# 全局配置服务（首次使用时由全局配置读取器创建）
+_service: Optional[ConfigService] = None
+_service_lock = threading.Lock()
+
+_pinned_snapshot: contextvars.ContextVar = contextvars.ContextVar("config_snapshot", default=None)
+
+
+def get_config_service() -> ConfigService:
+    """获取全局配置服务"""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = ConfigService(get_config())
+    return _service
+
+
+def current_snapshot() -> ConfigSnapshot:
+    """当前请求固定的快照；没有固定时返回最新快照"""
+    snapshot = _pinned_snapshot.get()
+    return snapshot if snapshot is not None else get_config_service().current()
+
+
+@contextmanager
+def pinned_snapshot():
+    """
+    在范围内（同一线程/上下文，含 asyncio.to_thread）固定使用当前快照，
+    请求处理期间配置更新不影响该请求；已固定时沿用外层快照
+    """
+    snapshot = _pinned_snapshot.get()
+    if snapshot is not None:
+        yield snapshot
+        return
+    snapshot = get_config_service().current()
+    token = _pinned_snapshot.set(snapshot)
+    try:
+        yield snapshot
+    finally:
+        _pinned_snapshot.reset(token)
+
+
+def config_section(name: str) -> ConfigSection:
+    """获取配置段视图"""
+    return ConfigSection(name)
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+调用成本与资源用量记账模块
+统计 Bedrock 输入/输出 token、EXA 搜索次数和结果字节数、S3 LIST 次数和扫描键数、
+S3 Range GET 次数和读取字节数、CloudWatch 发送字节数，按单次预审和全局累计，并按配置的单价估算费用
+"""
+
+import contextvars
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+# 计量项
+USAGE_FIELDS = (
+    "bedrock_calls",
+    "bedrock_input_tokens",
+    "bedrock_output_tokens",
+    "exa_requests",
+    "exa_result_bytes",
+    "s3_list_calls",
+    "s3_keys_scanned",
+    "s3_get_calls",
+    "s3_bytes_read",
+    "cloudwatch_bytes",
+)
+
+# 默认单价（美元），应按账户实际价格在 [COST] 中配置；配置读取也以此为默认值
+DEFAULT_PRICING = {
+    "bedrock_input_per_1k_tokens": 0.00025,
+    "bedrock_output_per_1k_tokens": 0.00125,
+    "exa_per_search": 0.005,
+    "s3_list_per_1k_requests": 0.005,
+    "s3_get_per_1k_requests": 0.0004,
+    "cloudwatch_per_gb": 0.50,
+}
+
+
+def estimate_cost(usage: Dict[str, int], pricing: Dict[str, float]) -> Dict[str, float]:
+    """按单价估算各项费用（美元），pricing 中未提供的项使用默认单价"""
+    def price(key: str) -> float:
+        return pricing.get(key, DEFAULT_PRICING[key])
+
+    costs = {
+        "bedrock": usage.get("bedrock_input_tokens", 0) / 1000 * price("bedrock_input_per_1k_tokens")
+        + usage.get("bedrock_output_tokens", 0) / 1000 * price("bedrock_output_per_1k_tokens"),
+        "exa": usage.get("exa_requests", 0) * price("exa_per_search"),
+        "s3": usage.get("s3_list_calls", 0) / 1000 * price("s3_list_per_1k_requests")
+        + usage.get("s3_get_calls", 0) / 1000 * price("s3_get_per_1k_requests"),
+        "cloudwatch": usage.get("cloudwatch_bytes", 0) / (1024 ** 3) * price("cloudwatch_per_gb"),
+    }
+    costs["total"] = sum(costs.values())
+    return {name: round(value, 8) for name, value in costs.items()}
+
+
+class Usage:
+    """
+    一个记账范围（如一次预审）内的用量
+
+    同一预审的多个工作线程（复制了上下文）会同时记账，计数更新需要加锁
+    """
+
+    def __init__(self, parent: Optional["Usage"] = None):
+        self.parent = parent
+        self.counters = {name: 0 for name in USAGE_FIELDS}
+        self._lock = threading.Lock()
+
+    def add(self, counts: Dict[str, int]):
+        with self._lock:
+            for name, value in counts.items():
+                self.counters[name] += value
+
+    def snapshot(self) -> Dict[str, int]:
+        """当前各计量项的一致快照"""
+        with self._lock:
+            return dict(self.counters)
+
+    def to_dict(self, pricing: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+        """用量和估算费用"""
+        data: Dict[str, Any] = self.snapshot()
+        data["estimated_usd"] = estimate_cost(data, pricing or _ledger.pricing)["total"]
+        return data
+
+
+_current_usage: contextvars.ContextVar = contextvars.ContextVar("cost_ledger_usage", default=None)
+
+
+class CostLedger:
+    """全局累计用量、各结论的预审次数和每位通过验证讲者的费用"""
+
+    def __init__(self):
+        self.pricing = dict(DEFAULT_PRICING)
+        self._lock = threading.Lock()
+        self._totals = {name: 0 for name in USAGE_FIELDS}
+        self._preaudit_totals = {name: 0 for name in USAGE_FIELDS}
+        self._verdicts: Dict[str, int] = {}
+
+    def configure_pricing(self, **pricing: float):
+        """更新单价（未提供的项保持默认值）"""
+        with self._lock:
+            self.pricing.update({key: value for key, value in pricing.items() if key in DEFAULT_PRICING})
+
+    def record(self, counts: Dict[str, int]):
+        with self._lock:
+            for name, value in counts.items():
+                self._totals[name] += value
+
+    def record_preaudit(self, verdict: str, usage: Usage):
+        """记录一次预审的结论和用量"""
+        with self._lock:
+            self._verdicts[verdict] = self._verdicts.get(verdict, 0) + 1
+            for name, value in usage.snapshot().items():
+                self._preaudit_totals[name] += value
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """累计用量、估算费用和每位通过验证讲者的费用"""
+        with self._lock:
+            totals = dict(self._totals)
+            preaudit_totals = dict(self._preaudit_totals)
+            verdicts = dict(self._verdicts)
+            pricing = dict(self.pricing)
+
+        preaudits = sum(verdicts.values())
+        verified = verdicts.get("pass", 0)
+        preaudit_cost = estimate_cost(preaudit_totals, pricing)["total"]
+        return {
+            "totals": totals,
+            "estimated_usd": estimate_cost(totals, pricing),
+            "preaudits": preaudits,
+            "verdicts": verdicts,
+            "per_preaudit": {
+                name: round(value / preaudits, 3) for name, value in preaudit_totals.items()
+            } if preaudits else {},
+            "usd_per_preaudit": round(preaudit_cost / preaudits, 8) if preaudits else 0.0,
+            "usd_per_verified_speaker": round(preaudit_cost / verified, 8) if verified else 0.0,
+            "pricing": pricing
+        }
+
+
+# 全局记账实例
+_ledger = CostLedger()
+
+
+def get_cost_ledger() -> CostLedger:
+    """获取全局记账实例"""
+    return _ledger
+
+
+@contextmanager
+def track_usage():
+    """
+    开启一个记账范围，范围内（同一线程/上下文）的用量计入返回的 Usage，
+    嵌套范围的用量同时计入外层范围
+    """
+    usage = Usage(parent=_current_usage.get())
+    token = _current_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _current_usage.reset(token)
+
+
+def record_usage(**counts: int):
+    """
+    记录一次外部调用的用量（计入当前记账范围及全局累计）
+
+    Args:
+        counts: USAGE_FIELDS 中的计量项，如 bedrock_input_tokens=120
+    """
+    for name in counts:
+        if name not in USAGE_FIELDS:
+            raise ValueError(f"未知的计量项: {name}")
+    usage = _current_usage.get()
+    while usage is not None:
+        usage.add(counts)
+        usage = usage.parent
+    _ledger.record(counts)
+
+
+def get_cost_metrics() -> Dict[str, Any]:
+    """获取全局用量和费用指标"""
+    return _ledger.get_metrics()
@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+"""
+请求截止时间（deadline）模块
+为一次预审调用提供整体时间预算，各阶段按剩余时间确定自身超时，时间不足时跳过可选步骤；
+调用方取消请求时，进行中的外部调用被中止（关闭其连接），剩余阶段不再执行
+"""
+
+import asyncio
+import contextvars
+import logging
+import socket
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class DeadlineExceeded(Exception):
+    """请求的时间预算已耗尽"""
+
+    def __init__(self, stage: str, message: str = ""):
+        self.stage = stage
+        super().__init__(message or f"阶段 '{stage}' 开始前时间预算已耗尽")
+
+
+class RequestCancelled(BaseException):
+    """
+    请求已被调用方取消（客户端取消请求或断开连接）
+
+    与 asyncio.CancelledError 一样继承 BaseException，各阶段按 Exception 捕获的降级逻辑不会吞掉它
+    """
+
+    def __init__(self, stage: str, reason: str = ""):
+        self.stage = stage
+        self.reason = reason
+        super().__init__(f"阶段 '{stage}' 因请求取消而中止" + (f": {reason}" if reason else ""))
+
+
+class CancellationStats:
+    """
+    取消统计：被取消的请求数、各阶段中止的工作数，以及请求取消时进行中的外部调用的去向
+
+    - aborted_calls：调用被中止（尚未开始即取消，或关闭连接后很快结束），不再产生费用
+    - abandoned_calls：调用未能中止，在后台一直执行到自身结束或超时（仍然计费）
+    - abandoned_running：请求已取消、但调用仍在后台执行的数量
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.cancelled_requests = 0
+        self.aborted_stages: Dict[str, int] = {}
+        self.aborted_calls: Dict[str, int] = {}
+        self.abandoned_calls: Dict[str, int] = {}
+        self.abandoned_running = 0
+
+    def record_cancel(self):
+        with self._lock:
+            self.cancelled_requests += 1
+
+    def record_aborted(self, stage: str):
+        with self._lock:
+            self.aborted_stages[stage] = self.aborted_stages.get(stage, 0) + 1
+
+    def record_call_aborted(self, stage: str):
+        with self._lock:
+            self.aborted_calls[stage] = self.aborted_calls.get(stage, 0) + 1
+
+    def record_abort_started(self):
+        """请求取消时调用仍在执行：计入后台执行中的数量，结束时再按耗时区分中止或放弃"""
+        with self._lock:
+            self.abandoned_running += 1
+
+    def record_cancelled_call_finished(self, stage: str, aborted: bool):
+        with self._lock:
+            self.abandoned_running -= 1
+            calls = self.aborted_calls if aborted else self.abandoned_calls
+            calls[stage] = calls.get(stage, 0) + 1
+
+    def get_metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "cancelled_requests": self.cancelled_requests,
+                "aborted_work": sum(self.aborted_stages.values()),
+                "aborted_stages": dict(self.aborted_stages),
+                "aborted_calls": dict(self.aborted_calls),
+                "abandoned_calls": dict(self.abandoned_calls),
+                "abandoned_running": self.abandoned_running
+            }
+
+
+_cancellation_stats = CancellationStats()
+
+# 可取消请求的外部调用在共享的有界线程池中执行
+EXTERNAL_CALL_WORKERS = 64
+# 中止后在该时间内结束的调用视为已中止，超过则视为被放弃（在后台执行到自身超时）
+ABORT_GRACE_SECONDS = 1.0
+
+_external_executor: Optional[ThreadPoolExecutor] = None
+_external_executor_lock = threading.Lock()
+# 线程池中当前正在执行的外部调用（用于登记中止操作）
+_active_call: contextvars.ContextVar = contextvars.ContextVar("external_call", default=None)
+# 异步调用所在的阶段（线程适配的同步客户端据此记录取消统计）
+_call_stage: contextvars.ContextVar = contextvars.ContextVar("external_call_stage", default="external")
+
+
+def _get_external_executor() -> ThreadPoolExecutor:
+    global _external_executor
+    with _external_executor_lock:
+        if _external_executor is None:
+            _external_executor = ThreadPoolExecutor(max_workers=EXTERNAL_CALL_WORKERS,
+                                                    thread_name_prefix="external-call")
+        return _external_executor
+
+
+def _run_closer(closer: Callable[[], None]):
+    try:
+        closer()
+    except Exception as e:
+        logger.debug(f"中止外部调用时关闭连接失败: {str(e)}")
+
+
+class _ExternalCall:
+    """一次在线程池中执行的外部调用：登记的中止操作（关闭所用连接）和取消后的去向"""
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self._lock = threading.Lock()
+        self._closers: List[Callable[[], None]] = []
+        self._aborted_at: Optional[float] = None
+        self._finished = False
+
+    def add_closer(self, closer: Callable[[], None]):
+        """登记中止操作；调用已被中止时立即执行"""
+        with self._lock:
+            if self._aborted_at is None and not self._finished:
+                self._closers.append(closer)
+                return
+        _run_closer(closer)
+
+    def run(self, func: Callable[..., Any], args: tuple, kwargs: Dict[str, Any]) -> Any:
+        token = _active_call.set(self)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _active_call.reset(token)
+            self._finish()
+
+    def abort(self, future: Future):
+        """
+        请求取消后中止调用：尚未开始的直接取消，进行中的关闭其连接；
+        调用结束时按中止后的耗时计入 aborted_calls 或 abandoned_calls
+        """
+        if future.cancelled() or future.cancel():
+            _cancellation_stats.record_call_aborted(self.stage)
+            return
+        with self._lock:
+            if self._finished or self._aborted_at is not None:
+                return
+            self._aborted_at = time.monotonic()
+            closers, self._closers = self._closers, []
+        _cancellation_stats.record_abort_started()
+        for closer in closers:
+            _run_closer(closer)
+        if not closers:
+            logger.info(f"外部调用没有可关闭的连接，在后台执行到自身超时: {self.stage}")
+
+    def _finish(self):
+        with self._lock:
+            self._finished = True
+            self._closers = []
+            aborted_at = self._aborted_at
+        if aborted_at is not None:
+            aborted = time.monotonic() - aborted_at <= ABORT_GRACE_SECONDS
+            _cancellation_stats.record_cancelled_call_finished(self.stage, aborted)
+
+
+def _submit_external_call(call: _ExternalCall, func: Callable[..., Any], args: tuple,
+                          kwargs: Dict[str, Any]) -> Future:
+    """在有界线程池中发起调用（继承当前上下文，如请求 ID 和记账范围）"""
+    context = contextvars.copy_context()
+    return _get_external_executor().submit(context.run, call.run, func, args, kwargs)
+
+
+def register_abort(closer: Callable[[], None]):
+    """
+    为当前外部调用登记中止操作（如关闭所用的连接），请求取消时执行
+
+    不在可取消的外部调用中时不做任何事
+    """
+    call = _active_call.get()
+    if call is not None:
+        call.add_closer(closer)
+
+
+class _AbortableConnection:
+    """HTTP 连接混入：在外部调用中发送请求时登记中止操作，中止时关闭套接字使阻塞的读写立即出错"""
+
+    _abort_requested = False
+
+    def request(self, *args, **kwargs):
+        self._abort_requested = False
+        register_abort(self._abort)
+        return super().request(*args, **kwargs)
+
+    def connect(self):
+        super().connect()
+        # 建立连接期间收到中止请求
+        if self._abort_requested:
+            self._abort()
+
+    def _abort(self):
+        self._abort_requested = True
+        sock = getattr(self, "sock", None)
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+def abortable_pool_classes(pool_classes: Dict[str, type]) -> Dict[str, type]:
+    """
+    为 urllib3 连接池类（requests 和 botocore 的 pool_classes_by_scheme）生成可中止的子类
+
+    子类的连接在可取消的外部调用中登记中止操作，请求取消时关闭连接而不是等待调用自身超时
+    """
+    abortable = {}
+    for scheme, pool_class in pool_classes.items():
+        if issubclass(pool_class.ConnectionCls, _AbortableConnection):
+            abortable[scheme] = pool_class
+            continue
+        connection_class = type(f"Abortable{pool_class.ConnectionCls.__name__}",
+                                (_AbortableConnection, pool_class.ConnectionCls), {})
+        abortable[scheme] = type(f"Abortable{pool_class.__name__}", (pool_class,),
+                                 {"ConnectionCls": connection_class})
+    return abortable
+
+
+class Deadline:
+    """一次请求的截止时间和取消状态，跨阶段传递"""
+
+    def __init__(self, budget_seconds: Optional[float] = None, cancellable: bool = False):
+        """
+        初始化截止时间
+
+        Args:
+            budget_seconds: 总时间预算（秒），None 表示不限时
+            cancellable: 调用方是否可能取消请求（如 MCP 请求）；
+                可取消时外部调用在共享线程池中发起，取消后立即中止
+        """
+        self.budget_seconds = budget_seconds
+        self.cancellable = cancellable
+        self._started_at = time.monotonic()
+        self._expires_at = None if budget_seconds is None else self._started_at + budget_seconds
+        self.skipped_stages: List[str] = []
+        self.cancel_reason = ""
+        # 异步调用被取消时所在的阶段
+        self.aborted_stage: Optional[str] = None
+        self._cancelled = False
+        self._lock = threading.Lock()
+        self._waiters: Set[threading.Event] = set()
+
+    @classmethod
+    def from_timeout(cls, timeout_seconds: Optional[float], cancellable: bool = False) -> "Deadline":
+        """根据超时秒数创建截止时间，非正数视为不限时"""
+        if timeout_seconds is None or timeout_seconds <= 0:
+            return cls(None, cancellable)
+        return cls(float(timeout_seconds), cancellable)
+
+    def remaining(self) -> float:
+        """剩余时间（秒），不限时返回 inf"""
+        if self._expires_at is None:
+            return float('inf')
+        return max(0.0, self._expires_at - time.monotonic())
+
+    def elapsed(self) -> float:
+        """已用时间（秒）"""
+        return time.monotonic() - self._started_at
+
+    def expired(self) -> bool:
+        """是否已经超时"""
+        return self.remaining() <= 0
+
+    def has_time_for(self, seconds: float) -> bool:
+        """剩余时间是否足够执行一个预计耗时 seconds 的阶段"""
+        return self.remaining() >= seconds
+
+    def timeout_for(self, stage: str, cap: float, reserve: float = 0.0) -> float:
+        """
+        为某个阶段计算超时时间
+
+        Args:
+            stage: 阶段名称（用于错误信息）
+            cap: 该阶段自身的最大超时
+            reserve: 为后续必需阶段保留的时间
+
+        Returns:
+            min(cap, 剩余时间 - reserve)
+
+        Raises:
+            DeadlineExceeded: 可用时间不大于 0
+            RequestCancelled: 请求已被取消
+        """
+        self.check_cancelled(stage)
+        available = self.remaining() - reserve
+        if available <= 0:
+            raise DeadlineExceeded(stage)
+        return min(cap, available)
+
+    def check(self, stage: str):
+        """阶段开始前检查是否已取消或超时"""
+        self.check_cancelled(stage)
+        if self.expired():
+            raise DeadlineExceeded(stage)
+
+    @property
+    def cancelled(self) -> bool:
+        """请求是否已被取消"""
+        return self._cancelled
+
+    def cancel(self, reason: str = "请求已取消"):
+        """取消请求：唤醒正在等待外部调用的阶段，之后的阶段检查时抛出 RequestCancelled"""
+        with self._lock:
+            if self._cancelled:
+                return
+            self._cancelled = True
+            self.cancel_reason = reason
+            waiters = list(self._waiters)
+        _cancellation_stats.record_cancel()
+        for waiter in waiters:
+            waiter.set()
+
+    def check_cancelled(self, stage: str):
+        """请求已被取消时抛出 RequestCancelled"""
+        if self._cancelled:
+            raise RequestCancelled(stage, self.cancel_reason)
+
+    def call(self, stage: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        发起一次阻塞的外部调用（Bedrock、EXA、S3）
+
+        可取消的请求在共享的有界线程池中发起调用，请求被取消时立即停止等待并抛出 RequestCancelled，
+        释放当前工作线程；进行中的调用被中止（关闭其连接，见 abortable_pool_classes），
+        无法中止的调用在后台执行到自身超时，结果丢弃
+
+        Raises:
+            RequestCancelled: 调用前或调用过程中请求被取消
+        """
+        self.check_cancelled(stage)
+        if not self.cancellable:
+            return func(*args, **kwargs)
+
+        finished = threading.Event()
+        with self._lock:
+            if self._cancelled:
+                raise RequestCancelled(stage, self.cancel_reason)
+            self._waiters.add(finished)
+        try:
+            call = _ExternalCall(stage)
+            future = _submit_external_call(call, func, args, kwargs)
+            future.add_done_callback(lambda _: finished.set())
+            finished.wait()
+        finally:
+            with self._lock:
+                self._waiters.discard(finished)
+
+        if future.done():
+            return future.result()
+        call.abort(future)
+        logger.info(f"请求已取消，中止进行中的外部调用: {stage}")
+        raise RequestCancelled(stage, self.cancel_reason)
+
+    async def call_async(self, stage: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        发起一次异步外部调用（func 为协程函数）
+
+        请求被取消时所在任务被取消，进行中的调用随之中止，记录中止时所在的阶段；
+        func 通过 run_blocking_call 在线程中执行同步客户端时，按 stage 记录该调用的取消统计
+
+        Raises:
+            RequestCancelled: 调用前请求已被取消
+        """
+        self.check_cancelled(stage)
+        token = _call_stage.set(stage)
+        try:
+            return await func(*args, **kwargs)
+        except asyncio.CancelledError:
+            if self.aborted_stage is None:
+                self.aborted_stage = stage
+            raise
+        finally:
+            _call_stage.reset(token)
+
+    def skip(self, stage: str, reason: str = "时间预算不足"):
+        """记录因时间不足被跳过的可选阶段"""
+        self.skipped_stages.append(stage)
+        logger.warning(f"跳过阶段 '{stage}': {reason}，剩余时间 {self.remaining():.2f}s")
+
+
+async def run_blocking_call(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    在共享的有界线程池中执行阻塞的外部调用（异步调用方使用同步客户端时）
+
+    所在任务被取消时中止调用（尚未开始的直接取消，进行中的关闭其连接），不占用默认线程池
+    """
+    call = _ExternalCall(_call_stage.get())
+    future = _submit_external_call(call, func, args, kwargs)
+    try:
+        return await asyncio.wrap_future(future)
+    except asyncio.CancelledError:
+        call.abort(future)
+        raise
+
+
+def ensure_deadline(deadline: Optional[Deadline]) -> Deadline:
+    """调用方未提供截止时间时返回不限时的 Deadline"""
+    return deadline if deadline is not None else Deadline(None)
+
+
+def record_aborted_work(stage: str):
+    """记录一次因请求取消而中止的工作（中止时所在的阶段）"""
+    _cancellation_stats.record_aborted(stage)
+
+
+def get_cancellation_metrics() -> Dict[str, Any]:
+    """获取取消统计"""
+    return _cancellation_stats.get_metrics()
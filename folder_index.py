@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+讲者文件夹索引模块
+根据列表结果中的 ETag 和大小识别重复上传的文档（如 证书.pdf 和 证书 (1).pdf），
+统计唯一文档数量和重复文件组，常见情况下不需要额外的 GET 请求；
+分段上传的对象 ETag 不是内容 MD5，可选读取其内容计算 MD5 后再比较。
+每个文件夹的结果按列表内容缓存，内容 MD5 按 ETag 缓存
+"""
+
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field, replace
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 重复判定依据
+METHOD_ETAG = "etag"
+METHOD_CONTENT_HASH = "content_hash"
+
+
+def normalize_etag(etag: str) -> str:
+    """去掉 ETag 两侧的引号"""
+    return (etag or "").strip('"')
+
+
+def is_multipart_etag(etag: str) -> bool:
+    """分段上传对象的 ETag 形如 "<md5>-<分段数>"，不是内容的 MD5"""
+    return "-" in normalize_etag(etag)
+
+
+@dataclass(slots=True)
+class DuplicateGroup:
+    """内容相同的一组文件（keys[0] 计为唯一文档，其余为重复文件）"""
+    keys: List[str]
+    size: int
+    method: str = METHOD_ETAG
+
+
+@dataclass(slots=True)
+class FolderDuplicates:
+    """一个文件夹的重复文档统计"""
+    document_count: int = 0
+    unique_count: int = 0
+    groups: List[DuplicateGroup] = field(default_factory=list)
+    # 可能与其他文件重复但未计算内容 MD5 的分段上传文件
+    unverified: List[str] = field(default_factory=list)
+    # 本次计算内容 MD5 发起的 GET 次数
+    hashed: int = 0
+
+    @property
+    def duplicate_count(self) -> int:
+        """未计入唯一文档数量的重复文件数"""
+        return self.document_count - self.unique_count
+
+    def listing_fields(self) -> Dict[str, Any]:
+        """附加到文件夹检查结果上的字段"""
+        return {
+            "unique_file_count": self.unique_count,
+            "duplicate_groups": [asdict(group) for group in self.groups],
+            "unverified_duplicates": list(self.unverified)
+        }
+
+
+def multipart_candidates(objects: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    需要比较内容 MD5 才能确定是否重复的分段上传文件：
+    与其他 ETag 不同的文件大小相同（大小不同的文件内容一定不同，无需读取）
+    """
+    etags_by_size: Dict[int, set] = {}
+    for obj in objects:
+        etags_by_size.setdefault(obj.get("size", 0), set()).add(normalize_etag(obj.get("etag", "")))
+    return [
+        obj for obj in objects
+        if is_multipart_etag(obj.get("etag", "")) and len(etags_by_size[obj.get("size", 0)]) > 1
+    ]
+
+
+def find_duplicates(objects: List[Dict[str, Any]], digests: Optional[Dict[str, str]] = None) -> FolderDuplicates:
+    """
+    按内容指纹和大小分组统计重复文件（纯函数，不发起远程调用）
+
+    Args:
+        objects: 列表结果中的对象（key、etag、size）
+        digests: 分段上传对象的内容 MD5（ETag -> MD5），单段上传对象的 ETag 即内容 MD5
+
+    Returns:
+        重复文档统计
+    """
+    digests = digests or {}
+    candidates = {obj["key"] for obj in multipart_candidates(objects)}
+    groups: Dict[Tuple[str, int], List[str]] = {}
+    hashed_groups = set()
+    unverified = []
+    for obj in objects:
+        etag = normalize_etag(obj.get("etag", ""))
+        fingerprint = etag
+        if is_multipart_etag(etag):
+            digest = digests.get(etag)
+            if digest is not None:
+                fingerprint = digest
+            elif obj["key"] in candidates:
+                unverified.append(obj["key"])
+        group_key = (fingerprint, obj.get("size", 0))
+        if not fingerprint:
+            # 没有 ETag 时无法判断，按唯一文档计
+            group_key = (obj["key"], obj.get("size", 0))
+        groups.setdefault(group_key, []).append(obj["key"])
+        if fingerprint != etag:
+            hashed_groups.add(group_key)
+
+    duplicates = [
+        DuplicateGroup(keys=sorted(keys), size=size,
+                       method=METHOD_CONTENT_HASH if (fingerprint, size) in hashed_groups else METHOD_ETAG)
+        for (fingerprint, size), keys in groups.items() if len(keys) > 1
+    ]
+    duplicates.sort(key=lambda group: group.keys[0])
+    return FolderDuplicates(
+        document_count=len(objects),
+        unique_count=len(groups),
+        groups=duplicates,
+        unverified=sorted(unverified)
+    )
+
+
+def _listing_fingerprint(objects: List[Dict[str, Any]]) -> str:
+    """列表内容的指纹（键、ETag、大小），文件夹内容不变时指纹不变"""
+    digest = hashlib.blake2b(digest_size=16)
+    for obj in sorted(objects, key=lambda item: item["key"]):
+        digest.update(f"{obj['key']}\0{obj.get('etag', '')}\0{obj.get('size', 0)}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+# 计算对象内容 MD5：hash_object(key) -> 十六进制 MD5
+ObjectHasher = Callable[[str], str]
+AsyncObjectHasher = Callable[[str], Awaitable[str]]
+
+
+class FolderIndex:
+    """文件夹索引：缓存每个文件夹的重复文档统计（LRU）和分段上传对象的内容 MD5"""
+
+    def __init__(self, max_folders: int = 10000, max_digests: int = 100000, hash_max_bytes: int = 104857600):
+        """
+        Args:
+            max_folders: 缓存的文件夹数量上限
+            max_digests: 缓存的内容 MD5 数量上限
+            hash_max_bytes: 计算内容 MD5 的文件大小上限（更大的文件只按 ETag 判断）
+        """
+        self.max_folders = max_folders
+        self.max_digests = max_digests
+        self.hash_max_bytes = hash_max_bytes
+        self._folders: "OrderedDict[Tuple[str, str], Tuple[str, FolderDuplicates]]" = OrderedDict()
+        self._digests: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._metrics = {"lookups": 0, "cache_hits": 0, "content_hashes": 0, "hash_errors": 0,
+                         "duplicate_files": 0}
+
+    def configure(self, max_folders: int = 10000, max_digests: int = 100000, hash_max_bytes: int = 104857600):
+        """更新缓存大小和计算内容 MD5 的文件大小上限"""
+        with self._lock:
+            self.max_folders = max_folders
+            self.max_digests = max_digests
+            self.hash_max_bytes = hash_max_bytes
+            _trim(self._folders, max_folders)
+            _trim(self._digests, max_digests)
+
+    # ---- 缓存 ----
+
+    def _cached(self, bucket: str, prefix: str, fingerprint: str, verified: bool) -> Optional[FolderDuplicates]:
+        """列表内容未变化时返回缓存的结果（verified 为真时要求没有未确认的分段上传文件）"""
+        with self._lock:
+            self._metrics["lookups"] += 1
+            entry = self._folders.get((bucket, prefix))
+            if entry is None or entry[0] != fingerprint or (verified and entry[1].unverified):
+                return None
+            self._folders.move_to_end((bucket, prefix))
+            self._metrics["cache_hits"] += 1
+            return entry[1]
+
+    def _store(self, bucket: str, prefix: str, fingerprint: str, duplicates: FolderDuplicates):
+        with self._lock:
+            self._folders[(bucket, prefix)] = (fingerprint, duplicates)
+            self._folders.move_to_end((bucket, prefix))
+            _trim(self._folders, self.max_folders)
+            self._metrics["duplicate_files"] += duplicates.duplicate_count
+
+    def _known_digests(self, candidates: List[Dict[str, Any]]) -> Tuple[Dict[str, str], List[Dict[str, Any]]]:
+        """拆分为已知内容 MD5 的 ETag 和需要读取内容的对象（同一 ETag 只读取一次，超过大小上限的不读取）"""
+        known, pending, seen = {}, [], set()
+        with self._lock:
+            for obj in candidates:
+                etag = normalize_etag(obj.get("etag", ""))
+                digest = self._digests.get(etag)
+                if digest is not None:
+                    self._digests.move_to_end(etag)
+                    known[etag] = digest
+                elif etag not in seen and obj.get("size", 0) <= self.hash_max_bytes:
+                    seen.add(etag)
+                    pending.append(obj)
+        return known, pending
+
+    def _remember_digest(self, etag: str, digest: str):
+        with self._lock:
+            self._digests[etag] = digest
+            self._digests.move_to_end(etag)
+            _trim(self._digests, self.max_digests)
+            self._metrics["content_hashes"] += 1
+
+    def _hash_failed(self, key: str, error: Exception):
+        logger.warning(f"计算文件内容 MD5 失败，按 ETag 判断是否重复: {key}: {error}")
+        with self._lock:
+            self._metrics["hash_errors"] += 1
+
+    # ---- 统计 ----
+
+    def deduplicate(self, bucket: str, prefix: str, objects: List[Dict[str, Any]],
+                    hash_object: Optional[ObjectHasher] = None) -> FolderDuplicates:
+        """
+        统计文件夹中的重复文档
+
+        Args:
+            bucket: 存储桶名称
+            prefix: 文件夹前缀
+            objects: 列表结果中的对象（key、etag、size）
+            hash_object: 计算对象内容 MD5 的函数；为空时不读取内容，只按 ETag 和大小判断
+
+        Returns:
+            重复文档统计；列表内容与上次相同时直接返回缓存的结果
+        """
+        fingerprint = _listing_fingerprint(objects)
+        cached = self._cached(bucket, prefix, fingerprint, verified=hash_object is not None)
+        if cached is not None:
+            return replace(cached, hashed=0)
+
+        digests, pending, hashed = {}, [], 0
+        candidates = multipart_candidates(objects)
+        if candidates:
+            digests, pending = self._known_digests(candidates)
+        if hash_object is not None:
+            for obj in pending:
+                try:
+                    digest = hash_object(obj["key"])
+                except Exception as e:
+                    self._hash_failed(obj["key"], e)
+                    continue
+                hashed += 1
+                digests[normalize_etag(obj.get("etag", ""))] = digest
+                self._remember_digest(normalize_etag(obj.get("etag", "")), digest)
+        return self._finish(bucket, prefix, fingerprint, objects, digests, hashed)
+
+    async def deduplicate_async(self, bucket: str, prefix: str, objects: List[Dict[str, Any]],
+                                hash_object: AsyncObjectHasher) -> FolderDuplicates:
+        """统计文件夹中的重复文档（异步版本：hash_object 为协程函数，各对象并发读取）"""
+        fingerprint = _listing_fingerprint(objects)
+        cached = self._cached(bucket, prefix, fingerprint, verified=True)
+        if cached is not None:
+            return replace(cached, hashed=0)
+
+        digests, pending = self._known_digests(multipart_candidates(objects))
+        results = await asyncio.gather(*(hash_object(obj["key"]) for obj in pending), return_exceptions=True)
+        hashed = 0
+        for obj, result in zip(pending, results):
+            if isinstance(result, BaseException):
+                if not isinstance(result, Exception):
+                    raise result
+                self._hash_failed(obj["key"], result)
+                continue
+            hashed += 1
+            digests[normalize_etag(obj.get("etag", ""))] = result
+            self._remember_digest(normalize_etag(obj.get("etag", "")), result)
+        return self._finish(bucket, prefix, fingerprint, objects, digests, hashed)
+
+    def _finish(self, bucket: str, prefix: str, fingerprint: str, objects: List[Dict[str, Any]],
+                digests: Dict[str, str], hashed: int) -> FolderDuplicates:
+        duplicates = find_duplicates(objects, digests)
+        duplicates.hashed = hashed
+        self._store(bucket, prefix, fingerprint, duplicates)
+        if duplicates.groups:
+            logger.info(f"文件夹 {prefix} 中发现 {len(duplicates.groups)} 组重复文件，"
+                        f"唯一文档 {duplicates.unique_count} 个（共 {duplicates.document_count} 个文件）")
+        return duplicates
+
+    def invalidate(self, bucket: str, prefix: str):
+        """丢弃一个文件夹的缓存结果"""
+        with self._lock:
+            self._folders.pop((bucket, prefix), None)
+
+    def clear(self):
+        """清空全部缓存"""
+        with self._lock:
+            self._folders.clear()
+            self._digests.clear()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """缓存命中、内容 MD5 计算次数和发现的重复文件数"""
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics["folders"] = len(self._folders)
+            metrics["digests"] = len(self._digests)
+        lookups = metrics["lookups"]
+        metrics["cache_hit_rate"] = round(metrics["cache_hits"] / lookups, 4) if lookups else 0.0
+        return metrics
+
+
+def _trim(cache: OrderedDict, limit: int):
+    while len(cache) > max(0, limit):
+        cache.popitem(last=False)
+
+
+def md5_stream(body, chunk_size: int = 1024 * 1024) -> str:
+    """分块读取流式响应体并计算 MD5"""
+    digest = hashlib.md5()
+    for chunk in iter(lambda: body.read(chunk_size), b""):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+# 全局文件夹索引
+_index = FolderIndex()
+
+
+def configure_folder_index(max_folders: int = 10000, max_digests: int = 100000,
+                           hash_max_bytes: int = 104857600) -> FolderIndex:
+    """按 [DOCUMENTS] 配置更新全局文件夹索引"""
+    _index.configure(max_folders, max_digests, hash_max_bytes)
+    return _index
+
+
+def get_folder_index() -> FolderIndex:
+    """获取全局文件夹索引"""
+    return _index
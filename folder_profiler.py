@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+"""
+讲者文件夹内容画像模块
+对文件夹中的每个对象只读取开头几 KB（并发的 Range GET），按文件头魔数和文件名识别文档格式
+（PDF、JPEG/PNG、DOCX 等）和文档类别（执业证书、简历、截图等），统计各类型数量；
+格式识别结果按 ETag 缓存，内容未变化的文件不会被重复读取
+"""
+
+import asyncio
+import contextvars
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 文档格式
+FORMAT_PDF = "pdf"
+FORMAT_JPEG = "jpeg"
+FORMAT_PNG = "png"
+FORMAT_GIF = "gif"
+FORMAT_WEBP = "webp"
+FORMAT_HEIC = "heic"
+FORMAT_TIFF = "tiff"
+FORMAT_BMP = "bmp"
+FORMAT_DOCX = "docx"
+FORMAT_XLSX = "xlsx"
+FORMAT_PPTX = "pptx"
+FORMAT_OLE = "doc"  # 旧版 Office（DOC/XLS/PPT）复合文档
+FORMAT_ZIP = "zip"
+FORMAT_TEXT = "text"
+FORMAT_UNKNOWN = "unknown"
+
+IMAGE_FORMATS = frozenset({FORMAT_JPEG, FORMAT_PNG, FORMAT_GIF, FORMAT_WEBP, FORMAT_HEIC, FORMAT_TIFF, FORMAT_BMP})
+
+# 文件头魔数 -> 格式（按顺序匹配）
+MAGIC_SIGNATURES: List[Tuple[bytes, str]] = [
+    (b"%PDF-", FORMAT_PDF),
+    (b"\xff\xd8\xff", FORMAT_JPEG),
+    (b"\x89PNG\r\n\x1a\n", FORMAT_PNG),
+    (b"GIF87a", FORMAT_GIF),
+    (b"GIF89a", FORMAT_GIF),
+    (b"II*\x00", FORMAT_TIFF),
+    (b"MM\x00*", FORMAT_TIFF),
+    (b"BM", FORMAT_BMP),
+    (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", FORMAT_OLE),
+]
+
+# Office Open XML（ZIP 容器）中标识文档类型的目录
+OOXML_MARKERS: List[Tuple[bytes, str]] = [
+    (b"word/", FORMAT_DOCX),
+    (b"xl/", FORMAT_XLSX),
+    (b"ppt/", FORMAT_PPTX),
+]
+
+# 扩展名 -> 格式（读取失败时使用，并用于发现扩展名与内容不符的文件）
+EXTENSION_FORMATS = {
+    ".pdf": FORMAT_PDF,
+    ".jpg": FORMAT_JPEG, ".jpeg": FORMAT_JPEG,
+    ".png": FORMAT_PNG,
+    ".gif": FORMAT_GIF,
+    ".webp": FORMAT_WEBP,
+    ".heic": FORMAT_HEIC, ".heif": FORMAT_HEIC,
+    ".tif": FORMAT_TIFF, ".tiff": FORMAT_TIFF,
+    ".bmp": FORMAT_BMP,
+    ".docx": FORMAT_DOCX,
+    ".xlsx": FORMAT_XLSX,
+    ".pptx": FORMAT_PPTX,
+    ".doc": FORMAT_OLE, ".xls": FORMAT_OLE, ".ppt": FORMAT_OLE,
+    ".zip": FORMAT_ZIP,
+    ".txt": FORMAT_TEXT, ".csv": FORMAT_TEXT, ".md": FORMAT_TEXT,
+}
+
+# 文档类别（按文件名匹配，按顺序取第一个匹配的类别）
+CATEGORY_OTHER = "other"
+DOCUMENT_CATEGORIES: List[Tuple[str, "re.Pattern"]] = [
+    ("practice_certificate", re.compile(r"执业证|执业注册", re.IGNORECASE)),
+    ("qualification_certificate", re.compile(r"资格证", re.IGNORECASE)),
+    ("title_certificate", re.compile(r"职称", re.IGNORECASE)),
+    ("employment_proof", re.compile(r"工作证|在职证明|聘书|聘任", re.IGNORECASE)),
+    ("id_document", re.compile(r"身份证|护照", re.IGNORECASE)),
+    ("cv", re.compile(r"简历|履历|(^|[^a-z])cv([^a-z]|$)|resume", re.IGNORECASE)),
+    ("publication", re.compile(r"论文|文章|paper|publication", re.IGNORECASE)),
+    ("screenshot", re.compile(r"截图|截屏|屏幕快照|screenshot|screen shot|微信图片|^img_\d+|^mmexport", re.IGNORECASE)),
+]
+
+CATEGORY_LABELS = {
+    "practice_certificate": "医师执业证书",
+    "qualification_certificate": "医师资格证书",
+    "title_certificate": "职称证书",
+    "employment_proof": "工作证明",
+    "id_document": "身份证件",
+    "cv": "简历",
+    "publication": "论文",
+    "screenshot": "截图",
+    CATEGORY_OTHER: "其他",
+}
+
+# 文本文件判断：开头内容可按 UTF-8 解码且不含 NUL
+_TEXT_SAMPLE = 512
+
+
+def sniff_format(head: bytes) -> str:
+    """根据文件开头的字节识别文档格式，无法识别时返回 unknown"""
+    for magic, doc_format in MAGIC_SIGNATURES:
+        if head.startswith(magic):
+            return doc_format
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return FORMAT_WEBP
+    if head[4:8] == b"ftyp" and head[8:12] in (b"heic", b"heix", b"mif1", b"msf1", b"heif"):
+        return FORMAT_HEIC
+    if head.startswith(b"PK\x03\x04"):
+        # OOXML 的第一个条目通常是 [Content_Types].xml，文档目录出现在开头几 KB 内
+        for marker, doc_format in OOXML_MARKERS:
+            if marker in head:
+                return doc_format
+        return FORMAT_ZIP
+    sample = head[:_TEXT_SAMPLE]
+    if sample and b"\x00" not in sample:
+        try:
+            sample.decode("utf-8")
+            return FORMAT_TEXT
+        except UnicodeDecodeError as e:
+            # 截断位置恰好在多字节字符中间
+            if e.start >= len(sample) - 3:
+                return FORMAT_TEXT
+    return FORMAT_UNKNOWN
+
+
+def format_from_name(key: str) -> str:
+    """根据扩展名推断文档格式"""
+    return EXTENSION_FORMATS.get(os.path.splitext(key)[1].lower(), FORMAT_UNKNOWN)
+
+
+def categorize(key: str) -> str:
+    """根据文件名识别文档类别（执业证书、简历、截图等）"""
+    name = key.rsplit("/", 1)[-1]
+    for category, pattern in DOCUMENT_CATEGORIES:
+        if pattern.search(name):
+            return category
+    return CATEGORY_OTHER
+
+
+@dataclass(slots=True)
+class DocumentProfile:
+    """单个文档的画像"""
+    key: str
+    etag: str
+    size: int
+    format: str
+    category: str
+    # 格式来源：magic（读取文件头）或 extension（读取失败时按扩展名推断）
+    source: str = "magic"
+    # 扩展名与实际内容不符（如改名为 .pdf 的截图）
+    mismatch: bool = False
+
+
+@dataclass(slots=True)
+class FolderProfile:
+    """一个文件夹的内容画像"""
+    documents: List[DocumentProfile] = field(default_factory=list)
+    ranged_gets: int = 0
+    cache_hits: int = 0
+    bytes_read: int = 0
+    unreadable: int = 0
+
+    @property
+    def formats(self) -> Dict[str, int]:
+        """各格式的文档数量"""
+        return _count(document.format for document in self.documents)
+
+    @property
+    def categories(self) -> Dict[str, int]:
+        """各类别的文档数量"""
+        return _count(document.category for document in self.documents)
+
+    def summary(self) -> Dict[str, Any]:
+        """各类型数量统计（不含逐个文档）"""
+        return {
+            "document_count": len(self.documents),
+            "formats": self.formats,
+            "categories": self.categories,
+            "images": sum(1 for document in self.documents if document.format in IMAGE_FORMATS),
+            "mismatched": [document.key for document in self.documents if document.mismatch],
+            "unreadable": self.unreadable,
+            "ranged_gets": self.ranged_gets,
+            "cache_hits": self.cache_hits,
+            "bytes_read": self.bytes_read
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = self.summary()
+        data["documents"] = [asdict(document) for document in self.documents]
+        return data
+
+
+def describe_counts(summary: Dict[str, Any]) -> str:
+    """各类型数量的可读描述（用于预审报告）"""
+    formats = "、".join(f"{name.upper()} {count}个" for name, count in summary.get("formats", {}).items())
+    categories = "、".join(f"{CATEGORY_LABELS.get(name, name)} {count}个"
+                           for name, count in summary.get("categories", {}).items())
+    return f"文档格式: {formats or '无'}；文档类别: {categories or '无'}"
+
+
+def _count(values) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for value in values:
+        counts[value] = counts.get(value, 0) + 1
+    return dict(sorted(counts.items(), key=lambda item: (-item[1], item[0])))
+
+
+# 读取文件头：fetch_head(key, head_bytes) -> bytes
+HeadFetcher = Callable[[str, int], bytes]
+AsyncHeadFetcher = Callable[[str, int], Awaitable[bytes]]
+
+
+class FolderProfiler:
+    """文件夹内容画像器：并发读取文件头，格式识别结果按 ETag 缓存（LRU）"""
+
+    def __init__(self, head_bytes: int = 4096, max_concurrency: int = 8, cache_size: int = 10000):
+        """
+        Args:
+            head_bytes: 每个对象读取的字节数
+            max_concurrency: 同一文件夹同时进行的 Range GET 数
+            cache_size: 按 ETag 缓存的格式识别结果数量上限
+        """
+        self.head_bytes = head_bytes
+        self.max_concurrency = max(1, max_concurrency)
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._metrics = {"folders": 0, "documents": 0, "ranged_gets": 0, "cache_hits": 0,
+                         "bytes_read": 0, "unreadable": 0}
+
+    def configure(self, head_bytes: int = 4096, max_concurrency: int = 8, cache_size: int = 10000):
+        """更新配置（缓存保留；并发数变化时之后的画像使用新的线程池）"""
+        with self._lock:
+            self.head_bytes = head_bytes
+            self.cache_size = cache_size
+            while len(self._cache) > cache_size:
+                self._cache.popitem(last=False)
+            if max(1, max_concurrency) != self.max_concurrency:
+                self.max_concurrency = max(1, max_concurrency)
+                executor, self._executor = self._executor, None
+                if executor is not None:
+                    executor.shutdown(wait=False)
+
+    # ---- 缓存 ----
+
+    def _cached_format(self, etag: str) -> Optional[str]:
+        if not etag:
+            return None
+        with self._lock:
+            doc_format = self._cache.get(etag)
+            if doc_format is not None:
+                self._cache.move_to_end(etag)
+            return doc_format
+
+    def _remember(self, etag: str, doc_format: str):
+        if not etag or self.cache_size <= 0:
+            return
+        with self._lock:
+            self._cache[etag] = doc_format
+            self._cache.move_to_end(etag)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _pending(self, objects: List[Dict[str, Any]]) -> Tuple[Dict[str, str], List[Dict[str, Any]]]:
+        """拆分为缓存命中的对象（key -> 格式）和需要读取文件头的对象"""
+        cached, pending = {}, []
+        for obj in objects:
+            doc_format = self._cached_format(obj.get("etag", ""))
+            if doc_format is None:
+                pending.append(obj)
+            else:
+                cached[obj["key"]] = doc_format
+        return cached, pending
+
+    # ---- 画像 ----
+
+    def profile(self, objects: List[Dict[str, Any]], fetch_head: HeadFetcher) -> FolderProfile:
+        """
+        为文件夹中的对象生成内容画像
+
+        Args:
+            objects: 列表结果中的对象（key、etag、size）
+            fetch_head: 读取对象开头 head_bytes 字节的函数，在线程池中并发调用
+
+        Returns:
+            文件夹内容画像；单个对象读取失败时按扩展名推断格式
+        """
+        cached, pending = self._pending(objects)
+        heads: Dict[str, Any] = {}
+        if pending:
+            executor = self._get_executor()
+            head_bytes = self.head_bytes
+            # 每个读取任务携带调用方上下文的副本（用量记账、配置快照）
+            futures = {
+                obj["key"]: executor.submit(contextvars.copy_context().run, fetch_head, obj["key"], head_bytes)
+                for obj in pending
+            }
+            for key, future in futures.items():
+                try:
+                    heads[key] = future.result()
+                except Exception as e:
+                    heads[key] = e
+        return self._build(objects, cached, heads)
+
+    async def profile_async(self, objects: List[Dict[str, Any]], fetch_head: AsyncHeadFetcher) -> FolderProfile:
+        """为文件夹中的对象生成内容画像（异步版本：fetch_head 为协程函数，最多 max_concurrency 个同时进行）"""
+        cached, pending = self._pending(objects)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        head_bytes = self.head_bytes
+
+        async def fetch(key: str):
+            async with semaphore:
+                return await fetch_head(key, head_bytes)
+
+        results = await asyncio.gather(*(fetch(obj["key"]) for obj in pending), return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException) and not isinstance(result, Exception):
+                raise result
+        heads = {obj["key"]: result for obj, result in zip(pending, results)}
+        return self._build(objects, cached, heads)
+
+    def _build(self, objects: List[Dict[str, Any]], cached: Dict[str, str],
+               heads: Dict[str, Any]) -> FolderProfile:
+        """根据缓存结果和读取到的文件头生成画像，并缓存新识别的格式"""
+        profile = FolderProfile()
+        for obj in objects:
+            key, etag = obj["key"], obj.get("etag", "")
+            by_name = format_from_name(key)
+            source = "magic"
+            if key in cached:
+                doc_format = cached[key]
+                profile.cache_hits += 1
+            else:
+                head = heads.get(key)
+                profile.ranged_gets += 1
+                if isinstance(head, Exception) or head is None:
+                    logger.warning(f"读取文件头失败，按扩展名推断格式: {key}: {head}")
+                    doc_format, source = by_name, "extension"
+                    profile.unreadable += 1
+                else:
+                    profile.bytes_read += len(head)
+                    doc_format = sniff_format(head)
+                    self._remember(etag, doc_format)
+            profile.documents.append(DocumentProfile(
+                key=key,
+                etag=etag,
+                size=obj.get("size", 0),
+                format=doc_format,
+                category=categorize(key),
+                source=source,
+                mismatch=(source == "magic" and by_name != FORMAT_UNKNOWN and doc_format != FORMAT_UNKNOWN
+                          and by_name != doc_format)
+            ))
+
+        with self._lock:
+            self._metrics["folders"] += 1
+            self._metrics["documents"] += len(profile.documents)
+            self._metrics["ranged_gets"] += profile.ranged_gets
+            self._metrics["cache_hits"] += profile.cache_hits
+            self._metrics["bytes_read"] += profile.bytes_read
+            self._metrics["unreadable"] += profile.unreadable
+        return profile
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency,
+                                                    thread_name_prefix="folder-profiler")
+            return self._executor
+
+    def clear_cache(self):
+        """清空 ETag 缓存"""
+        with self._lock:
+            self._cache.clear()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """画像次数、Range GET 次数、缓存命中和读取字节数"""
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics["cache_entries"] = len(self._cache)
+        lookups = metrics["ranged_gets"] + metrics["cache_hits"]
+        metrics["cache_hit_rate"] = round(metrics["cache_hits"] / lookups, 4) if lookups else 0.0
+        return metrics
+
+
+# 全局画像器
+_profiler = FolderProfiler()
+
+
+def configure_folder_profiler(head_bytes: int = 4096, max_concurrency: int = 8,
+                              cache_size: int = 10000) -> FolderProfiler:
+    """按 [DOCUMENTS] 配置更新全局画像器"""
+    _profiler.configure(head_bytes, max_concurrency, cache_size)
+    return _profiler
+
+
+def get_folder_profiler() -> FolderProfiler:
+    """获取全局画像器"""
+    return _profiler
@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+MCP server 负载生成器
+启动 MCP server 子进程并通过 stdio 从多个并发客户端会话回放提交语料，
+支持开环（按目标速率发送）和闭环（固定并发）两种模式，
+报告各工具的延迟直方图、错误率以及服务端队列深度
+
+用法:
+    python load_generator.py corpus.jsonl --sessions 2 --concurrency 16 --requests 500
+    python load_generator.py corpus.jsonl --mode open --rate 20 --duration 60
+    python load_generator.py corpus.jsonl --config bench.config --launcher
+
+语料格式（JSON Lines，每行一个请求）:
+    {"tool": "perform_preaudit", "arguments": {"user_input": "..."}}
+    {"user_input": "..."}            # 简写，等同于 perform_preaudit
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+METRICS_URI = "speaker-validation://metrics"
+DEFAULT_TOOL = "perform_preaudit"
+
+# 延迟直方图的桶上界（毫秒）
+HISTOGRAM_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000]
+
+OUTCOME_OK = "ok"
+OUTCOME_INCOMPLETE = "incomplete"
+OUTCOME_TOOL_ERROR = "tool_error"
+OUTCOME_TIMEOUT = "timeout"
+OUTCOME_TRANSPORT_ERROR = "transport_error"
+
+
+def load_corpus(path: str) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    读取提交语料
+
+    Args:
+        path: JSON Lines 文件路径
+
+    Returns:
+        (工具名称, 参数) 列表
+    """
+    corpus = []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            item = json.loads(line)
+            if "tool" in item:
+                corpus.append((item["tool"], item.get("arguments", {})))
+            elif "user_input" in item:
+                corpus.append((DEFAULT_TOOL, {"user_input": item["user_input"]}))
+            else:
+                raise ValueError(f"语料第 {line_number} 行缺少 tool 或 user_input 字段")
+    if not corpus:
+        raise ValueError(f"语料文件为空: {path}")
+    return corpus
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """最近秩百分位数"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def classify_result(tool: str, text: str, is_error: bool) -> str:
+    """根据工具返回内容判断调用结果"""
+    if is_error or text.startswith("错误:"):
+        return OUTCOME_TOOL_ERROR
+    if tool == DEFAULT_TOOL and text.startswith("预审未完成"):
+        return OUTCOME_INCOMPLETE
+    return OUTCOME_OK
+
+
+class ToolStats:
+    """单个工具的延迟样本和结果统计"""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.outcomes: Dict[str, int] = {}
+
+    def record(self, latency: float, outcome: str):
+        self.latencies.append(latency)
+        self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+
+    @property
+    def count(self) -> int:
+        return len(self.latencies)
+
+    def error_rate(self) -> float:
+        errors = sum(n for outcome, n in self.outcomes.items() if outcome not in (OUTCOME_OK, OUTCOME_INCOMPLETE))
+        return errors / self.count if self.count else 0.0
+
+    def histogram(self) -> List[Tuple[str, int]]:
+        """按 HISTOGRAM_BUCKETS_MS 分桶的计数"""
+        counts = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+        for latency in self.latencies:
+            ms = latency * 1000
+            index = next((i for i, bound in enumerate(HISTOGRAM_BUCKETS_MS) if ms <= bound), len(HISTOGRAM_BUCKETS_MS))
+            counts[index] += 1
+        labels = [f"<= {bound}ms" for bound in HISTOGRAM_BUCKETS_MS] + [f"> {HISTOGRAM_BUCKETS_MS[-1]}ms"]
+        return list(zip(labels, counts))
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "requests": self.count,
+            "outcomes": dict(self.outcomes),
+            "error_rate": round(self.error_rate(), 4),
+            "p50_ms": round(percentile(self.latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(self.latencies, 95) * 1000, 2),
+            "p99_ms": round(percentile(self.latencies, 99) * 1000, 2),
+            "max_ms": round(max(self.latencies) * 1000, 2) if self.latencies else 0.0,
+            "histogram": self.histogram()
+        }
+
+
+class LoadRun:
+    """一次负载运行的状态：会话、统计和队列深度采样"""
+
+    def __init__(self, sessions: List[Any], corpus: List[Tuple[str, Dict[str, Any]]],
+                 request_timeout: float):
+        self.sessions = sessions
+        self.corpus = corpus
+        self.request_timeout = request_timeout
+        self.stats: Dict[str, ToolStats] = {}
+        self.queue_samples: List[Dict[str, int]] = []
+        self.client_in_flight = 0
+        self.max_client_in_flight = 0
+        self._next_request = 0
+        self._next_session = 0
+
+    def next_request(self) -> Tuple[str, Dict[str, Any]]:
+        """按顺序循环取出语料"""
+        tool, arguments = self.corpus[self._next_request % len(self.corpus)]
+        self._next_request += 1
+        return tool, arguments
+
+    def next_session(self) -> Any:
+        session = self.sessions[self._next_session % len(self.sessions)]
+        self._next_session += 1
+        return session
+
+    async def send(self, session: Any, tool: str, arguments: Dict[str, Any],
+                   scheduled_at: Optional[float] = None):
+        """
+        发送一次工具调用并记录结果
+
+        Args:
+            scheduled_at: 开环模式下的计划发送时间，延迟从该时间开始计算（避免协同遗漏）
+        """
+        started = scheduled_at if scheduled_at is not None else time.perf_counter()
+        self.client_in_flight += 1
+        self.max_client_in_flight = max(self.max_client_in_flight, self.client_in_flight)
+        try:
+            result = await asyncio.wait_for(session.call_tool(tool, arguments), self.request_timeout)
+            text = "".join(getattr(content, "text", "") for content in result.content)
+            outcome = classify_result(tool, text, bool(getattr(result, "isError", False)))
+        except asyncio.TimeoutError:
+            outcome = OUTCOME_TIMEOUT
+        except Exception:
+            outcome = OUTCOME_TRANSPORT_ERROR
+        finally:
+            self.client_in_flight -= 1
+        self.stats.setdefault(tool, ToolStats()).record(time.perf_counter() - started, outcome)
+
+    async def sample_queue_depth(self, interval: float, stop: asyncio.Event):
+        """定期读取各服务端的 metrics 资源，记录队列深度"""
+        while not stop.is_set():
+            sample = {"queued": 0, "in_flight": 0, "running": 0, "client_in_flight": self.client_in_flight}
+            for session in self.sessions:
+                try:
+                    resource = await asyncio.wait_for(session.read_resource(METRICS_URI), interval * 5)
+                    server = json.loads(resource.contents[0].text).get("server", {})
+                except Exception:
+                    continue
+                for key in ("queued", "in_flight", "running"):
+                    sample[key] += server.get(key, 0)
+            self.queue_samples.append(sample)
+            try:
+                await asyncio.wait_for(stop.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run_closed_loop(self, concurrency: int, total: Optional[int], duration: Optional[float]):
+        """闭环：固定数量的工作协程，每个完成后立即发送下一个请求"""
+        deadline = time.perf_counter() + duration if duration else None
+        remaining = {"count": total}
+
+        def take() -> bool:
+            if deadline is not None and time.perf_counter() >= deadline:
+                return False
+            if remaining["count"] is not None:
+                if remaining["count"] <= 0:
+                    return False
+                remaining["count"] -= 1
+            return True
+
+        async def worker(index: int):
+            session = self.sessions[index % len(self.sessions)]
+            while take():
+                tool, arguments = self.next_request()
+                await self.send(session, tool, arguments)
+
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+
+    async def run_open_loop(self, rate: float, total: Optional[int], duration: Optional[float],
+                            poisson: bool, seed: int):
+        """开环：按目标速率发送请求，不等待前一个请求完成"""
+        rng = random.Random(seed)
+        started = time.perf_counter()
+        scheduled = started
+        tasks = []
+        sent = 0
+        while (total is None or sent < total) and (duration is None or scheduled - started < duration):
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tool, arguments = self.next_request()
+            tasks.append(asyncio.create_task(self.send(self.next_session(), tool, arguments, scheduled)))
+            sent += 1
+            scheduled += rng.expovariate(rate) if poisson else 1.0 / rate
+        await asyncio.gather(*tasks)
+
+    def queue_summary(self) -> Dict[str, Any]:
+        summary = {}
+        for key in ("queued", "in_flight", "running", "client_in_flight"):
+            values = [sample[key] for sample in self.queue_samples]
+            summary[key] = {
+                "max": max(values) if values else 0,
+                "avg": round(sum(values) / len(values), 2) if values else 0.0,
+                "p95": percentile(values, 95)
+            }
+        summary["samples"] = len(self.queue_samples)
+        return summary
+
+
+def server_parameters(args) -> Any:
+    """构造 MCP server 子进程参数"""
+    from mcp import StdioServerParameters
+
+    project_dir = os.path.dirname(os.path.abspath(__file__))
+    script = "mcp_launcher.py" if args.launcher else "mcp_server.py"
+    env = os.environ.copy()
+    env["PYTHONPATH"] = project_dir
+    if args.config:
+        env["SPEAKER_VALIDATION_CONFIG"] = os.path.abspath(args.config)
+    return StdioServerParameters(
+        command=sys.executable,
+        args=[os.path.join(project_dir, script)],
+        env=env,
+        cwd=project_dir
+    )
+
+
+async def run_load(args) -> Dict[str, Any]:
+    """启动服务端会话并执行负载"""
+    from contextlib import AsyncExitStack
+    from mcp import ClientSession
+    from mcp.client.stdio import stdio_client
+
+    corpus = load_corpus(args.corpus)
+    params = server_parameters(args)
+
+    async with AsyncExitStack() as stack:
+        sessions = []
+        for _ in range(args.sessions):
+            read_stream, write_stream = await stack.enter_async_context(stdio_client(params))
+            session = await stack.enter_async_context(ClientSession(read_stream, write_stream))
+            await session.initialize()
+            sessions.append(session)
+        print(f"✅ 已启动 {len(sessions)} 个 MCP server 会话")
+
+        run = LoadRun(sessions, corpus, args.request_timeout)
+        stop = asyncio.Event()
+        sampler = asyncio.create_task(run.sample_queue_depth(args.sample_interval, stop))
+
+        started = time.perf_counter()
+        if args.mode == "open":
+            await run.run_open_loop(args.rate, args.requests, args.duration, args.poisson, args.seed)
+        else:
+            await run.run_closed_loop(args.concurrency, args.requests, args.duration)
+        elapsed = time.perf_counter() - started
+
+        stop.set()
+        await sampler
+
+    total = sum(stats.count for stats in run.stats.values())
+    return {
+        "mode": args.mode,
+        "sessions": args.sessions,
+        "concurrency": args.concurrency if args.mode == "closed" else None,
+        "target_rate": args.rate if args.mode == "open" else None,
+        "elapsed_seconds": round(elapsed, 3),
+        "requests": total,
+        "throughput": round(total / elapsed, 2) if elapsed > 0 else 0.0,
+        "max_client_in_flight": run.max_client_in_flight,
+        "tools": {tool: stats.summary() for tool, stats in run.stats.items()},
+        "queue_depth": run.queue_summary()
+    }
+
+
+def print_report(report: Dict[str, Any]):
+    """打印负载报告"""
+    print("\n" + "=" * 60)
+    print(f"模式: {report['mode']}, 会话: {report['sessions']}, 请求: {report['requests']}, "
+          f"耗时: {report['elapsed_seconds']}s, 吞吐量: {report['throughput']} req/s")
+
+    for tool, summary in report["tools"].items():
+        print(f"\n🔧 {tool}: {summary['requests']} 次, 错误率 {summary['error_rate']:.2%}, "
+              f"p50 {summary['p50_ms']}ms, p95 {summary['p95_ms']}ms, p99 {summary['p99_ms']}ms")
+        print(f"   结果: {summary['outcomes']}")
+        peak = max((count for _, count in summary["histogram"]), default=0) or 1
+        for label, count in summary["histogram"]:
+            if count:
+                print(f"   {label:>12} | {'█' * max(1, round(count / peak * 40))} {count}")
+
+    queue = report["queue_depth"]
+    print(f"\n📥 服务端队列深度（{queue['samples']} 次采样）:")
+    for key, label in (("queued", "线程池排队"), ("running", "执行中"), ("in_flight", "服务端处理中"),
+                       ("client_in_flight", "客户端未完成")):
+        values = queue[key]
+        print(f"   {label:<8} max {values['max']:>4}  avg {values['avg']:>7}  p95 {values['p95']:>4}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="MCP server 负载生成器")
+    parser.add_argument("corpus", help="提交语料（JSON Lines）")
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed", help="闭环（固定并发）或开环（目标速率）")
+    parser.add_argument("--sessions", type=int, default=1, help="MCP server 进程/会话数")
+    parser.add_argument("--concurrency", type=int, default=8, help="闭环模式的并发请求数（分布到各会话）")
+    parser.add_argument("--rate", type=float, default=10.0, help="开环模式的目标速率（请求/秒）")
+    parser.add_argument("--poisson", action="store_true", help="开环模式使用泊松到达间隔")
+    parser.add_argument("--requests", type=int, help="总请求数")
+    parser.add_argument("--duration", type=float, help="运行时长（秒）")
+    parser.add_argument("--request-timeout", type=float, default=60.0, help="单次请求的客户端超时（秒）")
+    parser.add_argument("--sample-interval", type=float, default=0.5, help="服务端队列深度采样间隔（秒）")
+    parser.add_argument("--config", help="服务端使用的配置文件（如启用录制回放的配置）")
+    parser.add_argument("--launcher", action="store_true", help="通过 mcp_launcher.py 启动服务端")
+    parser.add_argument("--seed", type=int, default=7, help="随机种子")
+    parser.add_argument("--output", help="将报告写入 JSON 文件")
+    args = parser.parse_args(argv)
+    if args.requests is None and args.duration is None:
+        args.requests = 100
+    return args
+
+
+def main(argv=None) -> int:
+    """主函数"""
+    args = parse_args(argv)
+    print("=" * 60)
+    print("MCP server 负载生成器")
+    print("=" * 60)
+
+    report = asyncio.run(run_load(args))
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
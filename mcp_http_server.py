@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+SpeakerValidationPreCheckSystem MCP Server（HTTP 传输）
+一个常驻进程通过 HTTP 为多个客户端提供服务，共享客户端连接池、缓存和合并请求：
+- SSE 传输：GET /sse 建立会话，POST /messages/ 发送请求
+- Streamable HTTP 传输：/mcp（需要 mcp>=1.8）
+- 健康检查：GET /health
+收到 SIGTERM/SIGINT 时优雅关闭：停止接收新会话和工具调用，等待进行中的调用完成后再关闭会话
+"""
+
+import argparse
+import asyncio
+import contextlib
+import time
+from typing import Any, Dict, Optional, Set
+
+import anyio
+import uvicorn
+from mcp.server.sse import SseServerTransport
+from sse_starlette.sse import AppStatus
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Mount, Route
+
+# 尝试导入 Streamable HTTP 传输（mcp>=1.8），不可用时只提供 SSE
+try:
+    from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
+    STREAMABLE_HTTP_AVAILABLE = True
+except ImportError:
+    STREAMABLE_HTTP_AVAILABLE = False
+
+from config_reader import get_config
+from mcp_server import (
+    build_initialization_options,
+    drain_tool_calls,
+    logger,
+    server,
+    start_config_watcher,
+    start_photo_indexer,
+    start_registry_refresher,
+    start_event_consumer,
+    tool_queue_stats
+)
+from resilience import get_resilience_metrics
+from audit_store import get_audit_store
+from columnar_export import get_columnar_exporter
+
+
+class McpHttpApp:
+    """MCP HTTP 应用：传输路由、健康检查和优雅关闭"""
+
+    def __init__(self, drain_timeout: float = 30.0):
+        """
+        Args:
+            drain_timeout: 关闭时等待进行中的工具调用完成的最长时间（秒）
+        """
+        self.drain_timeout = drain_timeout
+        self.started_at = time.time()
+        self.draining = False
+        self.sse = SseServerTransport("/messages/")
+        self._sse_sessions: Set[anyio.CancelScope] = set()
+        self._total_sessions = 0
+        self.streamable = StreamableHTTPSessionManager(app=server) if STREAMABLE_HTTP_AVAILABLE else None
+        # sse-starlette 默认在收到退出信号时立即结束所有 SSE 响应，会中断进行中的工具调用；
+        # 改为由 drain() 在调用完成后关闭会话
+        if hasattr(AppStatus, "disable_automatic_graceful_drain"):
+            AppStatus.disable_automatic_graceful_drain()
+
+        routes = [
+            Route("/health", endpoint=self.health, methods=["GET"]),
+            # 原始 ASGI 端点：SSE 响应由传输层直接发送
+            Route("/sse", endpoint=_AsgiEndpoint(self.handle_sse), methods=["GET"]),
+            Mount("/messages/", app=self.handle_post_message),
+        ]
+        if self.streamable is not None:
+            routes.append(Mount("/mcp", app=self.handle_streamable_http))
+        self.app = Starlette(routes=routes, lifespan=self.lifespan)
+
+    @contextlib.asynccontextmanager
+    async def lifespan(self, app: Starlette):
+        if self.streamable is None:
+            yield
+            return
+        async with self.streamable.run():
+            yield
+
+    async def _reject_if_draining(self, scope, receive, send) -> bool:
+        if not self.draining:
+            return False
+        response = JSONResponse({"error": "服务正在关闭，请连接其他实例或稍后重试"}, status_code=503,
+                                headers={"Retry-After": "5", "Connection": "close"})
+        await response(scope, receive, send)
+        return True
+
+    async def handle_sse(self, scope, receive, send):
+        """建立 SSE 会话并在其中运行 MCP server"""
+        if await self._reject_if_draining(scope, receive, send):
+            return
+        self._total_sessions += 1
+        async with self.sse.connect_sse(scope, receive, send) as (read_stream, write_stream):
+            # 关闭时只取消会话本身，写入流随之关闭，SSE 响应正常结束
+            with anyio.CancelScope() as cancel_scope:
+                self._sse_sessions.add(cancel_scope)
+                try:
+                    await server.run(read_stream, write_stream, build_initialization_options())
+                finally:
+                    self._sse_sessions.discard(cancel_scope)
+                    await write_stream.aclose()
+
+    async def handle_post_message(self, scope, receive, send):
+        await self.sse.handle_post_message(scope, receive, send)
+
+    async def handle_streamable_http(self, scope, receive, send):
+        if await self._reject_if_draining(scope, receive, send):
+            return
+        await self.streamable.handle_request(scope, receive, send)
+
+    def health_status(self) -> Dict[str, Any]:
+        """服务健康状态"""
+        dependencies = {
+            name: metrics["breaker"]["state"] for name, metrics in get_resilience_metrics().items()
+        }
+        return {
+            "status": "draining" if self.draining else "ok",
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "transports": ["sse"] + (["streamable-http"] if self.streamable is not None else []),
+            "sse_sessions": len(self._sse_sessions),
+            "total_sse_sessions": self._total_sessions,
+            "tools": tool_queue_stats.get_metrics(),
+            "dependencies": dependencies
+        }
+
+    async def health(self, request: Request) -> JSONResponse:
+        """健康检查：正常时返回 200，关闭过程中返回 503（负载均衡器据此摘除实例）"""
+        return JSONResponse(self.health_status(), status_code=503 if self.draining else 200)
+
+    async def drain(self):
+        """优雅关闭：拒绝新的会话和工具调用，等待进行中的调用完成，然后关闭会话并写入缓冲数据"""
+        if self.draining:
+            return
+        self.draining = True
+        logger.info(f"MCP HTTP Server 开始关闭，等待进行中的工具调用（最长 {self.drain_timeout}s）")
+        drained = await drain_tool_calls(self.drain_timeout)
+        if not drained:
+            logger.warning(f"关闭等待超时，仍有 {tool_queue_stats.get_metrics()['in_flight']} 个工具调用未完成")
+        for cancel_scope in list(self._sse_sessions):
+            cancel_scope.cancel()
+        AppStatus.should_exit = True
+        # 写入审计记录和列式导出的缓冲数据
+        await asyncio.to_thread(get_audit_store().flush)
+        exporter = get_columnar_exporter()
+        if exporter is not None:
+            await asyncio.to_thread(exporter.flush)
+        logger.info("MCP HTTP Server 已完成关闭前的清理")
+
+
+class _AsgiEndpoint:
+    """将 ASGI 可调用对象包装为 Starlette 路由端点（不经过请求/响应封装）"""
+
+    def __init__(self, handler):
+        self.handler = handler
+
+    async def __call__(self, scope, receive, send):
+        await self.handler(scope, receive, send)
+
+
+class DrainingServer(uvicorn.Server):
+    """收到退出信号后先完成应用的优雅关闭，再关闭监听和连接"""
+
+    def __init__(self, config: uvicorn.Config, http_app: McpHttpApp):
+        super().__init__(config)
+        self.http_app = http_app
+
+    async def shutdown(self, sockets: Optional[list] = None) -> None:
+        await self.http_app.drain()
+        await super().shutdown(sockets=sockets)
+
+
+def serve(host: Optional[str] = None, port: Optional[int] = None,
+          drain_timeout: Optional[float] = None):
+    """启动 HTTP 传输的 MCP server（参数为空时使用 [HTTP] 配置）"""
+    http_config = get_config().get_http_config()
+    host = host or http_config['host']
+    port = port or http_config['port']
+    if drain_timeout is None:
+        drain_timeout = http_config['drain_timeout_seconds']
+
+    http_app = McpHttpApp(drain_timeout)
+    start_config_watcher()
+    start_photo_indexer()
+    start_registry_refresher()
+    start_event_consumer()
+    config = uvicorn.Config(
+        http_app.app,
+        host=host,
+        port=port,
+        log_level="info",
+        # 应用自身的等待之后，剩余连接最多再等待几秒
+        timeout_graceful_shutdown=5
+    )
+    logger.info(f"启动 SpeakerValidationPreCheckSystem MCP HTTP Server: http://{host}:{port} "
+                f"（{', '.join(http_app.health_status()['transports'])}）")
+    DrainingServer(config, http_app).run()
+    logger.info("MCP HTTP Server 已停止")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="以 HTTP 传输（SSE / Streamable HTTP）启动 MCP server")
+    parser.add_argument("--host", help="监听地址，默认使用 [HTTP] HOST")
+    parser.add_argument("--port", type=int, help="监听端口，默认使用 [HTTP] PORT")
+    parser.add_argument("--drain-timeout", type=float, help="关闭时等待进行中调用的最长秒数")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.drain_timeout)
+
+
+if __name__ == "__main__":
+    main()
@@ -26,7 +26,7 @@ def main():
         sys.exit(1)
     
     # 检查配置文件是否存在
-    config_file = os.path.join(project_dir, '.config')
+    config_file = os.getenv('SPEAKER_VALIDATION_CONFIG', os.path.join(project_dir, '.config'))
     if not os.path.exists(config_file):
         print(f"错误: 配置文件不存在: {config_file}", file=sys.stderr)
         sys.exit(1)
@@ -5,12 +5,15 @@ SpeakerValidationPreCheckSystem MCP Server
 """
 
 import asyncio
+import inspect
 import json
 import sys
+import threading
 import time
 from typing import Any, Dict, List, Optional
 from mcp.server import Server
 from mcp.server.models import InitializationOptions
+from mcp.server.session import ServerSession
 from mcp.server.stdio import stdio_server
 from mcp.types import (
     Resource,
@@ -25,10 +28,42 @@ from mcp.types import (
 from speaker_validation_tools import (
     list_s3_files,
     check_string_content, 
-    perform_preaudit,
-    get_current_config
+    run_preaudit,
+    profile_folder_documents,
+    get_current_config,
+    query_preaudit_history,
+    start_photo_indexer,
+    start_registry_refresher,
+    start_event_consumer,
+    preaudit_config
 )
+import async_tools
+from deadline import Deadline, RequestCancelled, get_cancellation_metrics, record_aborted_work
 from cloudwatch_logger import get_cloudwatch_logger, log_mcp_tool_call
+from resilience import get_resilience_metrics
+from singleflight import get_coalescing_metrics
+from preaudit_planner import get_stage_planner
+from profiling import get_profiler
+from cost_ledger import get_cost_metrics
+from audit_store import get_audit_store
+from columnar_export import get_columnar_exporter
+from progress import PREAUDIT_PROGRESS_STAGES, progress_reporting
+from config_service import get_config_service, pinned_snapshot
+from folder_profiler import get_folder_profiler
+from folder_index import get_folder_index
+from pdf_text import get_pdf_text_extractor
+from photo_index import get_photo_index, get_photo_indexer
+from speaker_registry import get_registry_refresher, get_speaker_registry
+from s3_events import get_event_consumer
+from s3_inventory import get_inventory_reader
+from submission_scheduler import (
+    PRIORITY_BATCH,
+    PRIORITY_CLASSES,
+    PRIORITY_INTERACTIVE,
+    get_scheduler_metrics,
+    get_submission_scheduler,
+    normalize_priority
+)
 
 # 设置 CloudWatch 日志记录器
 logger = get_cloudwatch_logger("speaker_validation_mcp_server")
@@ -38,6 +73,371 @@ server = Server("speaker-validation-precheck")
 
 logger.info("讲者身份验证系统 MCP Server 初始化")
 
+
+class ToolQueueStats:
+    """工具调用排队统计：已提交到线程池但尚未开始执行的调用数即服务端队列深度"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.queued = 0
+        self.running = 0
+        self.max_in_flight = 0
+        self.max_queued = 0
+        self.completed = 0
+        self.total_queue_seconds = 0.0
+
+    def submitted(self):
+        with self._lock:
+            self.in_flight += 1
+            self.queued += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            self.max_queued = max(self.max_queued, self.queued)
+
+    def started(self, call: Dict[str, bool], queue_seconds: float):
+        with self._lock:
+            if call["finished"]:
+                return
+            call["started"] = True
+            self.queued -= 1
+            self.running += 1
+            self.total_queue_seconds += queue_seconds
+
+    def finished(self, call: Dict[str, bool]):
+        with self._lock:
+            call["finished"] = True
+            self.in_flight -= 1
+            self.completed += 1
+            if call["started"]:
+                self.running -= 1
+            else:
+                # 调用在进入线程池执行前被取消
+                self.queued -= 1
+
+    def get_metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "in_flight": self.in_flight,
+                "queued": self.queued,
+                "running": self.running,
+                "max_in_flight": self.max_in_flight,
+                "max_queued": self.max_queued,
+                "completed": self.completed,
+                "avg_queue_ms": round(self.total_queue_seconds / self.completed * 1000, 3) if self.completed else 0.0
+            }
+
+
+tool_queue_stats = ToolQueueStats()
+
+# 服务关闭时置位：不再接收新的工具调用，等待进行中的调用完成（HTTP 传输的优雅关闭）
+server_draining = threading.Event()
+
+
+class ServerDrainingError(RuntimeError):
+    """服务正在关闭，拒绝新的工具调用"""
+
+
+async def drain_tool_calls(timeout: float) -> bool:
+    """
+    停止接收新的工具调用，并等待进行中的调用完成
+
+    Args:
+        timeout: 最长等待时间（秒）
+
+    Returns:
+        是否在超时前全部完成
+    """
+    server_draining.set()
+    deadline = time.monotonic() + timeout
+    while tool_queue_stats.get_metrics()["in_flight"] > 0:
+        if time.monotonic() >= deadline:
+            return False
+        await asyncio.sleep(0.05)
+    return True
+
+
+def build_initialization_options() -> InitializationOptions:
+    """MCP 会话初始化选项（stdio 和 HTTP 传输共用）"""
+    return InitializationOptions(
+        server_name="speaker-validation-precheck",
+        server_version="1.0.0",
+        capabilities={
+            "tools": {},
+            "resources": {}
+        }
+    )
+
+
+def _render_preaudit_output(result, output_format: str) -> str:
+    """按输出格式生成预审返回文本"""
+    # 机器调用方获取紧凑 JSON，只有需要时才渲染文本报告
+    if output_format == "json":
+        return json.dumps(result.to_dict(), ensure_ascii=False, separators=(',', ':'))
+    return result.render("brief" if output_format == "brief" else "default")
+
+
+def _perform_preaudit_output(user_input: str, bucket_name: Optional[str], deadline: Deadline,
+                             output_format: str) -> str:
+    """执行预审并按输出格式生成返回文本（在线程池中执行，报告渲染计入请求剖析）"""
+    return _render_preaudit_output(run_preaudit(user_input, bucket_name, deadline), output_format)
+
+
+async def _perform_preaudit_output_async(user_input: str, bucket_name: Optional[str], deadline: Deadline,
+                                         output_format: str) -> str:
+    """执行预审并按输出格式生成返回文本（在事件循环中执行）"""
+    return _render_preaudit_output(await async_tools.run_preaudit(user_input, bucket_name, deadline), output_format)
+
+
+# 进度通知可选参数：消息文本（中间结果）和关联请求 ID（Streamable HTTP 按请求路由通知），旧版 mcp 不支持
+_PROGRESS_PARAMS = inspect.signature(ServerSession.send_progress_notification).parameters
+
+# 工作线程等待进度通知发出的最长时间（秒），客户端读取缓慢时不拖慢预审
+PROGRESS_SEND_TIMEOUT = 1.0
+
+# 批量预审的条目数上限和默认并发数
+BATCH_MAX_ITEMS = 50
+BATCH_DEFAULT_CONCURRENCY = 4
+BATCH_MAX_CONCURRENCY = 16
+
+
+def _progress_notifier():
+    """
+    当前 MCP 请求携带 progressToken 时，返回发送进度通知的协程函数 notify(progress, total, message)；
+    客户端未请求进度时返回 None
+    """
+    try:
+        ctx = server.request_context
+    except LookupError:
+        return None
+    progress_token = getattr(ctx.meta, "progressToken", None) if ctx.meta is not None else None
+    if progress_token is None:
+        return None
+
+    async def notify(progress: float, total: Optional[float], message: str):
+        kwargs = {}
+        if "message" in _PROGRESS_PARAMS:
+            kwargs["message"] = message
+        if "related_request_id" in _PROGRESS_PARAMS:
+            kwargs["related_request_id"] = str(ctx.request_id)
+        await ctx.session.send_progress_notification(progress_token, progress, total, **kwargs)
+
+    return notify
+
+
+def _submission_identity(arguments: Dict[str, Any], default_priority: str):
+    """
+    预审提交的优先级和提交人：未指定提交人时按 MCP 会话区分（同一连接的提交视为同一位代表）
+
+    Returns:
+        (优先级, 提交人)
+    """
+    priority = normalize_priority(arguments.get("priority"), default_priority)
+    submitter = arguments.get("submitter")
+    if not submitter:
+        try:
+            submitter = f"session-{id(server.request_context.session):x}"
+        except LookupError:
+            submitter = "anonymous"
+    return priority, str(submitter)
+
+
+class ProgressSender:
+    """
+    进度回调：线程池中的预审等待通知发出后继续；事件循环中的预审不等待，
+    通知按上报顺序在后台发送，返回结果前调用 flush 保证进度通知先于结果到达
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, notify):
+        self.loop = loop
+        self.notify = notify
+        self._last: Optional[asyncio.Task] = None
+
+    def __call__(self, progress: float, total: Optional[float], message: str):
+        try:
+            in_loop = asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            in_loop = False
+        if in_loop:
+            self._last = self.loop.create_task(self._send_after(self._last, progress, total, message))
+            return
+        future = asyncio.run_coroutine_threadsafe(self.notify(progress, total, message), self.loop)
+        future.result(timeout=PROGRESS_SEND_TIMEOUT)
+
+    async def _send_after(self, previous: Optional[asyncio.Task], progress: float, total: Optional[float],
+                          message: str):
+        if previous is not None:
+            await asyncio.wait([previous])
+        try:
+            await asyncio.wait_for(self.notify(progress, total, message), PROGRESS_SEND_TIMEOUT)
+        except Exception as e:
+            logger.debug(f"进度通知发送失败: {str(e)}")
+
+    async def flush(self):
+        """等待已上报的进度通知发送完成"""
+        if self._last is not None:
+            await asyncio.wait([self._last])
+
+
+def _progress_sender(loop: asyncio.AbstractEventLoop) -> Optional[ProgressSender]:
+    """当前请求的进度回调（客户端未请求进度时返回 None）"""
+    notify = _progress_notifier()
+    if notify is None:
+        return None
+    return ProgressSender(loop, notify)
+
+
+async def run_tool(name: str, func, *args, deadline: Optional[Deadline] = None,
+                   profile: Optional[bool] = None):
+    """
+    在线程池中执行同步工具函数，统计排队深度和排队时间，并按配置剖析该请求
+
+    客户端取消请求或断开连接时取消 deadline：尚未开始的调用不再执行，
+    进行中的调用放弃等待外部请求并跳过剩余阶段，工作线程立即释放
+    """
+    if server_draining.is_set():
+        raise ServerDrainingError("服务正在关闭，请稍后重试")
+    submitted_at = time.monotonic()
+    call = {"started": False, "finished": False}
+    tool_queue_stats.submitted()
+
+    def run():
+        tool_queue_stats.started(call, time.monotonic() - submitted_at)
+        try:
+            if deadline is not None:
+                deadline.check_cancelled(name)
+            # 调用期间固定使用开始执行时的配置快照（已由调用方固定时沿用）
+            with pinned_snapshot(), get_profiler().request(name, profile):
+                return func(*args)
+        except RequestCancelled as e:
+            record_aborted_work(e.stage)
+            return None
+
+    try:
+        return await asyncio.to_thread(run)
+    except asyncio.CancelledError:
+        if deadline is not None:
+            deadline.cancel("客户端取消请求或断开连接")
+        logger.info(f"MCP 工具调用已取消: {name}")
+        raise
+    finally:
+        tool_queue_stats.finished(call)
+
+
+async def run_async_tool(name: str, func, *args, deadline: Optional[Deadline] = None):
+    """
+    在事件循环中直接执行异步工具函数（等待外部调用时不占用线程），统计方式与 run_tool 相同
+
+    客户端取消请求或断开连接时任务被取消，进行中的外部调用随之中止，剩余阶段不再执行
+    """
+    if server_draining.is_set():
+        raise ServerDrainingError("服务正在关闭，请稍后重试")
+    call = {"started": False, "finished": False}
+    tool_queue_stats.submitted()
+    # 不经过线程池，没有排队时间
+    tool_queue_stats.started(call, 0.0)
+    try:
+        if deadline is not None:
+            deadline.check_cancelled(name)
+        # cProfile 和栈采样按线程采集，事件循环中的请求只记录阶段耗时
+        with pinned_snapshot(), get_profiler().request(name, profile=False):
+            return await func(*args)
+    except RequestCancelled as e:
+        record_aborted_work(e.stage)
+        return None
+    except asyncio.CancelledError:
+        if deadline is not None:
+            deadline.cancel("客户端取消请求或断开连接")
+            record_aborted_work(deadline.aborted_stage or name)
+        logger.info(f"MCP 工具调用已取消: {name}")
+        raise
+    finally:
+        tool_queue_stats.finished(call)
+
+
+async def call_tool_function(name: str, func, async_func, *args, deadline: Optional[Deadline] = None):
+    """
+    执行工具函数：默认在事件循环中执行异步版本；
+    请求被选中剖析或关闭了异步执行时，在线程池中执行同步版本
+    """
+    profile = get_profiler().claim_profile()
+    if async_tools.async_tools_enabled() and not profile:
+        return await run_async_tool(name, async_func, *args, deadline=deadline)
+    return await run_tool(name, func, *args, deadline=deadline, profile=profile)
+
+
+def _batch_item(index: int, result, output_format: str) -> Dict[str, Any]:
+    """批量预审中单个条目的结果"""
+    extraction = result.extraction or {}
+    item = {
+        "index": index,
+        "success": True,
+        "verdict": result.verdict,
+        "outcome": result.outcome,
+        "headline": result.headline,
+        "speaker_name": extraction.get("name", ""),
+        "hospital": extraction.get("hospital", ""),
+        "file_count": result.file_count
+    }
+    if output_format == "json":
+        item["result"] = result.to_dict()
+    return item
+
+
+async def run_preaudit_batch(items: List[str], bucket_name: Optional[str], timeout_seconds: float,
+                             output_format: str = "summary",
+                             max_concurrency: int = BATCH_DEFAULT_CONCURRENCY,
+                             priority: str = PRIORITY_BATCH, submitter: str = "anonymous") -> Dict[str, Any]:
+    """
+    并发执行多条预审，每条完成时立即通过进度通知发送该条结果
+
+    Args:
+        items: 医药代表提交的讲者信息列表
+        bucket_name: S3 存储桶名称
+        timeout_seconds: 每条预审的时间预算（秒），从该条经提交调度开始执行时计算
+        output_format: summary 只返回结论摘要，json 同时返回完整结构化结果
+        max_concurrency: 同时执行的预审数
+        priority: 提交调度优先级
+        submitter: 提交人，同一优先级内按提交人轮流执行
+
+    Returns:
+        按输入顺序排列的各条结果和结论统计
+    """
+    notify = _progress_notifier()
+    semaphore = asyncio.Semaphore(max(1, min(max_concurrency, BATCH_MAX_CONCURRENCY)))
+    results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+    completed = 0
+
+    async def run_item(index: int, user_input: str):
+        nonlocal completed
+        async with semaphore:
+            try:
+                # 排队等待不计入该条的时间预算
+                async with get_submission_scheduler().slot(priority, submitter):
+                    deadline = Deadline.from_timeout(timeout_seconds, cancellable=True)
+                    result = await call_tool_function("perform_preaudit", run_preaudit, async_tools.run_preaudit,
+                                                      user_input, bucket_name, deadline, deadline=deadline)
+                item = _batch_item(index, result, output_format)
+            except Exception as e:
+                item = {"index": index, "success": False, "error": str(e)}
+        results[index] = item
+        completed += 1
+        if notify is not None:
+            try:
+                await notify(completed, len(items), json.dumps(item, ensure_ascii=False, separators=(',', ':')))
+            except Exception as e:
+                logger.debug(f"批量预审进度通知发送失败: {str(e)}")
+
+    # 同一批次的所有条目使用批次开始时的配置快照
+    with pinned_snapshot():
+        await asyncio.gather(*(run_item(index, user_input) for index, user_input in enumerate(items)))
+
+    verdicts: Dict[str, int] = {}
+    for item in results:
+        key = item["verdict"] if item["success"] else "error"
+        verdicts[key] = verdicts.get(key, 0) + 1
+    return {"count": len(items), "verdicts": verdicts, "results": results}
+
+
 @server.list_tools()
 async def handle_list_tools() -> List[Tool]:
     """
@@ -70,6 +470,10 @@ async def handle_list_tools() -> List[Tool]:
                     "target_word": {
                         "type": "string",
                         "description": "特殊验证标识。如果为空，则使用配置文件中的默认标识"
+                    },
+                    "timeout_seconds": {
+                        "type": "number",
+                        "description": "本次调用的整体时间预算（秒）。如果为空，则使用配置文件中的 TIMEOUT_SECONDS"
                     }
                 },
                 "required": ["input_string"]
@@ -88,11 +492,134 @@ async def handle_list_tools() -> List[Tool]:
                     "bucket_name": {
                         "type": "string",
                         "description": "存储讲者验证文档的S3存储桶名称。如果为空，则使用配置文件中的默认存储桶"
+                    },
+                    "timeout_seconds": {
+                        "type": "number",
+                        "description": "本次预审的整体时间预算（秒），超时返回标记为部分结果的预审结论。如果为空，则使用配置文件中的 TIMEOUT_SECONDS"
+                    },
+                    "output_format": {
+                        "type": "string",
+                        "enum": ["text", "brief", "json"],
+                        "description": "返回格式：text 为完整中文报告（默认），brief 为简要报告，json 为供程序调用的紧凑结构化结果"
+                    },
+                    "priority": {
+                        "type": "string",
+                        "enum": list(PRIORITY_CLASSES),
+                        "description": "提交调度优先级：interactive 为交互式检查（默认），batch 为批量任务，nightly 为夜间任务"
+                    },
+                    "submitter": {
+                        "type": "string",
+                        "description": "提交人（如医药代表工号），同一优先级内按提交人轮流执行。如果为空，则按 MCP 会话区分"
                     }
                 },
                 "required": ["user_input"]
             }
         ),
+        Tool(
+            name="perform_preaudit_batch",
+            description="批量执行讲者预审。多条讲者信息并发预审，每条完成时立即通过进度通知返回该条结论，最后返回按输入顺序排列的全部结果和结论统计。适用于：活动讲者名单批量审核、多位讲者同时预审。",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "items": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": f"医药代表提交的讲者信息列表，每条一位讲者，最多 {BATCH_MAX_ITEMS} 条"
+                    },
+                    "bucket_name": {
+                        "type": "string",
+                        "description": "存储讲者验证文档的S3存储桶名称。如果为空，则使用配置文件中的默认存储桶"
+                    },
+                    "timeout_seconds": {
+                        "type": "number",
+                        "description": "每条预审的时间预算（秒），从该条开始执行时计算。如果为空，则使用配置文件中的 TIMEOUT_SECONDS"
+                    },
+                    "output_format": {
+                        "type": "string",
+                        "enum": ["summary", "json"],
+                        "description": "每条结果的格式：summary 为结论摘要（默认），json 同时包含完整结构化结果"
+                    },
+                    "max_concurrency": {
+                        "type": "integer",
+                        "description": f"同时执行的预审数，默认 {BATCH_DEFAULT_CONCURRENCY}，最多 {BATCH_MAX_CONCURRENCY}"
+                    },
+                    "priority": {
+                        "type": "string",
+                        "enum": list(PRIORITY_CLASSES),
+                        "description": "提交调度优先级：batch 为批量任务（默认），nightly 为夜间任务，interactive 为交互式检查"
+                    },
+                    "submitter": {
+                        "type": "string",
+                        "description": "提交人（如医药代表工号），同一优先级内按提交人轮流执行。如果为空，则按 MCP 会话区分"
+                    }
+                },
+                "required": ["items"]
+            }
+        ),
+        Tool(
+            name="profile_folder_documents",
+            description="统计讲者专属文件夹中各格式（PDF、JPEG/PNG、DOCX 等）和各类别（执业证书、简历、截图等）的文档数量。只读取每个文档开头几 KB 识别真实格式。适用于：支撑材料构成检查、文档类型统计、扩展名与内容不符排查。",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "folder_prefix": {
+                        "type": "string",
+                        "description": "讲者专属文件夹前缀，如：'宋智钢-长海医院/'"
+                    },
+                    "bucket_name": {
+                        "type": "string",
+                        "description": "S3存储桶名称。如果为空，则使用配置文件中的默认存储桶"
+                    },
+                    "timeout_seconds": {
+                        "type": "number",
+                        "description": "本次调用的整体时间预算（秒）。如果为空，则使用配置文件中的 TIMEOUT_SECONDS"
+                    }
+                },
+                "required": ["folder_prefix"]
+            }
+        ),
+        Tool(
+            name="query_preaudit_history",
+            description="查询讲者预审历史记录。从本地审计记录中按讲者姓名、医院、文件夹、结论和时间范围查找以往的预审结论，毫秒级返回。适用于：讲者上次验证时间查询、历史预审结论追溯、某医院讲者预审统计。",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "speaker_name": {
+                        "type": "string",
+                        "description": "讲者姓名（精确匹配），如：'宋智钢'"
+                    },
+                    "hospital": {
+                        "type": "string",
+                        "description": "医院名称（精确匹配）"
+                    },
+                    "folder": {
+                        "type": "string",
+                        "description": "讲者专属文件夹前缀（精确匹配）"
+                    },
+                    "verdict": {
+                        "type": "string",
+                        "enum": ["pass", "partial_pass", "fail", "incomplete"],
+                        "description": "预审结论"
+                    },
+                    "since": {
+                        "type": "string",
+                        "description": "起始时间（含），ISO 格式，如 2024-05-01 或 2024-05-01T10:00:00"
+                    },
+                    "until": {
+                        "type": "string",
+                        "description": "截止时间（不含），ISO 格式"
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "返回记录数上限，默认 20，最多 500"
+                    },
+                    "include_result": {
+                        "type": "boolean",
+                        "description": "是否返回完整的结构化预审结果"
+                    }
+                }
+            }
+        ),
         Tool(
             name="get_current_config",
             description="获取讲者身份验证系统的当前配置和审核标准。查询系统的验证标准、EXA搜索配置、文档要求等参数。适用于：系统配置查询、审核标准确认、验证参数检查。",
@@ -107,14 +634,22 @@ async def handle_list_tools() -> List[Tool]:
 async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> List[TextContent]:
     """
     处理工具调用
+    
+    身份检查和预审直接在事件循环中执行异步版本，其他同步工具函数在线程池中执行，避免阻塞事件循环
     """
     start_time = time.time()
     logger.info(f"MCP 工具调用开始: {name}")
     
+    # 整体时间预算从这里开始计算，并传递到各个阶段
+    timeout_seconds = arguments.get("timeout_seconds")
+    if timeout_seconds is None:
+        timeout_seconds = preaudit_config['timeout_seconds']
+    deadline = Deadline.from_timeout(timeout_seconds, cancellable=True)
+    
     try:
         if name == "list_s3_files":
             bucket_name = arguments.get("bucket_name")
-            result = list_s3_files(bucket_name)
+            result = await run_tool(name, list_s3_files, bucket_name)
             
             execution_time = time.time() - start_time
             logger.info(f"MCP 工具调用成功: {name}, 执行时间: {execution_time:.2f}s")
@@ -131,7 +666,8 @@ async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> List[TextCon
             if not input_string:
                 raise ValueError("input_string 参数是必需的")
             
-            result = check_string_content(input_string, target_word)
+            result = await call_tool_function(name, check_string_content, async_tools.check_string_content,
+                                              input_string, target_word, deadline, deadline=deadline)
             
             execution_time = time.time() - start_time
             logger.info(f"MCP 工具调用成功: {name}, 执行时间: {execution_time:.2f}s")
@@ -148,18 +684,97 @@ async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> List[TextCon
             if not user_input:
                 raise ValueError("user_input 参数是必需的")
             
-            result = perform_preaudit(user_input, bucket_name)
+            output_format = arguments.get("output_format") or "text"
+            priority, submitter = _submission_identity(arguments, PRIORITY_INTERACTIVE)
+            # 客户端请求进度时，各阶段完成后发送进度通知（附带中间结构化结果）
+            progress_sender = _progress_sender(asyncio.get_running_loop())
+            # 按优先级和提交人排队，排队时间计入整体时间预算
+            async with get_submission_scheduler().slot(priority, submitter, timeout=deadline.remaining()):
+                with progress_reporting(progress_sender, total=len(PREAUDIT_PROGRESS_STAGES)):
+                    text = await call_tool_function(name, _perform_preaudit_output, _perform_preaudit_output_async,
+                                                    user_input, bucket_name, deadline, output_format,
+                                                    deadline=deadline)
+            if progress_sender is not None:
+                await progress_sender.flush()
             
             execution_time = time.time() - start_time
             logger.info(f"MCP 工具调用成功: {name}, 执行时间: {execution_time:.2f}s")
             
             return [TextContent(
                 type="text",
-                text=result
+                text=text
+            )]
+        
+        elif name == "perform_preaudit_batch":
+            items = arguments.get("items")
+            
+            if not isinstance(items, list) or not items:
+                raise ValueError("items 参数是必需的，且应为非空的讲者信息列表")
+            if len(items) > BATCH_MAX_ITEMS:
+                raise ValueError(f"单次批量预审最多 {BATCH_MAX_ITEMS} 条，当前 {len(items)} 条")
+            if not all(isinstance(item, str) and item.strip() for item in items):
+                raise ValueError("items 中的每一条都应为非空字符串")
+            
+            priority, submitter = _submission_identity(arguments, PRIORITY_BATCH)
+            result = await run_preaudit_batch(
+                items,
+                arguments.get("bucket_name"),
+                timeout_seconds,
+                arguments.get("output_format") or "summary",
+                arguments.get("max_concurrency") or BATCH_DEFAULT_CONCURRENCY,
+                priority,
+                submitter
+            )
+            
+            execution_time = time.time() - start_time
+            logger.info(f"MCP 工具调用成功: {name}, 条目数: {len(items)}, 执行时间: {execution_time:.2f}s")
+            
+            return [TextContent(
+                type="text",
+                text=json.dumps(result, ensure_ascii=False, indent=2)
+            )]
+        
+        elif name == "profile_folder_documents":
+            folder_prefix = arguments.get("folder_prefix")
+            
+            if not folder_prefix:
+                raise ValueError("folder_prefix 参数是必需的")
+            
+            result = await run_tool(name, profile_folder_documents, folder_prefix,
+                                    arguments.get("bucket_name"), deadline, deadline=deadline)
+            
+            execution_time = time.time() - start_time
+            logger.info(f"MCP 工具调用成功: {name}, 执行时间: {execution_time:.2f}s")
+            
+            return [TextContent(
+                type="text",
+                text=json.dumps(result, ensure_ascii=False, indent=2)
+            )]
+        
+        elif name == "query_preaudit_history":
+            result = await run_tool(
+                name,
+                query_preaudit_history,
+                arguments.get("speaker_name"),
+                arguments.get("hospital"),
+                arguments.get("folder"),
+                arguments.get("verdict"),
+                arguments.get("since"),
+                arguments.get("until"),
+                arguments.get("limit") or 20,
+                bool(arguments.get("include_result"))
+            )
+            
+            execution_time = time.time() - start_time
+            logger.info(f"MCP 工具调用成功: {name}, 执行时间: {execution_time:.2f}s")
+            
+            return [TextContent(
+                type="text",
+                text=json.dumps(result, ensure_ascii=False, indent=2)
             )]
         
         elif name == "get_current_config":
-            result = get_current_config()
+            result = await run_tool(name, get_current_config)
             
             execution_time = time.time() - start_time
             logger.info(f"MCP 工具调用成功: {name}, 执行时间: {execution_time:.2f}s")
@@ -195,6 +810,19 @@ async def handle_list_resources() -> List[Resource]:
             description="SpeakerValidationPreCheckSystem 的当前配置信息",
             mimeType="application/json"
         ),
+        Resource(
+            uri="speaker-validation://metrics",
+            name="运行指标",
+            description="外部依赖（Bedrock、EXA）的熔断状态、重试次数、限流等待时间，重复请求合并统计，以及预审各阶段的执行/跳过次数",
+            mimeType="application/json"
+        ),
+        Resource(
+            uri="speaker-validation://profiles",
+            name="请求剖析结果",
+            description="最近被剖析请求的阶段耗时和热点函数；读取 speaker-validation://profiles/arm 按需剖析下一个请求，"
+                        "读取 speaker-validation://profiles/<id> 获取火焰图使用的 collapsed-stack 文本",
+            mimeType="application/json"
+        ),
         Resource(
             uri="speaker-validation://help",
             name="使用帮助",
@@ -208,6 +836,7 @@ async def handle_read_resource(uri: str) -> str:
     """
     读取资源内容
     """
+    uri = str(uri)
     if uri == "speaker-validation://config":
         try:
             config = get_current_config()
@@ -215,6 +844,49 @@ async def handle_read_resource(uri: str) -> str:
         except Exception as e:
             return f"配置读取失败: {str(e)}"
     
+    elif uri == "speaker-validation://metrics":
+        exporter = get_columnar_exporter()
+        metrics = {
+            "dependencies": get_resilience_metrics(),
+            "coalescing": get_coalescing_metrics(),
+            "stages": get_stage_planner().get_metrics(),
+            "server": tool_queue_stats.get_metrics(),
+            "cancellation": get_cancellation_metrics(),
+            "config": get_config_service().get_metrics(),
+            "async": async_tools.get_async_metrics(),
+            "profiling": get_profiler().get_metrics(),
+            "documents": get_folder_profiler().get_metrics(),
+            "folder_index": get_folder_index().get_metrics(),
+            "pdf_text": get_pdf_text_extractor().get_metrics(),
+            "photo_index": _photo_index_metrics(),
+            "speaker_registry": _speaker_registry_metrics(),
+            "s3_events": _event_consumer_metrics(),
+            "inventory": get_inventory_reader().get_metrics(),
+            "scheduler": get_scheduler_metrics(),
+            "cost": get_cost_metrics(),
+            "audit": get_audit_store().get_metrics(),
+            "export": exporter.get_metrics() if exporter is not None else {"enabled": False}
+        }
+        return json.dumps(metrics, ensure_ascii=False, indent=2)
+    
+    elif uri == "speaker-validation://profiles":
+        return json.dumps(get_profiler().get_profiles(), ensure_ascii=False, indent=2)
+    
+    elif uri.startswith("speaker-validation://profiles/arm"):
+        # 可选参数 ?count=N，按需剖析接下来的 N 个请求
+        count = 1
+        if "count=" in uri:
+            count = max(1, int(uri.split("count=", 1)[1].split("&", 1)[0]))
+        armed = get_profiler().arm(count)
+        return json.dumps({"armed": armed}, ensure_ascii=False)
+    
+    elif uri.startswith("speaker-validation://profiles/"):
+        trace_id = uri.rsplit("/", 1)[1]
+        profile = get_profiler().get_profile(trace_id)
+        if profile is None:
+            raise ValueError(f"未找到剖析结果: {trace_id}")
+        return profile.to_collapsed()
+    
     elif uri == "speaker-validation://help":
         return """
 SpeakerValidationPreCheckSystem - 医药代表内容预审系统使用指南
@@ -229,6 +901,7 @@ SpeakerValidationPreCheckSystem - 医药代表内容预审系统使用指南
 - list_s3_files: 检查支撑文档完整性
 - check_string_content: 检查内容合规标识
 - perform_preaudit: 执行完整预审流程（推荐使用）
+- perform_preaudit_batch: 批量预审，逐条返回结果
 - get_current_config: 获取当前审核标准
 
 使用示例：
@@ -247,6 +920,30 @@ SpeakerValidationPreCheckSystem - 医药代表内容预审系统使用指南
     else:
         raise ValueError(f"未知的资源: {uri}")
 
+def _photo_index_metrics() -> Dict[str, Any]:
+    """照片索引和后台索引器的指标"""
+    indexer = get_photo_indexer()
+    return dict(get_photo_index().get_metrics(),
+                indexer=indexer.get_metrics() if indexer is not None else {"running": False})
+
+def _speaker_registry_metrics() -> Dict[str, Any]:
+    """讲者预验证登记表的查找命中和服务内定时刷新的指标"""
+    refresher = get_registry_refresher()
+    return dict(get_speaker_registry().get_metrics(),
+                refresher=refresher.get_metrics() if refresher is not None else {"running": False})
+
+def _event_consumer_metrics() -> Dict[str, Any]:
+    """S3 对象事件消费者的指标"""
+    consumer = get_event_consumer()
+    return consumer.get_metrics() if consumer is not None else {"running": False}
+
+def start_config_watcher():
+    """按 [RELOAD] 配置启动配置文件监视（修改后无需重启服务）"""
+    reload_config = get_config_service().current().section('reload')
+    if reload_config['enabled']:
+        get_config_service().start_watching(reload_config['poll_interval_seconds'])
+
+
 async def main():
     """
     启动 MCP server
@@ -254,14 +951,14 @@ async def main():
     logger.info("启动 SpeakerValidationPreCheckSystem MCP Server")
     
     # 设置初始化选项
-    options = InitializationOptions(
-        server_name="speaker-validation-precheck",
-        server_version="1.0.0",
-        capabilities={
-            "tools": {},
-            "resources": {}
-        }
-    )
+    options = build_initialization_options()
+    start_config_watcher()
+    # 按 [PHOTO_INDEX] ENABLED 启动后台照片索引
+    start_photo_indexer()
+    # 按 [REGISTRY] SCHEDULE_IN_SERVER 在服务内定时刷新讲者登记表
+    start_registry_refresher()
+    # 按 [EVENTS] ENABLED 消费 S3 对象事件，增量更新讲者登记表
+    start_event_consumer()
     
     try:
         async with stdio_server() as (read_stream, write_stream):
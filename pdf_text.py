@@ -0,0 +1,747 @@
+#!/usr/bin/env python3
+"""
+PDF 文本流式提取模块
+按块（Range GET）读取讲者文件夹中的 PDF，增量解析已完整读取的对象；页面的内容流和字体 ToUnicode 映射
+就绪后立即提交到线程池逐页提取文本，找到全部检索词（讲者姓名、医院）后停止读取剩余内容。
+提取的文本按 ETag 缓存，内容未变化的文档不会重复下载和解析
+
+内置解析器支持 FlateDecode 压缩流、对象流（ObjStm）和 ToUnicode 映射（包括中文 CID 字体）；
+扫描件（只有图片、没有文本层）无法提取文本。单个文档解压后的总字节数有上限，超过上限（如压缩炸弹）的文档跳过
+"""
+
+import contextvars
+import logging
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from folder_profiler import categorize
+
+logger = logging.getLogger(__name__)
+
+_OBJ_HEADER = re.compile(rb"(\d+)\s+(\d+)\s+obj\b")
+_REF = re.compile(rb"(\d+)\s+\d+\s+R\b")
+_PAGE_TYPE = re.compile(rb"/Type\s*/Page(?![A-Za-z])")
+_OBJSTM_TYPE = re.compile(rb"/Type\s*/ObjStm\b")
+_DIRECT_LENGTH = re.compile(rb"/Length\s+(\d+)(?!\s+\d+\s+R)")
+_WHITESPACE = re.compile(r"\s+")
+
+# 内容流词法：字面字符串 "(" 单独解析（可嵌套括号），其余记号由正则匹配
+_TOKEN = re.compile(
+    rb"\s+|%[^\r\n]*|<<|>>|<([0-9A-Fa-f\s]*)>|\[|\]|\(|/[^\s/\[\]()<>{}%]*"
+    rb"|[-+]?(?:\d+\.?\d*|\.\d+)|[A-Za-z'\"*][A-Za-z0-9*]*|.",
+    re.S
+)
+_ESCAPES = {b"n": b"\n", b"r": b"\r", b"t": b"\t", b"b": b"\b", b"f": b"\f",
+            b"(": b"(", b")": b")", b"\\": b"\\"}
+
+# 文档读取顺序：证书和简历中最可能出现讲者姓名和医院
+_CATEGORY_PRIORITY = ["practice_certificate", "qualification_certificate", "title_certificate",
+                      "employment_proof", "cv", "publication"]
+
+
+class PdfTooLarge(ValueError):
+    """文档解压后的字节数超过上限"""
+
+
+@dataclass(slots=True)
+class _PdfObject:
+    dictionary: bytes
+    stream: Optional[bytes] = None
+
+
+# ---- 对象和字典 ----
+
+def _value(data: bytes, key: bytes) -> Optional[bytes]:
+    """字典中某个键的原始值（引用、名称、数字、数组或嵌套字典）"""
+    match = re.search(rb"/" + key + rb"(?![A-Za-z0-9])\s*", data)
+    if match is None:
+        return None
+    start = match.end()
+    if data.startswith(b"<<", start):
+        depth, i = 0, start
+        while i < len(data) - 1:
+            pair = data[i:i + 2]
+            if pair == b"<<":
+                depth += 1
+                i += 2
+            elif pair == b">>":
+                depth -= 1
+                i += 2
+                if depth == 0:
+                    return data[start:i]
+            else:
+                i += 1
+        return data[start:]
+    if data.startswith(b"[", start):
+        end = data.find(b"]", start)
+        return data[start:end + 1] if end != -1 else data[start:]
+    ref = re.match(rb"\d+\s+\d+\s+R\b", data[start:])
+    if ref is not None:
+        return ref.group(0)
+    token = re.match(rb"/?[^\s/\[\]<>()]+", data[start:])
+    return token.group(0) if token is not None else None
+
+
+def _refs(value: Optional[bytes]) -> List[int]:
+    return [int(num) for num in _REF.findall(value or b"")]
+
+
+def _decode_stream(obj: _PdfObject, limit: int) -> Optional[bytes]:
+    """
+    解码流数据（只支持未压缩和 FlateDecode）
+
+    Raises:
+        PdfTooLarge: 解压后超过 limit 字节
+    """
+    if obj.stream is None:
+        return None
+    filters = _value(obj.dictionary, b"Filter") or b""
+    names = re.findall(rb"/(\w+)", filters)
+    if not names:
+        return obj.stream
+    if names != [b"FlateDecode"] and names != [b"Fl"]:
+        return None
+    # 限制解压输出：文件夹中的 PDF 由医药代表上传，不可信（8 MB 的全零压缩流可以解压到约 8 GB）；
+    # 截断或带有尾部垃圾的流解出已有部分
+    decompressor = zlib.decompressobj()
+    data = decompressor.decompress(obj.stream, limit + 1)
+    if decompressor.unconsumed_tail or len(data) > limit:
+        raise PdfTooLarge(f"解压后超过 {limit} 字节")
+    return data
+
+
+class _ObjectScanner:
+    """增量扫描 PDF 字节流，解析已完整读取的间接对象（已处理的字节不再保留）"""
+
+    def __init__(self, max_decoded_bytes: int = 67108864):
+        self.objects: Dict[int, _PdfObject] = {}
+        self.max_decoded_bytes = max_decoded_bytes
+        self.decoded_bytes = 0
+        self._buffer = bytearray()
+
+    def decode(self, obj: _PdfObject) -> Optional[bytes]:
+        """解码流数据，整个文档解码的总字节数超过 max_decoded_bytes 时抛出 PdfTooLarge"""
+        data = _decode_stream(obj, max(0, self.max_decoded_bytes - self.decoded_bytes))
+        if data is not None:
+            self.decoded_bytes += len(data)
+        return data
+
+    def feed(self, data: bytes) -> List[int]:
+        """追加数据，返回新解析出的对象编号"""
+        self._buffer.extend(data)
+        buffer, pos, found = self._buffer, 0, []
+        while True:
+            header = _OBJ_HEADER.search(buffer, pos)
+            if header is None:
+                # 保留末尾可能被截断的对象头
+                pos = max(pos, len(buffer) - 32)
+                break
+            parsed = self._parse(buffer, header)
+            if parsed is None:
+                pos = header.start()
+                break
+            number, obj, pos = parsed
+            self.objects[number] = obj
+            found.append(number)
+            if obj.stream is not None and _OBJSTM_TYPE.search(obj.dictionary):
+                found.extend(self._expand_object_stream(obj))
+        del self._buffer[:pos]
+        return found
+
+    @staticmethod
+    def _parse(buffer: bytearray, header) -> Optional[Tuple[int, _PdfObject, int]]:
+        body = header.end()
+        end = buffer.find(b"endobj", body)
+        stream_at = buffer.find(b"stream", body)
+        if stream_at != -1 and (end == -1 or stream_at < end) and buffer[stream_at - 3:stream_at] != b"end":
+            dictionary = bytes(buffer[body:stream_at])
+            data_start = stream_at + len(b"stream")
+            if buffer[data_start:data_start + 2] == b"\r\n":
+                data_start += 2
+            elif buffer[data_start:data_start + 1] in (b"\n", b"\r"):
+                data_start += 1
+            length = _DIRECT_LENGTH.search(dictionary)
+            data_end = -1
+            if length is not None:
+                data_end = data_start + int(length.group(1))
+                if buffer.find(b"endstream", data_end, data_end + 16) == -1:
+                    data_end = -1
+            if data_end == -1:
+                data_end = buffer.find(b"endstream", data_start)
+                if data_end == -1:
+                    return None
+            end = buffer.find(b"endobj", data_end)
+            if end == -1:
+                return None
+            stream = bytes(buffer[data_start:data_end]).rstrip(b"\r\n") if length is None else \
+                bytes(buffer[data_start:data_end])
+            return int(header.group(1)), _PdfObject(dictionary, stream), end + len(b"endobj")
+        if end == -1:
+            return None
+        return int(header.group(1)), _PdfObject(bytes(buffer[body:end])), end + len(b"endobj")
+
+    def _expand_object_stream(self, obj: _PdfObject) -> List[int]:
+        """展开对象流中压缩存放的对象"""
+        data = self.decode(obj)
+        first = _value(obj.dictionary, b"First")
+        if data is None or first is None:
+            return []
+        first = int(first)
+        numbers = [int(value) for value in data[:first].split()]
+        pairs = list(zip(numbers[0::2], numbers[1::2]))
+        found = []
+        for i, (number, offset) in enumerate(pairs):
+            end = first + pairs[i + 1][1] if i + 1 < len(pairs) else len(data)
+            self.objects[number] = _PdfObject(data[first + offset:end])
+            found.append(number)
+        return found
+
+
+# ---- ToUnicode 映射 ----
+
+def _hex_bytes(value: bytes) -> bytes:
+    value = re.sub(rb"\s+", b"", value)
+    if len(value) % 2:
+        value += b"0"
+    return bytes.fromhex(value.decode("ascii"))
+
+
+def _utf16(data: bytes) -> str:
+    return data.decode("utf-16-be", errors="ignore")
+
+
+def parse_cmap(data: bytes) -> Dict[bytes, str]:
+    """解析 ToUnicode CMap（bfchar 和 bfrange）"""
+    mapping: Dict[bytes, str] = {}
+    for block in re.findall(rb"beginbfchar(.*?)endbfchar", data, re.S):
+        for source, target in re.findall(rb"<([0-9A-Fa-f\s]+)>\s*<([0-9A-Fa-f\s]*)>", block):
+            mapping[_hex_bytes(source)] = _utf16(_hex_bytes(target))
+    for block in re.findall(rb"beginbfrange(.*?)endbfrange", data, re.S):
+        for low, high, target in re.findall(
+                rb"<([0-9A-Fa-f\s]+)>\s*<([0-9A-Fa-f\s]+)>\s*(<[0-9A-Fa-f\s]*>|\[[^\]]*\])", block):
+            low, high = _hex_bytes(low), _hex_bytes(high)
+            width = len(low)
+            start, stop = int.from_bytes(low, "big"), int.from_bytes(high, "big")
+            if stop - start > 65535:
+                continue
+            if target.startswith(b"["):
+                targets = re.findall(rb"<([0-9A-Fa-f\s]*)>", target)
+                for offset, value in enumerate(targets[:stop - start + 1]):
+                    mapping[(start + offset).to_bytes(width, "big")] = _utf16(_hex_bytes(value))
+            else:
+                base = _hex_bytes(target[1:-1])
+                prefix, last = base[:-2], int.from_bytes(base[-2:], "big") if len(base) >= 2 else 0
+                for offset in range(stop - start + 1):
+                    code = (start + offset).to_bytes(width, "big")
+                    mapping[code] = _utf16(prefix + ((last + offset) & 0xFFFF).to_bytes(2, "big"))
+    return mapping
+
+
+def _decode_text(data: bytes, cmap: Optional[Dict[bytes, str]]) -> str:
+    """按字体的 ToUnicode 映射解码字符串，没有映射时按单字节编码解码"""
+    if not cmap:
+        if data.startswith(b"\xfe\xff"):
+            return _utf16(data[2:])
+        return data.decode("cp1252", errors="ignore")
+    widths = sorted({len(code) for code in cmap}, reverse=True)
+    chars, i = [], 0
+    while i < len(data):
+        for width in widths:
+            char = cmap.get(data[i:i + width])
+            if char is not None:
+                chars.append(char)
+                i += width
+                break
+        else:
+            i += widths[-1]
+    return "".join(chars)
+
+
+# ---- 内容流 ----
+
+def _literal(data: bytes, start: int) -> Tuple[bytes, int]:
+    """解析字面字符串（start 指向 "(" 之后），返回内容和结束位置"""
+    out, depth, i = bytearray(), 1, start
+    while i < len(data):
+        char = data[i:i + 1]
+        if char == b"\\":
+            escaped = data[i + 1:i + 2]
+            if escaped in _ESCAPES:
+                out += _ESCAPES[escaped]
+                i += 2
+            elif escaped.isdigit():
+                octal = re.match(rb"[0-7]{1,3}", data[i + 1:i + 4]).group(0)
+                out.append(int(octal, 8) & 0xFF)
+                i += 1 + len(octal)
+            elif escaped in (b"\r", b"\n"):
+                i += 2
+            else:
+                i += 1
+            continue
+        if char == b"(":
+            depth += 1
+        elif char == b")":
+            depth -= 1
+            if depth == 0:
+                return bytes(out), i + 1
+        out += char
+        i += 1
+    return bytes(out), i
+
+
+def extract_content_text(content: bytes, fonts: Dict[bytes, Optional[Dict[bytes, str]]]) -> str:
+    """
+    提取页面内容流中的文本（Tj、TJ、'、" 操作符）
+
+    Args:
+        content: 解码后的内容流
+        fonts: 字体资源名 -> ToUnicode 映射（没有映射时为 None）
+    """
+    parts: List[str] = []
+    operands: List[Any] = []
+    array: Optional[List[Any]] = None
+    cmap = None
+    pos = 0
+    while pos < len(content):
+        match = _TOKEN.match(content, pos)
+        token = match.group(0)
+        pos = match.end()
+        if token == b"(":
+            value, pos = _literal(content, pos)
+            (array if array is not None else operands).append(value)
+        elif match.group(1) is not None:
+            value = _hex_bytes(match.group(1))
+            (array if array is not None else operands).append(value)
+        elif token == b"[":
+            array = []
+        elif token == b"]":
+            operands.append(array or [])
+            array = None
+        elif token[:1] == b"/":
+            (array if array is not None else operands).append(token)
+        elif token[:1].isdigit() or token[:1] in (b"-", b"+", b"."):
+            if array is not None:
+                array.append(float(token))
+            else:
+                operands.append(token)
+        elif token[:1].isalpha() or token in (b"'", b'"'):
+            if token == b"Tf" and len(operands) >= 2:
+                cmap = fonts.get(operands[-2][1:]) if isinstance(operands[-2], bytes) else None
+            elif token in (b"Tj", b"'", b'"') and operands and isinstance(operands[-1], bytes):
+                if token != b"Tj":
+                    parts.append("\n")
+                parts.append(_decode_text(operands[-1], cmap))
+            elif token == b"TJ" and operands and isinstance(operands[-1], list):
+                for item in operands[-1]:
+                    if isinstance(item, bytes):
+                        parts.append(_decode_text(item, cmap))
+                    elif item < -200:
+                        parts.append(" ")
+            elif token in (b"Td", b"TD", b"T*", b"ET"):
+                parts.append("\n")
+            elif token in (b"Tm",):
+                parts.append(" ")
+            operands = []
+    return "".join(parts)
+
+
+def _page_text(contents: List[bytes], fonts: Dict[bytes, Optional[Dict[bytes, str]]]) -> str:
+    return "\n".join(extract_content_text(content, fonts) for content in contents)
+
+
+class _PdfDocument:
+    """增量解析的 PDF：跟踪已发现的页面，依赖的对象就绪后交出页面"""
+
+    def __init__(self, max_decoded_bytes: int = 67108864):
+        self.scanner = _ObjectScanner(max_decoded_bytes)
+        self._pages: List[int] = []
+        self._emitted = set()
+        self._cmaps: Dict[int, Dict[bytes, str]] = {}
+
+    def feed(self, data: bytes) -> List[Tuple[int, List[bytes], Dict]]:
+        """追加数据，返回依赖已就绪的页面（页序号、内容流、字体映射）"""
+        for number in self.scanner.feed(data):
+            if _PAGE_TYPE.search(self.scanner.objects[number].dictionary):
+                self._pages.append(number)
+        return self._ready(final=False)
+
+    def finish(self) -> List[Tuple[int, List[bytes], Dict]]:
+        """读取结束：交出剩余页面（缺失的内容流或字体映射跳过）"""
+        return self._ready(final=True)
+
+    def _ready(self, final: bool) -> List[Tuple[int, List[bytes], Dict]]:
+        ready = []
+        for index, number in enumerate(self._pages):
+            if index in self._emitted:
+                continue
+            parts = self._page_parts(number, final)
+            if parts is not None:
+                self._emitted.add(index)
+                ready.append((index, *parts))
+        return ready
+
+    def _resolve(self, value: Optional[bytes], final: bool):
+        """解析可能是间接引用的值；引用的对象尚未读取时返回 False（读取结束时返回 None）"""
+        refs = _REF.fullmatch(value.strip()) if value else None
+        if refs is None:
+            return value
+        obj = self.scanner.objects.get(int(refs.group(1)))
+        if obj is None:
+            return None if final else False
+        return obj.dictionary
+
+    def _resources(self, number: int, final: bool):
+        """页面资源（页面没有时沿 Parent 继承）"""
+        seen = set()
+        while number not in seen:
+            seen.add(number)
+            obj = self.scanner.objects.get(number)
+            if obj is None:
+                return None if final else False
+            resources = _value(obj.dictionary, b"Resources")
+            if resources is not None:
+                return self._resolve(resources, final)
+            parent = _refs(_value(obj.dictionary, b"Parent"))
+            if not parent:
+                return None
+            number = parent[0]
+        return None
+
+    def _page_parts(self, number: int, final: bool) -> Optional[Tuple[List[bytes], Dict]]:
+        objects = self.scanner.objects
+        page = objects[number].dictionary
+        streams = []
+        for ref in _refs(_value(page, b"Contents")):
+            obj = objects.get(ref)
+            if obj is None or obj.stream is None:
+                if final:
+                    continue
+                return None
+            streams.append(obj)
+
+        resources = self._resources(number, final)
+        if resources is False:
+            return None
+        fonts = {}
+        font_dict = self._resolve(_value(resources, b"Font"), final) if resources else None
+        if font_dict is False:
+            return None
+        for name, ref in re.findall(rb"/([^\s/\[\]<>()]+)\s+(\d+)\s+\d+\s+R\b", font_dict or b""):
+            font = objects.get(int(ref))
+            if font is None:
+                if final:
+                    fonts[name] = None
+                    continue
+                return None
+            cmap_ref = _refs(_value(font.dictionary, b"ToUnicode"))
+            if not cmap_ref:
+                fonts[name] = None
+                continue
+            cmap = self._cmap(cmap_ref[0])
+            if cmap is None and not final:
+                return None
+            fonts[name] = cmap
+        # 依赖全部就绪后才解码内容流，未就绪的页面下次检查时不重复解码
+        contents = [data for data in map(self.scanner.decode, streams) if data is not None]
+        return contents, fonts
+
+    def _cmap(self, number: int) -> Optional[Dict[bytes, str]]:
+        cmap = self._cmaps.get(number)
+        if cmap is None:
+            obj = self.scanner.objects.get(number)
+            if obj is None:
+                return None
+            cmap = parse_cmap(self.scanner.decode(obj) or b"")
+            self._cmaps[number] = cmap
+        return cmap
+
+
+# ---- 提取和缓存 ----
+
+def normalize_text(text: str) -> str:
+    """去掉空白（PDF 中的中文常被拆成单字并以空格分隔）"""
+    return _WHITESPACE.sub("", text)
+
+
+@dataclass(slots=True)
+class DocumentText:
+    """一个 PDF 已提取的文本"""
+    key: str
+    etag: str
+    pages: List[str] = field(default_factory=list)
+    # 是否已读取到文件末尾或读取上限（找到检索词提前停止时为 False）
+    complete: bool = False
+    bytes_read: int = 0
+    is_pdf: bool = True
+    # 解压后超过上限而跳过（不提取文本）
+    too_large: bool = False
+
+    def find(self, terms: Dict[str, str]) -> Dict[str, int]:
+        """检索词所在的页序号（从 0 开始），未找到的检索词不在结果中"""
+        found = {}
+        wanted = {name: normalize_text(term) for name, term in terms.items() if term}
+        for index, page in enumerate(self.pages):
+            text = normalize_text(page)
+            for name, term in wanted.items():
+                if name not in found and term in text:
+                    found[name] = index
+        return found
+
+
+# 读取字节范围：read_range(start, end) -> bytes（end 含）
+RangeReader = Callable[[int, int], bytes]
+
+
+class PdfTextExtractor:
+    """PDF 文本提取器：按块读取、逐页并行提取，结果按 ETag 缓存（LRU）"""
+
+    def __init__(self, chunk_bytes: int = 262144, max_bytes: int = 8388608, workers: int = 4,
+                 cache_size: int = 1000, max_decoded_bytes: int = 67108864):
+        """
+        Args:
+            chunk_bytes: 每次 Range GET 读取的字节数
+            max_bytes: 单个文档最多读取的字节数
+            workers: 逐页提取文本的线程数
+            cache_size: 按 ETag 缓存的文档数量上限
+            max_decoded_bytes: 单个文档解压后的总字节数上限（超过时跳过该文档）
+        """
+        self.chunk_bytes = max(1024, chunk_bytes)
+        self.max_bytes = max_bytes
+        self.max_decoded_bytes = max_decoded_bytes
+        self.workers = max(1, workers)
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, DocumentText]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._metrics = {"documents": 0, "cache_hits": 0, "pages": 0, "ranged_gets": 0,
+                         "bytes_read": 0, "stopped_early": 0, "too_large": 0, "errors": 0}
+
+    def configure(self, chunk_bytes: int = 262144, max_bytes: int = 8388608, workers: int = 4,
+                  cache_size: int = 1000, max_decoded_bytes: int = 67108864):
+        """更新配置（缓存保留；线程数变化时之后的提取使用新的线程池）"""
+        with self._lock:
+            self.chunk_bytes = max(1024, chunk_bytes)
+            self.max_bytes = max_bytes
+            self.max_decoded_bytes = max_decoded_bytes
+            self.cache_size = cache_size
+            while len(self._cache) > cache_size:
+                self._cache.popitem(last=False)
+            if max(1, workers) != self.workers:
+                self.workers = max(1, workers)
+                executor, self._executor = self._executor, None
+                if executor is not None:
+                    executor.shutdown(wait=False)
+
+    def _cached(self, etag: str) -> Optional[DocumentText]:
+        if not etag:
+            return None
+        with self._lock:
+            document = self._cache.get(etag)
+            if document is not None:
+                self._cache.move_to_end(etag)
+            return document
+
+    def _remember(self, document: DocumentText):
+        if not document.etag or self.cache_size <= 0:
+            return
+        with self._lock:
+            previous = self._cache.get(document.etag)
+            # 提前停止得到的部分文本不覆盖读取更多页面的结果
+            if previous is not None and len(previous.pages) > len(document.pages) and not document.complete:
+                return
+            self._cache[document.etag] = document
+            self._cache.move_to_end(document.etag)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def extract(self, key: str, etag: str, size: int, read_range: RangeReader,
+                terms: Optional[Dict[str, str]] = None) -> Tuple[DocumentText, bool]:
+        """
+        提取一个 PDF 的文本
+
+        Args:
+            key: 对象键
+            etag: 对象 ETag（缓存键）
+            size: 对象大小（为 0 时按 max_bytes 读取到文件末尾）
+            read_range: 读取字节范围的函数
+            terms: 检索词（名称 -> 文本）；全部找到后停止读取
+
+        Returns:
+            (文档文本, 是否来自缓存)
+        """
+        terms = {name: term for name, term in (terms or {}).items() if term}
+        cached = self._cached(etag)
+        if cached is not None and (cached.complete or len(cached.find(terms)) == len(terms)):
+            with self._lock:
+                self._metrics["cache_hits"] += 1
+            return cached, True
+
+        document = self._stream(key, etag, size, read_range, terms)
+        self._remember(document)
+        return document, False
+
+    def _stream(self, key: str, etag: str, size: int, read_range: RangeReader,
+                terms: Dict[str, str]) -> DocumentText:
+        pdf = _PdfDocument(self.max_decoded_bytes)
+        executor = self._get_executor()
+        futures, texts = {}, {}
+        limit = min(size, self.max_bytes) if size else self.max_bytes
+        offset, gets, stopped = 0, 0, False
+        result = DocumentText(key=key, etag=etag)
+
+        def submit(pages):
+            for index, contents, fonts in pages:
+                # 每个页面任务携带调用方上下文的副本（用量记账、配置快照）
+                futures[index] = executor.submit(contextvars.copy_context().run, _page_text, contents, fonts)
+
+        def collect(block: bool):
+            done = [index for index, future in futures.items() if block or future.done()]
+            for index in done:
+                texts[index] = futures.pop(index).result()
+
+        def all_found() -> bool:
+            pages = DocumentText(key, etag, [texts[index] for index in sorted(texts)])
+            return bool(terms) and len(pages.find(terms)) == len(terms)
+
+        try:
+            while offset < limit:
+                data = read_range(offset, min(offset + self.chunk_bytes, limit) - 1)
+                gets += 1
+                if not data:
+                    break
+                if offset == 0 and b"%PDF-" not in data[:1024]:
+                    result.is_pdf = False
+                    offset += len(data)
+                    break
+                offset += len(data)
+                submit(pdf.feed(data))
+                # 需要判断是否提前停止时等待本块的页面提取完成（同一块中的多个页面并行提取）
+                collect(block=bool(terms))
+                if all_found():
+                    stopped = offset < limit
+                    break
+            if not stopped:
+                submit(pdf.finish())
+            collect(block=True)
+        except PdfTooLarge as e:
+            # 不提取文本，按读取完成缓存，相同 ETag 不再重复解压
+            result.too_large = True
+            logger.warning(f"PDF 解压后超过上限，跳过该文档: {key}: {str(e)}")
+        finally:
+            for future in futures.values():
+                future.cancel()
+            if futures:
+                wait(list(futures.values()))
+
+        result.pages = [] if result.too_large else [texts[index] for index in sorted(texts)]
+        result.bytes_read = offset
+        result.complete = not stopped
+        with self._lock:
+            self._metrics["documents"] += 1
+            self._metrics["pages"] += len(result.pages)
+            self._metrics["ranged_gets"] += gets
+            self._metrics["bytes_read"] += offset
+            self._metrics["stopped_early"] += int(stopped)
+            self._metrics["too_large"] += int(result.too_large)
+        if stopped:
+            logger.info(f"PDF 文本提取提前结束（已找到全部检索词）: {key}, 读取 {offset}/{size} 字节")
+        return result
+
+    def find_evidence(self, objects: List[Dict[str, Any]], read_range: Callable[[str, int, int], bytes],
+                      terms: Dict[str, str], max_documents: int = 10) -> Dict[str, Any]:
+        """
+        在文件夹的 PDF 中查找检索词（证书、简历优先），全部找到后不再读取其他文档
+
+        Args:
+            objects: 列表结果中的对象（key、etag、size）
+            read_range: 读取对象字节范围的函数 read_range(key, start, end)
+            terms: 检索词（名称 -> 文本），如 {"name": "张三", "hospital": "北京协和医院"}
+            max_documents: 最多读取的 PDF 数量
+
+        Returns:
+            每个检索词所在的文档和页码，以及读取统计
+        """
+        terms = {name: term for name, term in terms.items() if term}
+        pdfs = [obj for obj in objects if obj["key"].lower().endswith(".pdf")]
+        pdfs.sort(key=_document_priority)
+        found: Dict[str, Dict[str, Any]] = {}
+        documents_read = cache_hits = bytes_read = too_large = errors = 0
+        for obj in pdfs[:max_documents]:
+            remaining = {name: term for name, term in terms.items() if name not in found}
+            if not remaining:
+                break
+            key = obj["key"]
+            try:
+                document, cached = self.extract(key, obj.get("etag", ""), obj.get("size", 0),
+                                                lambda start, end, key=key: read_range(key, start, end),
+                                                remaining)
+            except Exception as e:
+                logger.warning(f"读取 PDF 文本失败: {key}: {e}")
+                errors += 1
+                with self._lock:
+                    self._metrics["errors"] += 1
+                continue
+            documents_read += 1
+            cache_hits += int(cached)
+            bytes_read += 0 if cached else document.bytes_read
+            too_large += int(document.too_large)
+            for name, index in document.find(remaining).items():
+                found[name] = {"document": key, "page": index + 1}
+
+        return {
+            "found": found,
+            "all_found": bool(terms) and len(found) == len(terms),
+            "pdf_count": len(pdfs),
+            "documents_read": documents_read,
+            "cache_hits": cache_hits,
+            "bytes_read": bytes_read,
+            "too_large": too_large,
+            "errors": errors
+        }
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pdf-text")
+            return self._executor
+
+    def clear_cache(self):
+        """清空 ETag 缓存"""
+        with self._lock:
+            self._cache.clear()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """提取的文档和页面数量、Range GET 次数、读取字节数、解压超过上限跳过的文档数和缓存命中"""
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics["cache_entries"] = len(self._cache)
+        lookups = metrics["documents"] + metrics["cache_hits"]
+        metrics["cache_hit_rate"] = round(metrics["cache_hits"] / lookups, 4) if lookups else 0.0
+        return metrics
+
+
+def _document_priority(obj: Dict[str, Any]) -> Tuple[int, int]:
+    category = categorize(obj["key"])
+    rank = _CATEGORY_PRIORITY.index(category) if category in _CATEGORY_PRIORITY else len(_CATEGORY_PRIORITY)
+    return rank, obj.get("size", 0)
+
+
+# 全局提取器
+_extractor = PdfTextExtractor()
+
+
+def configure_pdf_text_extractor(chunk_bytes: int = 262144, max_bytes: int = 8388608, workers: int = 4,
+                                 cache_size: int = 1000, max_decoded_bytes: int = 67108864) -> PdfTextExtractor:
+    """按 [PDF_EVIDENCE] 配置更新全局提取器"""
+    _extractor.configure(chunk_bytes, max_bytes, workers, cache_size, max_decoded_bytes)
+    return _extractor
+
+
+def get_pdf_text_extractor() -> PdfTextExtractor:
+    """获取全局提取器"""
+    return _extractor
@@ -6,7 +6,8 @@ SpeakerValidationPreCheckSystem 演示
 
 import os
 import sys
-from speaker_validation_tools import perform_preaudit, check_string_content
+from speaker_validation_tools import run_preaudit, check_string_content
+from preaudit_result import VERDICT_PASS, VERDICT_PARTIAL_PASS
 
 def demo_speaker_validation():
     """演示讲者身份验证功能"""
@@ -90,28 +91,30 @@ def demo_speaker_validation():
             
             # 执行完整预审流程
             print("   🔄 执行完整预审流程...")
-            preaudit_result = perform_preaudit(test_case['content'])
+            preaudit_result = run_preaudit(test_case['content'])
             
-            # 显示预审结果摘要
-            if "预审通过" in preaudit_result:
+            # 显示预审结果摘要（直接读取结构化结论，无需解析报告文本）
+            if preaudit_result.verdict == VERDICT_PASS:
                 print("   🎉 预审结果: ✅ 通过")
-            elif "预审部分通过" in preaudit_result:
+            elif preaudit_result.verdict == VERDICT_PARTIAL_PASS:
                 print("   ⚠️  预审结果: 🔶 部分通过")
             else:
                 print("   ❌ 预审结果: ❌ 不通过")
             
             # 提取关键信息
-            if "网络搜索验证通过" in preaudit_result:
+            verification = preaudit_result.verification
+            if verification.get("method") == "exa_search" and verification.get("passed"):
                 print("   🌐 网络验证: ✅ 通过")
-            elif "网络搜索验证失败" in preaudit_result:
+            elif verification.get("method") == "exa_search_failed":
                 print("   🌐 网络验证: ❌ 失败")
-            elif "内部验证流程" in preaudit_result:
+            elif verification.get("method") == "direct_pass":
                 print("   🔒 内部验证: ✅ 通过")
             
-            if "支撑文档数量充足" in preaudit_result:
-                print("   📁 文档验证: ✅ 充足")
-            elif "支撑文档不足" in preaudit_result:
-                print("   📁 文档验证: ❌ 不足")
+            if preaudit_result.folder and preaudit_result.folder.exists:
+                if preaudit_result.file_count > preaudit_result.min_file_count:
+                    print("   📁 文档验证: ✅ 充足")
+                else:
+                    print("   📁 文档验证: ❌ 不足")
             
         except Exception as e:
             print(f"   ❌ 测试失败: {str(e)}")
@@ -0,0 +1,834 @@
+#!/usr/bin/env python3
+"""
+讲者照片感知哈希索引模块
+为各讲者文件夹（姓名-医院-科室/）中的图片计算 64 位感知哈希（DCT pHash），存入多索引哈希表，
+按汉明距离的近似查找只比较少量候选；同一张照片（缩放、重新压缩后）出现在不同“医生”的文件夹中是冒用照片的信号。
+哈希按 ETag 缓存，内容未变化的图片不会被重复读取；后台索引器按间隔扫描整个存储桶。
+安装 Pillow 时用它解码图片，否则使用内置的 PNG 解码器和基线 JPEG 解码器（只解码 DC 系数，得到 1/8 尺寸的灰度图）
+"""
+
+import io
+import itertools
+import logging
+import math
+import re
+import statistics
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from folder_profiler import IMAGE_FORMATS, format_from_name
+
+# 尝试导入 Pillow，如果失败则使用内置的 PNG / JPEG 解码器
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# 计算哈希前缩放到的边长（像素）
+THUMBNAIL_SIZE = 32
+# 取左上角 HASH_SIZE x HASH_SIZE 个低频 DCT 系数，得到 64 位哈希
+HASH_SIZE = 8
+# 灰度标准差低于该值的图片视为纯色（占位图、空白扫描件），不建立索引，以免彼此误判为重复
+FLAT_CONTRAST = 2.0
+# 内置解码器接受的最大像素数（与 Pillow 的 MAX_IMAGE_PIXELS 作用相同）：图片由医药代表上传，
+# 很小的文件可以声明极大的尺寸，按声明的尺寸解码会耗尽内存
+MAX_IMAGE_PIXELS = 16777216
+
+ImageFetcher = Callable[[str], bytes]
+
+
+# ---- 内置解码器 ----
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# PNG 颜色类型 -> 每像素字节数（位深 8）
+_PNG_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+
+def _luma(r: int, g: int, b: int) -> float:
+    return (299 * r + 587 * g + 114 * b) / 1000
+
+
+def _paeth(a: int, b: int, c: int) -> int:
+    p = a + b - c
+    pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+    if pa <= pb and pa <= pc:
+        return a
+    return b if pb <= pc else c
+
+
+def _unfilter(raw: bytes, stride: int, height: int, bpp: int) -> List[bytearray]:
+    """还原 PNG 逐行过滤（None/Sub/Up/Average/Paeth）"""
+    rows = []
+    previous = bytearray(stride)
+    pos = 0
+    for _ in range(height):
+        kind = raw[pos]
+        row = bytearray(raw[pos + 1:pos + 1 + stride])
+        pos += 1 + stride
+        if len(row) != stride:
+            raise ValueError("PNG 数据不完整")
+        if kind == 1:
+            for i in range(bpp, stride):
+                row[i] = (row[i] + row[i - bpp]) & 0xFF
+        elif kind == 2:
+            row = bytearray((a + b) & 0xFF for a, b in zip(row, previous))
+        elif kind == 3:
+            for i in range(stride):
+                left = row[i - bpp] if i >= bpp else 0
+                row[i] = (row[i] + (left + previous[i]) // 2) & 0xFF
+        elif kind == 4:
+            for i in range(stride):
+                left = row[i - bpp] if i >= bpp else 0
+                upper_left = previous[i - bpp] if i >= bpp else 0
+                row[i] = (row[i] + _paeth(left, previous[i], upper_left)) & 0xFF
+        elif kind != 0:
+            raise ValueError(f"未知的 PNG 过滤类型: {kind}")
+        rows.append(row)
+        previous = row
+    return rows
+
+
+def decode_png(data: bytes) -> Optional[Tuple[int, int, List[float]]]:
+    """
+    解码 8 位非隔行 PNG 为灰度图
+
+    Returns:
+        (宽, 高, 按行排列的灰度值)；不支持的 PNG（16 位、隔行扫描等）返回 None
+
+    Raises:
+        ValueError: 数据不完整或像素数超过 MAX_IMAGE_PIXELS
+    """
+    if not data.startswith(_PNG_SIGNATURE):
+        return None
+    header = palette = None
+    idat = []
+    pos = len(_PNG_SIGNATURE)
+    while pos + 8 <= len(data):
+        length, kind = struct.unpack(">I4s", data[pos:pos + 8])
+        chunk = data[pos + 8:pos + 8 + length]
+        pos += 12 + length
+        if kind == b"IHDR":
+            header = struct.unpack(">IIBBBBB", chunk[:13])
+        elif kind == b"PLTE":
+            palette = chunk
+        elif kind == b"IDAT":
+            idat.append(chunk)
+        elif kind == b"IEND":
+            break
+    if header is None:
+        return None
+    width, height, depth, color, _, _, interlace = header
+    if depth != 8 or interlace or color not in _PNG_CHANNELS or (color == 3 and palette is None):
+        return None
+
+    if width * height > MAX_IMAGE_PIXELS:
+        raise ValueError(f"PNG 尺寸过大: {width}x{height}")
+
+    channels = _PNG_CHANNELS[color]
+    # 解压输出不超过按尺寸算出的过滤后数据大小（每行一个过滤类型字节）
+    raw = zlib.decompressobj().decompress(b"".join(idat), height * (width * channels + 1))
+    rows = _unfilter(raw, width * channels, height, channels)
+    pixels: List[float] = []
+    for row in rows:
+        if color == 0:
+            pixels.extend(row)
+        elif color == 4:
+            pixels.extend(row[0::2])
+        elif color == 3:
+            pixels.extend(_luma(palette[3 * i], palette[3 * i + 1], palette[3 * i + 2]) for i in row)
+        else:
+            pixels.extend(map(_luma, row[0::channels], row[1::channels], row[2::channels]))
+    return width, height, pixels
+
+
+# 基线（顺序、哈夫曼编码）JPEG；渐进式和算术编码的 JPEG 不支持
+_SOF_BASELINE = frozenset({0xC0, 0xC1})
+_SOF_UNSUPPORTED = frozenset({0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF})
+# 熵编码数据在第一个非填充（FF00）、非重启（FFD0-FFD7）的标记处结束
+_SCAN_END = re.compile(rb"\xff[^\x00\xd0-\xd7]")
+_RESTART = re.compile(rb"\xff[\xd0-\xd7]")
+_INVALID_CODE = (16, None)
+
+
+def _huffman_table(counts: bytes, symbols: bytes) -> List[Tuple[int, Optional[int]]]:
+    """规范哈夫曼码 -> 以接下来 16 位为下标的查找表（码长, 符号）"""
+    table = [_INVALID_CODE] * 65536
+    code = index = 0
+    for length in range(1, 17):
+        span_bits = 16 - length
+        for _ in range(counts[length - 1]):
+            start = code << span_bits
+            table[start:start + (1 << span_bits)] = [(length, symbols[index])] * (1 << span_bits)
+            code += 1
+            index += 1
+        code <<= 1
+    return table
+
+
+def decode_jpeg(data: bytes) -> Optional[Tuple[int, int, List[float]]]:
+    """
+    解码基线 JPEG 亮度分量的 DC 系数（每个 8x8 块的平均亮度）
+
+    感知哈希只需要 32x32 的缩略图，DC 系数组成的 1/8 尺寸图像已经足够；
+    AC 系数只解码码字以便跳过，不做反 DCT
+
+    Returns:
+        (宽, 高, 按行排列的灰度值)，尺寸为原图的 1/8；渐进式等不支持的 JPEG 返回 None
+    """
+    if not data.startswith(b"\xff\xd8"):
+        return None
+    quant: Dict[int, int] = {}
+    dc_tables: Dict[int, list] = {}
+    ac_tables: Dict[int, list] = {}
+    frame = None
+    restart_interval = 0
+    pos = 2
+    while pos + 4 <= len(data):
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        if marker == 0xFF:
+            pos += 1
+            continue
+        if marker == 0xD9:
+            return None
+        length = struct.unpack(">H", data[pos + 2:pos + 4])[0]
+        segment = data[pos + 4:pos + 2 + length]
+        pos += 2 + length
+        if marker == 0xDB:
+            i = 0
+            while i < len(segment):
+                precision, table_id = segment[i] >> 4, segment[i] & 15
+                # 只需要 DC 量化值（第一个系数）
+                quant[table_id] = struct.unpack(">H", segment[i + 1:i + 3])[0] if precision else segment[i + 1]
+                i += 1 + (128 if precision else 64)
+        elif marker == 0xC4:
+            i = 0
+            while i < len(segment):
+                table_class, table_id = segment[i] >> 4, segment[i] & 15
+                counts = segment[i + 1:i + 17]
+                symbols = segment[i + 17:i + 17 + sum(counts)]
+                (ac_tables if table_class else dc_tables)[table_id] = _huffman_table(counts, symbols)
+                i += 17 + len(symbols)
+        elif marker == 0xDD:
+            restart_interval = struct.unpack(">H", segment[:2])[0]
+        elif marker in _SOF_BASELINE:
+            _, height, width, count = struct.unpack(">BHHB", segment[:6])
+            if width * height > MAX_IMAGE_PIXELS:
+                raise ValueError(f"JPEG 尺寸过大: {width}x{height}")
+            components = [(segment[6 + 3 * k], segment[7 + 3 * k] >> 4, segment[7 + 3 * k] & 15, segment[8 + 3 * k])
+                          for k in range(count)]
+            frame = (width, height, components)
+        elif marker in _SOF_UNSUPPORTED:
+            return None
+        elif marker == 0xDA:
+            if frame is None:
+                return None
+            end = _SCAN_END.search(data, pos)
+            scan = data[pos:end.start() if end else len(data)]
+            selectors = [(segment[1 + 2 * k], segment[2 + 2 * k] >> 4, segment[2 + 2 * k] & 15)
+                         for k in range(segment[0])]
+            if any(selector[0] == frame[2][0][0] for selector in selectors):
+                return _decode_dc(scan, frame, selectors, quant, dc_tables, ac_tables, restart_interval)
+            pos = end.start() if end else len(data)
+    return None
+
+
+def _decode_dc(scan: bytes, frame, selectors, quant: Dict[int, int], dc_tables: Dict[int, list],
+               ac_tables: Dict[int, list], restart_interval: int) -> Tuple[int, int, List[float]]:
+    """解码一次扫描中亮度分量每个块的 DC 系数"""
+    width, height, components = frame
+    by_id = {component[0]: component for component in components}
+    h_max = max(component[1] for component in components)
+    v_max = max(component[2] for component in components)
+    luma_id, luma_h, luma_v, luma_quant = components[0]
+    tables = [(dc_tables[dc_id], ac_tables[ac_id]) for _, dc_id, ac_id in selectors]
+    luma_index = next(k for k, selector in enumerate(selectors) if selector[0] == luma_id)
+    # 亮度分量实际覆盖的块数
+    blocks_x = math.ceil(math.ceil(width * luma_h / h_max) / 8)
+    blocks_y = math.ceil(math.ceil(height * luma_v / v_max) / 8)
+
+    if len(selectors) == 1:
+        # 非交错扫描：每个 MCU 只有一个块，按分量自身的块网格排列
+        mcus_x, mcus_y = blocks_x, blocks_y
+        units = [(0, 0, 0)]
+        grid_x, grid_y = mcus_x, mcus_y
+    else:
+        mcus_x = math.ceil(width / (8 * h_max))
+        mcus_y = math.ceil(height / (8 * v_max))
+        units = [(k, bx, by) for k, selector in enumerate(selectors)
+                 for by in range(by_id[selector[0]][2]) for bx in range(by_id[selector[0]][1])]
+        grid_x, grid_y = mcus_x * luma_h, mcus_y * luma_v
+    interleaved = len(selectors) > 1
+    grid = [128.0] * (grid_x * grid_y)
+    scale = quant.get(luma_quant, 1) / 8
+
+    total = mcus_x * mcus_y
+    mcu = 0
+    for segment in (_RESTART.split(scan) if restart_interval else [scan]):
+        bits = segment.replace(b"\xff\x00", b"\xff") + b"\x00" * 8
+        pos = 0
+        predictions = [0] * len(selectors)
+        for _ in range(min(restart_interval or total, total - mcu)):
+            mcu_x, mcu_y = mcu % mcus_x, mcu // mcus_x
+            for k, bx, by in units:
+                dc_table, ac_table = tables[k]
+                # DC：哈夫曼码给出差值的位数，随后是差值本身
+                offset = pos & 7
+                window = int.from_bytes(bits[pos >> 3:(pos >> 3) + 5], "big")
+                length, size = dc_table[(window >> (24 - offset)) & 0xFFFF]
+                if size is None:
+                    raise ValueError("无效的 JPEG 哈夫曼码")
+                diff = 0
+                if size:
+                    diff = (window >> (40 - offset - length - size)) & ((1 << size) - 1)
+                    if diff < 1 << (size - 1):
+                        diff -= (1 << size) - 1
+                pos += length + size
+                predictions[k] += diff
+                if k == luma_index:
+                    x = mcu_x * luma_h + bx if interleaved else mcu_x
+                    y = mcu_y * luma_v + by if interleaved else mcu_y
+                    grid[y * grid_x + x] = 128 + predictions[k] * scale
+                # AC：只跳过码字和数值位
+                index = 1
+                while index < 64:
+                    offset = pos & 7
+                    window = int.from_bytes(bits[pos >> 3:(pos >> 3) + 3], "big")
+                    length, symbol = ac_table[(window >> (8 - offset)) & 0xFFFF]
+                    if symbol is None:
+                        raise ValueError("无效的 JPEG 哈夫曼码")
+                    size = symbol & 15
+                    pos += length + size
+                    if size:
+                        index += (symbol >> 4) + 1
+                    elif symbol == 0xF0:
+                        index += 16
+                    else:
+                        break
+            mcu += 1
+        if mcu >= total:
+            break
+
+    pixels = [grid[y * grid_x + x] for y in range(blocks_y) for x in range(blocks_x)]
+    return blocks_x, blocks_y, pixels
+
+
+def _resize(pixels: List[float], width: int, height: int, size: int) -> List[float]:
+    """按区域平均缩放灰度图（源图小于目标尺寸时取最近的像素）"""
+    thumbnail = []
+    for ty in range(size):
+        y0 = ty * height // size
+        y1 = max(y0 + 1, (ty + 1) * height // size)
+        for tx in range(size):
+            x0 = tx * width // size
+            x1 = max(x0 + 1, (tx + 1) * width // size)
+            total = 0.0
+            for y in range(y0, y1):
+                total += sum(pixels[y * width + x0:y * width + x1])
+            thumbnail.append(total / ((y1 - y0) * (x1 - x0)))
+    return thumbnail
+
+
+def grayscale_thumbnail(data: bytes, size: int = THUMBNAIL_SIZE) -> Optional[List[float]]:
+    """将图片解码并缩放为 size x size 的灰度缩略图；无法解码时返回 None"""
+    if PIL_AVAILABLE:
+        try:
+            image = Image.open(io.BytesIO(data))
+            # JPEG 解码时直接按 DCT 缩放，不解码完整尺寸
+            image.draft("L", (size * 2, size * 2))
+            return [float(value) for value in image.convert("L").resize((size, size), Image.BOX).getdata()]
+        except Exception:
+            return None
+    if data.startswith(_PNG_SIGNATURE):
+        decoder = decode_png
+    elif data.startswith(b"\xff\xd8"):
+        decoder = decode_jpeg
+    else:
+        return None
+    try:
+        decoded = decoder(data)
+    except (ValueError, IndexError, KeyError, StopIteration, struct.error, zlib.error):
+        return None
+    if decoded is None or not decoded[0] or not decoded[1]:
+        return None
+    width, height, pixels = decoded
+    return _resize(pixels, width, height, size)
+
+
+# ---- 感知哈希 ----
+
+_DCT_BASIS = [[math.cos((2 * x + 1) * u * math.pi / (2 * THUMBNAIL_SIZE)) for x in range(THUMBNAIL_SIZE)]
+              for u in range(HASH_SIZE)]
+
+
+def perceptual_hash(thumbnail: List[float]) -> Optional[int]:
+    """
+    计算 64 位 DCT 感知哈希：对缩略图做二维 DCT，低频系数高于中位数的位置为 1
+
+    缩放、重新压缩和轻微调色不改变低频结构，哈希的汉明距离很小；纯色图片返回 None
+    """
+    n = THUMBNAIL_SIZE
+    if statistics.pstdev(thumbnail) < FLAT_CONTRAST:
+        return None
+    rows = [[sum(c * p for c, p in zip(basis, thumbnail[y * n:(y + 1) * n])) for basis in _DCT_BASIS]
+            for y in range(n)]
+    coefficients = [sum(basis[y] * rows[y][u] for y in range(n)) for basis in _DCT_BASIS for u in range(HASH_SIZE)]
+    median = statistics.median(coefficients[1:])
+    value = 0
+    for coefficient in coefficients:
+        value = (value << 1) | (coefficient > median)
+    return value
+
+
+def image_hash(data: bytes) -> Optional[int]:
+    """图片内容的感知哈希；无法解码或纯色图片返回 None"""
+    thumbnail = grayscale_thumbnail(data)
+    return perceptual_hash(thumbnail) if thumbnail is not None else None
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class MultiIndexHash:
+    """
+    多索引哈希表（按汉明距离近似查找）
+
+    64 位哈希分成 chunks 段，每段一张精确匹配的表。两个哈希的距离不超过 r 时，
+    至少有一段的距离不超过 r // chunks（鸽巢原理），因此查找时只需在每段枚举距离不超过
+    r // chunks 的取值，再对取出的少量候选计算完整距离，不需要扫描全部哈希
+    """
+
+    def __init__(self, bits: int = HASH_SIZE * HASH_SIZE, chunks: int = 4):
+        self.chunks = chunks
+        self.chunk_bits = bits // chunks
+        self._mask = (1 << self.chunk_bits) - 1
+        self._tables: List[Dict[int, Set[int]]] = [{} for _ in range(chunks)]
+        self._values: Set[int] = set()
+        self._flip_masks: Dict[int, List[int]] = {}
+        self.comparisons = 0
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def _parts(self, value: int) -> List[int]:
+        return [(value >> (i * self.chunk_bits)) & self._mask for i in range(self.chunks)]
+
+    def _flips(self, radius: int) -> List[int]:
+        """一段内距离不超过 radius 的全部异或掩码"""
+        masks = self._flip_masks.get(radius)
+        if masks is None:
+            masks = [sum(1 << bit for bit in bits)
+                     for count in range(radius + 1) for bits in itertools.combinations(range(self.chunk_bits), count)]
+            self._flip_masks[radius] = masks
+        return masks
+
+    def add(self, value: int) -> bool:
+        """插入一个哈希，已存在时返回 False"""
+        if value in self._values:
+            return False
+        self._values.add(value)
+        for table, part in zip(self._tables, self._parts(value)):
+            table.setdefault(part, set()).add(value)
+        return True
+
+    def remove(self, value: int) -> bool:
+        """删除一个哈希，不存在时返回 False"""
+        if value not in self._values:
+            return False
+        self._values.discard(value)
+        for table, part in zip(self._tables, self._parts(value)):
+            bucket = table[part]
+            bucket.discard(value)
+            if not bucket:
+                del table[part]
+        return True
+
+    def search(self, value: int, max_distance: int) -> List[Tuple[int, int]]:
+        """查找与 value 距离不超过 max_distance 的哈希，返回 [(哈希, 距离)]"""
+        flips = self._flips(max_distance // self.chunks)
+        candidates: Set[int] = set()
+        for table, part in zip(self._tables, self._parts(value)):
+            for flip in flips:
+                bucket = table.get(part ^ flip)
+                if bucket:
+                    candidates |= bucket
+        self.comparisons += len(candidates)
+        matches = []
+        for candidate in candidates:
+            distance = hamming(value, candidate)
+            if distance <= max_distance:
+                matches.append((candidate, distance))
+        return matches
+
+
+# ---- 索引 ----
+
+def folder_of(key: str) -> str:
+    """对象所在的讲者文件夹前缀"""
+    return key[:key.rfind("/") + 1]
+
+
+def is_photo(key: str) -> bool:
+    return format_from_name(key) in IMAGE_FORMATS
+
+
+@dataclass(slots=True)
+class PhotoMatch:
+    """在其他讲者文件夹中找到的近似重复照片"""
+    key: str
+    other_key: str
+    other_folder: str
+    distance: int
+
+
+@dataclass(slots=True)
+class IndexStats:
+    """一次索引的统计"""
+    photos: int = 0
+    # 读取并计算哈希的图片数
+    hashed: int = 0
+    # ETag 未变化、不需要处理的图片数
+    unchanged: int = 0
+    # 其他位置有相同 ETag、直接使用缓存哈希的图片数
+    etag_hits: int = 0
+    undecodable: int = 0
+    too_large: int = 0
+    errors: int = 0
+    removed: int = 0
+    bytes_read: int = 0
+    # 没有哈希（无法解码、纯色、过大或读取失败）的图片
+    unindexed: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass(slots=True)
+class PhotoCheck:
+    """一个讲者文件夹的照片复用检查结果"""
+    photos: int
+    hashed: int
+    unindexed: List[str]
+    matches: List[PhotoMatch]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "photos": self.photos,
+            "hashed": self.hashed,
+            "unindexed": self.unindexed,
+            "matches": [asdict(match) for match in self.matches],
+            "reused_elsewhere": bool(self.matches)
+        }
+
+
+_MISSING = object()
+
+
+class PhotoIndex:
+    """
+    全部讲者文件夹中图片的感知哈希索引（线程安全）
+
+    - (存储桶, 键) -> (ETag, 哈希)：ETag 未变化的图片不重复读取
+    - ETag -> 哈希（LRU）：同一文件复制到其他位置时不重复读取
+    - 多索引哈希表 + 哈希 -> 持有该哈希的图片：近似查找；没有图片持有的哈希从表中删除
+    """
+
+    def __init__(self, max_distance: int = 8, max_image_bytes: int = 20971520, cache_size: int = 100000):
+        self._lock = threading.Lock()
+        self._hashes = MultiIndexHash()
+        self._holders: Dict[int, Set[Tuple[str, str]]] = {}
+        self._photos: Dict[Tuple[str, str], Tuple[str, Optional[int]]] = {}
+        self._etag_hashes: "OrderedDict[str, Optional[int]]" = OrderedDict()
+        self._metrics = {"hashed": 0, "bytes_read": 0, "etag_hits": 0, "undecodable": 0, "errors": 0,
+                         "lookups": 0, "matches": 0}
+        self.configure(max_distance, max_image_bytes, cache_size)
+
+    def configure(self, max_distance: int = 8, max_image_bytes: int = 20971520, cache_size: int = 100000):
+        """更新近似距离上限、图片大小上限和 ETag 缓存大小（已建立的索引保留）"""
+        with self._lock:
+            self.max_distance = max(0, max_distance)
+            self.max_image_bytes = max(1, max_image_bytes)
+            self.cache_size = max(1, cache_size)
+            while len(self._etag_hashes) > self.cache_size:
+                self._etag_hashes.popitem(last=False)
+
+    def _lookup_etag(self, etag: str):
+        if not etag:
+            return _MISSING
+        with self._lock:
+            value = self._etag_hashes.get(etag, _MISSING)
+            if value is not _MISSING:
+                self._etag_hashes.move_to_end(etag)
+                self._metrics["etag_hits"] += 1
+            return value
+
+    def _store(self, bucket: str, key: str, etag: str, value: Optional[int]):
+        with self._lock:
+            self._discard((bucket, key))
+            self._photos[(bucket, key)] = (etag, value)
+            if value is not None:
+                self._holders.setdefault(value, set()).add((bucket, key))
+                self._hashes.add(value)
+            if etag:
+                self._etag_hashes[etag] = value
+                self._etag_hashes.move_to_end(etag)
+                while len(self._etag_hashes) > self.cache_size:
+                    self._etag_hashes.popitem(last=False)
+
+    def _discard(self, photo: Tuple[str, str]) -> bool:
+        """从索引中删除一张图片（调用方持有锁）"""
+        previous = self._photos.pop(photo, None)
+        if previous is None:
+            return False
+        value = previous[1]
+        if value is not None:
+            holders = self._holders.get(value)
+            if holders is not None:
+                holders.discard(photo)
+                if not holders:
+                    del self._holders[value]
+                    self._hashes.remove(value)
+        return True
+
+    def index_objects(self, bucket: str, objects: Iterable[Dict[str, Any]], fetch_image: ImageFetcher,
+                      prefix: Optional[str] = None) -> IndexStats:
+        """
+        为列表结果中的图片建立索引（只读取 ETag 变化且没有缓存哈希的图片）
+
+        Args:
+            bucket: 存储桶
+            objects: 列表结果中的对象（key、etag、size），可以是迭代器
+            fetch_image: 读取图片全部内容的函数 fetch_image(key)
+            prefix: objects 是该前缀下的完整列表时指定，索引中该前缀下已不存在的图片会被删除
+        """
+        stats = IndexStats()
+        listed = set()
+        for obj in objects:
+            key = obj["key"]
+            if not is_photo(key):
+                continue
+            listed.add(key)
+            stats.photos += 1
+            etag = obj.get("etag", "")
+            with self._lock:
+                current = self._photos.get((bucket, key))
+            if current is not None and etag and current[0] == etag:
+                stats.unchanged += 1
+                if current[1] is None:
+                    stats.unindexed.append(key)
+                continue
+            value = self._lookup_etag(etag)
+            if value is not _MISSING:
+                stats.etag_hits += 1
+            elif obj.get("size", 0) > self.max_image_bytes:
+                stats.too_large += 1
+                value = None
+            else:
+                try:
+                    data = fetch_image(key)
+                except Exception as e:
+                    logger.warning(f"读取图片失败: {key}: {str(e)}")
+                    stats.errors += 1
+                    stats.unindexed.append(key)
+                    with self._lock:
+                        self._metrics["errors"] += 1
+                    continue
+                value = image_hash(data)
+                stats.hashed += 1
+                stats.bytes_read += len(data)
+                with self._lock:
+                    self._metrics["hashed"] += 1
+                    self._metrics["bytes_read"] += len(data)
+                    if value is None:
+                        self._metrics["undecodable"] += 1
+                if value is None:
+                    stats.undecodable += 1
+            if value is None:
+                stats.unindexed.append(key)
+            self._store(bucket, key, etag, value)
+
+        if prefix is not None:
+            with self._lock:
+                vanished = [photo for photo in self._photos
+                            if photo[0] == bucket and photo[1].startswith(prefix) and photo[1] not in listed]
+                for photo in vanished:
+                    self._discard(photo)
+            stats.removed = len(vanished)
+        return stats
+
+    def find_reused(self, bucket: str, keys: Iterable[str], max_distance: Optional[int] = None) -> List[PhotoMatch]:
+        """查找这些图片在其他讲者文件夹中的近似重复（只查已建立索引的图片）"""
+        if max_distance is None:
+            max_distance = self.max_distance
+        matches = []
+        with self._lock:
+            for key in keys:
+                entry = self._photos.get((bucket, key))
+                if entry is None or entry[1] is None:
+                    continue
+                self._metrics["lookups"] += 1
+                folder = folder_of(key)
+                for value, distance in self._hashes.search(entry[1], max_distance):
+                    for other_bucket, other_key in sorted(self._holders.get(value, ())):
+                        if other_bucket == bucket and folder_of(other_key) != folder:
+                            matches.append(PhotoMatch(key, other_key, folder_of(other_key), distance))
+            self._metrics["matches"] += len(matches)
+        matches.sort(key=lambda match: (match.key, match.distance, match.other_key))
+        return matches
+
+    def check_folder(self, bucket: str, prefix: str, objects: List[Dict[str, Any]],
+                     fetch_image: ImageFetcher) -> PhotoCheck:
+        """为讲者文件夹中新增或变化的图片建立索引，再查找在其他讲者文件夹中出现的照片"""
+        stats = self.index_objects(bucket, objects, fetch_image, prefix=prefix)
+        photos = [obj["key"] for obj in objects if is_photo(obj["key"])]
+        return PhotoCheck(photos=stats.photos, hashed=stats.hashed, unindexed=stats.unindexed,
+                          matches=self.find_reused(bucket, photos))
+
+    def remove(self, bucket: str, key: str) -> bool:
+        """从索引中删除一张图片"""
+        with self._lock:
+            return self._discard((bucket, key))
+
+    def clear(self):
+        """清空索引和 ETag 缓存"""
+        with self._lock:
+            self._hashes = MultiIndexHash()
+            self._holders.clear()
+            self._photos.clear()
+            self._etag_hashes.clear()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """索引的图片和哈希数量、读取次数和字节数、查找次数和平均比较次数"""
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics["photos"] = len(self._photos)
+            metrics["hashes"] = len(self._holders)
+            metrics["etag_cache_entries"] = len(self._etag_hashes)
+            comparisons = self._hashes.comparisons
+        metrics["decoder"] = "pillow" if PIL_AVAILABLE else "builtin"
+        metrics["comparisons_per_lookup"] = round(comparisons / metrics["lookups"], 2) if metrics["lookups"] else 0.0
+        return metrics
+
+
+class PhotoIndexer:
+    """后台索引器：按间隔列出整个存储桶，为新增和变化的图片计算哈希，删除已不存在的图片"""
+
+    def __init__(self, index: PhotoIndex, bucket: str, list_objects: Callable[[], Iterable[Dict[str, Any]]],
+                 fetch_image: ImageFetcher, interval_seconds: float = 3600.0):
+        """
+        Args:
+            index: 照片索引
+            bucket: 存储桶
+            list_objects: 列出存储桶全部对象（key、etag、size）的函数，可以返回迭代器
+            fetch_image: 读取图片全部内容的函数 fetch_image(key)
+            interval_seconds: 两次扫描的间隔（秒）
+        """
+        self.index = index
+        self.bucket = bucket
+        self.list_objects = list_objects
+        self.fetch_image = fetch_image
+        self.interval_seconds = interval_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._metrics: Dict[str, Any] = {"runs": 0, "failed_runs": 0, "last_run_seconds": None,
+                                         "last_run_at": None, "last_stats": None}
+
+    def run_once(self) -> IndexStats:
+        """扫描一次整个存储桶"""
+        started = time.monotonic()
+        stats = self.index.index_objects(self.bucket, self.list_objects(), self.fetch_image, prefix="")
+        elapsed = round(time.monotonic() - started, 3)
+        summary = stats.to_dict()
+        summary["unindexed"] = len(stats.unindexed)
+        self._metrics.update(runs=self._metrics["runs"] + 1, last_run_seconds=elapsed,
+                             last_run_at=time.time(), last_stats=summary)
+        logger.info(f"照片索引扫描完成: {self.bucket}, 图片 {stats.photos} 张, 计算哈希 {stats.hashed} 张, "
+                    f"未变化 {stats.unchanged} 张, 删除 {stats.removed} 张, 耗时 {elapsed}s")
+        return stats
+
+    def start(self):
+        """启动后台线程（立即扫描一次，之后按间隔扫描）"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="photo-indexer", daemon=True)
+        self._thread.start()
+        logger.info(f"照片索引器已启动: {self.bucket}（每 {self.interval_seconds}s 扫描一次）")
+
+    def stop(self):
+        """停止后台线程（进行中的扫描完成后退出）"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive() and not self._stop.is_set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                self._metrics["failed_runs"] += 1
+                logger.error(f"照片索引扫描失败: {str(e)}")
+            if self._stop.wait(self.interval_seconds):
+                break
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """扫描次数、最近一次扫描的耗时和统计"""
+        return dict(self._metrics, running=self.running, interval_seconds=self.interval_seconds)
+
+
+# 全局索引和后台索引器
+_index = PhotoIndex()
+_indexer: Optional[PhotoIndexer] = None
+_indexer_lock = threading.Lock()
+
+
+def configure_photo_index(max_distance: int = 8, max_image_bytes: int = 20971520,
+                          cache_size: int = 100000) -> PhotoIndex:
+    """按 [PHOTO_INDEX] 配置更新全局照片索引"""
+    _index.configure(max_distance, max_image_bytes, cache_size)
+    return _index
+
+
+def get_photo_index() -> PhotoIndex:
+    """获取全局照片索引"""
+    return _index
+
+
+def start_photo_indexer(bucket: str, list_objects: Callable[[], Iterable[Dict[str, Any]]],
+                        fetch_image: ImageFetcher, interval_seconds: float = 3600.0) -> PhotoIndexer:
+    """启动全局后台索引器（替换之前的索引器）"""
+    global _indexer
+    with _indexer_lock:
+        if _indexer is not None:
+            _indexer.stop()
+        _indexer = PhotoIndexer(_index, bucket, list_objects, fetch_image, interval_seconds)
+        _indexer.start()
+        return _indexer
+
+
+def stop_photo_indexer():
+    """停止全局后台索引器"""
+    global _indexer
+    with _indexer_lock:
+        if _indexer is not None:
+            _indexer.stop()
+            _indexer = None
+
+
+def get_photo_indexer() -> Optional[PhotoIndexer]:
+    """获取全局后台索引器（未启动时为 None）"""
+    return _indexer
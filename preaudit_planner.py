@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+预审阶段规划模块
+按阶段成本和短路（直接决定结论）概率排序执行：廉价且常短路的阶段先执行，
+一旦结论已确定，后续付费阶段直接跳过，并记录每个阶段的执行/跳过统计
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 短路概率的最小值，避免从未短路的阶段排序权重无穷大
+MIN_SHORT_CIRCUIT_RATE = 0.01
+
+
+class Stage:
+    """一个可规划的预审阶段"""
+
+    def __init__(self, name: str, run: Callable[[], bool]):
+        """
+        Args:
+            name: 阶段名称（需在规划器中注册成本）
+            run: 执行函数（execute_async 中为协程函数），返回 True 表示结论已确定（后续阶段可跳过）
+        """
+        self.name = name
+        self.run = run
+
+
+class _StageStats:
+    """单个阶段的成本估计和统计"""
+
+    def __init__(self, cost: float, short_circuit_rate: float):
+        self.cost = cost
+        self.short_circuit_rate = short_circuit_rate
+        self.runs = 0
+        self.short_circuits = 0
+        self.skipped = 0
+        self.total_seconds = 0.0
+
+
+class StagePlanner:
+    """按 成本 / 短路概率 升序安排阶段执行顺序"""
+
+    def __init__(self, smoothing: float = 0.1):
+        """
+        Args:
+            smoothing: 短路概率的指数加权平滑系数（0-1，越大越偏向最近的观测）
+        """
+        self.smoothing = smoothing
+        self._stats: Dict[str, _StageStats] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, cost: float, short_circuit_rate: float = 0.5):
+        """
+        注册阶段的相对成本和初始短路概率
+
+        Args:
+            name: 阶段名称
+            cost: 相对成本（综合延迟和费用，如 S3 LIST=1，EXA 搜索=50）
+            short_circuit_rate: 初始短路概率估计
+        """
+        with self._lock:
+            self._stats[name] = _StageStats(cost, short_circuit_rate)
+
+    def _priority(self, name: str) -> float:
+        stats = self._stats.get(name)
+        if stats is None:
+            return float('inf')
+        return stats.cost / max(stats.short_circuit_rate, MIN_SHORT_CIRCUIT_RATE)
+
+    def order(self, names: List[str]) -> List[str]:
+        """返回按优先级排序后的阶段名称（稳定排序，未注册阶段排在最后）"""
+        with self._lock:
+            return sorted(names, key=self._priority)
+
+    def record_run(self, name: str, short_circuited: bool, duration: float):
+        """记录一次阶段执行结果并更新短路概率"""
+        with self._lock:
+            stats = self._stats.setdefault(name, _StageStats(1.0, 0.5))
+            stats.runs += 1
+            stats.total_seconds += duration
+            if short_circuited:
+                stats.short_circuits += 1
+            observed = 1.0 if short_circuited else 0.0
+            stats.short_circuit_rate += self.smoothing * (observed - stats.short_circuit_rate)
+
+    def record_skip(self, name: str):
+        """记录一次因结论已确定而跳过的阶段"""
+        with self._lock:
+            stats = self._stats.setdefault(name, _StageStats(1.0, 0.5))
+            stats.skipped += 1
+
+    def execute(self, stages: List[Stage]) -> Optional[str]:
+        """
+        按规划顺序执行阶段，遇到短路后跳过剩余阶段
+
+        Args:
+            stages: 待执行的阶段列表
+
+        Returns:
+            触发短路的阶段名称，未短路返回 None
+        """
+        by_name = {stage.name: stage for stage in stages}
+        ordered = self.order(list(by_name.keys()))
+
+        for index, name in enumerate(ordered):
+            started = time.monotonic()
+            short_circuited = bool(by_name[name].run())
+            if self._finish_stage(ordered, index, short_circuited, started):
+                return name
+
+        return None
+
+    async def execute_async(self, stages: List[Stage]) -> Optional[str]:
+        """按规划顺序执行阶段（异步版本：阶段的 run 为协程函数）"""
+        by_name = {stage.name: stage for stage in stages}
+        ordered = self.order(list(by_name.keys()))
+
+        for index, name in enumerate(ordered):
+            started = time.monotonic()
+            short_circuited = bool(await by_name[name].run())
+            if self._finish_stage(ordered, index, short_circuited, started):
+                return name
+
+        return None
+
+    def _finish_stage(self, ordered: List[str], index: int, short_circuited: bool, started: float) -> bool:
+        """记录阶段执行结果；短路时记录被跳过的剩余阶段并返回 True"""
+        name = ordered[index]
+        self.record_run(name, short_circuited, time.monotonic() - started)
+        if not short_circuited:
+            return False
+        for skipped_name in ordered[index + 1:]:
+            self.record_skip(skipped_name)
+            logger.info(f"阶段 '{name}' 已确定结论，跳过阶段 '{skipped_name}'")
+        return True
+
+    def get_metrics(self) -> Dict[str, Dict[str, float]]:
+        """获取各阶段的成本估计和执行/跳过统计"""
+        with self._lock:
+            return {
+                name: {
+                    "cost": stats.cost,
+                    "short_circuit_rate": round(stats.short_circuit_rate, 4),
+                    "runs": stats.runs,
+                    "short_circuits": stats.short_circuits,
+                    "skipped": stats.skipped,
+                    "avg_seconds": round(stats.total_seconds / stats.runs, 4) if stats.runs else 0.0
+                }
+                for name, stats in self._stats.items()
+            }
+
+
+# 全局预审阶段规划器
+_planner = StagePlanner()
+_planner.register("s3_folder_listing", cost=1.0, short_circuit_rate=0.5)
+_planner.register("exa_search", cost=50.0, short_circuit_rate=0.05)
+
+
+def get_stage_planner() -> StagePlanner:
+    """获取全局预审阶段规划器"""
+    return _planner
@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+"""
+预审报告渲染模块
+将结构化的 PreauditResult 渲染为面向医药代表的中文报告，模板按 样式 + 结果类型 注册，可替换
+"""
+
+from typing import Callable, Dict, Tuple
+
+from folder_profiler import describe_counts
+from preaudit_result import (
+    OUTCOME_DIRECT_PASS,
+    OUTCOME_DIRECT_PASS_INSUFFICIENT,
+    OUTCOME_DOCUMENTS_INSUFFICIENT_UNVERIFIED,
+    OUTCOME_EXA_FAILED_DOCUMENTS_OK,
+    OUTCOME_EXA_VERIFIED,
+    OUTCOME_EXA_VERIFIED_INSUFFICIENT,
+    OUTCOME_FOLDER_MISSING,
+    OUTCOME_INCOMPLETE,
+    OUTCOME_NEEDS_IMPROVEMENT,
+    OUTCOME_S3_ERROR,
+    FolderInfo,
+    PreauditResult
+)
+
+ReportTemplate = Callable[[PreauditResult], str]
+
+# (样式, 结果类型) -> 模板；结果类型为 "*" 表示该样式的通用模板
+_templates: Dict[Tuple[str, str], ReportTemplate] = {}
+
+
+def register_report_template(outcome: str, template: ReportTemplate, style: str = "default"):
+    """
+    注册报告模板
+
+    Args:
+        outcome: 结果类型（如 folder_missing），"*" 表示该样式下所有结果类型通用
+        template: 接收 PreauditResult 返回报告文本的函数
+        style: 报告样式名称
+    """
+    _templates[(style, outcome)] = template
+
+
+def get_report_styles():
+    """获取已注册的报告样式"""
+    return sorted({style for style, _ in _templates})
+
+
+def render_report(result: PreauditResult, style: str = "default") -> str:
+    """
+    渲染预审报告，找不到指定样式的模板时回退到 default 样式
+
+    Args:
+        result: 结构化预审结果
+        style: 报告样式
+
+    Returns:
+        报告文本
+    """
+    for key in ((style, result.outcome), (style, "*"), ("default", result.outcome)):
+        template = _templates.get(key)
+        if template is not None:
+            return template(result)
+    return result.headline
+
+
+def _folder_fields(result: PreauditResult) -> Tuple[str, str, int, str]:
+    """文件夹类型、名称、文档数量和文档列表文本"""
+    folder = result.folder
+    file_list = folder.files if folder else []
+    if file_list:
+        file_list_str = "\n".join([f"  - {file}" for file in file_list])
+    else:
+        file_list_str = "  （无文件）"
+    if folder.duplicate_groups:
+        file_list_str += f"\n  {_describe_duplicates(folder)}"
+    if folder.documents:
+        file_list_str += f"\n  {describe_counts(folder.documents)}"
+    if folder.photo_reuse:
+        file_list_str += f"\n  {_describe_photo_reuse(folder.photo_reuse)}"
+    evidence = result.verification.get("document_evidence")
+    if evidence:
+        file_list_str += f"\n  {_describe_evidence(evidence)}"
+    registry = result.verification.get("registry")
+    if registry:
+        file_list_str += f"\n  讲者登记表: 身份验证和文档数量来自预先验证（验证于 {registry['verified_at']}，" \
+                         f"文档列出于 {registry['listed_at']}）"
+    return folder.folder_type, folder.name, folder.file_count, file_list_str
+
+
+def _describe_duplicates(folder: FolderInfo) -> str:
+    """重复文件的可读描述（每组第一个文件计入文档数量）"""
+    groups = "；".join(
+        f"{'、'.join(group['keys'][1:])} 与 {group['keys'][0]} 相同" for group in folder.duplicate_groups
+    )
+    return f"重复文件（{folder.duplicate_count}个，未计入文档数量）: {groups}"
+
+
+def _describe_photo_reuse(photo_reuse: Dict) -> str:
+    """照片复用检查结果的可读描述"""
+    matches = photo_reuse.get("matches", [])
+    if not matches:
+        return f"照片复用检查: {photo_reuse.get('photos', 0)} 张照片均未在其他讲者文件夹中出现"
+    places = "；".join(
+        f"{match['key'].rsplit('/', 1)[-1]} 与 {match['other_key']} 近似（距离 {match['distance']}）"
+        for match in matches
+    )
+    return f"⚠️ 照片复用: {places}"
+
+
+_EVIDENCE_LABELS = {"name": "讲者姓名", "hospital": "医院"}
+
+
+def _describe_evidence(evidence: Dict) -> str:
+    """PDF 文本证据的可读描述"""
+    if not evidence.get("success"):
+        return f"PDF 文本证据: 未能读取文件夹（{evidence.get('error') or '未知错误'}）"
+    found = evidence.get("found", {})
+    if not found:
+        return f"PDF 文本证据: 在 {evidence.get('documents_read', 0)} 个 PDF 中未找到讲者姓名或医院"
+    places = "；".join(
+        f"{_EVIDENCE_LABELS.get(name, name)}见 {place['document'].rsplit('/', 1)[-1]} 第{place['page']}页"
+        for name, place in found.items()
+    )
+    return f"PDF 文本证据: {places}"
+
+
+def _exa_results(result: PreauditResult) -> Dict:
+    return result.verification.get("exa_search_results", {}) or {}
+
+
+def _numbered(lines) -> str:
+    return chr(10).join([f"{i+1}. {line}" for i, line in enumerate(lines)])
+
+
+def _render_folder_missing(result: PreauditResult) -> str:
+    info = result.extraction
+    folder_name = result.folder.name
+    return f"""{result.headline}
+
+问题详情：
+❌ 系统中未找到讲者 '{info.get('name', '未知')}' 的专属文件夹
+❌ 预期文件夹路径: {folder_name}
+
+讲者信息：
+- 姓名: {info.get('name', '未提取')}
+- 医院: {info.get('hospital', '未提取')}
+- 科室: {info.get('department', '未提取')}
+- 职称: {info.get('title', '未提取')}
+
+具体改进建议：
+1. 请确认讲者信息是否准确无误
+2. 联系系统管理员创建讲者专属文件夹: '{folder_name}'
+3. 上传以下类型的支撑文档到专属文件夹：
+   - 医师执业证书
+   - 医师简历和工作证明
+   - 学术论文和研究成果
+   - 医院出具的身份证明
+   - 专业资质证书
+
+整改步骤：
+1. 核实讲者身份信息的准确性
+2. 联系相关部门创建专属文件夹
+3. 准备并上传完整的身份验证文档
+4. 重新提交预审系统进行检查
+
+注意事项：
+- 每位讲者都必须有专属的文件夹存储验证文档
+- 文件夹命名格式：姓名-医院-科室
+- 所有文档必须真实有效，支持身份验证
+- 如有疑问，请咨询医学事务部门或合规团队"""
+
+
+def _render_s3_error(result: PreauditResult) -> str:
+    return f"""{result.headline}
+
+改进建议：
+1. 请联系IT支持检查文档存储系统连接
+2. 确认您有权限访问相关文档存储区域
+3. 稍后重试或联系系统管理员
+
+后续步骤：
+- 解决技术问题后重新提交审核
+- 如持续出现问题，请提交技术支持工单"""
+
+
+def _render_direct_pass(result: PreauditResult) -> str:
+    folder_type, folder_name, file_count, file_list_str = _folder_fields(result)
+    return f"""{result.headline}
+
+通过原因：
+✅ 内容已通过内部验证流程
+✅ {folder_type} '{folder_name}' 中支撑文档数量充足（{file_count}个文档，超过最低要求{result.min_file_count}个）
+
+当前{folder_type}文档列表：
+{file_list_str}
+
+优化建议：
+1. 建议在正式使用前进行最终人工审核
+2. 确保所有引用的临床数据都有对应的支撑文档
+3. 检查内容是否符合最新的监管指导原则
+4. 考虑添加免责声明和适应症说明
+
+后续步骤：
+- 可以提交给合规部门进行详细审核
+- 准备相关的问答材料以备现场使用
+- 确保演讲者熟悉所有支撑材料的内容"""
+
+
+def _render_direct_pass_insufficient(result: PreauditResult) -> str:
+    folder_type, folder_name, file_count, file_list_str = _folder_fields(result)
+    min_file_count = result.min_file_count
+    return f"""{result.headline}
+
+问题详情：
+✅ 内容已通过内部验证流程
+❌ {folder_type} '{folder_name}' 中支撑文档不足（当前{file_count}个，需要超过{min_file_count}个）
+
+当前{folder_type}文档列表：
+{file_list_str}
+
+具体改进建议：
+1. 请补充以下类型的支撑文档到 '{folder_name}' 文件夹：
+   - 产品说明书或处方信息
+   - 相关临床研究数据
+   - 安全性信息和不良反应资料
+   - 监管部门批准的产品信息
+   - 至少需要{min_file_count + 1}个支撑文档
+
+整改步骤：
+1. 上传更多相关支撑文档到S3存储桶的 '{folder_name}' 文件夹
+2. 确保所有材料符合公司合规政策
+3. 重新提交预审系统进行检查
+4. 通过预审后提交人工详细审核"""
+
+
+def _render_exa_verified(result: PreauditResult) -> str:
+    folder_type, folder_name, file_count, file_list_str = _folder_fields(result)
+    info = result.extraction
+    exa_results = _exa_results(result)
+    return f"""{result.headline}
+
+通过原因：
+✅ 网络搜索验证通过，讲者身份真实可靠
+✅ {folder_type} '{folder_name}' 中支撑文档数量充足（{file_count}个文档，超过最低要求{result.min_file_count}个）
+
+讲者信息：
+- 姓名: {info.get('name', '未提取')}
+- 医院: {info.get('hospital', '未提取')}
+- 科室: {info.get('department', '未提取')}
+- 职称: {info.get('title', '未提取')}
+
+网络验证详情：
+- 搜索匹配分数: {exa_results.get('match_score', 0)}/10
+- 搜索结果数量: {exa_results.get('total_results', 0)}个
+- 匹配结果数量: {len(exa_results.get('matched_results', []))}个
+
+当前{folder_type}文档列表：
+{file_list_str}
+
+后续步骤：
+- 身份验证已通过网络搜索确认
+- 建议进行进一步的背景调查
+- 确认讲者的专业领域匹配度
+- 准备相关的演讲协议和材料"""
+
+
+def _render_exa_verified_insufficient(result: PreauditResult) -> str:
+    folder_type, folder_name, file_count, file_list_str = _folder_fields(result)
+    exa_results = _exa_results(result)
+    return f"""{result.headline}
+
+问题详情：
+✅ 网络搜索验证通过，讲者身份真实可靠
+❌ {folder_type} '{folder_name}' 中支撑文档不足（当前{file_count}个，需要超过{result.min_file_count}个）
+
+网络验证详情：
+- 搜索匹配分数: {exa_results.get('match_score', 0)}/10
+- 搜索结果数量: {exa_results.get('total_results', 0)}个
+
+当前{folder_type}文档列表：
+{file_list_str}
+
+具体改进建议：
+请补充更多支撑文档到 '{folder_name}' 文件夹以满足审核要求"""
+
+
+def _render_exa_failed_documents_ok(result: PreauditResult) -> str:
+    folder_type, folder_name, file_count, file_list_str = _folder_fields(result)
+    exa_results = _exa_results(result)
+    return f"""{result.headline}
+
+问题详情：
+❌ 网络搜索验证失败，无法确认讲者身份真实性
+✅ {folder_type} '{folder_name}' 中支撑文档数量充足（{file_count}个文档，超过最低要求{result.min_file_count}个）
+
+网络验证详情：
+- 搜索错误: {exa_results.get('error', '未知错误')}
+- 搜索结果数量: {exa_results.get('total_results', 0)}个
+
+当前{folder_type}文档列表：
+{file_list_str}
+
+具体改进建议：
+{_numbered(result.suggestions)}
+
+整改步骤：
+1. 优先解决讲者身份验证问题
+2. 提供更多讲者身份证明材料
+3. 重新提交预审系统进行检查
+4. 考虑联系讲者所在医院确认身份
+
+注意事项：
+- 虽然支撑文档充足，但讲者身份验证是必需的
+- 建议在解决身份验证问题后再进行下一步"""
+
+
+def _render_documents_insufficient_unverified(result: PreauditResult) -> str:
+    folder_type, folder_name, file_count, file_list_str = _folder_fields(result)
+    return f"""{result.headline}
+
+问题详情：
+❌ {folder_type} '{folder_name}' 中支撑文档不足（当前{file_count}个，需要超过{result.min_file_count}个）
+⏸️ 文档不足已决定预审结论，本次未执行讲者身份网络验证
+
+当前{folder_type}文档列表：
+{file_list_str}
+
+具体改进建议：
+{_numbered(result.suggestions)}
+
+整改步骤：
+1. 上传更多相关支撑文档到 '{folder_name}' 文件夹
+2. 重新提交预审系统，届时将进行讲者身份网络验证
+3. 通过预审后提交人工详细审核"""
+
+
+def _render_needs_improvement(result: PreauditResult) -> str:
+    folder_type, folder_name, _, file_list_str = _folder_fields(result)
+    return f"""{result.headline}
+
+问题详情：
+❌ {'; '.join(result.reasons)}
+
+当前{folder_type} '{folder_name}' 文档列表：
+{file_list_str}
+
+具体改进建议：
+{_numbered(result.suggestions)}
+
+整改步骤：
+1. 根据上述建议补充讲者身份验证文档
+2. 上传更多相关支撑文档到 '{folder_name}' 文件夹
+3. 确保所有材料符合公司合规政策
+4. 重新提交预审系统进行检查
+5. 通过预审后提交人工详细审核
+
+注意事项：
+- 所有讲者都必须经过完整的身份验证流程
+- 网络搜索验证是身份真实性的重要环节
+- 请确保讲者信息的真实性和专业性
+- 如有疑问，请咨询医学事务部门或合规团队"""
+
+
+def _render_incomplete(result: PreauditResult) -> str:
+    info = result.extraction
+    deadline = result.deadline
+    skipped_stages = deadline.get("skipped_stages") or []
+    skipped = "、".join(skipped_stages) if skipped_stages else "无"
+    folder_line = f"- 预期文件夹: {result.folder.name}" if result.folder else "- 预期文件夹: 未确定"
+    return f"""{result.headline}
+
+说明：
+⏱️ 预审在阶段 '{deadline.get('stage')}' 时达到时间预算（{deadline.get('budget_seconds')}s），以下为已完成部分的结果
+⏱️ 因时间不足跳过的阶段: {skipped}
+
+已获取的讲者信息：
+- 姓名: {info.get('name') or '未提取'}
+- 医院: {info.get('hospital') or '未提取'}
+- 科室: {info.get('department') or '未提取'}
+- 职称: {info.get('title') or '未提取'}
+{folder_line}
+
+后续步骤：
+- 本结果不是最终结论，请稍后重新提交预审
+- 如持续超时，请联系IT支持检查外部服务状态"""
+
+
+def _render_brief(result: PreauditResult) -> str:
+    """简要样式：标题 + 原因，适合聊天界面或日志"""
+    lines = [result.headline]
+    if result.reasons:
+        lines.extend([f"- {reason}" for reason in result.reasons])
+    if result.folder:
+        lines.append(f"- 文件夹: {result.folder.name}（{result.folder.file_count}个文档）")
+        if result.folder.duplicate_groups:
+            lines.append(f"- {_describe_duplicates(result.folder)}")
+        if result.folder.documents:
+            lines.append(f"- {describe_counts(result.folder.documents)}")
+    return "\n".join(lines)
+
+
+register_report_template(OUTCOME_FOLDER_MISSING, _render_folder_missing)
+register_report_template(OUTCOME_S3_ERROR, _render_s3_error)
+register_report_template(OUTCOME_DIRECT_PASS, _render_direct_pass)
+register_report_template(OUTCOME_DIRECT_PASS_INSUFFICIENT, _render_direct_pass_insufficient)
+register_report_template(OUTCOME_EXA_VERIFIED, _render_exa_verified)
+register_report_template(OUTCOME_EXA_VERIFIED_INSUFFICIENT, _render_exa_verified_insufficient)
+register_report_template(OUTCOME_EXA_FAILED_DOCUMENTS_OK, _render_exa_failed_documents_ok)
+register_report_template(OUTCOME_DOCUMENTS_INSUFFICIENT_UNVERIFIED, _render_documents_insufficient_unverified)
+register_report_template(OUTCOME_NEEDS_IMPROVEMENT, _render_needs_improvement)
+register_report_template(OUTCOME_INCOMPLETE, _render_incomplete)
+register_report_template("*", _render_brief, style="brief")
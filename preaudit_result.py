@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+结构化预审结果模型
+预审流程只产出紧凑的结构化结果；人类可读的报告在需要时才由 preaudit_report 渲染
+"""
+
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+from profiling import span
+
+# 预审结论
+VERDICT_PASS = "pass"
+VERDICT_PARTIAL_PASS = "partial_pass"
+VERDICT_FAIL = "fail"
+VERDICT_INCOMPLETE = "incomplete"
+
+# 预审结果类型（每种类型对应一个报告模板）
+OUTCOME_FOLDER_MISSING = "folder_missing"
+OUTCOME_S3_ERROR = "s3_error"
+OUTCOME_DIRECT_PASS = "direct_pass"
+OUTCOME_DIRECT_PASS_INSUFFICIENT = "direct_pass_insufficient_documents"
+OUTCOME_EXA_VERIFIED = "exa_verified"
+OUTCOME_EXA_VERIFIED_INSUFFICIENT = "exa_verified_insufficient_documents"
+OUTCOME_EXA_FAILED_DOCUMENTS_OK = "exa_failed_documents_sufficient"
+OUTCOME_DOCUMENTS_INSUFFICIENT_UNVERIFIED = "documents_insufficient_identity_unchecked"
+OUTCOME_NEEDS_IMPROVEMENT = "needs_improvement"
+OUTCOME_INCOMPLETE = "incomplete"
+
+# 结果类型 -> (结论, 标题)
+OUTCOMES = {
+    OUTCOME_FOLDER_MISSING: (VERDICT_FAIL, "预审不通过 - 未找到讲者专属文件夹"),
+    OUTCOME_S3_ERROR: (VERDICT_FAIL, "预审不通过 - 支撑文档系统访问失败: {error}"),
+    OUTCOME_DIRECT_PASS: (VERDICT_PASS, "预审通过 - 恭喜！您的内容已通过初步审核"),
+    OUTCOME_DIRECT_PASS_INSUFFICIENT: (VERDICT_FAIL, "预审不通过 - 虽然内容通过验证，但支撑文档不足"),
+    OUTCOME_EXA_VERIFIED: (VERDICT_PASS, "预审通过 - 讲者身份验证成功"),
+    OUTCOME_EXA_VERIFIED_INSUFFICIENT: (VERDICT_FAIL, "预审不通过 - 讲者身份验证通过但支撑文档不足"),
+    OUTCOME_EXA_FAILED_DOCUMENTS_OK: (VERDICT_PARTIAL_PASS, "预审部分通过 - 网络验证失败但文档充足"),
+    OUTCOME_DOCUMENTS_INSUFFICIENT_UNVERIFIED: (VERDICT_FAIL, "预审不通过 - 支撑文档不足（讲者身份尚未验证）"),
+    OUTCOME_NEEDS_IMPROVEMENT: (VERDICT_FAIL, "预审不通过 - 内容需要改进"),
+    OUTCOME_INCOMPLETE: (VERDICT_INCOMPLETE, "预审未完成 - 超出时间预算（部分结果）"),
+}
+
+
+@dataclass(slots=True)
+class FolderInfo:
+    """被检查的讲者文件夹"""
+    prefix: str
+    name: str
+    folder_type: str
+    exists: bool = False
+    # 唯一文档数量（内容相同的重复文件只计一次）
+    file_count: int = 0
+    files: List[str] = field(default_factory=list)
+    # 未计入文档数量的重复文件数和重复文件组
+    duplicate_count: int = 0
+    duplicate_groups: List[Dict[str, Any]] = field(default_factory=list)
+    error: Optional[str] = None
+    # 各格式和类别的文档数量（开启内容画像时）
+    documents: Optional[Dict[str, Any]] = None
+    # 照片复用检查结果（开启时）：文件夹中的照片是否出现在其他讲者的文件夹中
+    photo_reuse: Optional[Dict[str, Any]] = None
+
+
+@dataclass(slots=True)
+class PreauditResult:
+    """一次预审的结构化结果"""
+    verdict: str
+    outcome: str
+    headline: str
+    reasons: List[str] = field(default_factory=list)
+    suggestions: List[str] = field(default_factory=list)
+    extraction: Dict[str, str] = field(default_factory=dict)
+    verification: Dict[str, Any] = field(default_factory=dict)
+    folder: Optional[FolderInfo] = None
+    min_file_count: int = 0
+    contains_target: bool = False
+    stage_timings: Dict[str, float] = field(default_factory=dict)
+    deadline: Dict[str, Any] = field(default_factory=dict)
+    cost: Dict[str, Any] = field(default_factory=dict)
+    _rendered: Dict[str, str] = field(default_factory=dict, repr=False, compare=False)
+
+    @classmethod
+    def create(cls, outcome: str, **kwargs) -> "PreauditResult":
+        """根据结果类型创建结果，结论和标题由类型决定"""
+        verdict, headline = OUTCOMES[outcome]
+        folder = kwargs.get("folder")
+        if "{error}" in headline:
+            headline = headline.format(error=(folder.error if folder and folder.error else "未知错误"))
+        return cls(verdict=verdict, outcome=outcome, headline=headline, **kwargs)
+
+    @property
+    def passed(self) -> bool:
+        """预审是否通过"""
+        return self.verdict == VERDICT_PASS
+
+    @property
+    def file_count(self) -> int:
+        """被检查文件夹中的文档数量"""
+        return self.folder.file_count if self.folder else 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为可 JSON 序列化的紧凑字典（不包含渲染后的报告）"""
+        data = asdict(self)
+        data.pop("_rendered", None)
+        return data
+
+    def render(self, style: str = "default") -> str:
+        """
+        渲染人类可读的报告（按样式缓存，只在首次请求时渲染）
+
+        Args:
+            style: 报告模板样式，如 default、brief
+
+        Returns:
+            报告文本
+        """
+        report = self._rendered.get(style)
+        if report is None:
+            from preaudit_report import render_report
+            with span("report_rendering"):
+                report = render_report(self, style)
+            self._rendered[style] = report
+        return report
+
+    def __str__(self) -> str:
+        return self.render()
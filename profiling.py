@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+"""
+预审流程性能剖析模块
+在提取、EXA 搜索、S3 检查、报告渲染和日志记录等阶段埋点（span），
+并按采样率或按需对单个请求进行剖析：cprofile 模式为确定性剖析，sampling 模式为定时栈采样，
+结果可导出为火焰图使用的 collapsed-stack 格式
+"""
+
+import contextvars
+import cProfile
+import functools
+import inspect
+import itertools
+import logging
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MODE_CPROFILE = "cprofile"
+MODE_SAMPLING = "sampling"
+
+# 从 cProfile 调用图还原调用栈时的最大深度
+MAX_STACK_DEPTH = 64
+
+
+class RequestTrace:
+    """单个请求的 span 记录"""
+
+    def __init__(self, trace_id: str, name: str):
+        self.trace_id = trace_id
+        self.name = name
+        self.stack: List[str] = [name]
+        # (span 路径, 总耗时, 子 span 耗时)
+        self.spans: List[Tuple[str, float, float]] = []
+        self._child_seconds: List[float] = [0.0]
+
+
+class RequestProfile:
+    """一次请求的剖析结果"""
+
+    def __init__(self, trace: RequestTrace, mode: Optional[str], duration: float,
+                 collapsed: Dict[str, int], top_functions: List[Dict[str, Any]]):
+        self.trace_id = trace.trace_id
+        self.name = trace.name
+        self.mode = mode
+        self.created_at = time.time()
+        self.duration = duration
+        self.spans = trace.spans
+        self.collapsed = collapsed
+        self.top_functions = top_functions
+
+    def span_collapsed(self) -> Dict[str, int]:
+        """span 树的 collapsed-stack（值为自身耗时，单位微秒）"""
+        stacks: Dict[str, int] = {}
+        for path, total, children in self.spans:
+            self_us = int(max(total - children, 0.0) * 1_000_000)
+            if self_us:
+                stacks[path] = stacks.get(path, 0) + self_us
+        return stacks
+
+    def to_collapsed(self) -> str:
+        """导出 collapsed-stack 文本（flamegraph.pl / speedscope 可直接读取）"""
+        stacks = self.collapsed or self.span_collapsed()
+        return "\n".join(f"{stack} {value}" for stack, value in sorted(stacks.items()))
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.trace_id,
+            "name": self.name,
+            "mode": self.mode,
+            "created_at": self.created_at,
+            "duration_ms": round(self.duration * 1000, 3),
+            "spans": [
+                {"path": path, "ms": round(total * 1000, 3)} for path, total, _ in self.spans
+            ],
+            "top_functions": self.top_functions
+        }
+
+
+class StackSampler:
+    """定时采样指定线程的调用栈"""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Dict[str, int] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            key = ";".join(reversed(stack))
+            self.samples[key] = self.samples.get(key, 0) + 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self) -> Dict[str, int]:
+        self._stop.set()
+        self._thread.join()
+        return self.samples
+
+
+def _func_label(func: Tuple[str, int, str]) -> str:
+    filename, line, name = func
+    if filename == "~":
+        return name
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def cprofile_to_collapsed(stats: pstats.Stats) -> Dict[str, int]:
+    """
+    将 cProfile 调用图转换为 collapsed-stack（值为微秒）
+    cProfile 只记录调用边，各路径的耗时按调用边的累计时间比例分配
+    """
+    raw = stats.stats
+    children: Dict[Any, Dict[Any, float]] = {}
+    for func, (_, _, _, _, callers) in raw.items():
+        for caller, (_, _, _, caller_ct) in callers.items():
+            children.setdefault(caller, {})[func] = caller_ct
+    roots = [func for func, (_, _, _, _, callers) in raw.items()
+             if not any(caller in raw for caller in callers)]
+
+    collapsed: Dict[str, int] = {}
+
+    def walk(func, seconds: float, path: List[str], seen: set):
+        _, _, tt, ct, _ = raw[func]
+        scale = seconds / ct if ct > 0 else 0.0
+        label = ";".join(path)
+        self_us = int(tt * scale * 1_000_000)
+        if self_us:
+            collapsed[label] = collapsed.get(label, 0) + self_us
+        if len(path) >= MAX_STACK_DEPTH:
+            return
+        for child, edge_ct in children.get(func, {}).items():
+            if child in seen or child not in raw:
+                continue
+            walk(child, edge_ct * scale, path + [_func_label(child)], seen | {child})
+
+    for root in roots:
+        walk(root, raw[root][3], [_func_label(root)], {root})
+    return collapsed
+
+
+def _top_functions(stats: pstats.Stats, limit: int = 10) -> List[Dict[str, Any]]:
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+    return [
+        {
+            "function": _func_label(func),
+            "calls": nc,
+            "self_ms": round(tt * 1000, 3),
+            "cumulative_ms": round(ct * 1000, 3)
+        }
+        for func, (_, nc, tt, ct, _) in rows
+    ]
+
+
+class Profiler:
+    """span 统计和请求级剖析"""
+
+    def __init__(self):
+        self.enabled = True
+        self.sample_rate = 0.0
+        self.mode = MODE_CPROFILE
+        self.sampling_interval = 0.005
+        self.output_dir = ""
+        self._lock = threading.Lock()
+        self._armed = 0
+        self._ids = itertools.count(1)
+        self._profiles: deque = deque(maxlen=20)
+        self._span_stats: Dict[str, Dict[str, float]] = {}
+        # cProfile 同一时间只能在一个线程中启用（Python 3.12+ 为解释器级别）
+        self._cprofile_lock = threading.Lock()
+        self._trace: contextvars.ContextVar = contextvars.ContextVar("profiling_trace", default=None)
+
+    def configure(self, enabled: bool = True, sample_rate: float = 0.0, mode: str = MODE_CPROFILE,
+                  sampling_interval_ms: float = 5.0, max_profiles: int = 20, output_dir: str = ""):
+        """
+        配置剖析参数
+
+        Args:
+            enabled: 是否记录 span
+            sample_rate: 自动剖析的请求比例（0-1）
+            mode: cprofile（确定性剖析）或 sampling（栈采样）
+            sampling_interval_ms: 栈采样间隔（毫秒）
+            max_profiles: 内存中保留的最近剖析结果数量
+            output_dir: 剖析结果的 collapsed-stack 输出目录，为空则只保留在内存中
+        """
+        if mode not in (MODE_CPROFILE, MODE_SAMPLING):
+            raise ValueError(f"未知的剖析模式: {mode}")
+        with self._lock:
+            self.enabled = enabled
+            self.sample_rate = sample_rate
+            self.mode = mode
+            self.sampling_interval = sampling_interval_ms / 1000.0
+            self.output_dir = output_dir
+            self._profiles = deque(self._profiles, maxlen=max_profiles)
+
+    def arm(self, count: int = 1) -> int:
+        """按需剖析接下来的 count 个请求，返回当前待剖析数量"""
+        with self._lock:
+            self._armed += count
+            return self._armed
+
+    def claim_profile(self) -> bool:
+        """
+        当前请求是否被按需剖析或采样选中（选中时消耗一次按需剖析名额）
+
+        调用方据此决定请求的执行方式，再以 request(name, profile=True) 剖析该请求
+        """
+        return self.enabled and self._trace.get() is None and self._should_profile()
+
+    def _should_profile(self) -> bool:
+        with self._lock:
+            if self._armed > 0:
+                self._armed -= 1
+                return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    @contextmanager
+    def request(self, name: str, profile: Optional[bool] = None):
+        """
+        请求级剖析范围（在执行请求的线程中进入）
+
+        Args:
+            name: 请求名称（如工具名称）
+            profile: 是否剖析该请求，None 表示按按需剖析和采样率决定；
+                在事件循环中执行的请求应传 False（cProfile 和栈采样按线程采集，会混入其他请求），只记录阶段耗时
+        """
+        if not self.enabled or self._trace.get() is not None:
+            yield None
+            return
+
+        trace = RequestTrace(f"{int(time.time())}-{next(self._ids)}", name)
+        token = self._trace.set(trace)
+        if profile is None:
+            profile = self._should_profile()
+        mode = self.mode if profile else None
+
+        profile = None
+        sampler = None
+        if mode == MODE_CPROFILE and not self._cprofile_lock.acquire(blocking=False):
+            # 其他请求正在 cProfile 剖析，改用栈采样
+            mode = MODE_SAMPLING
+        if mode == MODE_CPROFILE:
+            profile = cProfile.Profile()
+            profile.enable()
+        elif mode == MODE_SAMPLING:
+            sampler = StackSampler(threading.get_ident(), self.sampling_interval)
+            sampler.start()
+
+        started = time.perf_counter()
+        try:
+            yield trace
+        finally:
+            duration = time.perf_counter() - started
+            trace.spans.append((name, duration, trace._child_seconds[0]))
+            self._record_span(name, duration)
+            collapsed: Dict[str, int] = {}
+            top_functions: List[Dict[str, Any]] = []
+            if profile is not None:
+                profile.disable()
+                self._cprofile_lock.release()
+                stats = pstats.Stats(profile)
+                collapsed = cprofile_to_collapsed(stats)
+                top_functions = _top_functions(stats)
+            elif sampler is not None:
+                collapsed = sampler.stop()
+            self._trace.reset(token)
+            if mode is not None:
+                self._store(RequestProfile(trace, mode, duration, collapsed, top_functions))
+
+    @contextmanager
+    def span(self, name: str):
+        """命名阶段耗时记录（嵌套 span 组成调用路径）"""
+        if not self.enabled:
+            yield
+            return
+
+        trace = self._trace.get()
+        if trace is not None:
+            trace.stack.append(name)
+            trace._child_seconds.append(0.0)
+
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self._record_span(name, elapsed)
+            if trace is not None:
+                children = trace._child_seconds.pop()
+                trace.spans.append((";".join(trace.stack), elapsed, children))
+                trace.stack.pop()
+                trace._child_seconds[-1] += elapsed
+
+    def _record_span(self, name: str, elapsed: float):
+        with self._lock:
+            stats = self._span_stats.setdefault(name, {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+            stats["count"] += 1
+            stats["total_seconds"] += elapsed
+            stats["max_seconds"] = max(stats["max_seconds"], elapsed)
+
+    def _store(self, profile: RequestProfile):
+        with self._lock:
+            self._profiles.append(profile)
+        if self.output_dir:
+            try:
+                os.makedirs(self.output_dir, exist_ok=True)
+                path = os.path.join(self.output_dir, f"{profile.name}-{profile.trace_id}.collapsed")
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(profile.to_collapsed() + "\n")
+            except OSError as e:
+                logger.warning(f"写入剖析结果失败: {str(e)}")
+        logger.info(f"请求剖析完成: {profile.name} ({profile.mode}), 耗时 {profile.duration * 1000:.1f}ms, id={profile.trace_id}")
+
+    def get_profiles(self) -> List[Dict[str, Any]]:
+        """最近的剖析结果摘要"""
+        with self._lock:
+            return [profile.summary() for profile in reversed(self._profiles)]
+
+    def get_profile(self, trace_id: str) -> Optional[RequestProfile]:
+        with self._lock:
+            for profile in self._profiles:
+                if profile.trace_id == trace_id:
+                    return profile
+        return None
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """各 span 的累计统计和剖析状态"""
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "sample_rate": self.sample_rate,
+                "armed": self._armed,
+                "profiles": len(self._profiles),
+                "spans": {
+                    name: {
+                        "count": stats["count"],
+                        "avg_ms": round(stats["total_seconds"] / stats["count"] * 1000, 3),
+                        "max_ms": round(stats["max_seconds"] * 1000, 3)
+                    }
+                    for name, stats in self._span_stats.items()
+                }
+            }
+
+
+# 全局剖析器
+_profiler = Profiler()
+
+
+def get_profiler() -> Profiler:
+    """获取全局剖析器"""
+    return _profiler
+
+
+def span(name: str):
+    """在全局剖析器中记录一个命名阶段"""
+    return _profiler.span(name)
+
+
+def traced(name: str):
+    """装饰器：将函数调用记录为命名阶段（支持协程函数）"""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with _profiler.span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _profiler.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
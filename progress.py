@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+预审进度上报模块
+预审各阶段完成时（信息提取、身份验证、文件夹检查）上报阶段名和中间结构化结果，
+由调用方（如 MCP server）转换为进度通知，客户端无需等待整个流程结束
+"""
+
+import contextvars
+import json
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 预审流程上报的阶段（按典型完成顺序；实际顺序由阶段规划决定）
+PREAUDIT_PROGRESS_STAGES = ("extraction", "identity_verification", "folder_check")
+
+# 进度回调：(已完成数, 总数, 消息文本)
+ProgressCallback = Callable[[float, Optional[float], str], None]
+
+
+class ProgressReporter:
+    """单个请求的进度上报器：记录已上报的阶段并调用回调（回调失败不影响预审）"""
+
+    def __init__(self, callback: Optional[ProgressCallback] = None, total: Optional[float] = None):
+        self.callback = callback
+        self.total = total
+        self.events: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def report(self, stage: str, data: Optional[Dict[str, Any]] = None):
+        """
+        上报一个阶段完成
+
+        Args:
+            stage: 阶段名
+            data: 该阶段的中间结果（需可 JSON 序列化）
+        """
+        with self._lock:
+            event = {"stage": stage, "data": data or {}}
+            self.events.append(event)
+            progress = len(self.events)
+        if self.callback is None:
+            return
+        message = json.dumps(event, ensure_ascii=False, separators=(',', ':'), default=str)
+        try:
+            self.callback(progress, self.total, message)
+        except Exception as e:
+            logger.debug(f"进度上报失败（阶段 {stage}）: {str(e)}")
+
+
+_current_reporter: contextvars.ContextVar = contextvars.ContextVar("progress_reporter", default=None)
+
+
+@contextmanager
+def progress_reporting(callback: Optional[ProgressCallback] = None, total: Optional[float] = None):
+    """
+    开启进度上报范围，范围内（同一线程/上下文，含 asyncio.to_thread）的阶段进度交给 callback
+    """
+    reporter = ProgressReporter(callback, total)
+    token = _current_reporter.set(reporter)
+    try:
+        yield reporter
+    finally:
+        _current_reporter.reset(token)
+
+
+def report_progress(stage: str, **data: Any):
+    """上报当前请求的阶段进度（没有上报范围时不做任何事）"""
+    reporter = _current_reporter.get()
+    if reporter is not None:
+        reporter.report(stage, data)
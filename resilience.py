@@ -0,0 +1,565 @@
+#!/usr/bin/env python3
+"""
+外部依赖弹性调用模块
+为 Bedrock、EXA 等外部依赖提供限流重试（指数退避 + 抖动）、熔断器和令牌桶限流，
+并暴露熔断状态与限流等待时间等指标
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# botocore ClientError 中表示限流或临时不可用的错误码
+THROTTLING_ERROR_CODES = {
+    'ThrottlingException',
+    'Throttling',
+    'TooManyRequestsException',
+    'ServiceUnavailableException',
+    'ServiceUnavailable',
+    'ModelNotReadyException',
+    'SlowDown',
+    'RequestLimitExceeded',
+}
+
+# 类名不以 ConnectionError 结尾的连接失败异常（httpx、aiohttp）
+CONNECTION_ERROR_NAMES = {'ConnectError', 'RemoteProtocolError', 'ClientConnectorError', 'ServerDisconnectedError'}
+
+
+class ThrottlingError(Exception):
+    """依赖返回限流或临时不可用（可重试）"""
+
+
+class CircuitOpenError(Exception):
+    """熔断器处于打开状态，调用被快速拒绝"""
+
+
+class RateLimitExceeded(Exception):
+    """在允许的等待时间内无法获取令牌"""
+
+
+def is_throttling_error(exc: BaseException) -> bool:
+    """
+    判断异常是否为限流/临时不可用错误
+
+    Args:
+        exc: 捕获到的异常
+
+    Returns:
+        是否应按限流错误重试
+    """
+    if isinstance(exc, ThrottlingError):
+        return True
+
+    # botocore ClientError: exc.response['Error']['Code']
+    response = getattr(exc, 'response', None)
+    if isinstance(response, dict):
+        error_code = response.get('Error', {}).get('Code', '')
+        if error_code in THROTTLING_ERROR_CODES:
+            return True
+        status_code = response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+        if status_code in (429, 503):
+            return True
+
+    return False
+
+
+def is_timeout_error(exc: BaseException) -> bool:
+    """判断异常是否为客户端超时（botocore ReadTimeoutError、requests Timeout、httpx TimeoutException 等）"""
+    if isinstance(exc, (TimeoutError, asyncio.TimeoutError)):
+        return True
+    return any("Timeout" in cls.__name__ for cls in type(exc).__mro__)
+
+
+def is_connection_error(exc: BaseException) -> bool:
+    """判断异常是否为连接失败（无法建立连接或连接中断）"""
+    if isinstance(exc, ConnectionError):
+        return True
+    return any(cls.__name__.endswith("ConnectionError") or cls.__name__ in CONNECTION_ERROR_NAMES
+               for cls in type(exc).__mro__)
+
+
+def is_dependency_failure(exc: BaseException) -> bool:
+    """
+    判断异常是否说明依赖本身出现故障（计入熔断）：限流、5xx、连接失败或超时
+
+    参数错误、权限不足等客户端错误不代表依赖故障，不计入熔断
+    """
+    if is_throttling_error(exc) or is_timeout_error(exc) or is_connection_error(exc):
+        return True
+    response = getattr(exc, 'response', None)
+    if isinstance(response, dict):
+        status_code = response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+        return isinstance(status_code, int) and status_code >= 500
+    return False
+
+
+class TokenBucket:
+    """令牌桶限流器（按账户配额设置速率和突发容量）"""
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        初始化令牌桶
+
+        Args:
+            rate: 每秒补充的令牌数，<=0 表示不限流
+            capacity: 桶容量（允许的突发请求数）
+        """
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self._tokens = self.capacity
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+
+    def _reserve(self, tokens: float) -> float:
+        """有足够令牌时取走并返回 0，否则返回还需等待的秒数"""
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens: float = 1, timeout: Optional[float] = None) -> float:
+        """
+        获取令牌，必要时阻塞等待
+
+        Args:
+            tokens: 需要的令牌数
+            timeout: 最长等待秒数，None 表示一直等待
+
+        Returns:
+            实际等待的秒数
+
+        Raises:
+            RateLimitExceeded: 在 timeout 内无法获得令牌
+        """
+        if self.rate <= 0:
+            return 0.0
+
+        waited = 0.0
+        while True:
+            wait_time = self._reserve(tokens)
+            if wait_time == 0.0:
+                return waited
+
+            if timeout is not None and waited + wait_time > timeout:
+                raise RateLimitExceeded(f"等待令牌超过 {timeout:.2f}s")
+
+            time.sleep(wait_time)
+            waited += wait_time
+
+    async def acquire_async(self, tokens: float = 1, timeout: Optional[float] = None) -> float:
+        """获取令牌（异步版本，等待期间不占用线程）"""
+        if self.rate <= 0:
+            return 0.0
+
+        waited = 0.0
+        while True:
+            wait_time = self._reserve(tokens)
+            if wait_time == 0.0:
+                return waited
+
+            if timeout is not None and waited + wait_time > timeout:
+                raise RateLimitExceeded(f"等待令牌超过 {timeout:.2f}s")
+
+            await asyncio.sleep(wait_time)
+            waited += wait_time
+
+
+class CircuitBreaker:
+    """熔断器：连续失败达到阈值后打开，冷却后半开试探"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0,
+                 half_open_max_calls: int = 1):
+        """
+        初始化熔断器
+
+        Args:
+            failure_threshold: 连续失败多少次后打开熔断
+            recovery_timeout: 打开后多少秒进入半开状态
+            half_open_max_calls: 半开状态允许的并发试探请求数
+        """
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._state = self.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._half_open_in_flight = 0
+        self._open_count = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._update_state()
+            return self._state
+
+    def _update_state(self):
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = self.HALF_OPEN
+            self._half_open_in_flight = 0
+
+    def allow_request(self) -> bool:
+        """判断当前是否允许发起请求"""
+        with self._lock:
+            self._update_state()
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and self._half_open_in_flight < self.half_open_max_calls:
+                self._half_open_in_flight += 1
+                return True
+            return False
+
+    def release(self):
+        """归还未完成（未实际发出或被中断）的半开试探名额"""
+        with self._lock:
+            if self._state == self.HALF_OPEN and self._half_open_in_flight > 0:
+                self._half_open_in_flight -= 1
+
+    def record_success(self):
+        """记录一次成功调用"""
+        with self._lock:
+            self._consecutive_failures = 0
+            if self._state != self.CLOSED:
+                logger.info("熔断器恢复为关闭状态")
+            self._state = self.CLOSED
+            self._half_open_in_flight = 0
+
+    def record_failure(self):
+        """记录一次失败调用"""
+        with self._lock:
+            self._consecutive_failures += 1
+            if self._state == self.HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self._open_count += 1
+                    logger.warning(f"熔断器打开，连续失败 {self._consecutive_failures} 次")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._half_open_in_flight = 0
+
+    def get_metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            self._update_state()
+            return {
+                "state": self._state,
+                "consecutive_failures": self._consecutive_failures,
+                "open_count": self._open_count
+            }
+
+
+class RetryPolicy:
+    """指数退避 + 全抖动 (full jitter) 的重试策略"""
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5, max_delay: float = 8.0):
+        """
+        初始化重试策略
+
+        Args:
+            max_attempts: 最大尝试次数（包含首次调用）
+            base_delay: 退避基准秒数
+            max_delay: 单次退避上限秒数
+        """
+        self.max_attempts = max(max_attempts, 1)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def compute_delay(self, attempt: int) -> float:
+        """计算第 attempt 次失败（从 1 开始）后的等待时间"""
+        ceiling = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return random.uniform(0, ceiling)
+
+
+class DependencyGuard:
+    """单个外部依赖的弹性调用封装：限流 -> 熔断 -> 调用 -> 重试"""
+
+    def __init__(self, name: str, retry_policy: RetryPolicy = None,
+                 breaker: CircuitBreaker = None, limiter: TokenBucket = None,
+                 is_retryable: Callable[[BaseException], bool] = is_throttling_error,
+                 max_limiter_wait: Optional[float] = 10.0,
+                 is_failure: Callable[[BaseException], bool] = is_dependency_failure):
+        self.name = name
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        self.limiter = limiter or TokenBucket(rate=0, capacity=1)
+        self.is_retryable = is_retryable
+        self.is_failure = is_failure
+        self.max_limiter_wait = max_limiter_wait
+        self._metrics = {
+            "calls": 0,
+            "successes": 0,
+            "failures": 0,
+            "retries": 0,
+            "throttled": 0,
+            "short_circuited": 0,
+            "rate_limited": 0,
+            "cancelled": 0,
+            "budget_timeouts": 0,
+            "limiter_wait_total": 0.0,
+            "limiter_wait_max": 0.0,
+            "concurrency_wait_total": 0.0
+        }
+        self._lock = threading.Lock()
+
+    def _incr(self, key: str, value: float = 1):
+        with self._lock:
+            self._metrics[key] += value
+
+    def _record_limiter_wait(self, waited: float):
+        with self._lock:
+            self._metrics["limiter_wait_total"] += waited
+            self._metrics["limiter_wait_max"] = max(self._metrics["limiter_wait_max"], waited)
+
+    def _limiter_timeout(self, max_wait: Optional[float]) -> Optional[float]:
+        if max_wait is None:
+            return self.max_limiter_wait
+        return max_wait if self.max_limiter_wait is None else min(self.max_limiter_wait, max_wait)
+
+    def _admit(self):
+        """每次尝试前检查熔断器"""
+        if not self.breaker.allow_request():
+            self._incr("short_circuited")
+            raise CircuitOpenError(f"{self.name} 熔断器已打开，快速失败")
+
+    def _rate_limited(self):
+        self._incr("rate_limited")
+        # 未真正调用依赖，释放半开试探名额
+        self.breaker.release()
+
+    def _retry_delay(self, error: Exception, attempt: int, started: float,
+                     max_wait: Optional[float], budget_limited: bool = False) -> Optional[float]:
+        """记录一次失败，返回重试前的等待时间；不应重试时返回 None"""
+        if budget_limited and is_timeout_error(error):
+            # 客户端超时被调用方的时间预算缩短，超时不代表依赖故障（与请求取消一样处理），预算已用完不再重试
+            self.breaker.release()
+            self._incr("budget_timeouts")
+            return None
+        retryable = self.is_retryable(error)
+        if retryable:
+            self._incr("throttled")
+        if self.is_failure(error):
+            self.breaker.record_failure()
+        else:
+            # 客户端错误（参数错误、权限不足等）不计入熔断，释放半开试探名额
+            self.breaker.release()
+
+        if not retryable or attempt >= self.retry_policy.max_attempts:
+            self._incr("failures")
+            return None
+
+        delay = self.retry_policy.compute_delay(attempt)
+        if max_wait is not None and time.monotonic() - started + delay > max_wait:
+            self._incr("failures")
+            return None
+
+        self._incr("retries")
+        logger.warning(f"{self.name} 调用被限流，第 {attempt} 次重试前等待 {delay:.2f}s: {str(error)}")
+        return delay
+
+    def _interrupted(self):
+        # 调用被中断（如请求被取消）不代表依赖故障：不计入熔断失败，并释放半开试探名额
+        self.breaker.release()
+        self._incr("cancelled")
+
+    @staticmethod
+    def _release_bulkhead(bulkhead):
+        if bulkhead is not None:
+            bulkhead.release()
+
+    def _succeeded(self):
+        self.breaker.record_success()
+        self._incr("successes")
+
+    def call(self, func: Callable[..., Any], *args, max_wait: Optional[float] = None,
+             budget_limited: bool = False, **kwargs) -> Any:
+        """
+        通过弹性层调用依赖
+
+        Args:
+            func: 实际的依赖调用函数
+            max_wait: 本次调用允许的限流等待/退避总时长上限（秒）
+            budget_limited: 客户端超时是否被调用方的剩余时间预算缩短（此时超时不计入熔断）
+            *args, **kwargs: 透传给 func 的参数
+
+        Returns:
+            func 的返回值
+
+        Raises:
+            CircuitOpenError: 熔断器打开
+            RateLimitExceeded: 限流或并发名额等待超时
+            Exception: 重试耗尽后的最后一个异常
+        """
+        self._incr("calls")
+        limiter_timeout = self._limiter_timeout(max_wait)
+        started = time.monotonic()
+
+        for attempt in range(1, self.retry_policy.max_attempts + 1):
+            self._admit()
+            try:
+                waited = self.limiter.acquire(timeout=limiter_timeout)
+                bulkhead = get_dependency_bulkhead(self.name)
+                if bulkhead is not None:
+                    self._incr("concurrency_wait_total", bulkhead.acquire(timeout=limiter_timeout))
+            except RateLimitExceeded:
+                self._rate_limited()
+                raise
+            self._record_limiter_wait(waited)
+
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                # 退避期间不占用并发名额
+                self._release_bulkhead(bulkhead)
+                delay = self._retry_delay(e, attempt, started, max_wait, budget_limited)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            except BaseException:
+                self._release_bulkhead(bulkhead)
+                self._interrupted()
+                raise
+
+            self._release_bulkhead(bulkhead)
+            self._succeeded()
+            return result
+
+    async def call_async(self, func: Callable[..., Any], *args, max_wait: Optional[float] = None,
+                         budget_limited: bool = False, **kwargs) -> Any:
+        """
+        通过弹性层调用依赖（异步版本：func 为协程函数，限流等待和退避期间不占用线程）
+
+        参数、返回值和异常与 call 相同；任务被取消时与请求取消一样不计入熔断失败
+        """
+        self._incr("calls")
+        limiter_timeout = self._limiter_timeout(max_wait)
+        started = time.monotonic()
+
+        for attempt in range(1, self.retry_policy.max_attempts + 1):
+            self._admit()
+            try:
+                waited = await self.limiter.acquire_async(timeout=limiter_timeout)
+                bulkhead = get_dependency_bulkhead(self.name)
+                if bulkhead is not None:
+                    self._incr("concurrency_wait_total", await bulkhead.acquire_async(timeout=limiter_timeout))
+            except RateLimitExceeded:
+                self._rate_limited()
+                raise
+            self._record_limiter_wait(waited)
+
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as e:
+                # 退避期间不占用并发名额
+                self._release_bulkhead(bulkhead)
+                delay = self._retry_delay(e, attempt, started, max_wait, budget_limited)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                self._release_bulkhead(bulkhead)
+                self._interrupted()
+                raise
+
+            self._release_bulkhead(bulkhead)
+            self._succeeded()
+            return result
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """获取该依赖的调用指标和熔断状态"""
+        with self._lock:
+            metrics = dict(self._metrics)
+        metrics["breaker"] = self.breaker.get_metrics()
+        return metrics
+
+
+# 全局依赖保护器注册表
+_guards: Dict[str, DependencyGuard] = {}
+_guards_lock = threading.Lock()
+# 依赖的并发名额（提供 acquire/acquire_async(timeout) 和 release，见 submission_scheduler）
+_bulkheads: Dict[str, Any] = {}
+
+
+def configure_dependency_guard(name: str, rate: float = 0, burst: float = 1,
+                               max_attempts: int = 3, base_delay: float = 0.5,
+                               max_delay: float = 8.0, failure_threshold: int = 5,
+                               recovery_timeout: float = 30.0,
+                               is_retryable: Callable[[BaseException], bool] = is_throttling_error,
+                               is_failure: Callable[[BaseException], bool] = is_dependency_failure
+                               ) -> DependencyGuard:
+    """
+    创建（或替换）指定依赖的保护器
+
+    Args:
+        name: 依赖名称，如 bedrock、exa
+        rate: 令牌桶速率（请求/秒），<=0 表示不限流
+        burst: 令牌桶容量
+        max_attempts: 最大尝试次数
+        base_delay: 退避基准秒数
+        max_delay: 单次退避上限秒数
+        failure_threshold: 熔断失败阈值
+        recovery_timeout: 熔断冷却秒数
+        is_retryable: 判断异常是否可重试
+        is_failure: 判断异常是否计入熔断失败
+
+    Returns:
+        配置好的依赖保护器
+    """
+    guard = DependencyGuard(
+        name,
+        retry_policy=RetryPolicy(max_attempts, base_delay, max_delay),
+        breaker=CircuitBreaker(failure_threshold, recovery_timeout),
+        limiter=TokenBucket(rate, burst),
+        is_retryable=is_retryable,
+        is_failure=is_failure
+    )
+    with _guards_lock:
+        _guards[name] = guard
+    return guard
+
+
+def get_dependency_guard(name: str) -> DependencyGuard:
+    """获取指定依赖的保护器，不存在时使用默认参数创建"""
+    with _guards_lock:
+        guard = _guards.get(name)
+        if guard is None:
+            guard = DependencyGuard(name)
+            _guards[name] = guard
+        return guard
+
+
+def set_dependency_bulkhead(name: str, bulkhead: Any):
+    """设置指定依赖的并发名额，None 表示不限制并发"""
+    with _guards_lock:
+        if bulkhead is None:
+            _bulkheads.pop(name, None)
+        else:
+            _bulkheads[name] = bulkhead
+
+
+def get_dependency_bulkhead(name: str) -> Any:
+    """获取指定依赖的并发名额，未设置时返回 None"""
+    return _bulkheads.get(name)
+
+
+def get_resilience_metrics() -> Dict[str, Dict[str, Any]]:
+    """获取所有依赖的弹性指标"""
+    with _guards_lock:
+        guards = list(_guards.items())
+    return {name: guard.get_metrics() for name, guard in guards}
@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+"""
+S3 对象事件消费模块
+从队列（SQS，或本地文件/内存队列替身）读取 S3 对象创建/删除通知，交给处理函数增量更新讲者文件夹的缓存，
+文件夹内容变化后缓存立即更新，不依赖过期时间和 LIST 请求
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Set, Union
+from urllib.parse import unquote_plus
+
+logger = logging.getLogger(__name__)
+
+EVENT_CREATED = "created"
+EVENT_REMOVED = "removed"
+
+# EventBridge 事件类型
+_EVENTBRIDGE_KINDS = {"Object Created": EVENT_CREATED, "Object Deleted": EVENT_REMOVED}
+
+
+@dataclass(slots=True)
+class S3ObjectEvent:
+    """一个对象的创建或删除"""
+    bucket: str
+    key: str
+    kind: str
+    size: int = 0
+    etag: str = ""
+    # 同一对象的事件顺序（十六进制字符串）
+    sequencer: str = ""
+    event_name: str = ""
+
+    @property
+    def removed(self) -> bool:
+        return self.kind == EVENT_REMOVED
+
+
+def _event_kind(event_name: str) -> Optional[str]:
+    """ObjectCreated:* 为创建；ObjectRemoved:* 和生命周期过期删除为删除；其他事件（恢复、转换存储类型等）忽略"""
+    if event_name.startswith("ObjectCreated:"):
+        return EVENT_CREATED
+    if event_name.startswith("ObjectRemoved:") or event_name.startswith("LifecycleExpiration:"):
+        return EVENT_REMOVED
+    return None
+
+
+def parse_event_message(body: Union[str, bytes, Dict[str, Any]]) -> List[S3ObjectEvent]:
+    """
+    解析一条队列消息中的对象事件
+
+    支持 S3 事件通知（Records）、经 SNS 转发的通知（Message 中为通知 JSON）和 EventBridge 事件；
+    S3 的测试事件（s3:TestEvent）和不相关的事件返回空列表
+
+    Raises:
+        ValueError: 消息不是 JSON
+    """
+    if isinstance(body, (str, bytes)):
+        try:
+            body = json.loads(body)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"无法解析的事件消息: {str(e)}")
+    if not isinstance(body, dict):
+        return []
+    if body.get("Type") == "Notification" and isinstance(body.get("Message"), str):
+        return parse_event_message(body["Message"])
+
+    if "detail-type" in body:
+        kind = _EVENTBRIDGE_KINDS.get(body["detail-type"])
+        detail = body.get("detail", {})
+        if kind is None or "object" not in detail:
+            return []
+        obj = detail["object"]
+        return [S3ObjectEvent(
+            bucket=detail.get("bucket", {}).get("name", ""), key=obj["key"], kind=kind,
+            size=obj.get("size", 0), etag=obj.get("etag", ""), sequencer=obj.get("sequencer", ""),
+            event_name=body["detail-type"]
+        )]
+
+    events = []
+    for record in body.get("Records", []):
+        kind = _event_kind(record.get("eventName", ""))
+        s3 = record.get("s3", {})
+        if kind is None or "object" not in s3:
+            continue
+        obj = s3["object"]
+        events.append(S3ObjectEvent(
+            # S3 事件通知中的对象键经过 URL 编码（空格编码为 +）
+            bucket=s3.get("bucket", {}).get("name", ""), key=unquote_plus(obj["key"]), kind=kind,
+            size=obj.get("size", 0), etag=obj.get("eTag", ""), sequencer=obj.get("sequencer", ""),
+            event_name=record["eventName"]
+        ))
+    return events
+
+
+@dataclass(slots=True)
+class QueueMessage:
+    """从事件源收到的一条消息"""
+    body: str
+    # 确认（删除）消息所需的句柄
+    receipt: Any = None
+    # 重新投递时不变的消息标识（用于跟踪处理失败、等待重新投递的消息）
+    message_id: str = ""
+
+    @property
+    def key(self) -> str:
+        return self.message_id or self.body
+
+
+class EventSource:
+    """事件源接口：receive 取一批消息，处理完成后 ack 确认（未确认的消息由事件源重新投递）"""
+
+    name = "base"
+    # receive 是否在没有消息时等待（长轮询）；不等待的事件源由消费者在空闲时休眠
+    long_polling = False
+
+    def receive(self, max_messages: int, wait_seconds: float) -> List[QueueMessage]:
+        raise NotImplementedError
+
+    def ack(self, messages: List[QueueMessage]):
+        raise NotImplementedError
+
+    def pending_messages(self) -> Optional[int]:
+        """
+        队列中尚未确认的消息数（包括等待投递和已投递、尚未确认的消息）；无法获取时返回 None
+
+        默认以一次空的接收为准（进程内的事件源在 ack 后没有处理中的消息）
+        """
+        return 0
+
+
+class SqsEventSource(EventSource):
+    """SQS 队列（S3 事件通知直接发送到 SQS，或经 SNS、EventBridge 转发）"""
+
+    name = "sqs"
+    long_polling = True
+
+    def __init__(self, client_factory: Callable[[], Any], queue_url: str):
+        """
+        Args:
+            client_factory: 返回 SQS 客户端的函数
+            queue_url: 队列 URL
+        """
+        self.client_factory = client_factory
+        self.queue_url = queue_url
+
+    def receive(self, max_messages: int, wait_seconds: float) -> List[QueueMessage]:
+        # 长轮询：队列为空时最多等待 wait_seconds 秒，减少空轮询请求
+        response = self.client_factory().receive_message(
+            QueueUrl=self.queue_url,
+            MaxNumberOfMessages=max(1, min(max_messages, 10)),
+            WaitTimeSeconds=int(max(0, min(wait_seconds, 20)))
+        )
+        return [QueueMessage(message["Body"], message["ReceiptHandle"], message.get("MessageId", ""))
+                for message in response.get("Messages", [])]
+
+    def pending_messages(self) -> Optional[int]:
+        """
+        队列属性中的可见、处理中（其他消费者已接收或处理失败、等待可见性超时）和延迟投递的消息数
+
+        SQS 的接收是抽样的，一次空的接收不代表队列已处理完，需要以队列属性为准
+        """
+        names = ["ApproximateNumberOfMessages", "ApproximateNumberOfMessagesNotVisible",
+                 "ApproximateNumberOfMessagesDelayed"]
+        try:
+            response = self.client_factory().get_queue_attributes(QueueUrl=self.queue_url, AttributeNames=names)
+        except Exception as e:
+            logger.warning(f"读取 SQS 队列属性失败: {str(e)}")
+            return None
+        attributes = response.get("Attributes", {})
+        return sum(int(attributes.get(name, 0)) for name in names)
+
+    def ack(self, messages: List[QueueMessage]):
+        if not messages:
+            return
+        response = self.client_factory().delete_message_batch(
+            QueueUrl=self.queue_url,
+            Entries=[{"Id": str(i), "ReceiptHandle": message.receipt} for i, message in enumerate(messages)]
+        )
+        for failure in response.get("Failed", []):
+            logger.warning(f"确认 SQS 消息失败（将重新投递）: {failure.get('Message', failure.get('Code', ''))}")
+
+
+class FileEventSource(EventSource):
+    """本地 JSON Lines 文件（每行一条消息），用于本地开发和测试；确认后才推进读取位置"""
+
+    name = "file"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._offset = 0
+        self._received: List[QueueMessage] = []
+
+    def receive(self, max_messages: int, wait_seconds: float) -> List[QueueMessage]:
+        if not os.path.exists(self.path):
+            return []
+        messages = []
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            offset = self._offset
+            while len(messages) < max_messages:
+                line = f.readline()
+                # 只读取完整的行（写入方可能正在追加）
+                if not line.endswith(b"\n"):
+                    break
+                offset += len(line)
+                if line.strip():
+                    messages.append(QueueMessage(line.decode("utf-8"), offset, str(offset)))
+        self._received = messages
+        if not messages:
+            # 只有空行时也推进读取位置
+            self._offset = offset
+        return messages
+
+    def ack(self, messages: List[QueueMessage]):
+        # 读取位置推进到第一条未确认的消息之前，未确认的消息下次重新读取
+        acked = {id(message) for message in messages}
+        for message in self._received:
+            if id(message) not in acked:
+                break
+            self._offset = message.receipt
+
+
+class MemoryEventSource(EventSource):
+    """进程内队列，用于测试"""
+
+    name = "memory"
+    long_polling = True
+
+    def __init__(self):
+        self._queue: "queue.Queue[str]" = queue.Queue()
+        self._received: List[QueueMessage] = []
+        self.acked = 0
+
+    def publish(self, body: Union[str, Dict[str, Any]]):
+        self._queue.put(body if isinstance(body, str) else json.dumps(body, ensure_ascii=False))
+
+    def receive(self, max_messages: int, wait_seconds: float) -> List[QueueMessage]:
+        messages = []
+        try:
+            messages.append(QueueMessage(self._queue.get(timeout=wait_seconds) if wait_seconds > 0
+                                         else self._queue.get_nowait()))
+            while len(messages) < max_messages:
+                messages.append(QueueMessage(self._queue.get_nowait()))
+        except queue.Empty:
+            pass
+        self._received = messages
+        return messages
+
+    def ack(self, messages: List[QueueMessage]):
+        # 未确认的消息放回队列，模拟重新投递
+        acked = {id(message) for message in messages}
+        for message in self._received:
+            if id(message) not in acked:
+                self._queue.put(message.body)
+        self._received = []
+        self.acked += len(messages)
+
+
+# 处理一个对象事件，返回处理结果（如 updated、created、removed、ignored）
+EventHandler = Callable[[S3ObjectEvent], str]
+
+
+class EventConsumer:
+    """事件消费者：轮询事件源，逐个处理对象事件，处理完成后确认消息"""
+
+    def __init__(self, source: EventSource, handler: EventHandler,
+                 on_drained: Optional[Callable[[], None]] = None,
+                 max_messages: int = 10, wait_seconds: float = 20.0, idle_seconds: float = 1.0):
+        """
+        Args:
+            source: 事件源
+            handler: 对象事件处理函数
+            on_drained: 队列已处理完时调用：一次接收没有收到消息、事件源中没有尚未确认的消息，
+                且之前处理失败的消息都已在重新投递后处理成功
+            max_messages: 每次最多接收的消息数
+            wait_seconds: 长轮询等待时间（秒）
+            idle_seconds: 事件源不支持长轮询时，没有消息后的等待时间（秒）
+        """
+        self.source = source
+        self.handler = handler
+        self.on_drained = on_drained
+        self.max_messages = max(1, max_messages)
+        self.wait_seconds = wait_seconds
+        self.idle_seconds = idle_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        # 处理失败、尚未在重新投递后处理成功的消息
+        self._unresolved: Set[str] = set()
+        self._metrics: Dict[str, Any] = {"polls": 0, "messages": 0, "events": 0, "malformed": 0, "failed": 0,
+                                         "outcomes": {}, "last_event_at": None, "last_drained_at": None}
+
+    def _count(self, key: str, value: int = 1):
+        with self._lock:
+            self._metrics[key] += value
+
+    def poll_once(self) -> int:
+        """
+        接收并处理一批消息
+
+        Returns:
+            收到的消息数
+        """
+        messages = self.source.receive(self.max_messages, self.wait_seconds)
+        self._count("polls")
+        processed = []
+        for message in messages:
+            try:
+                events = parse_event_message(message.body)
+            except ValueError as e:
+                # 无法解析的消息重新投递也无法处理，直接确认并计数
+                self._count("malformed")
+                logger.warning(str(e))
+                processed.append(message)
+                continue
+            try:
+                for event in events:
+                    outcome = self.handler(event)
+                    with self._lock:
+                        outcomes = self._metrics["outcomes"]
+                        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+                        self._metrics["events"] += 1
+                        self._metrics["last_event_at"] = time.time()
+            except Exception as e:
+                # 不确认，由事件源稍后重新投递
+                self._count("failed")
+                with self._lock:
+                    self._unresolved.add(message.key)
+                logger.error(f"处理 S3 对象事件失败: {str(e)}")
+                continue
+            processed.append(message)
+        self.source.ack(processed)
+        with self._lock:
+            self._unresolved.difference_update(message.key for message in processed)
+        self._count("messages", len(messages))
+        if not messages and self._queue_drained():
+            with self._lock:
+                self._metrics["last_drained_at"] = time.time()
+            if self.on_drained is not None:
+                self.on_drained()
+        return len(messages)
+
+    def _queue_drained(self) -> bool:
+        """
+        一次空的接收之后判断队列是否已处理完
+
+        处理失败的消息在可见性超时前不会重新投递，空的接收不代表其中的变化已经生效；
+        SQS 的短批次和空接收也可能只是抽样结果，以事件源报告的未确认消息数为准
+        """
+        with self._lock:
+            if self._unresolved:
+                return False
+        return self.source.pending_messages() == 0
+
+    def drain(self, max_polls: int = 1000) -> int:
+        """处理事件源中当前的全部消息（不等待新消息，直到一次接收没有收到消息）"""
+        wait_seconds, self.wait_seconds = self.wait_seconds, 0
+        try:
+            total = 0
+            for _ in range(max_polls):
+                received = self.poll_once()
+                total += received
+                if received == 0:
+                    break
+            return total
+        finally:
+            self.wait_seconds = wait_seconds
+
+    def start(self):
+        """启动后台线程"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="s3-event-consumer", daemon=True)
+        self._thread.start()
+        logger.info(f"S3 对象事件消费者已启动: {self.source.name}")
+
+    def stop(self):
+        """停止后台线程（进行中的轮询完成后退出）"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.wait_seconds + 5)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive() and not self._stop.is_set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                received = self.poll_once()
+            except Exception as e:
+                self._count("failed")
+                logger.error(f"接收 S3 对象事件失败: {str(e)}")
+                received = 0
+            # 长轮询的事件源在 receive 中等待；其他事件源没有消息时短暂休眠
+            if received == 0 and not self.source.long_polling and self._stop.wait(self.idle_seconds):
+                break
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """收到的消息和事件数量、各处理结果的数量、等待重新投递的失败消息数和最近一次处理完队列的时间"""
+        with self._lock:
+            metrics = dict(self._metrics, outcomes=dict(self._metrics["outcomes"]), unresolved=len(self._unresolved))
+        return dict(metrics, source=self.source.name, running=self.running)
+
+
+# 全局事件消费者
+_consumer: Optional[EventConsumer] = None
+_consumer_lock = threading.Lock()
+
+
+def start_event_consumer(source: EventSource, handler: EventHandler,
+                         on_drained: Optional[Callable[[], None]] = None, max_messages: int = 10,
+                         wait_seconds: float = 20.0, idle_seconds: float = 1.0) -> EventConsumer:
+    """启动全局事件消费者（替换之前的消费者）"""
+    global _consumer
+    with _consumer_lock:
+        if _consumer is not None:
+            _consumer.stop()
+        _consumer = EventConsumer(source, handler, on_drained, max_messages, wait_seconds, idle_seconds)
+        _consumer.start()
+        return _consumer
+
+
+def stop_event_consumer():
+    """停止全局事件消费者"""
+    global _consumer
+    with _consumer_lock:
+        if _consumer is not None:
+            _consumer.stop()
+            _consumer = None
+
+
+def get_event_consumer() -> Optional[EventConsumer]:
+    """获取全局事件消费者（未启动时为 None）"""
+    return _consumer
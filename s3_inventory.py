@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+"""
+S3 Inventory 清单导入模块
+读取 S3 Inventory 每天（或每周）生成的清单（manifest.json 及其 CSV / ORC / Parquet 数据文件），流式解析、分块产出
+存储桶全部对象的列表元数据，代替成千上万次分页 LIST 调用；清单日期之后新建和删除的讲者文件夹只按顶层文件夹实时列出，
+已有文件夹内的变化由 S3 对象事件补齐（未开启对象事件时不使用清单）。
+CSV 使用内置解析；ORC 和 Parquet 需要安装 pyarrow
+"""
+
+import csv
+import gzip
+import hashlib
+import io
+import json
+import logging
+import re
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set
+from urllib.parse import unquote_plus
+
+from cost_ledger import record_usage
+
+# 尝试导入 pyarrow，如果失败则只支持 CSV 格式的清单
+try:
+    import pyarrow.orc
+    import pyarrow.parquet
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# 清单按生成时间存放在 <前缀>/<源存储桶>/<清单配置 ID>/YYYY-MM-DDTHH-MMZ/ 下
+_MANIFEST_FOLDER = re.compile(r"(\d{4}-\d{2}-\d{2}T\d{2}-\d{2}Z)/$")
+# ORC / Parquet 数据文件中的列名
+_COLUMNAR_FIELDS = ("key", "size", "e_tag", "is_latest", "is_delete_marker")
+# ORC / Parquet 数据文件先写入临时文件（需要随机读取），超过该大小时落盘
+_SPOOL_BYTES = 64 * 1024 * 1024
+_READ_SIZE = 1024 * 1024
+
+
+class InventoryError(Exception):
+    """清单格式不支持、内容不完整或校验失败"""
+
+
+@dataclass(slots=True)
+class InventoryManifest:
+    """一次清单的 manifest.json"""
+    key: str
+    source_bucket: str
+    destination_bucket: str
+    file_format: str
+    # CSV 的列名（ORC / Parquet 按列名读取，不使用）
+    schema: List[str]
+    # 数据文件（key、size、MD5checksum）
+    files: List[Dict[str, Any]]
+    # 清单生成时间（epoch 秒）；清单中的对象列表截至该时间
+    created_at: float
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any], key: str = "") -> "InventoryManifest":
+        try:
+            return cls(
+                key=key,
+                source_bucket=data["sourceBucket"],
+                # arn:aws:s3:::bucket-name
+                destination_bucket=data["destinationBucket"].rsplit(":", 1)[-1],
+                file_format=data["fileFormat"].upper(),
+                schema=[column.strip() for column in data.get("fileSchema", "").split(",")],
+                files=list(data["files"]),
+                created_at=int(data["creationTimestamp"]) / 1000
+            )
+        except (KeyError, TypeError, ValueError) as e:
+            raise InventoryError(f"无法解析的清单 {key}: {str(e)}")
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "manifest": self.key,
+            "source_bucket": self.source_bucket,
+            "file_format": self.file_format,
+            "data_files": len(self.files),
+            "data_bytes": sum(file.get("size", 0) for file in self.files),
+            "created_at": datetime.fromtimestamp(self.created_at).isoformat(timespec="seconds")
+        }
+
+
+class _VerifyingReader(io.RawIOBase):
+    """读取时计算 MD5，读到末尾后与清单中记录的校验和比较"""
+
+    def __init__(self, body, expected_md5: str, name: str):
+        self._body = body
+        self._md5 = hashlib.md5()
+        self._expected = (expected_md5 or "").lower()
+        self._name = name
+        self.bytes_read = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self._body.read(len(buffer))
+        if not data:
+            if self._expected and self._md5.hexdigest() != self._expected:
+                raise InventoryError(f"清单数据文件校验失败: {self._name}")
+            return 0
+        self._md5.update(data)
+        self.bytes_read += len(data)
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def _is_false(value: Any) -> bool:
+    return value is False or str(value).lower() == "false"
+
+
+def _inventory_object(key: str, size: Any, etag: Any, is_latest: Any = True,
+                      is_delete_marker: Any = False) -> Optional[Dict[str, Any]]:
+    """清单中的一行 -> 与 LIST 结果相同结构的对象；旧版本、删除标记和文件夹占位对象返回 None"""
+    if not key or key.endswith("/") or _is_false(is_latest) or not _is_false(is_delete_marker):
+        return None
+    etag = str(etag or "")
+    # 清单中的 ETag 不带引号，LIST 结果带引号
+    if etag and not etag.startswith('"'):
+        etag = f'"{etag}"'
+    return {"key": key, "etag": etag, "size": int(size or 0)}
+
+
+def iter_csv_objects(stream, schema: List[str]) -> Iterator[Dict[str, Any]]:
+    """逐行解析 gzip 压缩的 CSV 数据文件（对象键经过 URL 编码）"""
+    columns = {name: index for index, name in enumerate(schema)}
+    if "Key" not in columns:
+        raise InventoryError("清单中没有 Key 列")
+
+    def column(row, name, default=None):
+        index = columns.get(name)
+        return row[index] if index is not None and index < len(row) else default
+
+    text = io.TextIOWrapper(gzip.GzipFile(fileobj=stream), encoding="utf-8", newline="")
+    for row in csv.reader(text):
+        obj = _inventory_object(unquote_plus(column(row, "Key", "")), column(row, "Size"), column(row, "ETag"),
+                                column(row, "IsLatest", True), column(row, "IsDeleteMarker", False))
+        if obj is not None:
+            yield obj
+
+
+def iter_columnar_objects(stream, file_format: str, batch_size: int = 10000) -> Iterator[Dict[str, Any]]:
+    """按行组（Parquet）或条带（ORC）读取数据文件，只读取需要的列"""
+    if not PYARROW_AVAILABLE:
+        raise InventoryError(f"{file_format} 格式的清单需要 pyarrow，请运行: pip install pyarrow")
+    with tempfile.SpooledTemporaryFile(max_size=_SPOOL_BYTES) as spooled:
+        while True:
+            data = stream.read(_READ_SIZE)
+            if not data:
+                break
+            spooled.write(data)
+        spooled.seek(0)
+        if file_format == "PARQUET":
+            reader = pyarrow.parquet.ParquetFile(spooled)
+            names = set(reader.schema_arrow.names)
+            batches = reader.iter_batches(batch_size=batch_size,
+                                          columns=[name for name in _COLUMNAR_FIELDS if name in names])
+        else:
+            reader = pyarrow.orc.ORCFile(spooled)
+            names = set(reader.schema.names)
+            batches = (reader.read_stripe(index, columns=[name for name in _COLUMNAR_FIELDS if name in names])
+                       for index in range(reader.nstripes))
+        for batch in batches:
+            columns = batch.to_pydict()
+            for row in range(batch.num_rows):
+                obj = _inventory_object(
+                    columns["key"][row], columns.get("size", [0] * batch.num_rows)[row],
+                    columns.get("e_tag", [""] * batch.num_rows)[row],
+                    columns.get("is_latest", [True] * batch.num_rows)[row],
+                    columns.get("is_delete_marker", [False] * batch.num_rows)[row]
+                )
+                if obj is not None:
+                    yield obj
+
+
+def _chunked(objects: Iterable[Dict[str, Any]], chunk_size: int) -> Iterator[List[Dict[str, Any]]]:
+    chunk = []
+    for obj in objects:
+        chunk.append(obj)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+@dataclass(slots=True)
+class InventoryStats:
+    """一次清单导入的统计"""
+    manifest: str = ""
+    data_files: int = 0
+    data_bytes: int = 0
+    objects: int = 0
+    # 清单之后新建（实时列出）和删除（从清单中去掉）的顶层文件夹
+    new_folders: List[str] = field(default_factory=list)
+    deleted_folders: List[str] = field(default_factory=list)
+    live_objects: int = 0
+    seconds: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class InventoryReader:
+    """按 [INVENTORY] 配置查找最新清单并流式读取"""
+
+    def __init__(self, enabled: bool = False, bucket: str = "", prefix: str = "",
+                 max_age_seconds: float = 86400.0, chunk_size: int = 10000):
+        """
+        Args:
+            enabled: 全量扫描存储桶时是否优先使用清单
+            bucket: 存放清单的目标存储桶
+            prefix: 清单配置的路径（<目标前缀>/<源存储桶>/<清单配置 ID>/）
+            max_age_seconds: 超过该时间的清单不使用（改为分页 LIST）
+            chunk_size: 每块产出的对象数量
+        """
+        self.enabled = enabled
+        self.bucket = bucket
+        self.prefix = prefix.rstrip("/") + "/" if prefix else ""
+        self.max_age_seconds = max_age_seconds
+        self.chunk_size = max(1, chunk_size)
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Any] = {"imports": 0, "fallbacks": 0, "last_import": None}
+
+    def latest_manifest(self, client) -> Optional[InventoryManifest]:
+        """
+        查找最新的完整清单（manifest.checksum 在 manifest.json 写完后生成，没有校验文件的清单仍在写入）
+
+        Returns:
+            最新的清单；没有清单时返回 None
+        """
+        folders = []
+        kwargs = {"Bucket": self.bucket, "Prefix": self.prefix, "Delimiter": "/"}
+        while True:
+            response = client.list_objects_v2(**kwargs)
+            record_usage(s3_list_calls=1)
+            for common in response.get("CommonPrefixes", []):
+                if _MANIFEST_FOLDER.search(common["Prefix"]):
+                    folders.append(common["Prefix"])
+            if not response.get("IsTruncated"):
+                break
+            kwargs["ContinuationToken"] = response["NextContinuationToken"]
+
+        for folder in sorted(folders, reverse=True):
+            try:
+                checksum = self._read(client, f"{folder}manifest.checksum").decode("ascii").strip()
+            except Exception as e:
+                if _is_missing(e):
+                    continue
+                raise
+            body = self._read(client, f"{folder}manifest.json")
+            if hashlib.md5(body).hexdigest() != checksum.lower():
+                raise InventoryError(f"清单校验失败: {folder}manifest.json")
+            return InventoryManifest.from_json(json.loads(body), f"{folder}manifest.json")
+        return None
+
+    def usable_manifest(self, client, source_bucket: str, now: Optional[float] = None,
+                        changes_tracked: bool = True) -> Optional[InventoryManifest]:
+        """
+        全量扫描 source_bucket 时可以使用的清单
+
+        Args:
+            changes_tracked: 清单日期之后已有文件夹内的变化是否由 S3 对象事件补齐；
+                清单只实时补齐新建和删除的顶层文件夹，未补齐时不使用清单
+
+        Returns:
+            未启用、没有对象事件补齐、没有清单、清单不属于该存储桶或已过期时返回 None（调用方改为分页 LIST）
+        """
+        if not self.enabled or not self.bucket:
+            return None
+        now = time.time() if now is None else now
+        manifest = None
+        if not changes_tracked:
+            logger.warning("清单之后已有文件夹内的变化需要开启 [EVENTS] 由对象事件补齐，改为分页列出")
+        else:
+            try:
+                manifest = self.latest_manifest(client)
+            except Exception as e:
+                logger.warning(f"读取 S3 Inventory 清单失败，改为分页列出: {str(e)}")
+        if manifest is not None and manifest.source_bucket != source_bucket:
+            logger.warning(f"S3 Inventory 清单 {manifest.key} 属于存储桶 {manifest.source_bucket}，"
+                           f"不用于 {source_bucket}")
+            manifest = None
+        if manifest is not None and now - manifest.created_at > self.max_age_seconds:
+            logger.warning(f"S3 Inventory 清单 {manifest.key} 已过期，改为分页列出")
+            manifest = None
+        if manifest is None:
+            with self._lock:
+                self._metrics["fallbacks"] += 1
+        return manifest
+
+    def iter_chunks(self, client, manifest: InventoryManifest,
+                    stats: Optional[InventoryStats] = None) -> Iterator[List[Dict[str, Any]]]:
+        """逐个数据文件流式读取清单，按 chunk_size 分块产出对象（key、etag、size）"""
+        if manifest.file_format not in ("CSV", "ORC", "PARQUET"):
+            raise InventoryError(f"不支持的清单格式: {manifest.file_format}")
+        stats = stats if stats is not None else InventoryStats()
+        stats.manifest = manifest.key
+        for file in manifest.files:
+            response = client.get_object(Bucket=manifest.destination_bucket or self.bucket, Key=file["key"])
+            stream = _VerifyingReader(response["Body"], file.get("MD5checksum", ""), file["key"])
+            if manifest.file_format == "CSV":
+                objects = iter_csv_objects(io.BufferedReader(stream, _READ_SIZE), manifest.schema)
+            else:
+                objects = iter_columnar_objects(stream, manifest.file_format, self.chunk_size)
+            for chunk in _chunked(objects, self.chunk_size):
+                stats.objects += len(chunk)
+                yield chunk
+            stats.data_files += 1
+            stats.data_bytes += stream.bytes_read
+            record_usage(s3_get_calls=1, s3_bytes_read=stream.bytes_read)
+
+    def iter_objects(self, client, manifest: InventoryManifest, live_folders: Optional[Set[str]] = None,
+                     list_folder: Optional[Callable[[str], Iterable[Dict[str, Any]]]] = None,
+                     stats: Optional[InventoryStats] = None) -> Iterator[Dict[str, Any]]:
+        """
+        存储桶的全部对象：清单中的对象，加上清单日期之后新建和删除的顶层文件夹
+
+        已有文件夹内清单日期之后的变化不在其中，由 S3 对象事件补齐（登记表刷新不覆盖清单日期之后由事件更新的文件夹）
+
+        Args:
+            live_folders: 当前的顶层文件夹（按 “/” 分隔列出，每次请求最多 1000 个文件夹）；
+                不在其中的清单文件夹已被删除，跳过
+            list_folder: 列出一个文件夹全部对象的函数，只用于清单中没有的新文件夹
+            stats: 导入统计（读取过程中更新）
+        """
+        started = time.monotonic()
+        stats = stats if stats is not None else InventoryStats()
+        seen: Set[str] = set()
+        deleted: Set[str] = set()
+        for chunk in self.iter_chunks(client, manifest, stats):
+            for obj in chunk:
+                folder = obj["key"].split("/", 1)[0] + "/" if "/" in obj["key"] else ""
+                if folder and live_folders is not None and folder not in live_folders:
+                    deleted.add(folder)
+                    continue
+                seen.add(folder)
+                yield obj
+        stats.deleted_folders = sorted(deleted)
+        if live_folders is not None and list_folder is not None:
+            for folder in sorted(live_folders - seen):
+                stats.new_folders.append(folder)
+                for obj in list_folder(folder):
+                    stats.live_objects += 1
+                    yield obj
+        stats.seconds = round(time.monotonic() - started, 3)
+        with self._lock:
+            self._metrics["imports"] += 1
+            self._metrics["last_import"] = dict(stats.to_dict(), created_at=manifest.summary()["created_at"])
+        logger.info(f"S3 Inventory 清单导入完成: {manifest.key}, 对象 {stats.objects} 个, "
+                    f"新文件夹 {len(stats.new_folders)} 个（实时列出 {stats.live_objects} 个对象）, "
+                    f"已删除文件夹 {len(stats.deleted_folders)} 个, 耗时 {stats.seconds}s")
+
+    def _read(self, client, key: str) -> bytes:
+        data = client.get_object(Bucket=self.bucket, Key=key)["Body"].read()
+        record_usage(s3_get_calls=1, s3_bytes_read=len(data))
+        return data
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """导入次数、改为分页列出的次数和最近一次导入的统计"""
+        with self._lock:
+            metrics = dict(self._metrics)
+        return dict(metrics, enabled=self.enabled, bucket=self.bucket, prefix=self.prefix)
+
+
+def _is_missing(error: Exception) -> bool:
+    """对象不存在（botocore ClientError 的 NoSuchKey / 404）"""
+    code = getattr(error, "response", {}).get("Error", {}).get("Code", "")
+    return code in ("NoSuchKey", "404", "NotFound")
+
+
+def list_top_level_folders(client, bucket: str) -> Set[str]:
+    """按 “/” 分隔列出存储桶的顶层文件夹（每次请求返回最多 1000 个文件夹，不列出文件夹中的对象）"""
+    folders: Set[str] = set()
+    kwargs = {"Bucket": bucket, "Delimiter": "/"}
+    while True:
+        response = client.list_objects_v2(**kwargs)
+        record_usage(s3_list_calls=1)
+        folders.update(common["Prefix"] for common in response.get("CommonPrefixes", []))
+        if not response.get("IsTruncated"):
+            return folders
+        kwargs["ContinuationToken"] = response["NextContinuationToken"]
+
+
+# 全局清单读取器
+_reader = InventoryReader()
+
+
+def configure_inventory_reader(enabled: bool = False, bucket: str = "", prefix: str = "",
+                               max_age_seconds: float = 86400.0, chunk_size: int = 10000) -> InventoryReader:
+    """按 [INVENTORY] 配置替换全局清单读取器"""
+    global _reader
+    _reader = InventoryReader(enabled, bucket, prefix, max_age_seconds, chunk_size)
+    if enabled:
+        logger.info(f"S3 Inventory 清单: s3://{bucket}/{_reader.prefix}")
+    return _reader
+
+
+def get_inventory_reader() -> InventoryReader:
+    """获取全局清单读取器"""
+    return _reader
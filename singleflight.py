@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+请求合并（single-flight）模块
+相同键的并发调用共享同一次进行中的计算，所有调用方获得同一结果；
+同步调用（线程）和异步调用（协程）可以互相合并
+"""
+
+import asyncio
+import copy
+import logging
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_input(text: str) -> str:
+    """规范化用户输入作为合并键：去除首尾空白并合并连续空白"""
+    return _WHITESPACE_RE.sub(' ', (text or '').strip())
+
+
+class _InFlightCall:
+    """一次进行中的计算"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.followers = 0
+        # 异步跟随者：(事件循环, future)，计算完成时在各自的事件循环中唤醒
+        self.async_waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    def finish(self):
+        self.done.set()
+        for loop, future in self.async_waiters:
+            try:
+                loop.call_soon_threadsafe(_resolve_waiter, future)
+            except RuntimeError:
+                # 跟随者所在的事件循环已关闭
+                pass
+
+
+def _resolve_waiter(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class SingleFlight:
+    """按键合并并发调用"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, _InFlightCall] = {}
+        self._lock = threading.Lock()
+        self._metrics = {
+            "executions": 0,
+            "coalesced": 0,
+            "wait_timeouts": 0,
+            "leader_aborts": 0,
+            "truncated_reruns": 0
+        }
+
+    def do(self, key: Hashable, func: Callable[..., Any], *args,
+           wait_timeout: Optional[float] = None, reusable: Optional[Callable[[Any], bool]] = None,
+           **kwargs) -> Any:
+        """
+        执行 func，若相同 key 已有进行中的调用则等待并共享其结果
+
+        Args:
+            key: 合并键
+            func: 实际计算函数
+            wait_timeout: 跟随者最长等待秒数，None 表示一直等待
+            reusable: 跟随者能否使用领导者的结果，返回 False 时跟随者重新执行
+                （如领导者的时间预算较短、结果被截断，而跟随者还有时间）；None 表示总是共享
+            *args, **kwargs: 透传给 func 的参数
+
+        Returns:
+            计算结果（跟随者获得深拷贝，避免共享可变对象）
+
+        Raises:
+            TimeoutError: 跟随者等待超时
+            Exception: 领导者计算抛出的异常会传递给所有调用方；领导者被中断（如请求取消）时跟随者重新执行
+        """
+        wait_until = None if wait_timeout is None else time.monotonic() + wait_timeout
+        while True:
+            call, leader, _ = self._join(key)
+            if leader:
+                break
+
+            logger.info(f"{self.name}: 合并重复请求，等待进行中的计算")
+            remaining = None if wait_until is None else max(0.0, wait_until - time.monotonic())
+            if not call.done.wait(remaining):
+                self._wait_timed_out()
+            if self._follower_outcome(call, reusable):
+                return copy.deepcopy(call.result)
+
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            self._leave(key, call)
+
+    async def do_async(self, key: Hashable, func: Callable[..., Any], *args,
+                       wait_timeout: Optional[float] = None, reusable: Optional[Callable[[Any], bool]] = None,
+                       **kwargs) -> Any:
+        """
+        执行协程函数 func（异步版本，跟随者等待期间不占用线程）
+
+        参数、返回值和异常与 do 相同；领导者任务被取消时跟随者重新执行
+        """
+        loop = asyncio.get_running_loop()
+        wait_until = None if wait_timeout is None else time.monotonic() + wait_timeout
+        while True:
+            call, leader, waiter = self._join(key, loop)
+            if leader:
+                break
+
+            logger.info(f"{self.name}: 合并重复请求，等待进行中的计算")
+            remaining = None if wait_until is None else max(0.0, wait_until - time.monotonic())
+            try:
+                await asyncio.wait_for(waiter, remaining)
+            except asyncio.TimeoutError:
+                self._wait_timed_out()
+            if self._follower_outcome(call, reusable):
+                return copy.deepcopy(call.result)
+
+        try:
+            call.result = await func(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            self._leave(key, call)
+
+    def _join(self, key: Hashable, loop: Optional[asyncio.AbstractEventLoop] = None
+              ) -> Tuple[_InFlightCall, bool, Optional[asyncio.Future]]:
+        """
+        加入相同键的计算，返回 (计算, 是否为领导者, 异步跟随者的等待 future)
+
+        异步跟随者在锁内登记等待，保证领导者结束时一定会唤醒它
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = _InFlightCall()
+                self._calls[key] = call
+                self._metrics["executions"] += 1
+                return call, True, None
+            call.followers += 1
+            self._metrics["coalesced"] += 1
+            waiter = None
+            if loop is not None:
+                waiter = loop.create_future()
+                call.async_waiters.append((loop, waiter))
+            return call, False, waiter
+
+    def _leave(self, key: Hashable, call: _InFlightCall):
+        """领导者结束计算：移除进行中的记录并唤醒所有跟随者"""
+        with self._lock:
+            self._calls.pop(key, None)
+        call.finish()
+
+    def _wait_timed_out(self):
+        with self._lock:
+            self._metrics["wait_timeouts"] += 1
+        raise TimeoutError(f"{self.name}: 等待进行中的计算超时")
+
+    def _follower_outcome(self, call: _InFlightCall, reusable: Optional[Callable[[Any], bool]] = None) -> bool:
+        """
+        跟随者等到计算结束后：成功返回 True，计算出错时抛出同一异常，
+        领导者被中断（如其请求被取消）而不是计算出错时、或结果不能给该跟随者使用时返回 False，由跟随者重新发起计算
+        """
+        if call.error is None:
+            if reusable is None or reusable(call.result):
+                return True
+            with self._lock:
+                self._metrics["truncated_reruns"] += 1
+            logger.info(f"{self.name}: 进行中的计算结果被其时间预算截断，按自身时间预算重新执行")
+            return False
+        if isinstance(call.error, Exception):
+            raise call.error
+        with self._lock:
+            self._metrics["leader_aborts"] += 1
+        logger.info(f"{self.name}: 进行中的计算被中断，重新执行")
+        return False
+
+    def in_flight(self) -> int:
+        """当前进行中的计算数量"""
+        with self._lock:
+            return len(self._calls)
+
+    def get_metrics(self) -> Dict[str, int]:
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics["in_flight"] = len(self._calls)
+        return metrics
+
+
+# 全局合并组注册表
+_groups: Dict[str, SingleFlight] = {}
+_groups_lock = threading.Lock()
+
+
+def get_single_flight(name: str) -> SingleFlight:
+    """获取指定名称的合并组，不存在时创建"""
+    with _groups_lock:
+        group = _groups.get(name)
+        if group is None:
+            group = SingleFlight(name)
+            _groups[name] = group
+        return group
+
+
+def get_coalescing_metrics() -> Dict[str, Dict[str, int]]:
+    """获取所有合并组的指标"""
+    with _groups_lock:
+        groups = list(_groups.items())
+    return {name: group.get_metrics() for name, group in groups}
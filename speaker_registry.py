@@ -0,0 +1,786 @@
+#!/usr/bin/env python3
+"""
+讲者预验证登记表模块
+定时（如每晚）列出存储桶中全部 “姓名-医院-科室/” 文件夹，解析出讲者信息，限速批量执行EXA网络搜索验证和文档计数，
+结果写入本地 SQLite（WAL 模式）；预审时先在登记表中按提交内容查找讲者，命中且未过期时不再调用 Bedrock、EXA 和 S3
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from folder_profiler import categorize, format_from_name
+from resilience import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS speakers (
+    bucket TEXT NOT NULL,
+    folder TEXT NOT NULL,
+    name TEXT NOT NULL,
+    hospital TEXT NOT NULL,
+    department TEXT NOT NULL,
+    file_count INTEGER NOT NULL,
+    unique_file_count INTEGER NOT NULL,
+    files_json TEXT,
+    duplicate_groups_json TEXT,
+    objects_json TEXT,
+    documents_json TEXT,
+    fingerprint TEXT,
+    listed_at REAL NOT NULL,
+    verification_passed INTEGER,
+    verification_json TEXT,
+    verified_at REAL,
+    PRIMARY KEY (bucket, folder)
+);
+CREATE INDEX IF NOT EXISTS idx_speakers_name ON speakers (bucket, name);
+CREATE TABLE IF NOT EXISTS registry_meta (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    generation INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO registry_meta (id, generation) VALUES (1, 0);
+CREATE TABLE IF NOT EXISTS event_polls (
+    bucket TEXT PRIMARY KEY,
+    drained_at REAL NOT NULL
+);
+"""
+
+# 早期版本的数据库中没有的列（连接时补齐）
+ADDED_COLUMNS = {"objects_json": "TEXT", "documents_json": "TEXT"}
+
+IDENTITY_COLUMNS = ("name", "hospital", "department")
+# 文件夹内容：列出时间较新的写入生效（刷新进行期间由对象事件更新的文件夹不会被刷新开始时的列表覆盖）
+LISTING_COLUMNS = (
+    "file_count", "unique_file_count", "files_json", "duplicate_groups_json", "objects_json", "documents_json",
+    "fingerprint", "listed_at"
+)
+# EXA验证结果：验证时间较新的写入生效
+VERIFICATION_COLUMNS = ("verification_passed", "verification_json", "verified_at")
+
+COLUMNS = ("bucket", "folder") + IDENTITY_COLUMNS + LISTING_COLUMNS + VERIFICATION_COLUMNS
+
+UPSERT_SQL = (
+    f"INSERT INTO speakers ({', '.join(COLUMNS)}) VALUES ({', '.join('?' for _ in COLUMNS)}) "
+    f"ON CONFLICT (bucket, folder) DO UPDATE SET "
+    + ", ".join(
+        [f"{column} = excluded.{column}" for column in IDENTITY_COLUMNS]
+        + [f"{column} = CASE WHEN excluded.listed_at >= speakers.listed_at "
+           f"THEN excluded.{column} ELSE speakers.{column} END" for column in LISTING_COLUMNS]
+        + [f"{column} = CASE WHEN excluded.verified_at IS NOT NULL AND (speakers.verified_at IS NULL "
+           f"OR excluded.verified_at >= speakers.verified_at) THEN excluded.{column} ELSE speakers.{column} END"
+           for column in VERIFICATION_COLUMNS]
+    )
+)
+
+# 文件夹检查结果中只展示前 10 个文件名（与实时列出时一致）
+MAX_LISTED_FILES = 10
+
+# 判断提交内容是否只提到一位讲者时忽略的称谓、字段标签和连接词（长词在前）
+PERSON_FILLER_WORDS = (
+    "副主任医师", "主任医师", "主治医师", "住院医师", "副主任", "副教授", "主任", "教授", "医师", "医生",
+    "大夫", "专家", "老师", "讲者", "姓名", "医院", "科室", "职称", "来自", "的"
+)
+_PUNCTUATION_RE = re.compile(r"[\W_]+")
+
+# 统计文件夹中唯一文档的函数 count_documents(prefix, objects)，返回 unique_file_count 和 duplicate_groups
+DocumentCounter = Callable[[str, List[Dict[str, Any]]], Dict[str, Any]]
+# EXA网络搜索验证函数 verify(name, hospital, department)，返回与 search_doctor_with_exa 相同结构的结果
+SpeakerVerifier = Callable[[str, str, str], Dict[str, Any]]
+
+
+def parse_folder_name(folder: str) -> Optional[Dict[str, str]]:
+    """
+    将 “姓名-医院-科室/” 文件夹名解析为讲者信息（医院名称中可以包含 “-”）
+
+    Returns:
+        包含 name、hospital、department 的字典；不符合格式的文件夹（如 tinabao/）返回 None
+    """
+    parts = [part.strip() for part in folder.rstrip("/").split("-")]
+    if len(parts) < 3 or "/" in folder.rstrip("/"):
+        return None
+    name, hospital, department = parts[0], "-".join(parts[1:-1]), parts[-1]
+    if not name or not hospital or not department:
+        return None
+    return {"name": name, "hospital": hospital, "department": department}
+
+
+def speaker_folder(key: str) -> str:
+    """对象所属的讲者文件夹（存储桶顶层前缀；子目录中的文档也计入讲者文件夹）"""
+    return key.split("/", 1)[0] + "/" if "/" in key else ""
+
+
+def listing_fingerprint(objects: List[Dict[str, Any]]) -> str:
+    """文件夹列表内容（键和 ETag）的指纹"""
+    digest = hashlib.md5()
+    for obj in sorted(objects, key=lambda obj: obj["key"]):
+        digest.update(f"{obj['key']}\0{obj.get('etag', '')}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def document_types(objects: List[Dict[str, Any]]) -> Dict[str, Dict[str, int]]:
+    """按文件名统计各格式和各类别的文档数量（不读取内容）"""
+    formats: Dict[str, int] = {}
+    categories: Dict[str, int] = {}
+    for obj in objects:
+        doc_format, category = format_from_name(obj["key"]), categorize(obj["key"])
+        formats[doc_format] = formats.get(doc_format, 0) + 1
+        categories[category] = categories.get(category, 0) + 1
+    return {"formats": dict(sorted(formats.items())), "categories": dict(sorted(categories.items()))}
+
+
+def _is_newer(sequencer: str, other: str) -> bool:
+    """比较 S3 事件的 sequencer（十六进制字符串，较短的一方右侧补 0 后按字典序比较）"""
+    width = max(len(sequencer), len(other))
+    return sequencer.upper().ljust(width, "0") > other.upper().ljust(width, "0")
+
+
+def _isoformat(timestamp: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(timestamp).isoformat(timespec="seconds") if timestamp is not None else None
+
+
+@dataclass(slots=True)
+class SpeakerRecord:
+    """登记表中的一位讲者（一个讲者文件夹）"""
+    bucket: str
+    folder: str
+    name: str
+    hospital: str
+    department: str
+    file_count: int
+    unique_file_count: int
+    listed_at: float
+    files: List[str] = field(default_factory=list)
+    duplicate_groups: List[Dict[str, Any]] = field(default_factory=list)
+    # 文件夹中全部对象的列表元数据（key、etag、size，对象事件更新时还有 sequencer），用于增量更新
+    objects: List[Dict[str, Any]] = field(default_factory=list)
+    # 按文件名统计的各格式和各类别的文档数量
+    documents: Dict[str, Dict[str, int]] = field(default_factory=dict)
+    fingerprint: str = ""
+    # EXA网络搜索验证结果；从未成功验证时为空
+    verification: Dict[str, Any] = field(default_factory=dict)
+    verification_passed: Optional[bool] = None
+    verified_at: Optional[float] = None
+
+    @classmethod
+    def from_row(cls, row: sqlite3.Row) -> "SpeakerRecord":
+        passed = row["verification_passed"]
+        return cls(
+            bucket=row["bucket"], folder=row["folder"], name=row["name"], hospital=row["hospital"],
+            department=row["department"], file_count=row["file_count"],
+            unique_file_count=row["unique_file_count"], listed_at=row["listed_at"],
+            files=json.loads(row["files_json"] or "[]"),
+            duplicate_groups=json.loads(row["duplicate_groups_json"] or "[]"),
+            objects=json.loads(row["objects_json"] or "[]"),
+            documents=json.loads(row["documents_json"] or "{}"),
+            fingerprint=row["fingerprint"] or "",
+            verification=json.loads(row["verification_json"] or "{}"),
+            verification_passed=None if passed is None else bool(passed),
+            verified_at=row["verified_at"]
+        )
+
+    def to_row(self) -> Tuple[Any, ...]:
+        return (
+            self.bucket, self.folder, self.name, self.hospital, self.department, self.file_count,
+            self.unique_file_count, json.dumps(self.files, ensure_ascii=False),
+            json.dumps(self.duplicate_groups, ensure_ascii=False), json.dumps(self.objects, ensure_ascii=False),
+            json.dumps(self.documents, ensure_ascii=False), self.fingerprint, self.listed_at,
+            None if self.verification_passed is None else int(self.verification_passed),
+            json.dumps(self.verification, ensure_ascii=False) if self.verification else None, self.verified_at
+        )
+
+    @property
+    def extracted_info(self) -> Dict[str, str]:
+        """与 Bedrock 提取结果结构相同的讲者信息（文件夹名中没有职称）"""
+        return {"name": self.name, "hospital": self.hospital, "department": self.department, "title": ""}
+
+    def only_person_named(self, text: str) -> bool:
+        """
+        提交内容是否只提到该讲者：去掉其姓名、医院、科室、称谓和标点后没有其他文字
+
+        还有其他文字时内容可能提到登记表之外的人（如未登记的讲者和同院已登记的同事），
+        调用方需要用 Bedrock 提取结果确认内容中的讲者就是该记录
+        """
+        rest = "".join(text.split())
+        for word in (self.name, self.hospital, self.department) + PERSON_FILLER_WORDS:
+            if word:
+                rest = rest.replace(word, "")
+        return not _PUNCTUATION_RE.sub("", rest)
+
+    def listing_result(self) -> Dict[str, Any]:
+        """与实时文件夹检查结构相同的结果（不含对象元数据，依赖对象列表的可选阶段不执行）"""
+        return {
+            "success": True,
+            "file_count": self.file_count,
+            "key_count": self.file_count,
+            "files": self.files[:MAX_LISTED_FILES],
+            "objects": [],
+            "unique_file_count": self.unique_file_count,
+            "duplicate_groups": self.duplicate_groups,
+            "unverified_duplicates": [],
+            "bucket_name": self.bucket,
+            "prefix": self.folder,
+            "from_registry": True
+        }
+
+    def summary(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """预审结果中记录的登记表来源信息"""
+        now = time.time() if now is None else now
+        return {
+            "folder": self.folder,
+            "listed_at": _isoformat(self.listed_at),
+            "verified_at": _isoformat(self.verified_at),
+            "age_seconds": round(now - min(self.listed_at, self.verified_at or self.listed_at), 1)
+        }
+
+    def set_objects(self, objects: List[Dict[str, Any]], count_documents: Optional[DocumentCounter], now: float):
+        """替换文件夹的对象列表，重新计算文档数量、重复文档和类型统计"""
+        counts = count_documents(self.folder, objects) if count_documents else {}
+        self.objects = sorted(objects, key=lambda obj: obj["key"])
+        self.file_count = len(objects)
+        self.unique_file_count = counts.get("unique_file_count", len(objects))
+        self.duplicate_groups = counts.get("duplicate_groups", [])
+        self.files = [obj["key"] for obj in self.objects][:MAX_LISTED_FILES]
+        self.documents = document_types(objects)
+        self.fingerprint = listing_fingerprint(objects)
+        self.listed_at = now
+
+    def to_dict(self) -> Dict[str, Any]:
+        record = asdict(self)
+        record.pop("objects")
+        record["listed_at"] = _isoformat(self.listed_at)
+        record["verified_at"] = _isoformat(self.verified_at)
+        return record
+
+
+@dataclass(slots=True)
+class RefreshStats:
+    """一次登记表刷新的统计"""
+    folders: int = 0
+    unparsed: int = 0
+    verified: int = 0
+    reused: int = 0
+    verify_errors: int = 0
+    removed: int = 0
+    seconds: float = 0.0
+    # 列表结果的来源：list（分页列出）或 inventory（S3 Inventory 清单，附导入统计）
+    listing: Dict[str, Any] = field(default_factory=lambda: {"source": "list"})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class SpeakerRegistry:
+    """讲者预验证登记表"""
+
+    def __init__(self, enabled: bool = False, path: str = "audit/speaker_registry.db",
+                 max_age_seconds: float = 129600.0, verify_max_age_seconds: float = 604800.0):
+        """
+        Args:
+            enabled: 预审时是否先查找登记表
+            path: SQLite 数据库文件路径
+            max_age_seconds: 文档计数的有效期（秒），超过后预审实时列出文件夹
+            verify_max_age_seconds: EXA验证结果的有效期（秒），刷新时重新验证超过有效期一半的讲者
+        """
+        self.enabled = enabled
+        self.path = path
+        self.max_age_seconds = max_age_seconds
+        self.verify_max_age_seconds = verify_max_age_seconds
+        self._lock = threading.Lock()
+        self._initialized = False
+        self._local = threading.local()
+        # 姓名索引：{存储桶: {姓名: [文件夹, ...]}}，登记表写入（包括其他进程的刷新任务）后重新加载
+        self._names: Dict[str, Dict[str, List[str]]] = {}
+        self._name_lengths: List[int] = []
+        self._generation: Optional[int] = None
+        self._metrics = {"lookups": 0, "hits": 0, "misses": 0, "stale": 0, "ambiguous": 0, "refreshes": 0,
+                         "confirmed": 0, "rejected": 0}
+
+    # ---- 连接 ----
+
+    def _connect(self) -> sqlite3.Connection:
+        """创建连接（首次连接时创建目录、表和索引）"""
+        with self._lock:
+            if not self._initialized:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                conn = sqlite3.connect(self.path)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(SCHEMA)
+                existing = {row[1] for row in conn.execute("PRAGMA table_info(speakers)")}
+                for column, column_type in ADDED_COLUMNS.items():
+                    if column not in existing:
+                        conn.execute(f"ALTER TABLE speakers ADD COLUMN {column} {column_type}")
+                conn.commit()
+                conn.close()
+                self._initialized = True
+        conn = sqlite3.connect(self.path, timeout=5.0)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        """当前线程的查询连接（WAL 模式下读取不阻塞刷新写入）"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+        return conn
+
+    # ---- 读写 ----
+
+    def upsert(self, records: Iterable[SpeakerRecord], remove_missing_in: Optional[str] = None,
+               listed_before: Optional[float] = None) -> int:
+        """
+        写入讲者记录（一个事务；已有记录中列出时间或验证时间更新的部分保留）
+
+        Args:
+            records: 讲者记录
+            remove_missing_in: 指定存储桶时，删除该存储桶中不在本次记录里的讲者（文件夹已删除）
+            listed_before: 只删除列出时间不晚于该时间的讲者（之后由对象事件新建的文件夹保留）
+
+        Returns:
+            删除的记录数
+        """
+        records = list(records)
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany(UPSERT_SQL, [record.to_row() for record in records])
+                removed = 0
+                if remove_missing_in is not None:
+                    kept = {record.folder for record in records if record.bucket == remove_missing_in}
+                    stale = [row["folder"] for row in conn.execute(
+                        "SELECT folder FROM speakers WHERE bucket = ? AND listed_at <= ?",
+                        (remove_missing_in, float("inf") if listed_before is None else listed_before)
+                    ) if row["folder"] not in kept]
+                    conn.executemany("DELETE FROM speakers WHERE bucket = ? AND folder = ?",
+                                     [(remove_missing_in, folder) for folder in stale])
+                    removed = len(stale)
+                conn.execute("UPDATE registry_meta SET generation = generation + 1 WHERE id = 1")
+        finally:
+            conn.close()
+        return removed
+
+    def remove(self, bucket: str, folder: str) -> bool:
+        """删除一位讲者的记录"""
+        conn = self._connect()
+        try:
+            with conn:
+                deleted = conn.execute("DELETE FROM speakers WHERE bucket = ? AND folder = ?",
+                                       (bucket, folder)).rowcount
+                conn.execute("UPDATE registry_meta SET generation = generation + 1 WHERE id = 1")
+        finally:
+            conn.close()
+        return deleted > 0
+
+    def get(self, bucket: str, folder: str) -> Optional[SpeakerRecord]:
+        """按文件夹读取讲者记录"""
+        row = self._reader().execute("SELECT * FROM speakers WHERE bucket = ? AND folder = ?",
+                                     (bucket, folder)).fetchone()
+        return SpeakerRecord.from_row(row) if row is not None else None
+
+    def records(self, bucket: str) -> Dict[str, SpeakerRecord]:
+        """存储桶中的全部讲者记录 {文件夹: 记录}"""
+        rows = self._reader().execute("SELECT * FROM speakers WHERE bucket = ?", (bucket,))
+        return {row["folder"]: SpeakerRecord.from_row(row) for row in rows}
+
+    def find_by_name(self, bucket: str, name: str) -> List[SpeakerRecord]:
+        """按讲者姓名查找（同名讲者可能有多条记录）"""
+        rows = self._reader().execute("SELECT * FROM speakers WHERE bucket = ? AND name = ? ORDER BY folder",
+                                      (bucket, name))
+        return [SpeakerRecord.from_row(row) for row in rows]
+
+    # ---- 预审查找 ----
+
+    def _load_names(self):
+        """登记表有写入时重新加载姓名索引（读取一行 generation，开销可以忽略）"""
+        conn = self._reader()
+        generation = conn.execute("SELECT generation FROM registry_meta WHERE id = 1").fetchone()[0]
+        if generation == self._generation:
+            return
+        names: Dict[str, Dict[str, List[str]]] = {}
+        for row in conn.execute("SELECT bucket, name, folder FROM speakers"):
+            names.setdefault(row["bucket"], {}).setdefault(row["name"], []).append(row["folder"])
+        with self._lock:
+            self._names = names
+            self._name_lengths = sorted({len(name) for bucket in names.values() for name in bucket})
+            self._generation = generation
+
+    def match_text(self, bucket: str, text: str) -> List[SpeakerRecord]:
+        """
+        在提交内容中查找登记表里的讲者：姓名和医院都出现在内容中；多条匹配时优先科室也出现的记录
+
+        按登记表中出现过的姓名长度逐一取内容的子串查找，开销与内容长度成正比，与讲者数量无关
+        """
+        self._load_names()
+        names = self._names.get(bucket, {})
+        compact = "".join(text.split())
+        folders = []
+        for length in self._name_lengths:
+            for start in range(len(compact) - length + 1):
+                for folder in names.get(compact[start:start + length], ()):
+                    if folder not in folders:
+                        folders.append(folder)
+        candidates = [record for record in (self.get(bucket, folder) for folder in folders)
+                      if record is not None and record.hospital in compact]
+        with_department = [record for record in candidates if record.department in compact]
+        return with_department or candidates
+
+    def is_fresh(self, record: SpeakerRecord, now: Optional[float] = None) -> bool:
+        """
+        文档计数和EXA验证结果都在有效期内
+
+        对象事件队列已处理完的存储桶，文档计数截至最后一次处理完队列时都是最新的（已标记过期的记录除外）
+        """
+        now = time.time() if now is None else now
+        if record.verified_at is None or not record.verification or record.listed_at <= 0:
+            return False
+        listed_at = max(record.listed_at, self.events_drained_at(record.bucket) or 0.0)
+        return (now - listed_at <= self.max_age_seconds
+                and now - record.verified_at <= self.verify_max_age_seconds)
+
+    def lookup(self, bucket: str, text: str, now: Optional[float] = None) -> Optional[SpeakerRecord]:
+        """
+        预审时查找讲者
+
+        Returns:
+            唯一匹配且未过期的讲者记录；未启用、未找到、匹配到多位讲者或记录过期时返回 None（预审按实时流程执行）
+        """
+        if not self.enabled:
+            return None
+        matches = self.match_text(bucket, text)
+        if len(matches) == 1 and self.is_fresh(matches[0], now):
+            outcome = "hits"
+        elif not matches:
+            outcome = "misses"
+        elif len(matches) > 1:
+            outcome = "ambiguous"
+        else:
+            outcome = "stale"
+        with self._lock:
+            self._metrics["lookups"] += 1
+            self._metrics[outcome] += 1
+        return matches[0] if outcome == "hits" else None
+
+    def record_confirmation(self, confirmed: bool):
+        """记录一次用 Bedrock 提取结果确认命中记录的结果（rejected：提取出的讲者不是该记录）"""
+        with self._lock:
+            self._metrics["confirmed" if confirmed else "rejected"] += 1
+
+    # ---- 对象事件 ----
+
+    def apply_object_event(self, bucket: str, key: str, removed: bool, etag: str = "", size: int = 0,
+                           sequencer: str = "", count_documents: Optional[DocumentCounter] = None,
+                           now: Optional[float] = None) -> str:
+        """
+        按 S3 对象创建/删除事件增量更新讲者文件夹的文档数量、重复文档和类型统计（不列出文件夹）
+
+        同一对象的事件按 sequencer 排序，重复投递或较旧的事件忽略
+
+        Returns:
+            updated、created（新的讲者文件夹，尚未验证）、removed（文件夹已清空）、
+            invalidated（记录缺少对象列表，无法增量更新，标记为过期）或 ignored
+        """
+        folder = speaker_folder(key)
+        speaker = parse_folder_name(folder) if folder and not key.endswith("/") else None
+        if speaker is None:
+            return "ignored"
+        now = time.time() if now is None else now
+        record = self.get(bucket, folder)
+        if record is not None and record.file_count and not record.objects:
+            self.invalidate(bucket, folder)
+            return "invalidated"
+
+        objects = {obj["key"]: obj for obj in record.objects} if record is not None else {}
+        current = objects.get(key)
+        if current is not None and sequencer and not _is_newer(sequencer, current.get("sequencer", "")):
+            return "ignored"
+        if removed:
+            if current is None:
+                return "ignored"
+            del objects[key]
+            if not objects:
+                self.remove(bucket, folder)
+                return "removed"
+        else:
+            if etag and not etag.startswith('"'):
+                etag = f'"{etag}"'
+            objects[key] = {"key": key, "etag": etag, "size": size, "sequencer": sequencer}
+
+        outcome = "updated"
+        if record is None:
+            record = SpeakerRecord(bucket=bucket, folder=folder, file_count=0, unique_file_count=0, listed_at=now,
+                                   **speaker)
+            outcome = "created"
+        record.set_objects(list(objects.values()), count_documents, now)
+        self.upsert([record])
+        return outcome
+
+    def invalidate(self, bucket: str, folder: str) -> bool:
+        """将文件夹的文档计数标记为过期（下次预审实时列出，下次刷新重新计数）"""
+        conn = self._connect()
+        try:
+            with conn:
+                updated = conn.execute("UPDATE speakers SET listed_at = 0 WHERE bucket = ? AND folder = ?",
+                                       (bucket, folder)).rowcount
+        finally:
+            conn.close()
+        return updated > 0
+
+    def mark_events_drained(self, bucket: str, now: Optional[float] = None):
+        """记录存储桶的对象事件队列已处理完（此前上传和删除的文档都已计入）"""
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO event_polls (bucket, drained_at) VALUES (?, ?)",
+                             (bucket, time.time() if now is None else now))
+        finally:
+            conn.close()
+
+    def events_drained_at(self, bucket: str) -> Optional[float]:
+        """存储桶的对象事件队列最后一次处理完的时间（没有事件消费者时为 None）"""
+        row = self._reader().execute("SELECT drained_at FROM event_polls WHERE bucket = ?", (bucket,)).fetchone()
+        return row[0] if row is not None else None
+
+    # ---- 刷新 ----
+
+    def refresh(self, bucket: str, objects: Iterable[Dict[str, Any]], verify: SpeakerVerifier,
+                count_documents: Optional[DocumentCounter] = None, rate_per_second: float = 1.0,
+                max_concurrency: int = 2, now: Optional[float] = None,
+                listed_at: Optional[float] = None) -> RefreshStats:
+        """
+        按整个存储桶的列表结果刷新登记表
+
+        Args:
+            bucket: 存储桶
+            objects: 存储桶全部对象（key、etag、size），可以是分页列出的迭代器
+            verify: EXA网络搜索验证函数；验证失败（success 为 False）时保留上次的验证结果
+            count_documents: 统计唯一文档的函数；为空时每个文件计为一个文档
+            rate_per_second: EXA验证的速率上限，<=0 表示不限速
+            max_concurrency: 同时进行的EXA验证数量
+            now: 本次刷新的时间（测试用）
+            listed_at: 列表结果截至的时间（如 S3 Inventory 清单的生成时间），默认为 now；
+                该时间之后由对象事件更新的文件夹不被覆盖或删除
+
+        Returns:
+            刷新统计
+        """
+        started = time.monotonic()
+        now = time.time() if now is None else now
+        listed_at = now if listed_at is None else listed_at
+        stats = RefreshStats()
+        folders: Dict[str, List[Dict[str, Any]]] = {}
+        for obj in objects:
+            folder = speaker_folder(obj["key"])
+            if folder:
+                folders.setdefault(folder, []).append(obj)
+
+        existing = self.records(bucket)
+        records, pending = [], []
+        for folder, folder_objects in sorted(folders.items()):
+            stats.folders += 1
+            speaker = parse_folder_name(folder)
+            if speaker is None:
+                stats.unparsed += 1
+                continue
+            record = SpeakerRecord(bucket=bucket, folder=folder, file_count=0, unique_file_count=0,
+                                   listed_at=listed_at, **speaker)
+            record.set_objects(folder_objects, count_documents, listed_at)
+            previous = existing.get(folder)
+            if previous is not None and previous.verified_at is not None:
+                record.verification = previous.verification
+                record.verification_passed = previous.verification_passed
+                record.verified_at = previous.verified_at
+            # 验证结果超过有效期一半时重新验证，保证按天刷新时预审查找到的结果始终有效
+            if record.verified_at is None or now - record.verified_at > self.verify_max_age_seconds / 2:
+                pending.append(record)
+            else:
+                stats.reused += 1
+            records.append(record)
+
+        limiter = TokenBucket(rate_per_second, 1)
+
+        def verify_record(record: SpeakerRecord) -> Dict[str, Any]:
+            if rate_per_second > 0:
+                limiter.acquire()
+            try:
+                return verify(record.name, record.hospital, record.department)
+            except Exception as e:
+                return {"success": False, "error": str(e)}
+
+        with ThreadPoolExecutor(max_workers=max(1, max_concurrency), thread_name_prefix="registry-verify") as pool:
+            for record, result in zip(pending, pool.map(verify_record, pending)):
+                if not result.get("success"):
+                    stats.verify_errors += 1
+                    logger.warning(f"讲者登记表：{record.folder} EXA验证失败，保留上次的结果: {result.get('error', '')}")
+                    continue
+                record.verification = result
+                record.verification_passed = bool(result.get("verification_passed"))
+                record.verified_at = now
+                stats.verified += 1
+
+        stats.removed = self.upsert(records, remove_missing_in=bucket, listed_before=listed_at)
+        stats.seconds = round(time.monotonic() - started, 3)
+        with self._lock:
+            self._metrics["refreshes"] += 1
+            self._metrics["last_refresh"] = dict(stats.to_dict(), bucket=bucket, at=_isoformat(now))
+        logger.info(f"讲者登记表刷新完成: {bucket}, 文件夹 {stats.folders} 个, EXA验证 {stats.verified} 位, "
+                    f"沿用 {stats.reused} 位, 验证失败 {stats.verify_errors} 位, 删除 {stats.removed} 位, "
+                    f"耗时 {stats.seconds}s")
+        return stats
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """查找命中统计和登记的讲者数量"""
+        speakers = None
+        # 尚未刷新过的登记表不创建数据库文件
+        if self._initialized or os.path.exists(self.path):
+            try:
+                speakers = self._reader().execute("SELECT COUNT(*) FROM speakers").fetchone()[0]
+            except sqlite3.Error as e:
+                logger.warning(f"读取讲者登记表失败: {str(e)}")
+        with self._lock:
+            metrics = dict(self._metrics)
+        lookups = metrics["lookups"]
+        metrics["hit_rate"] = round(metrics["hits"] / lookups, 4) if lookups else None
+        return dict(metrics, enabled=self.enabled, path=self.path, speakers=speakers)
+
+
+class RegistryRefresher:
+    """后台刷新器：按间隔（如每天）刷新一次登记表"""
+
+    def __init__(self, refresh: Callable[[], RefreshStats], interval_seconds: float = 86400.0):
+        """
+        Args:
+            refresh: 刷新一次登记表的函数
+            interval_seconds: 两次刷新的间隔（秒）
+        """
+        self.refresh = refresh
+        self.interval_seconds = interval_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._metrics: Dict[str, Any] = {"runs": 0, "failed_runs": 0, "last_run_at": None}
+
+    def run_once(self) -> RefreshStats:
+        stats = self.refresh()
+        self._metrics.update(runs=self._metrics["runs"] + 1, last_run_at=time.time())
+        return stats
+
+    def start(self):
+        """启动后台线程（立即刷新一次，之后按间隔刷新）"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="speaker-registry-refresher", daemon=True)
+        self._thread.start()
+        logger.info(f"讲者登记表刷新器已启动（每 {self.interval_seconds}s 刷新一次）")
+
+    def stop(self):
+        """停止后台线程（进行中的刷新完成后退出）"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive() and not self._stop.is_set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                self._metrics["failed_runs"] += 1
+                logger.error(f"讲者登记表刷新失败: {str(e)}")
+            if self._stop.wait(self.interval_seconds):
+                break
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return dict(self._metrics, running=self.running, interval_seconds=self.interval_seconds)
+
+
+# 全局登记表和后台刷新器（默认不在预审中查找）
+_registry = SpeakerRegistry()
+_refresher: Optional[RegistryRefresher] = None
+_refresher_lock = threading.Lock()
+
+
+def configure_speaker_registry(enabled: bool = False, path: str = "audit/speaker_registry.db",
+                               max_age_seconds: float = 129600.0,
+                               verify_max_age_seconds: float = 604800.0) -> SpeakerRegistry:
+    """按 [REGISTRY] 配置替换全局登记表"""
+    global _registry
+    _registry = SpeakerRegistry(enabled, path, max_age_seconds, verify_max_age_seconds)
+    if enabled:
+        logger.info(f"讲者预验证登记表: {path}")
+    return _registry
+
+
+def get_speaker_registry() -> SpeakerRegistry:
+    """获取全局登记表"""
+    return _registry
+
+
+def start_registry_refresher(refresh: Callable[[], RefreshStats],
+                             interval_seconds: float = 86400.0) -> RegistryRefresher:
+    """启动全局后台刷新器（替换之前的刷新器）"""
+    global _refresher
+    with _refresher_lock:
+        if _refresher is not None:
+            _refresher.stop()
+        _refresher = RegistryRefresher(refresh, interval_seconds)
+        _refresher.start()
+        return _refresher
+
+
+def stop_registry_refresher():
+    """停止全局后台刷新器"""
+    global _refresher
+    with _refresher_lock:
+        if _refresher is not None:
+            _refresher.stop()
+            _refresher = None
+
+
+def get_registry_refresher() -> Optional[RegistryRefresher]:
+    """获取全局后台刷新器（未启动时为 None）"""
+    return _refresher
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="讲者预验证登记表：定时刷新和查看")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    refresh_parser = subparsers.add_parser("refresh", help="列出存储桶中的讲者文件夹，限速执行EXA验证和文档计数（供 cron 每晚执行）")
+    refresh_parser.add_argument("--bucket", help="存储桶（默认使用 [S3] BUCKET_NAME）")
+
+    show_parser = subparsers.add_parser("show", help="查看讲者的登记记录")
+    show_parser.add_argument("name", help="讲者姓名")
+    show_parser.add_argument("--bucket", help="存储桶（默认使用 [S3] BUCKET_NAME）")
+
+    args = parser.parse_args(argv)
+    # 刷新需要 S3 和 EXA 客户端，按需导入工具模块（同时按 [REGISTRY] 配置全局登记表）
+    import speaker_validation_tools as tools
+    bucket = args.bucket or tools.s3_config['bucket_name']
+    if args.command == "refresh":
+        print(json.dumps(tools.refresh_speaker_registry(bucket), ensure_ascii=False))
+    else:
+        records = [record.to_dict() for record in get_speaker_registry().find_by_name(bucket, args.name)]
+        print(json.dumps(records, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    raise SystemExit(main())
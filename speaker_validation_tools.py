@@ -5,30 +5,108 @@ SpeakerValidationPreCheckSystem 独立工具函数
 """
 
 import boto3
+import functools
+import math
+import threading
 import time
-from typing import Dict, Any
-from config_reader import get_config
+from typing import Any, Callable, Dict, Optional
+from botocore.config import Config
+from config_reader import DEFAULT_EXA_BASE_URL, get_config
 from cloudwatch_logger import (
     get_cloudwatch_logger, 
     log_preaudit_event, 
     log_s3_access, 
-    log_mcp_tool_call
+    log_mcp_tool_call,
+    register_event_sink,
+    unregister_event_sink
+)
+from config_service import config_section, current_snapshot, get_config_service, pinned_snapshot
+from resilience import (
+    CircuitOpenError,
+    RateLimitExceeded,
+    ThrottlingError,
+    configure_dependency_guard,
+    get_dependency_guard,
+    is_throttling_error
+)
+from deadline import Deadline, DeadlineExceeded, RequestCancelled, abortable_pool_classes, ensure_deadline
+from cassette import configure_cassette, get_cassette
+from profiling import get_profiler, span, traced
+from cost_ledger import get_cost_ledger, record_usage, track_usage
+from progress import report_progress
+from audit_store import configure_audit_store, get_audit_store
+from columnar_export import configure_columnar_export
+from folder_profiler import configure_folder_profiler, get_folder_profiler
+from folder_index import configure_folder_index, get_folder_index, md5_stream
+from photo_index import (
+    configure_photo_index,
+    get_photo_index,
+    is_photo,
+    start_photo_indexer as _start_photo_indexer,
+    stop_photo_indexer
+)
+from pdf_text import configure_pdf_text_extractor, get_pdf_text_extractor
+from s3_inventory import (
+    InventoryStats,
+    configure_inventory_reader,
+    get_inventory_reader,
+    list_top_level_folders
+)
+from speaker_registry import (
+    configure_speaker_registry,
+    get_speaker_registry,
+    start_registry_refresher as _start_registry_refresher,
+    stop_registry_refresher
+)
+from s3_events import (
+    FileEventSource,
+    S3ObjectEvent,
+    SqsEventSource,
+    start_event_consumer as _start_event_consumer,
+    stop_event_consumer
+)
+from submission_scheduler import PRIORITY_NIGHTLY, configure_submission_scheduler, run_with_priority
+from singleflight import get_single_flight, normalize_input
+from preaudit_planner import Stage, get_stage_planner
+from preaudit_result import (
+    OUTCOME_DIRECT_PASS,
+    OUTCOME_DIRECT_PASS_INSUFFICIENT,
+    OUTCOME_DOCUMENTS_INSUFFICIENT_UNVERIFIED,
+    OUTCOME_EXA_FAILED_DOCUMENTS_OK,
+    OUTCOME_EXA_VERIFIED,
+    OUTCOME_EXA_VERIFIED_INSUFFICIENT,
+    OUTCOME_FOLDER_MISSING,
+    OUTCOME_INCOMPLETE,
+    OUTCOME_NEEDS_IMPROVEMENT,
+    OUTCOME_S3_ERROR,
+    FolderInfo,
+    PreauditResult
 )
 
 # 设置 CloudWatch 日志记录器
 logger = get_cloudwatch_logger("speaker_validation_tools")
 
-def check_s3_folder_exists(bucket_name, folder_prefix):
+@traced("s3_probe")
+def check_s3_folder_exists(bucket_name, folder_prefix, deadline: Optional[Deadline] = None):
     """
-    检查S3文件夹是否存在（简化版本，避免超时）
+    检查S3文件夹是否存在（廉价探测：只请求一个键）
     """
     try:
-        # 简化逻辑：如果能列出文件，就认为文件夹存在
-        # 即使文件数量为0，也可能是空文件夹存在
-        result = list_s3_files_with_prefix(bucket_name, folder_prefix)
+        s3_timeout = None
+        if deadline is not None and deadline.budget_seconds is not None:
+            s3_timeout = deadline.timeout_for("s3_folder_probe", S3_TIMEOUT_CAP)
         
-        # 如果S3访问成功，就认为文件夹存在（即使为空）
-        return result.get("success", False)
+        # 前缀下存在任意对象（包括文件夹占位对象）即认为文件夹存在
+        response = ensure_deadline(deadline).call(
+            "s3_folder_probe", create_s3_client(s3_timeout).list_objects_v2,
+            Bucket=bucket_name, Prefix=folder_prefix, MaxKeys=1
+        )
+        key_count = response.get('KeyCount', len(response.get('Contents', [])))
+        record_usage(s3_list_calls=1, s3_keys_scanned=key_count)
+        return key_count > 0
+    
+    except DeadlineExceeded:
+        raise
         
     except Exception as e:
         logger.error(f"检查文件夹存在性失败: {str(e)}")
@@ -41,12 +119,25 @@ try:
         logger.error("配置验证失败，请检查 .config 文件")
         raise Exception("配置验证失败")
     
-    # 获取配置信息
-    aws_config = config.get_aws_config()
-    s3_config = config.get_s3_config()
-    preaudit_config = config.get_preaudit_config()
-    cloudwatch_config = config.get_cloudwatch_config()
-    exa_config = config.get_exa_config()
+    # 配置段视图：每次读取当前请求固定的配置快照（配置文件修改后新请求使用新版本）
+    aws_config = config_section('aws')
+    s3_config = config_section('s3')
+    preaudit_config = config_section('preaudit')
+    cloudwatch_config = config_section('cloudwatch')
+    exa_config = config_section('exa')
+    resilience_config = config_section('resilience')
+    cassette_config = config_section('cassette')
+    profiling_config = config_section('profiling')
+    cost_config = config_section('cost')
+    audit_config = config_section('audit')
+    export_config = config_section('export')
+    documents_config = config_section('documents')
+    pdf_evidence_config = config_section('pdf_evidence')
+    photo_index_config = config_section('photo_index')
+    registry_config = config_section('registry')
+    events_config = config_section('events')
+    inventory_config = config_section('inventory')
+    scheduler_config = config_section('scheduler')
     
     logger.info("配置加载成功")
     
@@ -54,70 +145,822 @@ except Exception as e:
     logger.error(f"配置加载失败: {str(e)}")
     raise
 
-def create_s3_client():
-    """创建配置好的 S3 客户端"""
-    return boto3.client(
-        's3',
-        aws_access_key_id=aws_config['access_key_id'],
-        aws_secret_access_key=aws_config['secret_access_key'],
-        region_name=aws_config['region']
+# 各阶段自身的超时上限（秒），实际超时取其与剩余时间预算的较小值
+BEDROCK_TIMEOUT_CAP = 15.0
+EXA_TIMEOUT_CAP = 10.0
+S3_TIMEOUT_CAP = 5.0
+# 可选阶段的最小可用时间，低于该值直接跳过
+BEDROCK_MIN_SECONDS = 2.0
+EXA_MIN_SECONDS = 2.0
+# 为后续必需的 S3 检查保留的时间
+S3_RESERVE_SECONDS = 1.0
+
+def _configure_dependency_guards(resilience: Dict[str, Any]):
+    """配置外部依赖的弹性调用保护器（限流、重试、熔断）"""
+    configure_dependency_guard(
+        "bedrock",
+        rate=resilience['bedrock_rate'],
+        burst=resilience['bedrock_burst'],
+        max_attempts=resilience['max_attempts'],
+        base_delay=resilience['base_delay'],
+        max_delay=resilience['max_delay'],
+        failure_threshold=resilience['breaker_failure_threshold'],
+        recovery_timeout=resilience['breaker_recovery_seconds']
+    )
+    configure_dependency_guard(
+        "exa",
+        rate=resilience['exa_rate'],
+        burst=resilience['exa_burst'],
+        max_attempts=resilience['max_attempts'],
+        base_delay=resilience['base_delay'],
+        max_delay=resilience['max_delay'],
+        failure_threshold=resilience['breaker_failure_threshold'],
+        recovery_timeout=resilience['breaker_recovery_seconds'],
+        # EXA 仅对 429/5xx 重试；超时不重试以免成倍消耗等待时间，但计入熔断失败
+        is_retryable=is_throttling_error
+    )
+
+columnar_exporter = None
+
+def _configure_columnar_export(export: Dict[str, Any]):
+    """配置预审和工具调用事件的列式导出（替换之前的导出器及其事件订阅）"""
+    global columnar_exporter
+    if columnar_exporter is not None:
+        unregister_event_sink(columnar_exporter)
+    columnar_exporter = configure_columnar_export(**export)
+    if columnar_exporter is not None:
+        register_event_sink(columnar_exporter)
+
+_configure_dependency_guards(resilience_config)
+
+# 外部调用录制/回放（默认关闭；回放模式下不创建真实客户端）
+configure_cassette(**cassette_config)
+
+# 阶段耗时记录和请求级剖析
+get_profiler().configure(**profiling_config)
+
+# 调用用量记账的费用估算单价
+get_cost_ledger().configure_pricing(**cost_config)
+
+# 预审审计记录（后台线程批量写入 SQLite）
+configure_audit_store(**audit_config)
+
+# 预审和工具调用事件的列式导出（默认关闭）
+_configure_columnar_export(export_config)
+
+def _configure_documents(documents: Dict[str, Any]):
+    """配置文件夹内容画像（读取字节数、并发数和 ETag 缓存大小）和文件夹索引（重复文档检测）"""
+    configure_folder_profiler(
+        head_bytes=documents['head_bytes'],
+        max_concurrency=documents['max_concurrency'],
+        cache_size=documents['cache_size']
+    )
+    configure_folder_index(
+        max_folders=documents['index_size'],
+        max_digests=documents['cache_size'],
+        hash_max_bytes=documents['hash_max_bytes']
+    )
+
+_configure_documents(documents_config)
+
+def _configure_pdf_evidence(pdf_evidence: Dict[str, Any]):
+    """配置 PDF 文本提取（每次读取字节数、读取上限、解压上限、线程数和 ETag 缓存大小）"""
+    configure_pdf_text_extractor(
+        chunk_bytes=pdf_evidence['chunk_bytes'],
+        max_bytes=pdf_evidence['max_bytes'],
+        workers=pdf_evidence['workers'],
+        cache_size=pdf_evidence['cache_size'],
+        max_decoded_bytes=pdf_evidence['max_decoded_bytes']
+    )
+
+_configure_pdf_evidence(pdf_evidence_config)
+
+def _configure_photo_index(photo_index: Dict[str, Any]):
+    """配置照片索引（近似距离上限、图片大小上限和 ETag 缓存大小）"""
+    configure_photo_index(
+        max_distance=photo_index['max_distance'],
+        max_image_bytes=photo_index['max_image_bytes'],
+        cache_size=photo_index['cache_size']
+    )
+
+_configure_photo_index(photo_index_config)
+
+def _configure_speaker_registry(registry: Dict[str, Any]):
+    """配置讲者预验证登记表（预审时是否查找、数据库路径和有效期）"""
+    configure_speaker_registry(
+        enabled=registry['enabled'],
+        path=registry['path'],
+        max_age_seconds=registry['max_age_seconds'],
+        verify_max_age_seconds=registry['verify_max_age_seconds']
     )
 
-def list_s3_files_with_prefix(bucket_name: str = None, prefix: str = "") -> Dict[str, Any]:
+_configure_speaker_registry(registry_config)
+
+def _configure_inventory(inventory: Dict[str, Any], registry: Dict[str, Any]):
     """
-    检查指定前缀下的S3文件
+    配置 S3 Inventory 清单读取
+
+    按清单刷新的登记表记录从清单生成时间起算有效期，清单有效期不小于登记表有效期时记录导入时就已过期，
+    这时按登记表有效期的一半使用
+    """
+    max_age_seconds = inventory['max_age_seconds']
+    if max_age_seconds >= registry['max_age_seconds']:
+        max_age_seconds = registry['max_age_seconds'] / 2
+        logger.warning(f"[INVENTORY] MAX_AGE_SECONDS（{inventory['max_age_seconds']}）不小于 "
+                       f"[REGISTRY] MAX_AGE_SECONDS（{registry['max_age_seconds']}），按 {max_age_seconds} 使用")
+    configure_inventory_reader(**dict(inventory, max_age_seconds=max_age_seconds))
+
+# S3 Inventory 清单：全量扫描存储桶时优先读取最新清单
+_configure_inventory(inventory_config, registry_config)
+
+# 提交调度：预审按优先级和提交人排队，Bedrock 和 EXA 按优先级分配并发名额
+configure_submission_scheduler(**scheduler_config)
+
+# 每个 boto3 客户端的连接池大小（长期运行的共享服务中多个工作线程共用客户端）
+CLIENT_MAX_POOL_CONNECTIONS = 50
+# 客户端按超时分档复用，超时向下取整到该粒度（秒），避免为每个剩余预算创建新客户端
+CLIENT_TIMEOUT_GRANULARITY = 0.5
+
+def _timeout_client_config(timeout: Optional[float], config_class: type = Config) -> Config:
+    """
+    根据阶段超时生成 botocore 客户端配置（重试交给弹性层，这里只尝试一次）
+
+    config_class 可以是 Config 的子类（如 aiobotocore 的 AioConfig）
+    """
+    if timeout is None:
+        return config_class(max_pool_connections=CLIENT_MAX_POOL_CONNECTIONS)
+    return config_class(
+        connect_timeout=min(timeout, 3.0),
+        read_timeout=timeout,
+        retries={'total_max_attempts': 1},
+        max_pool_connections=CLIENT_MAX_POOL_CONNECTIONS
+    )
+
+_client_pool: Dict[Any, Any] = {}
+_client_pool_lock = threading.Lock()
+_http_session = None
+
+def _timeout_bucket(timeout: Optional[float]) -> Optional[float]:
+    """超时向下取整到 CLIENT_TIMEOUT_GRANULARITY，保证不超过调用方的时间预算"""
+    if timeout is None:
+        return None
+    return max(CLIENT_TIMEOUT_GRANULARITY,
+               math.floor(timeout / CLIENT_TIMEOUT_GRANULARITY) * CLIENT_TIMEOUT_GRANULARITY)
+
+def _pooled_client(service_name: str, timeout: Optional[float]):
+    """
+    获取复用的 boto3 客户端（线程安全，多个请求共享连接池）
+    
+    超时向下取整到 CLIENT_TIMEOUT_GRANULARITY，保证不超过调用方的时间预算
+    """
+    timeout = _timeout_bucket(timeout)
+    key = (service_name, timeout)
+    client = _client_pool.get(key)
+    if client is None:
+        # boto3 创建客户端不是线程安全的，创建过程加锁
+        with _client_pool_lock:
+            client = _client_pool.get(key)
+            if client is None:
+                client = boto3.client(
+                    service_name,
+                    aws_access_key_id=aws_config['access_key_id'],
+                    aws_secret_access_key=aws_config['secret_access_key'],
+                    region_name=aws_config['region'],
+                    config=_timeout_client_config(timeout)
+                )
+                _make_client_abortable(client)
+                _client_pool[key] = client
+    return client
+
+def _make_client_abortable(client):
+    """
+    请求取消时中止客户端进行中的调用（关闭该调用使用的连接）
+
+    botocore 没有公开的连接池扩展点，这里替换其 HTTP 会话的连接池类；结构不符时保持原样，
+    被取消的调用在后台执行到自身超时，计入 abandoned_calls
+    """
+    http_session = getattr(getattr(client, "_endpoint", None), "http_session", None)
+    pool_classes = getattr(http_session, "_pool_classes_by_scheme", None)
+    if isinstance(pool_classes, dict):
+        pool_classes.update(abortable_pool_classes(pool_classes))
+
+def _get_http_session():
+    """获取复用的 HTTP 会话（EXA 请求共享 keep-alive 连接池）"""
+    global _http_session
+    if _http_session is None:
+        import requests
+        from requests.adapters import HTTPAdapter
+        with _client_pool_lock:
+            if _http_session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=CLIENT_MAX_POOL_CONNECTIONS)
+                # 请求取消时关闭进行中的 EXA 请求所用的连接
+                adapter.poolmanager.pool_classes_by_scheme = abortable_pool_classes(
+                    adapter.poolmanager.pool_classes_by_scheme
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _http_session = session
+    return _http_session
+
+def reset_client_pool():
+    """丢弃复用的客户端和 HTTP 会话（凭证或地域变更后调用）"""
+    global _http_session
+    with _client_pool_lock:
+        _client_pool.clear()
+        session, _http_session = _http_session, None
+    if session is not None:
+        session.close()
+
+def _on_config_change(snapshot, changed):
+    """
+    配置更新后只重建受影响的组件：缓存、连接池和未变化段对应的组件保持不变
+
+    重建只影响之后开始的调用；进行中的请求继续使用开始时固定的配置快照
+    """
+    if 'aws' in changed:
+        reset_client_pool()
+    if 'resilience' in changed:
+        _configure_dependency_guards(snapshot.section('resilience'))
+    if 'cassette' in changed:
+        configure_cassette(**snapshot.section('cassette'))
+    if 'profiling' in changed:
+        get_profiler().configure(**snapshot.section('profiling'))
+    if 'cost' in changed:
+        get_cost_ledger().configure_pricing(**snapshot.section('cost'))
+    if 'audit' in changed:
+        configure_audit_store(**snapshot.section('audit'))
+    if 'export' in changed:
+        _configure_columnar_export(snapshot.section('export'))
+    if 'documents' in changed:
+        _configure_documents(snapshot.section('documents'))
+    if 'pdf_evidence' in changed:
+        _configure_pdf_evidence(snapshot.section('pdf_evidence'))
+    if 'photo_index' in changed:
+        _configure_photo_index(snapshot.section('photo_index'))
+    if 'registry' in changed:
+        _configure_speaker_registry(snapshot.section('registry'))
+    if changed & {'inventory', 'registry'}:
+        _configure_inventory(snapshot.section('inventory'), snapshot.section('registry'))
+    if 'scheduler' in changed:
+        configure_submission_scheduler(**snapshot.section('scheduler'))
+    # 后台照片索引器、登记表定时刷新和事件消费者在启动时固定了存储桶，[S3] 变化后同样按新配置重新启动
+    if changed & {'photo_index', 's3'} and _photo_indexer_requested:
+        start_photo_indexer(snapshot.section('photo_index'))
+    if changed & {'registry', 's3'} and _registry_refresher_requested:
+        start_registry_refresher(snapshot.section('registry'))
+    if changed & {'events', 's3'} and _event_consumer_requested:
+        start_event_consumer(snapshot.section('events'))
+    restart_required = sorted(changed & {'cloudwatch', 'http', 'reload'})
+    if restart_required:
+        logger.warning(f"配置段 {', '.join(restart_required)} 的修改需要重启服务后生效")
+
+get_config_service().subscribe(_on_config_change)
+
+def _unless_truncated(deadline: Deadline, truncated: Callable[[Any], bool], min_seconds: float):
+    """
+    合并结果的复用条件：领导者的结果因其自身时间预算耗尽而不完整、跟随者还有至少 min_seconds 时，
+    跟随者按自身时间预算重新执行，不使用被截断的结果
+    """
+    return lambda result: not truncated(result) or not deadline.has_time_for(min_seconds)
+
+def _wait_timeout(deadline: Deadline) -> Optional[float]:
+    """合并请求的跟随者最多等待自身剩余的时间预算"""
+    remaining = deadline.remaining()
+    return None if remaining == float('inf') else remaining
+
+def create_bedrock_client(timeout: Optional[float] = None):
+    """获取配置好的 Bedrock Runtime 客户端（按超时分档复用）"""
+    cassette = get_cassette()
+    if cassette.replaying:
+        return cassette.wrap_client("bedrock", None, timeout)
+    return cassette.wrap_client("bedrock", _pooled_client('bedrock-runtime', timeout), timeout)
+
+def create_s3_client(timeout: Optional[float] = None):
+    """获取配置好的 S3 客户端（按超时分档复用）"""
+    cassette = get_cassette()
+    if cassette.replaying:
+        return cassette.wrap_client("s3", None, timeout)
+    return cassette.wrap_client("s3", _pooled_client('s3', timeout), timeout)
+
+def list_s3_files_with_prefix(bucket_name: str = None, prefix: str = "",
+                              deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+    """
+    检查指定前缀下的S3文件（相同存储桶和前缀的并发请求共享一次 LIST）
     """
-    start_time = time.time()
     if bucket_name is None:
         bucket_name = s3_config['bucket_name']
     
+    deadline = ensure_deadline(deadline)
+    try:
+        return get_single_flight("s3_prefix").do(
+            (bucket_name, prefix),
+            _list_s3_files_with_prefix, bucket_name, prefix, deadline,
+            wait_timeout=_wait_timeout(deadline)
+        )
+    except TimeoutError:
+        raise DeadlineExceeded("s3_list")
+
+@traced("s3_list")
+def _list_s3_files_with_prefix(bucket_name: str, prefix: str, deadline: Deadline) -> Dict[str, Any]:
+    """实际执行前缀下的S3文件检查"""
+    start_time = time.time()
+    
     logger.info(f"开始检查 S3 存储桶: {bucket_name}, 前缀: {prefix}")
     
+    # 时间预算耗尽时直接抛出 DeadlineExceeded，由调用方返回部分结果
+    s3_timeout = None
+    if deadline.budget_seconds is not None:
+        s3_timeout = deadline.timeout_for("s3_list", S3_TIMEOUT_CAP)
+    
     try:
-        s3_client = create_s3_client()
+        s3_client = create_s3_client(s3_timeout)
         
         # 使用前缀过滤
         if prefix:
-            response = s3_client.list_objects_v2(Bucket=bucket_name, Prefix=prefix)
+            response = deadline.call("s3_list", s3_client.list_objects_v2, Bucket=bucket_name, Prefix=prefix)
         else:
-            response = s3_client.list_objects_v2(Bucket=bucket_name)
-        
-        files = []
-        if 'Contents' in response:
-            all_objects = [obj['Key'] for obj in response['Contents']]
-            # 过滤掉文件夹（以 '/' 结尾的对象）
-            files = [obj_key for obj_key in all_objects if not obj_key.endswith('/')]
+            response = deadline.call("s3_list", s3_client.list_objects_v2, Bucket=bucket_name)
         
-        result = {
-            "success": True,
-            "file_count": len(files),
-            "files": files[:10],  # 只显示前10个文件名
-            "bucket_name": bucket_name,
-            "prefix": prefix
-        }
-        
-        execution_time = time.time() - start_time
-        log_s3_access(bucket_name, True, len(files))
-        log_mcp_tool_call("list_s3_files_with_prefix", True, execution_time)
-        logger.info(f"S3 文件检查成功，前缀'{prefix}'下找到 {len(files)} 个文件")
-        
-        return result
+        return _s3_listing_result(response, bucket_name, prefix, start_time)
         
     except Exception as e:
-        execution_time = time.time() - start_time
-        error_msg = str(e)
-        log_s3_access(bucket_name, False, 0, error_msg)
-        log_mcp_tool_call("list_s3_files_with_prefix", False, execution_time, error_msg)
-        logger.error(f"列出 S3 文件失败: {error_msg}")
-        
-        return {
-            "success": False,
-            "file_count": 0,
-            "files": [],
-            "error": error_msg,
-            "bucket_name": bucket_name,
-            "prefix": prefix
-        }
+        return _s3_listing_error(e, bucket_name, prefix, start_time, deadline)
+
+def _s3_listing_result(response: Dict[str, Any], bucket_name: str, prefix: str,
+                       start_time: float) -> Dict[str, Any]:
+    """根据 list_objects_v2 响应生成前缀检查结果（同步和异步实现共用）"""
+    contents = response.get('Contents', [])
+    all_objects = [obj['Key'] for obj in contents]
+    # 过滤掉文件夹（以 '/' 结尾的对象）
+    objects = [
+        {"key": obj['Key'], "etag": obj.get('ETag', ''), "size": obj.get('Size', 0)}
+        for obj in contents if not obj['Key'].endswith('/')
+    ]
+    files = [obj["key"] for obj in objects]
+    record_usage(s3_list_calls=1, s3_keys_scanned=len(all_objects))
+    # 只用列表元数据（ETag、大小）识别重复上传的文件，不发起额外请求
+    duplicates = get_folder_index().deduplicate(bucket_name, prefix, objects)
+    
+    result = {
+        "success": True,
+        "file_count": len(files),
+        # 前缀下的全部对象数量（包含文件夹占位对象），用于判断文件夹是否存在
+        "key_count": len(all_objects),
+        "files": files[:10],  # 只显示前10个文件名
+        # 文档的列表元数据（键、ETag、大小），供内容画像使用
+        "objects": objects,
+        **duplicates.listing_fields(),
+        "bucket_name": bucket_name,
+        "prefix": prefix
+    }
+    
+    execution_time = time.time() - start_time
+    log_s3_access(bucket_name, True, len(files))
+    log_mcp_tool_call("list_s3_files_with_prefix", True, execution_time)
+    logger.info(f"S3 文件检查成功，前缀'{prefix}'下找到 {len(files)} 个文件")
+    
+    return result
+
+def _s3_listing_error(error: Exception, bucket_name: str, prefix: str, start_time: float,
+                      deadline: Deadline) -> Dict[str, Any]:
+    """前缀检查失败：超出时间预算时抛出 DeadlineExceeded，否则返回失败结果"""
+    execution_time = time.time() - start_time
+    error_msg = str(error)
+    log_s3_access(bucket_name, False, 0, error_msg)
+    log_mcp_tool_call("list_s3_files_with_prefix", False, execution_time, error_msg)
+    if deadline.expired():
+        logger.error(f"列出 S3 文件超出时间预算: {error_msg}")
+        raise DeadlineExceeded("s3_list")
+    logger.error(f"列出 S3 文件失败: {error_msg}")
+    
+    return {
+        "success": False,
+        "file_count": 0,
+        "key_count": 0,
+        "files": [],
+        "error": error_msg,
+        "bucket_name": bucket_name,
+        "prefix": prefix
+    }
+
+def _fetch_object_head(bucket_name: str, key: str, head_bytes: int, deadline: Deadline) -> bytes:
+    """用 Range GET 读取对象开头 head_bytes 字节"""
+    s3_timeout = None
+    if deadline.budget_seconds is not None:
+        s3_timeout = deadline.timeout_for("document_profile", S3_TIMEOUT_CAP)
+    response = deadline.call(
+        "document_profile", create_s3_client(s3_timeout).get_object,
+        Bucket=bucket_name, Key=key, Range=f"bytes=0-{head_bytes - 1}"
+    )
+    head = response['Body'].read()
+    record_usage(s3_get_calls=1, s3_bytes_read=len(head))
+    return head
+
+@traced("document_profile")
+def _profile_listed_folder(bucket_name: str, s3_result: Dict[str, Any], deadline: Deadline):
+    """为已列出的文件夹生成内容画像（只读取 ETag 未缓存的文件头）"""
+    return get_folder_profiler().profile(
+        s3_result["objects"],
+        lambda key, head_bytes: _fetch_object_head(bucket_name, key, head_bytes, deadline)
+    )
+
+def _should_profile_documents(s3_result: Dict[str, Any], deadline: Deadline) -> bool:
+    """预审时是否为文件夹生成内容画像（[DOCUMENTS] PROFILE_IN_PREAUDIT，剩余时间不足时跳过）"""
+    if not documents_config['profile_in_preaudit'] or not s3_result["success"] or not s3_result.get("objects"):
+        return False
+    if deadline.budget_seconds is not None and not deadline.has_time_for(S3_RESERVE_SECONDS):
+        deadline.skip("document_profile")
+        return False
+    return True
+
+def _with_document_profile(s3_result: Dict[str, Any], profile) -> Dict[str, Any]:
+    """在文件夹检查结果上附加各类型文档数量（列表结果可能被合并的请求共享，因此复制一份）"""
+    return dict(s3_result, documents=profile.summary())
+
+def _hash_object(bucket_name: str, key: str, deadline: Deadline) -> str:
+    """读取对象全部内容并计算 MD5（用于比较分段上传文件）"""
+    s3_timeout = None
+    if deadline.budget_seconds is not None:
+        s3_timeout = deadline.timeout_for("duplicate_hashing", S3_TIMEOUT_CAP)
+    response = deadline.call("duplicate_hashing", create_s3_client(s3_timeout).get_object,
+                             Bucket=bucket_name, Key=key)
+    digest = md5_stream(response['Body'])
+    record_usage(s3_get_calls=1, s3_bytes_read=response.get('ContentLength', 0))
+    return digest
+
+@traced("duplicate_hashing")
+def _hash_listed_duplicates(bucket_name: str, s3_result: Dict[str, Any], deadline: Deadline):
+    """读取可能重复的分段上传文件内容，按内容 MD5 重新统计重复文档"""
+    return get_folder_index().deduplicate(
+        bucket_name, s3_result["prefix"], s3_result["objects"],
+        lambda key: _hash_object(bucket_name, key, deadline)
+    )
+
+def _should_hash_duplicates(s3_result: Dict[str, Any], deadline: Deadline) -> bool:
+    """预审时是否读取分段上传文件内容判断重复（[DOCUMENTS] HASH_MULTIPART_DUPLICATES，剩余时间不足时跳过）"""
+    if not documents_config['hash_multipart_duplicates'] or not s3_result.get("unverified_duplicates"):
+        return False
+    if deadline.budget_seconds is not None and not deadline.has_time_for(S3_RESERVE_SECONDS):
+        deadline.skip("duplicate_hashing")
+        return False
+    return True
+
+def _with_duplicates(s3_result: Dict[str, Any], duplicates) -> Dict[str, Any]:
+    """用按内容 MD5 重新统计的结果替换文件夹检查结果中的重复文档字段（复制一份，不修改共享结果）"""
+    return dict(s3_result, **duplicates.listing_fields())
+
+def _fetch_image(bucket_name: str, key: str, deadline: Optional[Deadline] = None) -> bytes:
+    """读取图片全部内容（用于计算感知哈希；后台索引时没有时间预算）"""
+    s3_timeout = None
+    if deadline is not None and deadline.budget_seconds is not None:
+        s3_timeout = deadline.timeout_for("photo_reuse", S3_TIMEOUT_CAP)
+    s3_client = create_s3_client(s3_timeout)
+    if deadline is not None:
+        response = deadline.call("photo_reuse", s3_client.get_object, Bucket=bucket_name, Key=key)
+    else:
+        response = s3_client.get_object(Bucket=bucket_name, Key=key)
+    data = response['Body'].read()
+    record_usage(s3_get_calls=1, s3_bytes_read=len(data))
+    return data
+
+def _iter_bucket_objects(bucket_name: str, prefix: str = ""):
+    """分页列出存储桶（或前缀下）的全部对象（key、etag、size）"""
+    s3_client = create_s3_client()
+    kwargs = {"Bucket": bucket_name, "Prefix": prefix}
+    while True:
+        response = s3_client.list_objects_v2(**kwargs)
+        contents = response.get('Contents', [])
+        record_usage(s3_list_calls=1, s3_keys_scanned=len(contents))
+        for obj in contents:
+            if not obj['Key'].endswith('/'):
+                yield {"key": obj['Key'], "etag": obj.get('ETag', ''), "size": obj.get('Size', 0)}
+        if not response.get('IsTruncated'):
+            break
+        kwargs["ContinuationToken"] = response['NextContinuationToken']
+
+def index_bucket_photos(bucket_name: str = None) -> Dict[str, Any]:
+    """
+    扫描一次整个存储桶，为各讲者文件夹中新增和变化的图片计算感知哈希（ETag 未变化的图片不读取）
+    """
+    start_time = time.time()
+    if bucket_name is None:
+        bucket_name = s3_config['bucket_name']
+    stats = get_photo_index().index_objects(
+        bucket_name, _iter_bucket_objects(bucket_name), lambda key: _fetch_image(bucket_name, key), prefix=""
+    )
+    log_mcp_tool_call("index_bucket_photos", True, time.time() - start_time)
+    logger.info(f"照片索引完成: {bucket_name}, 图片 {stats.photos} 张, 计算哈希 {stats.hashed} 张, "
+                f"未变化 {stats.unchanged} 张, 删除 {stats.removed} 张")
+    return dict(stats.to_dict(), success=True, bucket_name=bucket_name)
+
+# MCP server 启动时请求后台索引；之后 [PHOTO_INDEX] 的修改随配置热加载生效
+_photo_indexer_requested = False
+
+def start_photo_indexer(photo_index: Optional[Dict[str, Any]] = None):
+    """按 [PHOTO_INDEX] 配置启动（ENABLED = false 时停止）后台照片索引器"""
+    global _photo_indexer_requested
+    _photo_indexer_requested = True
+    if photo_index is None:
+        photo_index = photo_index_config
+    if not photo_index['enabled']:
+        stop_photo_indexer()
+        return None
+    bucket_name = s3_config['bucket_name']
+    return _start_photo_indexer(
+        bucket_name,
+        lambda: _iter_bucket_objects(bucket_name),
+        lambda key: _fetch_image(bucket_name, key),
+        interval_seconds=photo_index['interval_seconds']
+    )
+
+@traced("photo_reuse")
+def _check_photo_reuse(bucket_name: str, s3_result: Dict[str, Any], deadline: Deadline):
+    """为讲者文件夹中新增的图片建立索引，查找在其他讲者文件夹中出现的照片"""
+    return get_photo_index().check_folder(
+        bucket_name, s3_result["prefix"], s3_result["objects"],
+        lambda key: _fetch_image(bucket_name, key, deadline)
+    )
+
+def _should_check_photo_reuse(s3_result: Dict[str, Any], deadline: Deadline) -> bool:
+    """预审时是否检查照片复用（[PHOTO_INDEX] CHECK_IN_PREAUDIT，文件夹中有图片，剩余时间不足时跳过）"""
+    if not photo_index_config['check_in_preaudit'] or not s3_result["success"]:
+        return False
+    if not any(is_photo(obj["key"]) for obj in s3_result.get("objects", [])):
+        return False
+    if deadline.budget_seconds is not None and not deadline.has_time_for(S3_RESERVE_SECONDS):
+        deadline.skip("photo_reuse")
+        return False
+    return True
+
+def _with_photo_reuse(s3_result: Dict[str, Any], check) -> Dict[str, Any]:
+    """在文件夹检查结果上附加照片复用检查结果（复制一份，不修改共享结果）"""
+    return dict(s3_result, photo_reuse=check.to_dict())
+
+def refresh_speaker_registry(bucket_name: str = None) -> Dict[str, Any]:
+    """
+    刷新一次讲者预验证登记表：分页列出整个存储桶，按讲者文件夹统计唯一文档数量，
+    按 [REGISTRY] 限速执行EXA验证（验证结果未过期一半的讲者沿用上次结果）
+    """
+    start_time = time.time()
+    if bucket_name is None:
+        bucket_name = s3_config['bucket_name']
+    stats = _refresh_registry(bucket_name, registry_config)
+    log_mcp_tool_call("refresh_speaker_registry", True, time.time() - start_time)
+    return dict(stats.to_dict(), success=True, bucket_name=bucket_name)
+
+# MCP server 启动时请求定时刷新；之后 [REGISTRY] 的修改随配置热加载生效
+_registry_refresher_requested = False
+
+def start_registry_refresher(registry: Optional[Dict[str, Any]] = None):
+    """按 [REGISTRY] 配置启动（SCHEDULE_IN_SERVER = false 时停止）服务内的登记表定时刷新"""
+    global _registry_refresher_requested
+    _registry_refresher_requested = True
+    if registry is None:
+        registry = registry_config
+    if not registry['schedule_in_server']:
+        stop_registry_refresher()
+        return None
+    bucket_name = s3_config['bucket_name']
+    return _start_registry_refresher(lambda: _refresh_registry(bucket_name, registry),
+                                     interval_seconds=registry['interval_seconds'])
+
+def _refresh_registry(bucket_name: str, registry: Dict[str, Any]):
+    """列出整个存储桶刷新登记表（唯一文档按文件夹索引统计，EXA验证经过弹性层并按 nightly 优先级使用并发名额）"""
+    objects, listed_at, inventory = _bucket_listing(bucket_name)
+    stats = get_speaker_registry().refresh(
+        bucket_name,
+        objects,
+        verify=functools.partial(run_with_priority, PRIORITY_NIGHTLY, search_doctor_with_exa),
+        count_documents=_count_folder_documents(bucket_name),
+        rate_per_second=registry['rate_per_second'],
+        max_concurrency=registry['max_concurrency'],
+        listed_at=listed_at
+    )
+    if inventory is not None:
+        stats.listing = dict(inventory.to_dict(), source="inventory")
+    return stats
+
+def _bucket_listing(bucket_name: str):
+    """
+    存储桶的全部对象：有可用的 S3 Inventory 清单时流式读取清单，只实时列出顶层文件夹和清单之后新建的文件夹；
+    否则分页列出整个存储桶
+
+    已有文件夹内清单之后的变化由 S3 对象事件补齐，未开启 [EVENTS] 时不使用清单
+
+    Returns:
+        (对象迭代器, 列表截至的时间（分页列出时为 None，即当前时间）, 清单导入统计（分页列出时为 None）)
+    """
+    reader = get_inventory_reader()
+    s3_client = create_s3_client()
+    manifest = reader.usable_manifest(s3_client, bucket_name, changes_tracked=events_config['enabled'])
+    if manifest is None:
+        return _iter_bucket_objects(bucket_name), None, None
+    stats = InventoryStats()
+    objects = reader.iter_objects(
+        s3_client, manifest,
+        live_folders=list_top_level_folders(s3_client, bucket_name),
+        list_folder=lambda folder: _iter_bucket_objects(bucket_name, folder),
+        stats=stats
+    )
+    logger.info(f"使用 S3 Inventory 清单刷新: {manifest.key}（生成于 {manifest.summary()['created_at']}）")
+    return objects, manifest.created_at, stats
+
+def _count_folder_documents(bucket_name: str):
+    """按文件夹索引统计唯一文档（只按 ETag 和大小判断，不读取内容）"""
+    return lambda prefix, objects: get_folder_index().deduplicate(bucket_name, prefix, objects).listing_fields()
+
+def _apply_s3_event(event: S3ObjectEvent) -> str:
+    """按一个 S3 对象事件更新登记表中对应讲者文件夹的文档统计；删除的照片从照片索引中移除"""
+    if event.removed:
+        get_photo_index().remove(event.bucket, event.key)
+    return get_speaker_registry().apply_object_event(
+        event.bucket, event.key, event.removed, etag=event.etag, size=event.size, sequencer=event.sequencer,
+        count_documents=_count_folder_documents(event.bucket)
+    )
+
+def _create_event_source(events: Dict[str, Any]):
+    """按 [EVENTS] SOURCE 创建事件源"""
+    if events['source'] == 'file':
+        return FileEventSource(events['file_path'])
+    if events['source'] != 'sqs':
+        raise ValueError(f"不支持的事件源: {events['source']}")
+    if not events['queue_url']:
+        raise ValueError("[EVENTS] SOURCE = sqs 时需要配置 QUEUE_URL")
+    # 长轮询最多等待 20 秒，使用默认读取超时（60 秒）的客户端
+    return SqsEventSource(lambda: _pooled_client('sqs', None), events['queue_url'])
+
+# MCP server 启动时请求事件消费；之后 [EVENTS] 的修改随配置热加载生效
+_event_consumer_requested = False
+
+def start_event_consumer(events: Optional[Dict[str, Any]] = None):
+    """按 [EVENTS] 配置启动（ENABLED = false 时停止）S3 对象事件消费者"""
+    global _event_consumer_requested
+    _event_consumer_requested = True
+    if events is None:
+        events = events_config
+    if not events['enabled']:
+        stop_event_consumer()
+        return None
+    try:
+        source = _create_event_source(events)
+    except ValueError as e:
+        logger.error(f"S3 对象事件消费者未启动: {str(e)}")
+        stop_event_consumer()
+        return None
+    bucket_name = s3_config['bucket_name']
+    return _start_event_consumer(
+        source,
+        _apply_s3_event,
+        on_drained=lambda: get_speaker_registry().mark_events_drained(bucket_name),
+        max_messages=events['max_messages'],
+        wait_seconds=events['wait_seconds'],
+        idle_seconds=events['idle_seconds']
+    )
+
+def _registry_covers_preaudit() -> bool:
+    """
+    预审是否可以使用登记表中的结果：开启 [REGISTRY] ENABLED，
+    且未开启需要实时读取文件夹内容的可选阶段（内容画像、照片复用、PDF 文本证据）
+    """
+    return (registry_config['enabled']
+            and not documents_config['profile_in_preaudit']
+            and not photo_index_config['check_in_preaudit']
+            and not pdf_evidence_config['enabled'])
+
+def _registry_lookup(user_input: str, bucket_name: str):
+    """
+    在登记表中查找提交内容中的讲者（本地 SQLite 查找，不发起远程调用）
+
+    Returns:
+        (唯一匹配且未过期的记录，未命中时为 None; 是否需要用 Bedrock 提取结果确认)；
+        内容中除该讲者外还有其他文字（可能提到其他人）时需要确认
+    """
+    record = get_speaker_registry().lookup(bucket_name, user_input)
+    return record, record is not None and not record.only_person_named(user_input)
+
+def _registry_confirms(record, extracted_info: Dict[str, str]) -> bool:
+    """
+    Bedrock 提取出的讲者是否就是登记表中的记录（姓名相同、医院一致）；
+    不是时（如内容中的讲者未登记，只是提到了同院已登记的同事）按实时流程执行
+    """
+    hospital = extracted_info.get('hospital') or ''
+    confirmed = (extracted_info.get('name') == record.name and bool(hospital)
+                 and (record.hospital in hospital or hospital in record.hospital))
+    get_speaker_registry().record_confirmation(confirmed)
+    if not confirmed:
+        logger.info(f"讲者登记表命中 {record.folder}，但提取出的讲者为 {extracted_info.get('name')}，按实时流程执行")
+    return confirmed
+
+def _registry_stage_results(record, user_input: str, target_word: str, deadline: Deadline,
+                            extracted_info: Optional[Dict[str, str]] = None):
+    """
+    使用登记表中预先验证的结果代替 EXA搜索和 S3 列出
+
+    Args:
+        record: 命中的登记表记录
+        extracted_info: 已用于确认的 Bedrock 提取结果；未提取时使用记录中的讲者信息
+
+    Returns:
+        (讲者信息, 文件夹, 各阶段结果)
+    """
+    if extracted_info is None:
+        extracted_info = record.extracted_info
+    folder = FolderInfo(record.folder, record.folder.rstrip('/'), "医生专属文件夹")
+    string_result = _new_identity_result(user_input, target_word)
+    string_result["extracted_info"] = extracted_info
+    _apply_exa_verification(string_result, extracted_info, record.verification, deadline)
+    string_result["registry"] = record.summary()
+    report_progress("registry_lookup", extraction=extracted_info, folder=folder.prefix,
+                    verified_at=string_result["registry"]["verified_at"])
+    _report_identity_progress(string_result)
+    logger.info(f"讲者登记表命中: {record.folder}，使用预先验证的结果")
+    return extracted_info, folder, {"s3_result": record.listing_result(), "string_result": string_result}
+
+def _read_object_range(bucket_name: str, key: str, start: int, end: int, deadline: Deadline) -> bytes:
+    """用 Range GET 读取对象的 [start, end] 字节"""
+    s3_timeout = None
+    if deadline.budget_seconds is not None:
+        s3_timeout = deadline.timeout_for("document_evidence", S3_TIMEOUT_CAP)
+    response = deadline.call("document_evidence", create_s3_client(s3_timeout).get_object,
+                             Bucket=bucket_name, Key=key, Range=f"bytes={start}-{end}")
+    data = response['Body'].read()
+    record_usage(s3_get_calls=1, s3_bytes_read=len(data))
+    return data
+
+def _evidence_terms(extracted_info: Dict[str, str]) -> Dict[str, str]:
+    return {"name": extracted_info.get('name', ''), "hospital": extracted_info.get('hospital', '')}
+
+def _evidence_result(folder_prefix: str, s3_result: Dict[str, Any], evidence: Optional[Dict[str, Any]],
+                     start_time: float) -> Dict[str, Any]:
+    """PDF 文本证据结果（同步和异步实现共用）"""
+    execution_time = time.time() - start_time
+    if evidence is None:
+        log_mcp_tool_call("collect_document_evidence", False, execution_time, s3_result.get("error"))
+        return {"success": False, "folder": folder_prefix, "error": s3_result.get("error")}
+    log_mcp_tool_call("collect_document_evidence", True, execution_time)
+    logger.info(f"PDF 文本证据: {folder_prefix}, 找到 {sorted(evidence['found'])}, "
+                f"读取 PDF {evidence['documents_read']} 个（缓存命中 {evidence['cache_hits']} 个）")
+    return dict(evidence, success=True, folder=folder_prefix)
+
+@traced("document_evidence")
+def collect_document_evidence(extracted_info: Dict[str, str], bucket_name: str = None,
+                              deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+    """
+    在讲者文件夹的 PDF 中查找讲者姓名和医院，作为基于文档内容的身份证据
+
+    按块读取 PDF 并逐页并行提取文本，全部找到后停止读取；提取的文本按 ETag 缓存
+    """
+    start_time = time.time()
+    if bucket_name is None:
+        bucket_name = s3_config['bucket_name']
+    deadline = ensure_deadline(deadline)
+    folder_prefix = _select_folder(False, extracted_info).prefix
+    
+    s3_result = list_s3_files_with_prefix(bucket_name, folder_prefix, deadline=deadline)
+    evidence = None
+    if s3_result["success"]:
+        evidence = get_pdf_text_extractor().find_evidence(
+            s3_result["objects"],
+            lambda key, start, end: _read_object_range(bucket_name, key, start, end, deadline),
+            _evidence_terms(extracted_info),
+            max_documents=pdf_evidence_config['max_documents']
+        )
+    return _evidence_result(folder_prefix, s3_result, evidence, start_time)
+
+def _should_collect_document_evidence(extracted_info: Dict[str, str], deadline: Deadline) -> bool:
+    """身份检查时是否查找 PDF 文本证据（[PDF_EVIDENCE] ENABLED，剩余时间不足时跳过）"""
+    if not pdf_evidence_config['enabled'] or not extracted_info.get('name'):
+        return False
+    if deadline.budget_seconds is not None and not deadline.has_time_for(S3_RESERVE_SECONDS):
+        deadline.skip("document_evidence")
+        return False
+    return True
+
+def profile_folder_documents(folder_prefix: str, bucket_name: str = None,
+                             deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+    """
+    统计讲者文件夹中各格式（PDF、JPEG/PNG、DOCX 等）和各类别（执业证书、简历、截图等）的文档数量
+
+    每个文档只读取开头几 KB，识别结果按 ETag 缓存
+    """
+    start_time = time.time()
+    if bucket_name is None:
+        bucket_name = s3_config['bucket_name']
+    deadline = ensure_deadline(deadline)
+    
+    s3_result = list_s3_files_with_prefix(bucket_name, folder_prefix, deadline=deadline)
+    if not s3_result["success"]:
+        log_mcp_tool_call("profile_folder_documents", False, time.time() - start_time, s3_result.get("error"))
+        return {"success": False, "error": s3_result.get("error"), "bucket_name": bucket_name,
+                "prefix": folder_prefix}
+    
+    profile = _profile_listed_folder(bucket_name, s3_result, deadline)
+    execution_time = time.time() - start_time
+    log_mcp_tool_call("profile_folder_documents", True, execution_time)
+    logger.info(f"文件夹内容画像完成: {folder_prefix}, 文档 {len(profile.documents)} 个, "
+                f"Range GET {profile.ranged_gets} 次, 缓存命中 {profile.cache_hits} 次")
+    return dict(profile.to_dict(), success=True, bucket_name=bucket_name, prefix=folder_prefix)
 
 def list_s3_files(bucket_name: str = None) -> Dict[str, Any]:
     """
@@ -136,6 +979,7 @@ def list_s3_files(bucket_name: str = None) -> Dict[str, Any]:
         files = []
         if 'Contents' in response:
             files = [obj['Key'] for obj in response['Contents']]
+        record_usage(s3_list_calls=1, s3_keys_scanned=len(files))
         
         result = {
             "success": True,
@@ -166,31 +1010,48 @@ def list_s3_files(bucket_name: str = None) -> Dict[str, Any]:
             "bucket_name": bucket_name
         }
 
-def extract_doctor_info(text: str) -> Dict[str, str]:
+# Bedrock 信息提取使用的模型
+BEDROCK_EXTRACTION_MODEL_ID = "anthropic.claude-3-haiku-20240307-v1:0"
+
+@traced("extraction")
+def extract_doctor_info(text: str, deadline: Optional[Deadline] = None) -> Dict[str, str]:
     """
     使用Bedrock LLM从文本中提取医生信息
     """
-    import boto3
-    import json
-    
-    info = {
-        'name': '',
-        'hospital': '',
-        'department': '',
-        'title': ''
-    }
+    # 剩余时间不足以完成一次 Bedrock 调用时，直接使用关键词提取
+    bedrock_timeout = None
+    if deadline is not None:
+        if not deadline.has_time_for(BEDROCK_MIN_SECONDS + S3_RESERVE_SECONDS):
+            deadline.skip("bedrock_extraction")
+            return extract_doctor_info_fallback(text)
+        bedrock_timeout = deadline.timeout_for("bedrock_extraction", BEDROCK_TIMEOUT_CAP, S3_RESERVE_SECONDS)
     
     try:
         # 创建Bedrock客户端
-        bedrock_client = boto3.client(
-            'bedrock-runtime',
-            aws_access_key_id=aws_config['access_key_id'],
-            aws_secret_access_key=aws_config['secret_access_key'],
-            region_name=aws_config['region']
+        bedrock_client = create_bedrock_client(bedrock_timeout)
+        
+        # 通过弹性层调用：限流错误指数退避重试，持续失败时熔断快速失败
+        response = get_dependency_guard("bedrock").call(
+            ensure_deadline(deadline).call,
+            "bedrock_extraction",
+            bedrock_client.invoke_model,
+            max_wait=bedrock_timeout,
+            budget_limited=bedrock_timeout is not None and bedrock_timeout < BEDROCK_TIMEOUT_CAP,
+            modelId=BEDROCK_EXTRACTION_MODEL_ID,
+            body=_extraction_request_body(text)
         )
         
-        # 构建提示词
-        prompt = f"""请从以下文本中提取医生的信息，如果某个信息不存在则返回空字符串。
+        return _parse_extraction_response(response['body'].read())
+    
+    except Exception as e:
+        return _extraction_fallback(text, e)
+
+def _extraction_request_body(text: str) -> str:
+    """构建 Bedrock 信息提取请求体"""
+    import json
+    
+    # 构建提示词
+    prompt = f"""请从以下文本中提取医生的信息，如果某个信息不存在则返回空字符串。
 
 文本：{text}
 
@@ -205,55 +1066,74 @@ def extract_doctor_info(text: str) -> Dict[str, str]:
 
 请只返回JSON，不要其他解释："""
 
-        # 调用Bedrock Claude模型
-        body = {
-            "anthropic_version": "bedrock-2023-05-31",
-            "max_tokens": 1000,
-            "messages": [
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ]
-        }
-        
-        response = bedrock_client.invoke_model(
-            modelId="anthropic.claude-3-haiku-20240307-v1:0",
-            body=json.dumps(body)
-        )
-        
-        response_body = json.loads(response['body'].read())
-        llm_response = response_body['content'][0]['text'].strip()
-        
-        # 尝试解析JSON响应
-        try:
-            # 提取JSON部分（可能包含其他文本）
-            json_start = llm_response.find('{')
-            json_end = llm_response.rfind('}') + 1
-            if json_start != -1 and json_end != -1:
-                json_str = llm_response[json_start:json_end]
-                extracted_info = json.loads(json_str)
-                
-                # 更新info字典
-                for key in info.keys():
-                    if key in extracted_info and extracted_info[key]:
-                        info[key] = str(extracted_info[key]).strip()
-                        
-                logger.info(f"Bedrock LLM成功提取医生信息: {info}")
-            else:
-                logger.warning("Bedrock LLM响应中未找到有效JSON")
-                
-        except json.JSONDecodeError as e:
-            logger.warning(f"解析Bedrock LLM响应JSON失败: {e}, 响应: {llm_response}")
+    # 调用Bedrock Claude模型
+    body = {
+        "anthropic_version": "bedrock-2023-05-31",
+        "max_tokens": 1000,
+        "messages": [
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
+    }
+    return json.dumps(body)
+
+def _parse_extraction_response(raw_body: bytes) -> Dict[str, str]:
+    """解析 Bedrock 响应体中的医生信息，并记录 token 用量"""
+    import json
+    
+    info = {
+        'name': '',
+        'hospital': '',
+        'department': '',
+        'title': ''
+    }
+    
+    response_body = json.loads(raw_body)
+    usage = response_body.get('usage', {})
+    record_usage(
+        bedrock_calls=1,
+        bedrock_input_tokens=usage.get('input_tokens', 0),
+        bedrock_output_tokens=usage.get('output_tokens', 0)
+    )
+    llm_response = response_body['content'][0]['text'].strip()
+    
+    # 尝试解析JSON响应
+    try:
+        # 提取JSON部分（可能包含其他文本）
+        json_start = llm_response.find('{')
+        json_end = llm_response.rfind('}') + 1
+        if json_start != -1 and json_end != -1:
+            json_str = llm_response[json_start:json_end]
+            extracted_info = json.loads(json_str)
             
-    except Exception as e:
-        logger.error(f"调用Bedrock LLM失败: {str(e)}")
-        # 如果Bedrock调用失败，回退到简单的关键词提取
-        logger.info("回退到关键词提取方法")
-        info = extract_doctor_info_fallback(text)
+            # 更新info字典
+            for key in info.keys():
+                if key in extracted_info and extracted_info[key]:
+                    info[key] = str(extracted_info[key]).strip()
+                    
+            logger.info(f"Bedrock LLM成功提取医生信息: {info}")
+        else:
+            logger.warning("Bedrock LLM响应中未找到有效JSON")
+            
+    except json.JSONDecodeError as e:
+        logger.warning(f"解析Bedrock LLM响应JSON失败: {e}, 响应: {llm_response}")
     
     return info
 
+def _extraction_fallback(text: str, error: Exception) -> Dict[str, str]:
+    """Bedrock 调用失败（熔断、限流或重试耗尽）时回退到关键词提取"""
+    if isinstance(error, CircuitOpenError):
+        logger.warning(f"Bedrock 熔断中，跳过调用: {str(error)}，回退到关键词提取方法")
+    elif isinstance(error, RateLimitExceeded):
+        logger.warning(f"Bedrock 限流等待超时: {str(error)}，回退到关键词提取方法")
+    else:
+        logger.error(f"调用Bedrock LLM失败（已按限流策略重试）: {str(error)}")
+        # 如果Bedrock调用失败，回退到简单的关键词提取
+        logger.info("回退到关键词提取方法")
+    return extract_doctor_info_fallback(text)
+
 def extract_doctor_info_fallback(text: str) -> Dict[str, str]:
     """
     回退方法：使用关键词匹配提取医生信息
@@ -301,631 +1181,930 @@ def extract_doctor_info_fallback(text: str) -> Dict[str, str]:
     
     return info
 
-def search_doctor_with_exa(doctor_name: str, hospital: str, department: str) -> Dict[str, Any]:
+def search_doctor_with_exa(doctor_name: str, hospital: str, department: str,
+                           deadline: Optional[Deadline] = None) -> Dict[str, Any]:
     """
-    使用EXA API搜索医生信息验证身份真实性
+    使用EXA API搜索医生信息验证身份真实性（相同讲者的并发搜索共享一次EXA调用）
     """
+    deadline = ensure_deadline(deadline)
+    key = (normalize_input(doctor_name), normalize_input(hospital), normalize_input(department))
     try:
-        import requests
-        import os
-        
-        # 优先从配置文件获取EXA API key，然后从环境变量获取
-        exa_api_key = exa_config.get('api_key', '')
-        if not exa_api_key:
-            exa_api_key = os.getenv('EXA_API_KEY', '')
-        
-        if not exa_api_key:
-            logger.warning("EXA API key未设置（配置文件和环境变量都未找到），跳过网络搜索验证")
+        return get_single_flight("exa_search").do(
+            key,
+            _search_doctor_with_exa, doctor_name, hospital, department, deadline,
+            wait_timeout=_wait_timeout(deadline),
+            reusable=_unless_truncated(deadline, _exa_search_skipped, EXA_MIN_SECONDS + S3_RESERVE_SECONDS)
+        )
+    except TimeoutError:
+        deadline.skip("exa_search", "等待进行中的EXA搜索超时")
+        return {"success": False, "skipped": True, "error": "时间预算不足，跳过EXA网络搜索"}
+
+def _exa_search_skipped(result: Dict[str, Any]) -> bool:
+    """EXA搜索因时间预算不足被跳过"""
+    return bool(result.get("skipped"))
+
+@traced("exa_search")
+def _search_doctor_with_exa(doctor_name: str, hospital: str, department: str,
+                            deadline: Deadline) -> Dict[str, Any]:
+    """实际执行EXA搜索"""
+    # 剩余时间不足时跳过EXA搜索（由调用方标记为部分结果）
+    exa_timeout = EXA_TIMEOUT_CAP
+    if deadline.budget_seconds is not None:
+        if not deadline.has_time_for(EXA_MIN_SECONDS + S3_RESERVE_SECONDS):
+            deadline.skip("exa_search")
+            return {"success": False, "skipped": True, "error": "时间预算不足，跳过EXA网络搜索"}
+        exa_timeout = deadline.timeout_for("exa_search", EXA_TIMEOUT_CAP, S3_RESERVE_SECONDS)
+    
+    try:
+        request = _exa_search_request(doctor_name, hospital, department)
+        if request is None:
             return {"success": False, "error": "EXA API key not found"}
+        url, payload, headers = request
         
-        # 构建搜索查询
-        search_query = f"{doctor_name} {hospital} {department} 医生"
-        
-        # EXA API调用
-        headers = {
-            "accept": "application/json",
-            "content-type": "application/json",
-            "x-api-key": exa_api_key
-        }
+        def _post_exa_search():
+            # 经过录制层发送（录制/回放模式下记录或重放请求，关闭时直接发送）
+            response = deadline.call(
+                "exa_search",
+                get_cassette().http_post,
+                "exa",
+                url,
+                _get_http_session().post,
+                payload,
+                headers,
+                exa_timeout
+            )
+            return _check_exa_response(response)
         
-        payload = {
-            "query": search_query,
-            "type": "neural",
-            "useAutoprompt": True,
-            "numResults": 5,
-            "contents": {
-                "text": True
-            }
+        response = get_dependency_guard("exa").call(_post_exa_search, max_wait=exa_timeout,
+                                                    budget_limited=exa_timeout < EXA_TIMEOUT_CAP)
+        return _exa_search_result(response, doctor_name, hospital, department, payload["query"])
+    
+    except Exception as e:
+        return _exa_search_error(e)
+
+def _exa_search_request(doctor_name: str, hospital: str, department: str):
+    """
+    构建EXA搜索请求
+
+    Returns:
+        (url, payload, headers)；未配置 API key 时返回 None
+    """
+    import os
+    
+    # 优先从配置文件获取EXA API key，然后从环境变量获取
+    exa_api_key = exa_config.get('api_key', '')
+    if not exa_api_key:
+        exa_api_key = os.getenv('EXA_API_KEY', '')
+    
+    if not exa_api_key:
+        logger.warning("EXA API key未设置（配置文件和环境变量都未找到），跳过网络搜索验证")
+        return None
+    
+    # 构建搜索查询
+    search_query = f"{doctor_name} {hospital} {department} 医生"
+    
+    # EXA API调用
+    headers = {
+        "accept": "application/json",
+        "content-type": "application/json",
+        "x-api-key": exa_api_key
+    }
+    
+    payload = {
+        "query": search_query,
+        "type": "neural",
+        "useAutoprompt": True,
+        "numResults": 5,
+        "contents": {
+            "text": True
         }
+    }
+    
+    logger.info(f"开始EXA搜索验证: {search_query}")
+    url = f"{exa_config.get('base_url', DEFAULT_EXA_BASE_URL).rstrip('/')}/search"
+    return url, payload, headers
+
+def _check_exa_response(response):
+    """记录EXA调用用量；429/5xx 视为限流或临时不可用，抛出 ThrottlingError 交给弹性层退避重试"""
+    record_usage(
+        exa_requests=1,
+        exa_result_bytes=len(response.text.encode('utf-8')) if response.status_code == 200 else 0
+    )
+    if response.status_code == 429 or response.status_code >= 500:
+        raise ThrottlingError(f"EXA API error: {response.status_code}")
+    return response
+
+def _exa_search_result(response, doctor_name: str, hospital: str, department: str,
+                       search_query: str) -> Dict[str, Any]:
+    """根据EXA响应计算匹配分数并生成验证结果"""
+    if response.status_code == 200:
+        search_results = response.json()
+        results = search_results.get('results', [])
         
-        logger.info(f"开始EXA搜索验证: {search_query}")
-        
-        response = requests.post(
-            "https://api.exa.ai/search",
-            json=payload,
-            headers=headers,
-            timeout=10
-        )
+        # 分析搜索结果
+        match_score = 0
+        matched_results = []
         
-        if response.status_code == 200:
-            search_results = response.json()
-            results = search_results.get('results', [])
-            
-            # 分析搜索结果
-            match_score = 0
-            matched_results = []
+        for result in results:
+            title = result.get('title', '').lower()
+            text = result.get('text', '').lower()
+            url = result.get('url', '')
             
-            for result in results:
-                title = result.get('title', '').lower()
-                text = result.get('text', '').lower()
-                url = result.get('url', '')
-                
-                content = f"{title} {text}"
-                current_score = 0
-                
-                # 检查姓名匹配
-                if doctor_name.lower() in content:
-                    current_score += 3
-                
-                # 检查医院匹配
-                if hospital.lower() in content:
-                    current_score += 2
-                
-                # 检查科室匹配
-                if department.lower() in content:
-                    current_score += 2
-                
-                # 检查医生相关关键词
-                doctor_keywords = ['医生', '医师', '主任', '教授', '副主任']
-                for keyword in doctor_keywords:
-                    if keyword in content:
-                        current_score += 1
-                        break
-                
-                if current_score > 0:
-                    matched_results.append({
-                        'title': result.get('title', ''),
-                        'url': url,
-                        'score': current_score,
-                        'text_snippet': text[:200] + '...' if len(text) > 200 else text
-                    })
-                    match_score = max(match_score, current_score)
+            content = f"{title} {text}"
+            current_score = 0
             
-            # 排序结果
-            matched_results.sort(key=lambda x: x['score'], reverse=True)
+            # 检查姓名匹配
+            if doctor_name.lower() in content:
+                current_score += 3
             
-            # 判断是否验证通过（匹配分数>=5认为验证通过）
-            verification_passed = match_score >= 5
+            # 检查医院匹配
+            if hospital.lower() in content:
+                current_score += 2
             
-            logger.info(f"EXA搜索完成，最高匹配分数: {match_score}, 验证通过: {verification_passed}")
+            # 检查科室匹配
+            if department.lower() in content:
+                current_score += 2
             
-            return {
-                "success": True,
-                "verification_passed": verification_passed,
-                "match_score": match_score,
-                "total_results": len(results),
-                "matched_results": matched_results[:3],  # 只返回前3个最佳匹配
-                "search_query": search_query
-            }
-        else:
-            logger.error(f"EXA API调用失败: {response.status_code}, {response.text}")
-            return {"success": False, "error": f"EXA API error: {response.status_code}"}
+            # 检查医生相关关键词
+            doctor_keywords = ['医生', '医师', '主任', '教授', '副主任']
+            for keyword in doctor_keywords:
+                if keyword in content:
+                    current_score += 1
+                    break
             
-    except Exception as e:
-        logger.error(f"EXA搜索过程中出现错误: {str(e)}")
-        return {"success": False, "error": str(e)}
+            if current_score > 0:
+                matched_results.append({
+                    'title': result.get('title', ''),
+                    'url': url,
+                    'score': current_score,
+                    'text_snippet': text[:200] + '...' if len(text) > 200 else text
+                })
+                match_score = max(match_score, current_score)
+        
+        # 排序结果
+        matched_results.sort(key=lambda x: x['score'], reverse=True)
+        
+        # 判断是否验证通过（匹配分数>=5认为验证通过）
+        verification_passed = match_score >= 5
+        
+        logger.info(f"EXA搜索完成，最高匹配分数: {match_score}, 验证通过: {verification_passed}")
+        
+        return {
+            "success": True,
+            "verification_passed": verification_passed,
+            "match_score": match_score,
+            "total_results": len(results),
+            "matched_results": matched_results[:3],  # 只返回前3个最佳匹配
+            "search_query": search_query
+        }
+    else:
+        logger.error(f"EXA API调用失败: {response.status_code}, {response.text}")
+        return {"success": False, "error": f"EXA API error: {response.status_code}"}
+
+def _exa_search_error(error: Exception) -> Dict[str, Any]:
+    """EXA搜索失败的结果（弹性层拒绝、重试耗尽或其他错误）"""
+    if isinstance(error, (CircuitOpenError, RateLimitExceeded)):
+        logger.warning(f"EXA 搜索被弹性层拒绝: {str(error)}")
+    else:
+        logger.error(f"EXA搜索过程中出现错误: {str(error)}")
+    return {"success": False, "error": str(error)}
+
+def check_string_content(input_string: str, target_word: str = None,
+                         deadline: Optional[Deadline] = None,
+                         extracted_info: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """
+    检查讲者身份信息的真实性和完整性（相同输入的并发请求共享一次检查）
+    """
+    with pinned_snapshot() as snapshot:
+        if target_word is None:
+            target_word = preaudit_config['target_word']
+        if deadline is None:
+            deadline = Deadline.from_timeout(preaudit_config['timeout_seconds'])
+        
+        try:
+            # 只合并使用同一配置版本、基于同一提取结果的请求
+            return get_single_flight("check_string_content").do(
+                _identity_flight_key(input_string, target_word, snapshot.version, extracted_info),
+                _check_string_content, input_string, target_word, deadline, extracted_info,
+                wait_timeout=_wait_timeout(deadline),
+                reusable=_unless_truncated(deadline, _identity_truncated, S3_RESERVE_SECONDS)
+            )
+        except TimeoutError:
+            return _coalesced_wait_identity_result(input_string, target_word)
 
-def check_string_content(input_string: str, target_word: str = None) -> Dict[str, Any]:
+def _identity_flight_key(input_string: str, target_word: str, version: int,
+                         extracted_info: Optional[Dict[str, str]]) -> tuple:
     """
-    检查讲者身份信息的真实性和完整性
+    身份检查的合并键
+
+    调用方传入的提取结果（如 Bedrock 限流后回退的关键词提取）决定 EXA 验证的对象，一并纳入合并键，
+    避免跟随者拿到基于另一份提取结果的验证
     """
+    extraction = None
+    if extracted_info is not None:
+        extraction = tuple(normalize_input(extracted_info.get(field) or '')
+                           for field in ('name', 'hospital', 'department'))
+    return (normalize_input(input_string), target_word, version, extraction)
+
+def _identity_truncated(result: Dict[str, Any]) -> bool:
+    """身份检查因时间预算不足未完成"""
+    return bool(result.get("deadline_exceeded"))
+
+def _coalesced_wait_identity_result(input_string: str, target_word: str) -> Dict[str, Any]:
+    """等待进行中的相同身份检查超时时的部分结果"""
+    logger.warning("讲者验证：等待进行中的相同请求超时")
+    result = _new_identity_result(input_string, target_word)
+    result["verification_method"] = "deadline_exceeded"
+    result["verification_details"] = {
+        "message": "时间预算不足，等待进行中的相同请求超时",
+        "confidence_score": 0
+    }
+    result["deadline_exceeded"] = True
+    return result
+
+def _check_string_content(input_string: str, target_word: str, deadline: Deadline,
+                          extracted_info: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """实际执行讲者身份检查（已提取的讲者信息可直接传入，避免重复调用 Bedrock）"""
     start_time = time.time()
-    if target_word is None:
-        target_word = preaudit_config['target_word']
     
     logger.info(f"开始检查内容合规标识: {target_word}")
     
     try:
-        contains_target = target_word in input_string
-        
-        result = {
-            "input_string": input_string,
-            "target_word": target_word,
-            "contains_target": contains_target,
-            "verification_passed": False,
-            "verification_method": "",
-            "extracted_info": {},
-            "verification_details": {},
-            "exa_search_results": {},
-            "string_length": len(input_string)
-        }
+        result = _new_identity_result(input_string, target_word)
         
         # 如果包含特殊标识（如"鲍娜"），直接通过但仍需提取信息
-        if contains_target:
-            result["verification_passed"] = True
-            result["verification_method"] = "direct_pass"
-            result["verification_details"] = {
-                "message": "内容已通过内部验证流程",
-                "confidence_score": 10
-            }
+        if result["contains_target"]:
             # 仍然提取医生信息用于文件夹选择
-            extracted_info = extract_doctor_info(input_string)
-            result["extracted_info"] = extracted_info
-            logger.info(f"讲者验证：包含特殊标识'{target_word}'，直接通过，同时提取信息用于文件夹选择")
+            if extracted_info is None:
+                extracted_info = extract_doctor_info(input_string, deadline)
+            _mark_direct_pass(result, extracted_info)
         else:
             # 如果不包含特殊标识，进行医生信息提取
             logger.info("讲者验证：未包含特殊标识，开始提取医生信息")
             
             # 提取医生信息
-            extracted_info = extract_doctor_info(input_string)
+            if extracted_info is None:
+                extracted_info = extract_doctor_info(input_string, deadline)
             result["extracted_info"] = extracted_info
             
-            if not extracted_info['name']:
-                result["verification_details"] = {
-                    "message": "无法从文本中提取医生姓名",
-                    "confidence_score": 0
-                }
-                logger.warning("讲者验证：无法提取医生姓名")
-            else:
+            if extracted_info['name']:
                 # 如果提取到医生信息，进行EXA网络搜索验证
                 logger.info(f"开始EXA网络搜索验证医生身份: {extracted_info['name']}")
                 
                 exa_results = search_doctor_with_exa(
                     extracted_info['name'],
                     extracted_info['hospital'],
-                    extracted_info['department']
+                    extracted_info['department'],
+                    deadline
                 )
-                
-                result["exa_search_results"] = exa_results
-                
-                if exa_results["success"] and exa_results["verification_passed"]:
-                    # EXA搜索验证通过
-                    result["verification_passed"] = True
-                    result["verification_method"] = "exa_search"
-                    result["verification_details"] = {
-                        "message": f"网络搜索验证通过，匹配分数: {exa_results['match_score']}",
-                        "confidence_score": min(exa_results['match_score'], 10),
-                        "search_results_count": exa_results['total_results'],
-                        "matched_results_count": len(exa_results['matched_results'])
-                    }
-                    logger.info(f"EXA搜索验证通过：匹配分数 {exa_results['match_score']}")
-                else:
-                    # EXA搜索验证失败，但仍然检查信息完整性作为辅助
-                    info_fields = [k for k, v in extracted_info.items() if v]
-                    if len(info_fields) >= 3:
-                        result["verification_passed"] = False  # 网络搜索失败，身份验证不通过
-                        result["verification_method"] = "exa_search_failed"
-                        result["verification_details"] = {
-                            "message": f"网络搜索验证失败，但讲者信息完整（包含{len(info_fields)}个字段）",
-                            "confidence_score": 2,  # 低置信度
-                            "search_error": exa_results.get("error", "搜索结果不匹配"),
-                            "info_completeness": f"{len(info_fields)}/4个字段"
-                        }
-                        logger.warning(f"EXA搜索验证失败，信息完整性作为辅助：{len(info_fields)}个字段")
-                    else:
-                        result["verification_details"] = {
-                            "message": f"网络搜索验证失败，且讲者信息不完整（仅包含{len(info_fields)}个字段）",
-                            "confidence_score": 0,
-                            "search_error": exa_results.get("error", "搜索结果不匹配"),
-                            "info_completeness": f"{len(info_fields)}/4个字段"
-                        }
-                        logger.warning(f"EXA搜索验证失败，信息也不完整：仅{len(info_fields)}个字段")
-        
-        execution_time = time.time() - start_time
-        log_mcp_tool_call("check_string_content", True, execution_time)
-        logger.info(f"内容合规检查完成，验证通过: {result['verification_passed']}")
+                _apply_exa_verification(result, extracted_info, exa_results, deadline)
+                if _should_collect_document_evidence(extracted_info, deadline):
+                    result["document_evidence"] = collect_document_evidence(extracted_info, deadline=deadline)
+            else:
+                _mark_name_missing(result)
         
-        return result
+        return _identity_check_finished(result, start_time)
         
     except Exception as e:
-        execution_time = time.time() - start_time
-        error_msg = str(e)
-        log_mcp_tool_call("check_string_content", False, execution_time, error_msg)
-        logger.error(f"内容合规检查失败: {error_msg}")
+        _identity_check_failed(e, start_time)
         raise
 
-def perform_preaudit(user_input: str, bucket_name: str = None) -> str:
-    """
-    执行医药代表内容的完整预审流程并提供改进建议
-    """
-    start_time = time.time()
-    if bucket_name is None:
-        bucket_name = s3_config['bucket_name']
+def _new_identity_result(input_string: str, target_word: str) -> Dict[str, Any]:
+    """身份检查结果的初始结构"""
+    return {
+        "input_string": input_string,
+        "target_word": target_word,
+        "contains_target": target_word in input_string,
+        "verification_passed": False,
+        "verification_method": "",
+        "extracted_info": {},
+        "verification_details": {},
+        "exa_search_results": {},
+        "string_length": len(input_string),
+        "deadline_exceeded": False
+    }
+
+def _mark_direct_pass(result: Dict[str, Any], extracted_info: Dict[str, str]):
+    """包含特殊标识：直接通过，提取的信息用于文件夹选择"""
+    result["verification_passed"] = True
+    result["verification_method"] = "direct_pass"
+    result["verification_details"] = {
+        "message": "内容已通过内部验证流程",
+        "confidence_score": 10
+    }
+    result["extracted_info"] = extracted_info
+    logger.info(f"讲者验证：包含特殊标识'{result['target_word']}'，直接通过，同时提取信息用于文件夹选择")
+
+def _mark_name_missing(result: Dict[str, Any]):
+    result["verification_details"] = {
+        "message": "无法从文本中提取医生姓名",
+        "confidence_score": 0
+    }
+    logger.warning("讲者验证：无法提取医生姓名")
+
+def _apply_exa_verification(result: Dict[str, Any], extracted_info: Dict[str, str],
+                            exa_results: Dict[str, Any], deadline: Deadline):
+    """根据EXA搜索结果确定身份验证结论"""
+    result["exa_search_results"] = exa_results
     
-    logger.info(f"开始执行完整预审流程，内容长度: {len(user_input)}")
+    if not exa_results["success"] and (exa_results.get("skipped") or deadline.expired()):
+        # 时间预算不足，网络搜索未完成，结果标记为部分结果
+        result["deadline_exceeded"] = True
+        result["verification_method"] = "deadline_exceeded"
+        result["verification_details"] = {
+            "message": "时间预算不足，未完成网络搜索验证",
+            "confidence_score": 0,
+            "search_error": exa_results.get("error", "")
+        }
+        logger.warning("讲者验证：时间预算不足，网络搜索验证未完成")
+    elif exa_results["success"] and exa_results["verification_passed"]:
+        # EXA搜索验证通过
+        result["verification_passed"] = True
+        result["verification_method"] = "exa_search"
+        result["verification_details"] = {
+            "message": f"网络搜索验证通过，匹配分数: {exa_results['match_score']}",
+            "confidence_score": min(exa_results['match_score'], 10),
+            "search_results_count": exa_results['total_results'],
+            "matched_results_count": len(exa_results['matched_results'])
+        }
+        logger.info(f"EXA搜索验证通过：匹配分数 {exa_results['match_score']}")
+    else:
+        # EXA搜索验证失败，但仍然检查信息完整性作为辅助
+        info_fields = [k for k, v in extracted_info.items() if v]
+        if len(info_fields) >= 3:
+            result["verification_passed"] = False  # 网络搜索失败，身份验证不通过
+            result["verification_method"] = "exa_search_failed"
+            result["verification_details"] = {
+                "message": f"网络搜索验证失败，但讲者信息完整（包含{len(info_fields)}个字段）",
+                "confidence_score": 2,  # 低置信度
+                "search_error": exa_results.get("error", "搜索结果不匹配"),
+                "info_completeness": f"{len(info_fields)}/4个字段"
+            }
+            logger.warning(f"EXA搜索验证失败，信息完整性作为辅助：{len(info_fields)}个字段")
+        else:
+            result["verification_details"] = {
+                "message": f"网络搜索验证失败，且讲者信息不完整（仅包含{len(info_fields)}个字段）",
+                "confidence_score": 0,
+                "search_error": exa_results.get("error", "搜索结果不匹配"),
+                "info_completeness": f"{len(info_fields)}/4个字段"
+            }
+            logger.warning(f"EXA搜索验证失败，信息也不完整：仅{len(info_fields)}个字段")
+
+def _identity_check_finished(result: Dict[str, Any], start_time: float) -> Dict[str, Any]:
+    execution_time = time.time() - start_time
+    log_mcp_tool_call("check_string_content", True, execution_time)
+    logger.info(f"内容合规检查完成，验证通过: {result['verification_passed']}")
+    return result
+
+def _identity_check_failed(error: Exception, start_time: float):
+    execution_time = time.time() - start_time
+    error_msg = str(error)
+    log_mcp_tool_call("check_string_content", False, execution_time, error_msg)
+    logger.error(f"内容合规检查失败: {error_msg}")
+
+def _planner_skipped_string_result(input_string: str, target_word: str,
+                                   extracted_info: Dict[str, str]) -> Dict[str, Any]:
+    """构建因文件夹检查已确定结论而跳过EXA搜索时的身份检查结果"""
+    return {
+        "input_string": input_string,
+        "target_word": target_word,
+        "contains_target": False,
+        "verification_passed": False,
+        "verification_method": "planner_skipped",
+        "extracted_info": extracted_info,
+        "verification_details": {
+            "message": "文件夹检查已确定预审结论，未执行网络搜索验证",
+            "confidence_score": 0
+        },
+        "exa_search_results": {},
+        "string_length": len(input_string),
+        "deadline_exceeded": False
+    }
+
+def _select_folder(contains_target: bool, extracted_info: Dict[str, str]) -> FolderInfo:
+    """根据讲者信息确定要检查的文件夹"""
+    doctor_name = extracted_info.get('name', '')
+    hospital = extracted_info.get('hospital', '')
+    department = extracted_info.get('department', '')
     
-    try:
-        # 首先检查讲者身份验证
-        string_result = check_string_content(user_input)
-        
-        # 根据验证结果决定检查哪个文件夹
-        extracted_info = string_result.get("extracted_info", {})
-        doctor_name = extracted_info.get('name', '')
-        hospital = extracted_info.get('hospital', '')
-        department = extracted_info.get('department', '')
-        contains_target = string_result.get("contains_target", False)
-        
-        # 确定要检查的文件夹前缀
-        if contains_target:
-            # 如果包含"鲍娜"，也需要提取信息来确定专属文件夹
-            logger.info("鲍娜医生：提取信息以确定专属文件夹")
-            if doctor_name and hospital and department:
-                # 鲍娜医生也使用专属文件夹，去除多余空格
-                clean_name = doctor_name.strip().replace(' ', '')
-                clean_hospital = hospital.strip().replace(' ', '')
-                clean_department = department.strip().replace(' ', '')
-                doctor_folder_prefix = f"{clean_name}-{clean_hospital}-{clean_department}/"
-                folder_prefix = doctor_folder_prefix
-                folder_type = "医生专属文件夹"
-                folder_name = doctor_folder_prefix.rstrip('/')
-                logger.info(f"鲍娜医生使用专属文件夹: {doctor_folder_prefix}")
-            else:
-                # 如果鲍娜医生信息不完整，使用tinabao作为后备
-                folder_prefix = "tinabao/"
-                folder_type = "用户文件夹"
-                folder_name = "tinabao"
-                logger.info("鲍娜医生信息不完整，使用默认tinabao文件夹")
-        elif doctor_name and hospital and department:
-            # 如果提取到完整的医生信息，检查医生专属文件夹，去除多余空格
+    if contains_target:
+        # 如果包含"鲍娜"，也需要提取信息来确定专属文件夹
+        logger.info("鲍娜医生：提取信息以确定专属文件夹")
+        if doctor_name and hospital and department:
+            # 鲍娜医生也使用专属文件夹，去除多余空格
             clean_name = doctor_name.strip().replace(' ', '')
             clean_hospital = hospital.strip().replace(' ', '')
             clean_department = department.strip().replace(' ', '')
             doctor_folder_prefix = f"{clean_name}-{clean_hospital}-{clean_department}/"
-            folder_prefix = doctor_folder_prefix
-            folder_type = "医生专属文件夹"
-            folder_name = doctor_folder_prefix.rstrip('/')
-            logger.info(f"检查医生专属文件夹: {doctor_folder_prefix}")
-        elif doctor_name:
-            # 如果只提取到医生姓名，尝试查找相关文件夹
-            # 这里我们先尝试查找是否有匹配的文件夹
-            folder_prefix = f"{doctor_name}-"
-            folder_type = "医生相关文件夹"
-            folder_name = f"{doctor_name}相关文件夹"
-            logger.info(f"检查医生相关文件夹: {folder_prefix}")
+            logger.info(f"鲍娜医生使用专属文件夹: {doctor_folder_prefix}")
+            return FolderInfo(doctor_folder_prefix, doctor_folder_prefix.rstrip('/'), "医生专属文件夹")
+        # 如果鲍娜医生信息不完整，使用tinabao作为后备
+        logger.info("鲍娜医生信息不完整，使用默认tinabao文件夹")
+        return FolderInfo("tinabao/", "tinabao", "用户文件夹")
+    
+    if doctor_name and hospital and department:
+        # 如果提取到完整的医生信息，检查医生专属文件夹，去除多余空格
+        clean_name = doctor_name.strip().replace(' ', '')
+        clean_hospital = hospital.strip().replace(' ', '')
+        clean_department = department.strip().replace(' ', '')
+        doctor_folder_prefix = f"{clean_name}-{clean_hospital}-{clean_department}/"
+        logger.info(f"检查医生专属文件夹: {doctor_folder_prefix}")
+        return FolderInfo(doctor_folder_prefix, doctor_folder_prefix.rstrip('/'), "医生专属文件夹")
+    
+    if doctor_name:
+        # 如果只提取到医生姓名，尝试查找相关文件夹
+        logger.info(f"检查医生相关文件夹: {doctor_name}-")
+        return FolderInfo(f"{doctor_name}-", f"{doctor_name}相关文件夹", "医生相关文件夹")
+    
+    # 如果没有提取到医生信息，默认检查tinabao文件夹
+    logger.info("未提取到医生信息，检查默认tinabao文件夹")
+    return FolderInfo("tinabao/", "tinabao", "用户文件夹")
+
+def _document_shortage_reason(folder: FolderInfo, min_file_count: int) -> str:
+    reason = f"{folder.folder_type} '{folder.name}' 中支撑文档不足（当前{folder.file_count}个，需要超过{min_file_count}个）"
+    if folder.duplicate_count:
+        reason += f"，另有{folder.duplicate_count}个重复文件未计入"
+    return reason
+
+def _document_suggestions(folder: FolderInfo) -> list:
+    return [
+        f"请补充以下类型的支撑文档到 '{folder.name}' 文件夹：",
+        "  - 产品说明书或处方信息",
+        "  - 相关临床研究数据",
+        "  - 安全性信息和不良反应资料",
+        "  - 监管部门批准的产品信息"
+    ]
+
+def _decide_preaudit_result(string_result: Dict[str, Any], folder: FolderInfo, s3_result: Dict[str, Any],
+                            min_file_count: int, needs_exa: bool) -> PreauditResult:
+    """
+    根据身份检查和文件夹检查结果确定预审结论（纯函数，不发起远程调用）
+    """
+    extracted_info = string_result.get("extracted_info", {})
+    verification_passed = string_result.get("verification_passed", False)
+    verification_method = string_result.get("verification_method", "")
+    
+    folder.exists = s3_result["success"] and s3_result.get("key_count", 0) > 0
+    # 同一文档重复上传只计一次
+    folder.file_count = _unique_file_count(s3_result)
+    folder.duplicate_count = s3_result["file_count"] - folder.file_count
+    folder.duplicate_groups = s3_result.get("duplicate_groups", [])
+    folder.files = s3_result.get("files", [])
+    folder.error = s3_result.get("error")
+    folder.documents = s3_result.get("documents")
+    folder.photo_reuse = s3_result.get("photo_reuse")
+    
+    common = {
+        "extraction": extracted_info,
+        "verification": {
+            "passed": verification_passed,
+            "method": verification_method,
+            "details": string_result.get("verification_details", {}),
+            "exa_search_results": string_result.get("exa_search_results", {})
+        },
+        "folder": folder,
+        "min_file_count": min_file_count,
+        "contains_target": string_result.get("contains_target", False)
+    }
+    if string_result.get("document_evidence"):
+        common["verification"]["document_evidence"] = string_result["document_evidence"]
+    if string_result.get("registry"):
+        common["verification"]["registry"] = string_result["registry"]
+    
+    # 对于非鲍娜医生，如果提取到了医生信息但S3中没有对应文件夹，直接失败
+    if needs_exa and s3_result["success"] and not folder.exists:
+        return PreauditResult.create(
+            OUTCOME_FOLDER_MISSING,
+            reasons=[f"系统中未找到讲者 '{extracted_info.get('name', '未知')}' 的专属文件夹"],
+            **common
+        )
+    
+    if not s3_result["success"]:
+        return PreauditResult.create(
+            OUTCOME_S3_ERROR,
+            reasons=[f"支撑文档系统访问失败: {s3_result.get('error', '未知错误')}"],
+            **common
+        )
+    
+    documents_sufficient = folder.file_count > min_file_count
+    
+    if verification_passed and verification_method == "direct_pass":
+        # 包含"鲍娜"的情况，检查文件夹的文档数量
+        if documents_sufficient:
+            return PreauditResult.create(OUTCOME_DIRECT_PASS, **common)
+        return PreauditResult.create(
+            OUTCOME_DIRECT_PASS_INSUFFICIENT,
+            reasons=[_document_shortage_reason(folder, min_file_count)],
+            **common
+        )
+    
+    if verification_passed and verification_method == "exa_search":
+        # EXA网络搜索验证通过的情况
+        if documents_sufficient:
+            return PreauditResult.create(OUTCOME_EXA_VERIFIED, **common)
+        return PreauditResult.create(
+            OUTCOME_EXA_VERIFIED_INSUFFICIENT,
+            reasons=[_document_shortage_reason(folder, min_file_count)],
+            **common
+        )
+    
+    # 验证失败的情况
+    reasons = []
+    improvements = []
+    name = extracted_info.get('name')
+    
+    if verification_method == "exa_search_failed":
+        # EXA搜索失败但信息完整的情况
+        exa_results = string_result.get("exa_search_results", {})
+        reasons.append(f"网络搜索验证失败，无法确认讲者'{extracted_info.get('name', '未知')}'的身份真实性")
+        improvements.extend([
+            f"讲者'{extracted_info.get('name', '未知')}'的网络验证失败：",
+            f"  - 搜索错误: {exa_results.get('error', '未知错误')}",
+            "  - 建议提供更详细的讲者身份证明文档",
+            "  - 或联系讲者提供官方身份验证材料",
+            "  - 可以尝试提供讲者的官方简历或医院官网链接"
+        ])
+        
+        if documents_sufficient:
+            return PreauditResult.create(
+                OUTCOME_EXA_FAILED_DOCUMENTS_OK,
+                reasons=reasons,
+                suggestions=improvements,
+                **common
+            )
+        reasons.append(_document_shortage_reason(folder, min_file_count))
+        improvements.extend(_document_suggestions(folder))
+    
+    elif verification_method == "planner_skipped":
+        # 支撑文档不足已决定结论，身份网络验证未执行（与“身份验证通过但文档不足”区分）
+        improvements.extend(_document_suggestions(folder))
+        improvements.append(f"讲者'{name}'的网络身份验证将在文档补充完整后重新提交时进行")
+        return PreauditResult.create(
+            OUTCOME_DOCUMENTS_INSUFFICIENT_UNVERIFIED,
+            reasons=[_document_shortage_reason(folder, min_file_count)],
+            suggestions=improvements,
+            **common
+        )
+    
+    else:
+        # 其他验证失败情况
+        if not name:
+            reasons.append("无法从文本中提取医生姓名")
+            improvements.extend([
+                "请在文本中明确提供讲者的具体姓名，例如：",
+                "  - '本次活动我请到了张三医生'",
+                "  - '邀请了李四医生担任讲者'",
+                "  - '王五医生将为我们演讲'"
+            ])
         else:
-            # 如果没有提取到医生信息，默认检查tinabao文件夹
-            folder_prefix = "tinabao/"
-            folder_type = "用户文件夹"
-            folder_name = "tinabao"
-            logger.info("未提取到医生信息，检查默认tinabao文件夹")
-        
-        # 检查对应的文件夹
-        s3_result = list_s3_files_with_prefix(bucket_name, folder_prefix)
-        
-        # 检查文件夹是否存在（区分文件夹不存在和文件夹为空）
-        folder_exists = check_s3_folder_exists(bucket_name, folder_prefix)
-        
-        # 新增逻辑：检查文件夹是否存在
-        if not contains_target and extracted_info.get('name'):
-            # 对于非鲍娜医生，如果提取到了医生信息但S3中没有对应文件夹，直接失败
-            if not folder_exists:
-                result = f"""预审不通过 - 未找到讲者专属文件夹
-
-问题详情：
-❌ 系统中未找到讲者 '{extracted_info.get('name', '未知')}' 的专属文件夹
-❌ 预期文件夹路径: {folder_name}
-
-讲者信息：
-- 姓名: {extracted_info.get('name', '未提取')}
-- 医院: {extracted_info.get('hospital', '未提取')}
-- 科室: {extracted_info.get('department', '未提取')}
-- 职称: {extracted_info.get('title', '未提取')}
-
-具体改进建议：
-1. 请确认讲者信息是否准确无误
-2. 联系系统管理员创建讲者专属文件夹: '{folder_name}'
-3. 上传以下类型的支撑文档到专属文件夹：
-   - 医师执业证书
-   - 医师简历和工作证明
-   - 学术论文和研究成果
-   - 医院出具的身份证明
-   - 专业资质证书
-
-整改步骤：
-1. 核实讲者身份信息的准确性
-2. 联系相关部门创建专属文件夹
-3. 准备并上传完整的身份验证文档
-4. 重新提交预审系统进行检查
-
-注意事项：
-- 每位讲者都必须有专属的文件夹存储验证文档
-- 文件夹命名格式：姓名-医院-科室
-- 所有文档必须真实有效，支持身份验证
-- 如有疑问，请咨询医学事务部门或合规团队"""
-                
-                execution_time = time.time() - start_time
-                log_preaudit_event(user_input, result, 0, contains_target)
-                log_mcp_tool_call("perform_preaudit", True, execution_time)
-                logger.warning(f"预审不通过：讲者专属文件夹不存在 - {folder_name}")
-                
-                return result
+            reasons.append(f"讲者'{name}'的信息验证失败")
+            improvements.extend([
+                f"讲者'{name}'的验证问题：",
+                "  - 请提供更完整的讲者信息（姓名、医院、科室、职称）",
+                "  - 确保信息格式规范和准确",
+                "  - 或联系讲者提供官方身份验证材料"
+            ])
         
-        # 预审逻辑
-        if not s3_result["success"]:
-            result = f"""预审不通过 - 支撑文档系统访问失败: {s3_result.get('error', '未知错误')}
+        if not documents_sufficient:
+            reasons.append(_document_shortage_reason(folder, min_file_count))
+            improvements.extend(_document_suggestions(folder))
+    
+    return PreauditResult.create(
+        OUTCOME_NEEDS_IMPROVEMENT,
+        reasons=reasons,
+        suggestions=improvements,
+        **common
+    )
+
+def _build_incomplete_result(stage: str, deadline: Deadline, extracted_info: Dict[str, str],
+                             folder: Optional[FolderInfo] = None,
+                             stage_timings: Optional[Dict[str, float]] = None) -> PreauditResult:
+    """构建超出时间预算时的部分预审结果"""
+    return PreauditResult.create(
+        OUTCOME_INCOMPLETE,
+        reasons=[f"预审在阶段 '{stage}' 时达到时间预算"],
+        extraction=extracted_info,
+        folder=folder,
+        min_file_count=preaudit_config['min_file_count'],
+        stage_timings=stage_timings or {},
+        deadline={
+            "stage": stage,
+            "budget_seconds": deadline.budget_seconds,
+            "skipped_stages": list(deadline.skipped_stages)
+        }
+    )
 
-改进建议：
-1. 请联系IT支持检查文档存储系统连接
-2. 确认您有权限访问相关文档存储区域
-3. 稍后重试或联系系统管理员
+def _preaudit_truncated(result: PreauditResult) -> bool:
+    """预审因时间预算不足未完成，或跳过了可选阶段（如 Bedrock 提取回退到关键词提取）"""
+    return result.outcome == OUTCOME_INCOMPLETE or bool(result.deadline.get("skipped_stages"))
 
-后续步骤：
-- 解决技术问题后重新提交审核
-- 如持续出现问题，请提交技术支持工单"""
-            
-            execution_time = time.time() - start_time
-            log_preaudit_event(user_input, result, 0, False)
-            log_mcp_tool_call("perform_preaudit", False, execution_time, "S3 access failed")
-            logger.error("预审失败：S3 访问失败")
-            return result
-        
-        file_count = s3_result["file_count"]
-        target_word = string_result["target_word"]
-        min_file_count = preaudit_config['min_file_count']
-        verification_passed = string_result.get("verification_passed", False)
-        verification_method = string_result.get("verification_method", "")
-        verification_details = string_result.get("verification_details", {})
-        
-        # 获取文件列表用于显示
-        file_list = s3_result.get("files", [])
-        file_list_str = ""
-        if file_list:
-            file_list_str = "\n".join([f"  - {file}" for file in file_list])
-        else:
-            file_list_str = "  （无文件）"
+def _record_skipped_stages(result: PreauditResult, deadline: Deadline):
+    """完成的预审中因时间预算跳过的可选阶段同样记入结果（部分结果已包含）"""
+    if deadline.skipped_stages and not result.deadline:
+        result.deadline = {
+            "budget_seconds": deadline.budget_seconds,
+            "skipped_stages": list(deadline.skipped_stages)
+        }
+
+def run_preaudit(user_input: str, bucket_name: str = None,
+                 deadline: Optional[Deadline] = None) -> PreauditResult:
+    """
+    执行医药代表内容的完整预审流程，返回结构化结果
+    （相同输入和存储桶的并发提交共享一次预审计算）
+    """
+    # 整个预审使用开始时的配置快照，处理期间配置更新不影响本次结果
+    with pinned_snapshot() as snapshot:
+        if bucket_name is None:
+            bucket_name = s3_config['bucket_name']
+        if deadline is None:
+            deadline = Deadline.from_timeout(preaudit_config['timeout_seconds'])
         
-        # 预审逻辑
-        if not s3_result["success"]:
-            result = f"""预审不通过 - 支撑文档系统访问失败: {s3_result.get('error', '未知错误')}
+        try:
+            # 只合并使用同一配置版本的提交
+            return get_single_flight("perform_preaudit").do(
+                (normalize_input(user_input), bucket_name, snapshot.version),
+                _run_preaudit, user_input, bucket_name, deadline,
+                wait_timeout=_wait_timeout(deadline),
+                reusable=_unless_truncated(deadline, _preaudit_truncated, S3_RESERVE_SECONDS)
+            )
+        except TimeoutError:
+            logger.warning("预审：等待进行中的相同提交超时，返回部分结果")
+            return _build_incomplete_result("coalesced_wait", deadline, {})
+
+def perform_preaudit(user_input: str, bucket_name: str = None,
+                     deadline: Optional[Deadline] = None, style: str = "default") -> str:
+    """
+    执行医药代表内容的完整预审流程并提供改进建议
+    返回人类可读的报告；需要结构化结果的调用方请使用 run_preaudit
+    """
+    return run_preaudit(user_input, bucket_name, deadline).render(style)
 
-改进建议：
-1. 请联系IT支持检查文档存储系统连接
-2. 确认您有权限访问相关文档存储区域
-3. 稍后重试或联系系统管理员
+def _preaudit_event_details(result: PreauditResult) -> Dict[str, Any]:
+    """预审事件中的结构化字段（供列式导出等分析使用）"""
+    extraction = result.extraction or {}
+    return {
+        "verdict": result.verdict,
+        "outcome": result.outcome,
+        "speaker_name": extraction.get('name', ''),
+        "hospital": extraction.get('hospital', ''),
+        "department": extraction.get('department', ''),
+        "title": extraction.get('title', ''),
+        "verification_method": (result.verification or {}).get('method', ''),
+        "folder": result.folder.prefix if result.folder else ''
+    }
 
-后续步骤：
-- 解决技术问题后重新提交审核
-- 如持续出现问题，请提交技术支持工单"""
-            
-            execution_time = time.time() - start_time
-            log_preaudit_event(user_input, result, 0, False)
-            log_mcp_tool_call("perform_preaudit", False, execution_time, "S3 access failed")
-            logger.error("预审失败：S3 访问失败")
-            return result
-        
-        file_count = s3_result["file_count"]
-        target_word = string_result["target_word"]
-        min_file_count = preaudit_config['min_file_count']
-        verification_passed = string_result.get("verification_passed", False)
-        verification_method = string_result.get("verification_method", "")
-        verification_details = string_result.get("verification_details", {})
-        
-        # 获取文件列表用于显示
-        file_list = s3_result.get("files", [])
-        file_list_str = ""
-        if file_list:
-            file_list_str = "\n".join([f"  - {file}" for file in file_list])
+def _report_identity_progress(string_result: Dict[str, Any]):
+    """上报身份验证阶段的中间结果"""
+    report_progress("identity_verification",
+                    passed=string_result.get("verification_passed", False),
+                    method=string_result.get("verification_method", ""),
+                    deadline_exceeded=bool(string_result.get("deadline_exceeded")))
+
+def _run_preaudit(user_input: str, bucket_name: str, deadline: Deadline) -> PreauditResult:
+    """实际执行完整预审流程，记录本次预审的调用用量和审计记录"""
+    with track_usage() as usage:
+        try:
+            result = _execute_preaudit(user_input, bucket_name, deadline)
+        except RequestCancelled:
+            # 取消前已产生的用量计入“cancelled”，用于评估客户端取消造成的浪费
+            get_cost_ledger().record_preaudit("cancelled", usage)
+            raise
+    _record_skipped_stages(result, deadline)
+    result.cost = usage.to_dict()
+    get_cost_ledger().record_preaudit(result.verdict, usage)
+    get_audit_store().record(result)
+    return result
+
+def _execute_preaudit(user_input: str, bucket_name: str, deadline: Deadline) -> PreauditResult:
+    """预审流程各阶段"""
+    start_time = time.time()
+    
+    logger.info(f"开始执行完整预审流程，内容长度: {len(user_input)}")
+    
+    extracted_info = {}
+    folder = None
+    stage_timings = {}
+    target_word = preaudit_config['target_word']
+    min_file_count = preaudit_config['min_file_count']
+    
+    try:
+        # 首先提取讲者信息（文件夹路径依赖提取结果）
+        contains_target = target_word in user_input
+        confirmed_extraction = None
+        if not contains_target and _registry_covers_preaudit():
+            # 登记表中有预先验证且未过期的结果时，本地查找代替 EXA搜索和 S3 列出；
+            # 内容只提到该讲者时同时代替 Bedrock 提取，否则先用提取结果确认
+            stage_started = time.monotonic()
+            record, needs_confirmation = _registry_lookup(user_input, bucket_name)
+            stage_timings["registry_lookup"] = round(time.monotonic() - stage_started, 4)
+            if needs_confirmation:
+                stage_started = time.monotonic()
+                confirmed_extraction = extract_doctor_info(user_input, deadline)
+                stage_timings["extraction"] = round(time.monotonic() - stage_started, 4)
+                if not _registry_confirms(record, confirmed_extraction):
+                    record = None
+            if record is not None:
+                extracted_info, folder, stage_results = _registry_stage_results(
+                    record, user_input, target_word, deadline, confirmed_extraction
+                )
+                return _finish_preaudit(user_input, target_word, contains_target, extracted_info, folder, True,
+                                        min_file_count, stage_results, stage_timings, start_time)
+        if confirmed_extraction is not None:
+            extracted_info = confirmed_extraction
         else:
-            file_list_str = "  （无文件）"
-        
-        # 新的预审逻辑
-        if verification_passed:
-            if verification_method == "direct_pass":
-                # 包含"鲍娜"的情况，检查tinabao文件夹的文档数量
-                if file_count > min_file_count:
-                    result = f"""预审通过 - 恭喜！您的内容已通过初步审核
-
-通过原因：
-✅ 内容已通过内部验证流程
-✅ {folder_type} '{folder_name}' 中支撑文档数量充足（{file_count}个文档，超过最低要求{min_file_count}个）
-
-当前{folder_type}文档列表：
-{file_list_str}
-
-优化建议：
-1. 建议在正式使用前进行最终人工审核
-2. 确保所有引用的临床数据都有对应的支撑文档
-3. 检查内容是否符合最新的监管指导原则
-4. 考虑添加免责声明和适应症说明
-
-后续步骤：
-- 可以提交给合规部门进行详细审核
-- 准备相关的问答材料以备现场使用
-- 确保演讲者熟悉所有支撑材料的内容"""
-                else:
-                    result = f"""预审不通过 - 虽然内容通过验证，但支撑文档不足
-
-问题详情：
-✅ 内容已通过内部验证流程
-❌ {folder_type} '{folder_name}' 中支撑文档不足（当前{file_count}个，需要超过{min_file_count}个）
-
-当前{folder_type}文档列表：
-{file_list_str}
-
-具体改进建议：
-1. 请补充以下类型的支撑文档到 '{folder_name}' 文件夹：
-   - 产品说明书或处方信息
-   - 相关临床研究数据
-   - 安全性信息和不良反应资料
-   - 监管部门批准的产品信息
-   - 至少需要{min_file_count + 1}个支撑文档
-
-整改步骤：
-1. 上传更多相关支撑文档到S3存储桶的 '{folder_name}' 文件夹
-2. 确保所有材料符合公司合规政策
-3. 重新提交预审系统进行检查
-4. 通过预审后提交人工详细审核"""
-            
-            elif verification_method == "exa_search":
-                # EXA网络搜索验证通过的情况
-                exa_results = string_result.get("exa_search_results", {})
-                if file_count > min_file_count:
-                    result = f"""预审通过 - 讲者身份验证成功
-
-通过原因：
-✅ 网络搜索验证通过，讲者身份真实可靠
-✅ {folder_type} '{folder_name}' 中支撑文档数量充足（{file_count}个文档，超过最低要求{min_file_count}个）
-
-讲者信息：
-- 姓名: {extracted_info.get('name', '未提取')}
-- 医院: {extracted_info.get('hospital', '未提取')}
-- 科室: {extracted_info.get('department', '未提取')}
-- 职称: {extracted_info.get('title', '未提取')}
-
-网络验证详情：
-- 搜索匹配分数: {exa_results.get('match_score', 0)}/10
-- 搜索结果数量: {exa_results.get('total_results', 0)}个
-- 匹配结果数量: {len(exa_results.get('matched_results', []))}个
-
-当前{folder_type}文档列表：
-{file_list_str}
-
-后续步骤：
-- 身份验证已通过网络搜索确认
-- 建议进行进一步的背景调查
-- 确认讲者的专业领域匹配度
-- 准备相关的演讲协议和材料"""
-                else:
-                    result = f"""预审不通过 - 讲者身份验证通过但支撑文档不足
-
-问题详情：
-✅ 网络搜索验证通过，讲者身份真实可靠
-❌ {folder_type} '{folder_name}' 中支撑文档不足（当前{file_count}个，需要超过{min_file_count}个）
-
-网络验证详情：
-- 搜索匹配分数: {exa_results.get('match_score', 0)}/10
-- 搜索结果数量: {exa_results.get('total_results', 0)}个
-
-当前{folder_type}文档列表：
-{file_list_str}
-
-具体改进建议：
-请补充更多支撑文档到 '{folder_name}' 文件夹以满足审核要求"""
+            stage_started = time.monotonic()
+            extracted_info = extract_doctor_info(user_input, deadline)
+            stage_timings["extraction"] = round(time.monotonic() - stage_started, 4)
+        folder, needs_exa = _plan_folder_check(contains_target, extracted_info)
+        stage_results = {}
+        
+        def run_folder_listing() -> bool:
+            # 一次 LIST 同时得到文件夹是否存在和文档数量
+            stage_started = time.monotonic()
+            s3_result = list_s3_files_with_prefix(bucket_name, folder.prefix, deadline=deadline)
+            stage_timings["s3_folder_listing"] = round(time.monotonic() - stage_started, 4)
+            if _should_hash_duplicates(s3_result, deadline):
+                stage_started = time.monotonic()
+                s3_result = _with_duplicates(s3_result, _hash_listed_duplicates(bucket_name, s3_result, deadline))
+                stage_timings["duplicate_hashing"] = round(time.monotonic() - stage_started, 4)
+            if _should_profile_documents(s3_result, deadline):
+                stage_started = time.monotonic()
+                s3_result = _with_document_profile(s3_result, _profile_listed_folder(bucket_name, s3_result, deadline))
+                stage_timings["document_profile"] = round(time.monotonic() - stage_started, 4)
+            if _should_check_photo_reuse(s3_result, deadline):
+                stage_started = time.monotonic()
+                s3_result = _with_photo_reuse(s3_result, _check_photo_reuse(bucket_name, s3_result, deadline))
+                stage_timings["photo_reuse"] = round(time.monotonic() - stage_started, 4)
+            stage_results["s3_result"] = s3_result
+            return _folder_listing_decides(s3_result, folder, needs_exa, min_file_count)
         
+        def run_identity_verification() -> bool:
+            stage_started = time.monotonic()
+            string_result = check_string_content(
+                user_input, target_word, deadline=deadline, extracted_info=extracted_info
+            )
+            stage_timings["identity_verification"] = round(time.monotonic() - stage_started, 4)
+            stage_results["string_result"] = string_result
+            _report_identity_progress(string_result)
+            # 身份验证失败时仍需文档数量区分“部分通过”和“不通过”，因此从不短路
+            return False
+        
+        if needs_exa:
+            # 按成本和短路概率排序：廉价的 S3 检查在前，付费的EXA搜索仅在能改变结论时执行
+            get_stage_planner().execute([
+                Stage("s3_folder_listing", run_folder_listing),
+                Stage("exa_search", run_identity_verification)
+            ])
         else:
-            # 验证失败的情况
-            reasons = []
-            improvements = []
-            
-            if verification_method == "exa_search_failed":
-                # EXA搜索失败但信息完整的情况
-                exa_results = string_result.get("exa_search_results", {})
-                reasons.append(f"网络搜索验证失败，无法确认讲者'{extracted_info.get('name', '未知')}'的身份真实性")
-                improvements.extend([
-                    f"讲者'{extracted_info.get('name', '未知')}'的网络验证失败：",
-                    f"  - 搜索错误: {exa_results.get('error', '未知错误')}",
-                    "  - 建议提供更详细的讲者身份证明文档",
-                    "  - 或联系讲者提供官方身份验证材料",
-                    "  - 可以尝试提供讲者的官方简历或医院官网链接"
-                ])
-                
-                # 检查文档情况
-                if file_count > min_file_count:
-                    result = f"""预审部分通过 - 网络验证失败但文档充足
-
-问题详情：
-❌ 网络搜索验证失败，无法确认讲者身份真实性
-✅ {folder_type} '{folder_name}' 中支撑文档数量充足（{file_count}个文档，超过最低要求{min_file_count}个）
-
-网络验证详情：
-- 搜索错误: {exa_results.get('error', '未知错误')}
-- 搜索结果数量: {exa_results.get('total_results', 0)}个
-
-当前{folder_type}文档列表：
-{file_list_str}
-
-具体改进建议：
-{chr(10).join([f"{i+1}. {imp}" for i, imp in enumerate(improvements)])}
-
-整改步骤：
-1. 优先解决讲者身份验证问题
-2. 提供更多讲者身份证明材料
-3. 重新提交预审系统进行检查
-4. 考虑联系讲者所在医院确认身份
-
-注意事项：
-- 虽然支撑文档充足，但讲者身份验证是必需的
-- 建议在解决身份验证问题后再进行下一步"""
-                else:
-                    reasons.append(f"{folder_type} '{folder_name}' 中支撑文档不足（当前{file_count}个，需要超过{min_file_count}个）")
-                    improvements.extend([
-                        f"请补充以下类型的支撑文档到 '{folder_name}' 文件夹：",
-                        "  - 产品说明书或处方信息",
-                        "  - 相关临床研究数据",
-                        "  - 安全性信息和不良反应资料",
-                        "  - 监管部门批准的产品信息"
-                    ])
-            else:
-                # 其他验证失败情况
-                if not extracted_info.get('name'):
-                    reasons.append("无法从文本中提取医生姓名")
-                    improvements.extend([
-                        "请在文本中明确提供讲者的具体姓名，例如：",
-                        "  - '本次活动我请到了张三医生'",
-                        "  - '邀请了李四医生担任讲者'",
-                        "  - '王五医生将为我们演讲'"
-                    ])
-                else:
-                    reasons.append(f"讲者'{extracted_info.get('name')}'的信息验证失败")
-                    improvements.extend([
-                        f"讲者'{extracted_info.get('name')}'的验证问题：",
-                        "  - 请提供更完整的讲者信息（姓名、医院、科室、职称）",
-                        "  - 确保信息格式规范和准确",
-                        "  - 或联系讲者提供官方身份验证材料"
-                    ])
-                
-                if file_count <= min_file_count:
-                    reasons.append(f"{folder_type} '{folder_name}' 中支撑文档不足（当前{file_count}个，需要超过{min_file_count}个）")
-                    improvements.extend([
-                        f"请补充以下类型的支撑文档到 '{folder_name}' 文件夹：",
-                        "  - 产品说明书或处方信息",
-                        "  - 相关临床研究数据",
-                        "  - 安全性信息和不良反应资料",
-                        "  - 监管部门批准的产品信息"
-                    ])
-            
-            if verification_method != "exa_search_failed" or file_count <= min_file_count:
-                result = f"""预审不通过 - 内容需要改进
+            # 鲍娜医生或无法提取姓名时不调用EXA，身份检查无需远程调用
+            run_identity_verification()
+            run_folder_listing()
+        
+        return _finish_preaudit(user_input, target_word, contains_target, extracted_info, folder, needs_exa,
+                                min_file_count, stage_results, stage_timings, start_time)
+    
+    except DeadlineExceeded as e:
+        return _preaudit_deadline_result(e, user_input, deadline, extracted_info, folder, stage_timings, start_time)
+    
+    except (RequestCancelled, Exception) as e:
+        _preaudit_aborted(e, start_time)
+        raise
 
-问题详情：
-❌ {'; '.join(reasons)}
+def _plan_folder_check(contains_target: bool, extracted_info: Dict[str, str]):
+    """
+    根据提取结果决定检查哪个文件夹，以及是否需要付费的EXA网络搜索，并上报提取阶段进度
 
-当前{folder_type} '{folder_name}' 文档列表：
-{file_list_str}
+    Returns:
+        (文件夹, 是否需要EXA搜索)
+    """
+    folder = _select_folder(contains_target, extracted_info)
+    # 只有非鲍娜医生且提取到姓名时才需要付费的EXA网络搜索
+    needs_exa = not contains_target and bool(extracted_info.get('name'))
+    report_progress("extraction", extraction=extracted_info, folder=folder.prefix,
+                    folder_type=folder.folder_type, needs_identity_search=needs_exa)
+    return folder, needs_exa
 
-具体改进建议：
-{chr(10).join([f"{i+1}. {imp}" for i, imp in enumerate(improvements)])}
+def _unique_file_count(s3_result: Dict[str, Any]) -> int:
+    """文件夹中的唯一文档数量（重复上传的文件只计一次）"""
+    return s3_result.get("unique_file_count", s3_result.get("file_count", 0))
 
-整改步骤：
-1. 根据上述建议补充讲者身份验证文档
-2. 上传更多相关支撑文档到 '{folder_name}' 文件夹
-3. 确保所有材料符合公司合规政策
-4. 重新提交预审系统进行检查
-5. 通过预审后提交人工详细审核
+def _folder_listing_decides(s3_result: Dict[str, Any], folder: FolderInfo, needs_exa: bool,
+                            min_file_count: int) -> bool:
+    """上报文件夹检查进度，并判断文件夹检查结果是否已确定预审结论（后续EXA搜索可跳过）"""
+    report_progress("folder_check", folder=folder.prefix, success=s3_result["success"],
+                    exists=s3_result["success"] and s3_result.get("key_count", 0) > 0,
+                    file_count=_unique_file_count(s3_result), min_file_count=min_file_count)
+    if not s3_result["success"]:
+        return True
+    if needs_exa and s3_result.get("key_count", 0) == 0:
+        return True
+    # 文档不足时无论身份验证结果如何都不会通过，EXA结果不再影响结论
+    return _unique_file_count(s3_result) <= min_file_count
 
-注意事项：
-- 所有讲者都必须经过完整的身份验证流程
-- 网络搜索验证是身份真实性的重要环节
-- 请确保讲者信息的真实性和专业性
-- 如有疑问，请咨询医学事务部门或合规团队"""
+def _finish_preaudit(user_input: str, target_word: str, contains_target: bool, extracted_info: Dict[str, str],
+                     folder: FolderInfo, needs_exa: bool, min_file_count: int, stage_results: Dict[str, Any],
+                     stage_timings: Dict[str, float], start_time: float) -> PreauditResult:
+    """各阶段完成后确定预审结论并记录事件（同步和异步实现共用）"""
+    s3_result = stage_results["s3_result"]
+    string_result = stage_results.get("string_result")
+    if string_result is None:
+        string_result = _planner_skipped_string_result(user_input, target_word, extracted_info)
+        _report_identity_progress(string_result)
+    
+    # 身份验证因时间不足未完成时，直接返回部分结果
+    if string_result.get("deadline_exceeded"):
+        raise DeadlineExceeded("exa_search")
+    
+    result = _decide_preaudit_result(string_result, folder, s3_result, min_file_count, needs_exa)
+    stage_timings["total"] = round(time.time() - start_time, 4)
+    result.stage_timings = stage_timings
+    
+    execution_time = time.time() - start_time
+    with span("logging"):
+        log_preaudit_event(user_input, result.headline, result.file_count, contains_target,
+                           _preaudit_event_details(result))
+        
+        if result.outcome == OUTCOME_S3_ERROR:
+            log_mcp_tool_call("perform_preaudit", False, execution_time, "S3 access failed")
+            logger.error("预审失败：S3 访问失败")
+        elif result.outcome == OUTCOME_FOLDER_MISSING:
+            log_mcp_tool_call("perform_preaudit", True, execution_time)
+            logger.warning(f"预审不通过：讲者专属文件夹不存在 - {folder.name}")
+        elif result.passed:
+            log_mcp_tool_call("perform_preaudit", True, execution_time)
+            logger.info(f"预审通过：验证方法={result.verification['method']}, 文档数量={result.file_count}")
+        else:
+            log_mcp_tool_call("perform_preaudit", True, execution_time)
+            logger.warning(f"预审不通过：验证方法={result.verification['method']}, 文档数量={result.file_count}")
+    
+    return result
+
+def _preaudit_deadline_result(error: DeadlineExceeded, user_input: str, deadline: Deadline,
+                              extracted_info: Dict[str, str], folder: Optional[FolderInfo],
+                              stage_timings: Dict[str, float], start_time: float) -> PreauditResult:
+    """预审超出时间预算：记录事件并返回部分结果"""
+    stage_timings["total"] = round(time.time() - start_time, 4)
+    result = _build_incomplete_result(error.stage, deadline, extracted_info, folder, stage_timings)
+    execution_time = time.time() - start_time
+    log_preaudit_event(user_input, result.headline, 0, False, _preaudit_event_details(result))
+    log_mcp_tool_call("perform_preaudit", False, execution_time, f"deadline exceeded at {error.stage}")
+    logger.warning(f"预审超出时间预算，返回部分结果：阶段={error.stage}, 耗时={execution_time:.2f}s")
+    return result
+
+def _preaudit_aborted(error: BaseException, start_time: float):
+    """记录因请求取消或执行错误而中止的预审"""
+    execution_time = time.time() - start_time
+    if isinstance(error, RequestCancelled):
+        log_mcp_tool_call("perform_preaudit", False, execution_time, f"cancelled at {error.stage}")
+        logger.info(f"预审已取消，跳过剩余阶段：阶段={error.stage}, 耗时={execution_time:.2f}s")
+        return
+    error_msg = str(error)
+    log_mcp_tool_call("perform_preaudit", False, execution_time, error_msg)
+    logger.error(f"预审执行失败: {error_msg}")
+
+def query_preaudit_history(speaker_name: str = None, hospital: str = None, folder: str = None,
+                           verdict: str = None, since: str = None, until: str = None,
+                           limit: int = 20, include_result: bool = False) -> Dict[str, Any]:
+    """
+    查询本地审计记录中的预审历史（如某位讲者最近一次验证的时间和结论）
+    """
+    start_time = time.time()
+    
+    try:
+        records = get_audit_store().query_history(
+            speaker_name=speaker_name,
+            hospital=hospital,
+            folder=folder,
+            verdict=verdict,
+            since=since,
+            until=until,
+            limit=limit,
+            include_result=include_result
+        )
         
         execution_time = time.time() - start_time
-        log_preaudit_event(user_input, result, file_count, contains_target)
-        log_mcp_tool_call("perform_preaudit", True, execution_time)
+        log_mcp_tool_call("query_preaudit_history", True, execution_time)
+        logger.info(f"预审历史查询成功，返回 {len(records)} 条记录")
         
-        if verification_passed and file_count > min_file_count:
-            logger.info(f"预审通过：验证方法={verification_method}, 文档数量={file_count}")
-        else:
-            logger.warning(f"预审不通过：验证方法={verification_method}, 文档数量={file_count}")
+        return {
+            "success": True,
+            "count": len(records),
+            "records": records,
+            "query_ms": round(execution_time * 1000, 2)
+        }
         
-        return result
-            
     except Exception as e:
         execution_time = time.time() - start_time
         error_msg = str(e)
-        log_mcp_tool_call("perform_preaudit", False, execution_time, error_msg)
-        logger.error(f"预审执行失败: {error_msg}")
-        raise
+        log_mcp_tool_call("query_preaudit_history", False, execution_time, error_msg)
+        logger.error(f"预审历史查询失败: {error_msg}")
+        
+        return {
+            "success": False,
+            "count": 0,
+            "records": [],
+            "error": error_msg
+        }
 
 def get_current_config() -> Dict[str, Any]:
     """
@@ -939,8 +2118,12 @@ def get_current_config() -> Dict[str, Any]:
             "s3_bucket": s3_config['bucket_name'],
             "target_word": preaudit_config['target_word'],
             "min_file_count": preaudit_config['min_file_count'],
+            "preaudit_timeout_seconds": preaudit_config['timeout_seconds'],
+            "cassette_mode": get_cassette().mode,
+            "audit_store": audit_config['path'] if audit_config['enabled'] else None,
             "cloudwatch_log_group": cloudwatch_config['log_group_name'],
-            "cloudwatch_log_stream": cloudwatch_config['log_stream_name']
+            "cloudwatch_log_stream": cloudwatch_config['log_stream_name'],
+            "config_version": current_snapshot().version
         }
         
         execution_time = time.time() - start_time
@@ -0,0 +1,477 @@
+#!/usr/bin/env python3
+"""
+提交调度模块
+预审请求按优先级分为 interactive（单条交互式检查）、batch（批量名单）和 nightly（夜间任务）三类：
+开始执行的顺序按优先级，同一优先级内按提交人轮流（一位代表上传的大批量名单不会排在其他人的单条检查前面），
+排队长度超过上限时拒绝新的提交；Bedrock 和 EXA 各有独立的并发名额，按优先级分配并为 interactive 预留，
+排队的批量任务再多，交互式检查的等待时间也不受影响
+"""
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from resilience import RateLimitExceeded, set_dependency_bulkhead
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BATCH = "batch"
+PRIORITY_NIGHTLY = "nightly"
+# 按优先级从高到低
+PRIORITY_CLASSES = (PRIORITY_INTERACTIVE, PRIORITY_BATCH, PRIORITY_NIGHTLY)
+_RANKS = {priority: rank for rank, priority in enumerate(PRIORITY_CLASSES)}
+
+# 记录排队时间分位数的最近样本数
+WAIT_SAMPLES = 1000
+
+_current_priority: contextvars.ContextVar = contextvars.ContextVar("submission_priority",
+                                                                  default=PRIORITY_INTERACTIVE)
+
+
+class AdmissionRejected(Exception):
+    """排队已满或排队超时，拒绝提交"""
+
+
+def normalize_priority(priority: Optional[str], default: str = PRIORITY_INTERACTIVE) -> str:
+    """校验优先级名称（为空时使用默认值）"""
+    if not priority:
+        return default
+    if priority not in _RANKS:
+        raise ValueError(f"未知的优先级: {priority}，可选 {', '.join(PRIORITY_CLASSES)}")
+    return priority
+
+
+def current_priority() -> str:
+    """当前请求的优先级（不经过调度器的调用视为 interactive）"""
+    return _current_priority.get()
+
+
+@contextmanager
+def submission_priority(priority: str):
+    """在该范围内的外部调用按 priority 使用 Bedrock 和 EXA 并发名额"""
+    token = _current_priority.set(normalize_priority(priority))
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def run_with_priority(priority: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+    """按 priority 执行 func（用于线程池中的后台任务，线程池不继承调用方的上下文）"""
+    with submission_priority(priority):
+        return func(*args, **kwargs)
+
+
+def _percentile(samples: List[float], fraction: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class _SlotWaiter:
+    __slots__ = ("rank", "event", "loop", "future", "granted", "cancelled")
+
+    def __init__(self, rank: int, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.rank = rank
+        self.loop = loop
+        self.event = threading.Event() if loop is None else None
+        self.future = loop.create_future() if loop is not None else None
+        self.granted = False
+        self.cancelled = False
+
+    def wake(self):
+        if self.event is not None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(True)
+
+
+class PrioritySemaphore:
+    """
+    按优先级分配的并发名额（用于 Bedrock、EXA 等外部依赖）
+
+    名额按优先级依次分配，同一优先级先到先得；batch 和 nightly 最多使用 capacity - reserved 个名额，
+    其余名额留给 interactive。线程和事件循环中的调用都可以等待
+    """
+
+    def __init__(self, name: str, capacity: int, reserved: int = 0):
+        """
+        Args:
+            name: 依赖名称
+            capacity: 并发名额，<=0 表示不限制
+            reserved: 只分配给 interactive 的名额
+        """
+        self.name = name
+        self.capacity = capacity
+        self.reserved = max(0, min(reserved, capacity - 1)) if capacity > 0 else 0
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._waiters: List[tuple] = []
+        self._sequence = itertools.count()
+        self._metrics: Dict[str, Any] = {
+            "acquired": 0, "waited": 0, "timed_out": 0, "max_in_use": 0,
+            "wait_seconds": {priority: 0.0 for priority in PRIORITY_CLASSES}
+        }
+
+    def _limit(self, rank: int) -> int:
+        return self.capacity if rank == 0 else self.capacity - self.reserved
+
+    def _prune(self):
+        while self._waiters and self._waiters[0][2].cancelled:
+            heapq.heappop(self._waiters)
+
+    def _take(self):
+        self._in_use += 1
+        self._metrics["acquired"] += 1
+        self._metrics["max_in_use"] = max(self._metrics["max_in_use"], self._in_use)
+
+    def _try_acquire(self, rank: int) -> bool:
+        """没有同等或更高优先级的等待者且名额未用完时立即获得（调用方持有锁）"""
+        self._prune()
+        if self._waiters and self._waiters[0][0] <= rank:
+            return False
+        if self._in_use >= self._limit(rank):
+            return False
+        self._take()
+        return True
+
+    def _grant_waiters(self):
+        """按优先级唤醒等待者（调用方持有锁）；队首得不到名额时，优先级更低的等待者也得不到"""
+        while True:
+            self._prune()
+            if not self._waiters or self._in_use >= self._limit(self._waiters[0][0]):
+                return
+            _, _, waiter = heapq.heappop(self._waiters)
+            waiter.granted = True
+            self._take()
+            waiter.wake()
+
+    def _enqueue(self, waiter: _SlotWaiter):
+        heapq.heappush(self._waiters, (waiter.rank, next(self._sequence), waiter))
+        self._metrics["waited"] += 1
+
+    def _record_wait(self, rank: int, waited: float):
+        with self._lock:
+            self._metrics["wait_seconds"][PRIORITY_CLASSES[rank]] += waited
+
+    def _timed_out(self, waiter: _SlotWaiter) -> bool:
+        """等待超时或被取消：尚未获得名额时放弃等待；已获得时返回 True"""
+        with self._lock:
+            if waiter.granted:
+                return True
+            waiter.cancelled = True
+            self._metrics["timed_out"] += 1
+            # 放弃的等待者可能挡住了后面的低优先级等待者
+            self._grant_waiters()
+            return False
+
+    def acquire(self, timeout: Optional[float] = None) -> float:
+        """
+        按当前请求的优先级获取一个名额，必要时阻塞等待
+
+        Returns:
+            实际等待的秒数
+
+        Raises:
+            RateLimitExceeded: 在 timeout 内没有获得名额
+        """
+        if self.capacity <= 0:
+            return 0.0
+        rank = _RANKS[current_priority()]
+        with self._lock:
+            if self._try_acquire(rank):
+                return 0.0
+            waiter = _SlotWaiter(rank)
+            self._enqueue(waiter)
+        started = time.monotonic()
+        if not waiter.event.wait(timeout) and not self._timed_out(waiter):
+            raise RateLimitExceeded(f"{self.name} 并发名额等待超过 {timeout:.2f}s")
+        waited = time.monotonic() - started
+        self._record_wait(rank, waited)
+        return waited
+
+    async def acquire_async(self, timeout: Optional[float] = None) -> float:
+        """获取一个名额（异步版本，等待期间不占用线程）"""
+        if self.capacity <= 0:
+            return 0.0
+        rank = _RANKS[current_priority()]
+        with self._lock:
+            if self._try_acquire(rank):
+                return 0.0
+            waiter = _SlotWaiter(rank, asyncio.get_running_loop())
+            self._enqueue(waiter)
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+        except asyncio.TimeoutError:
+            if not self._timed_out(waiter):
+                raise RateLimitExceeded(f"{self.name} 并发名额等待超过 {timeout:.2f}s")
+        except asyncio.CancelledError:
+            if self._timed_out(waiter):
+                self.release()
+            raise
+        waited = time.monotonic() - started
+        self._record_wait(rank, waited)
+        return waited
+
+    def release(self):
+        """归还一个名额"""
+        if self.capacity <= 0:
+            return
+        with self._lock:
+            self._in_use -= 1
+            self._grant_waiters()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            self._prune()
+            waiting = sum(1 for _, _, waiter in self._waiters if not waiter.cancelled)
+            metrics = dict(self._metrics, wait_seconds={
+                priority: round(seconds, 3) for priority, seconds in self._metrics["wait_seconds"].items()})
+            return dict(metrics, capacity=self.capacity, reserved=self.reserved, in_use=self._in_use,
+                        waiting=waiting)
+
+
+class _Ticket:
+    __slots__ = ("priority", "submitter", "loop", "future", "granted", "cancelled", "enqueued_at")
+
+    def __init__(self, priority: str, submitter: str, loop: asyncio.AbstractEventLoop):
+        self.priority = priority
+        self.submitter = submitter
+        self.loop = loop
+        self.future = loop.create_future()
+        self.granted = False
+        self.cancelled = False
+        self.enqueued_at = time.monotonic()
+
+
+class SubmissionScheduler:
+    """
+    预审提交调度器
+
+    开始执行的预审总数不超过 max_concurrency；batch 和 nightly 分别不超过各自的并发数，剩余的执行名额留给 interactive。
+    有空闲名额时，按优先级从高到低选择有排队请求的类别，同一类别内按提交人轮流取出各自最早的请求
+    """
+
+    def __init__(self, enabled: bool = False, max_concurrency: int = 16, batch_concurrency: int = 8,
+                 nightly_concurrency: int = 2, max_queue_interactive: int = 100, max_queue_batch: int = 2000,
+                 max_queue_nightly: int = 5000, max_queued_per_submitter: int = 500):
+        """
+        Args:
+            enabled: 是否调度；关闭时提交立即执行
+            max_concurrency: 同时执行的预审数
+            batch_concurrency: 同时执行的 batch 预审数上限
+            nightly_concurrency: 同时执行的 nightly 预审数上限
+            max_queue_interactive / max_queue_batch / max_queue_nightly: 各优先级排队长度上限
+            max_queued_per_submitter: 每位提交人在同一优先级的排队数上限
+        """
+        self._lock = threading.Lock()
+        # 各优先级：提交人 -> 排队的请求（OrderedDict 的顺序即轮流顺序）
+        self._queues: Dict[str, "OrderedDict[str, Deque[_Ticket]]"] = {
+            priority: OrderedDict() for priority in PRIORITY_CLASSES}
+        self._queued = {priority: 0 for priority in PRIORITY_CLASSES}
+        self._running = {priority: 0 for priority in PRIORITY_CLASSES}
+        self._waits = {priority: deque(maxlen=WAIT_SAMPLES) for priority in PRIORITY_CLASSES}
+        self._counters = {priority: {"admitted": 0, "rejected": 0, "timed_out": 0, "completed": 0}
+                          for priority in PRIORITY_CLASSES}
+        self.configure(enabled, max_concurrency, batch_concurrency, nightly_concurrency, max_queue_interactive,
+                       max_queue_batch, max_queue_nightly, max_queued_per_submitter)
+
+    def configure(self, enabled: bool = False, max_concurrency: int = 16, batch_concurrency: int = 8,
+                  nightly_concurrency: int = 2, max_queue_interactive: int = 100, max_queue_batch: int = 2000,
+                  max_queue_nightly: int = 5000, max_queued_per_submitter: int = 500):
+        """更新调度参数（排队中的请求保留，按新参数继续分配）"""
+        with self._lock:
+            self.enabled = enabled
+            self.max_concurrency = max(1, max_concurrency)
+            self._limits = {
+                PRIORITY_INTERACTIVE: self.max_concurrency,
+                PRIORITY_BATCH: max(1, min(batch_concurrency, self.max_concurrency)),
+                PRIORITY_NIGHTLY: max(1, min(nightly_concurrency, self.max_concurrency))
+            }
+            self._max_queue = {
+                PRIORITY_INTERACTIVE: max_queue_interactive,
+                PRIORITY_BATCH: max_queue_batch,
+                PRIORITY_NIGHTLY: max_queue_nightly
+            }
+            self.max_queued_per_submitter = max_queued_per_submitter
+            self._dispatch()
+
+    def _next_ticket(self) -> Optional[_Ticket]:
+        """按优先级和提交人轮流选出下一个可以开始的请求（调用方持有锁）"""
+        if sum(self._running.values()) >= self.max_concurrency:
+            return None
+        for priority in PRIORITY_CLASSES:
+            queue = self._queues[priority]
+            if not queue or self._running[priority] >= self._limits[priority]:
+                continue
+            submitter, tickets = next(iter(queue.items()))
+            ticket = tickets.popleft()
+            # 本轮取过的提交人排到最后
+            if tickets:
+                queue.move_to_end(submitter)
+            else:
+                del queue[submitter]
+            self._queued[priority] -= 1
+            return ticket
+        return None
+
+    def _dispatch(self):
+        """分配空闲的执行名额（调用方持有锁）"""
+        while True:
+            ticket = self._next_ticket()
+            if ticket is None:
+                return
+            ticket.granted = True
+            self._running[ticket.priority] += 1
+            self._waits[ticket.priority].append(time.monotonic() - ticket.enqueued_at)
+            ticket.loop.call_soon_threadsafe(_resolve, ticket.future)
+
+    def _enqueue(self, priority: str, submitter: str) -> _Ticket:
+        with self._lock:
+            counters = self._counters[priority]
+            queued_by_submitter = len(self._queues[priority].get(submitter, ()))
+            if self._queued[priority] >= self._max_queue[priority]:
+                counters["rejected"] += 1
+                raise AdmissionRejected(f"{priority} 排队已满（{self._queued[priority]} 个），请稍后重试")
+            if queued_by_submitter >= self.max_queued_per_submitter:
+                counters["rejected"] += 1
+                raise AdmissionRejected(f"提交人 {submitter} 排队的预审已达上限（{queued_by_submitter} 个），"
+                                        f"请等待已提交的预审完成")
+            ticket = _Ticket(priority, submitter, asyncio.get_running_loop())
+            self._queues[priority].setdefault(submitter, deque()).append(ticket)
+            self._queued[priority] += 1
+            counters["admitted"] += 1
+            self._dispatch()
+            return ticket
+
+    def _abandon(self, ticket: _Ticket) -> bool:
+        """排队超时或被取消：尚未开始时移出队列；已开始时返回 True"""
+        with self._lock:
+            if ticket.granted:
+                return True
+            tickets = self._queues[ticket.priority].get(ticket.submitter)
+            if tickets is not None and ticket in tickets:
+                tickets.remove(ticket)
+                if not tickets:
+                    del self._queues[ticket.priority][ticket.submitter]
+                self._queued[ticket.priority] -= 1
+            return False
+
+    def _finish(self, ticket: _Ticket):
+        with self._lock:
+            self._running[ticket.priority] -= 1
+            self._counters[ticket.priority]["completed"] += 1
+            self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, priority: str, submitter: str, timeout: Optional[float] = None):
+        """
+        排队等待执行名额，范围内的外部调用按 priority 使用 Bedrock 和 EXA 并发名额
+
+        Args:
+            priority: interactive、batch 或 nightly
+            submitter: 提交人（如医药代表 ID），同一优先级内按提交人轮流
+            timeout: 最长排队时间（秒），None 或 inf 表示一直等待
+
+        Raises:
+            AdmissionRejected: 排队已满或排队超时
+        """
+        priority = normalize_priority(priority)
+        if timeout is not None and math.isinf(timeout):
+            timeout = None
+        if not self.enabled:
+            with submission_priority(priority):
+                yield
+            return
+        ticket = self._enqueue(priority, submitter or "anonymous")
+        try:
+            await asyncio.wait_for(asyncio.shield(ticket.future), timeout)
+        except asyncio.TimeoutError:
+            if not self._abandon(ticket):
+                with self._lock:
+                    self._counters[priority]["timed_out"] += 1
+                raise AdmissionRejected(f"排队超过 {timeout:.1f}s 仍未开始执行，请稍后重试")
+        except asyncio.CancelledError:
+            if self._abandon(ticket):
+                self._finish(ticket)
+            raise
+        try:
+            with submission_priority(priority):
+                yield
+        finally:
+            self._finish(ticket)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """各优先级的排队和执行数量、接受/拒绝/超时次数、排队时间分位数，以及排队最多的提交人"""
+        with self._lock:
+            classes = {}
+            for priority in PRIORITY_CLASSES:
+                waits = list(self._waits[priority])
+                top = sorted(((submitter, len(tickets)) for submitter, tickets in self._queues[priority].items()),
+                             key=lambda item: -item[1])[:5]
+                classes[priority] = dict(
+                    self._counters[priority],
+                    queued=self._queued[priority],
+                    running=self._running[priority],
+                    concurrency_limit=self._limits[priority],
+                    max_queue=self._max_queue[priority],
+                    submitters=len(self._queues[priority]),
+                    top_submitters=dict(top),
+                    wait_p50_ms=None if not waits else round(_percentile(waits, 0.5) * 1000, 1),
+                    wait_p99_ms=None if not waits else round(_percentile(waits, 0.99) * 1000, 1)
+                )
+            return {"enabled": self.enabled, "max_concurrency": self.max_concurrency, "classes": classes}
+
+
+# 全局调度器和依赖并发名额
+_scheduler = SubmissionScheduler()
+_budgets: Dict[str, PrioritySemaphore] = {}
+
+
+def configure_submission_scheduler(enabled: bool = False, max_concurrency: int = 16, batch_concurrency: int = 8,
+                                   nightly_concurrency: int = 2, max_queue_interactive: int = 100,
+                                   max_queue_batch: int = 2000, max_queue_nightly: int = 5000,
+                                   max_queued_per_submitter: int = 500, bedrock_concurrency: int = 8,
+                                   exa_concurrency: int = 4, reserved_interactive: int = 2) -> SubmissionScheduler:
+    """按 [SCHEDULER] 配置更新全局调度器，并设置 Bedrock 和 EXA 的并发名额（关闭时不限制）"""
+    _scheduler.configure(enabled, max_concurrency, batch_concurrency, nightly_concurrency, max_queue_interactive,
+                         max_queue_batch, max_queue_nightly, max_queued_per_submitter)
+    for name, capacity in (("bedrock", bedrock_concurrency), ("exa", exa_concurrency)):
+        budget = PrioritySemaphore(name, capacity, reserved_interactive) if enabled and capacity > 0 else None
+        # 进行中的调用向原来的名额归还，新的调用使用新的名额
+        if budget is None:
+            _budgets.pop(name, None)
+        else:
+            _budgets[name] = budget
+        set_dependency_bulkhead(name, budget)
+    if enabled:
+        logger.info(f"提交调度已开启: 并发 {max_concurrency}（batch {batch_concurrency}, nightly {nightly_concurrency}）, "
+                    f"Bedrock {bedrock_concurrency}, EXA {exa_concurrency}, 为 interactive 预留 {reserved_interactive}")
+    return _scheduler
+
+
+def get_submission_scheduler() -> SubmissionScheduler:
+    """获取全局调度器"""
+    return _scheduler
+
+
+def get_scheduler_metrics() -> Dict[str, Any]:
+    """调度器和各依赖并发名额的指标"""
+    return dict(get_submission_scheduler().get_metrics(),
+                budgets={name: budget.get_metrics() for name, budget in list(_budgets.items())})
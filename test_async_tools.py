@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+测试异步工具函数：结果与同步版本一致、并发重复提交共享一次计算、任务取消时中止进行中的阶段
+使用基准测试替身服务（需要安装 boto3；EXA 请求经 httpx 或线程中的 requests 发送），不访问 AWS 或 EXA
+"""
+
+import asyncio
+import io
+
+
+def test_threaded_client_reads_body_in_thread():
+    """测试同步客户端适配：调用在线程中执行，响应体预先读入内存"""
+    from async_tools import ThreadedClient, _read_body
+
+    class Client:
+        def invoke_model(self, **kwargs):
+            return {"body": io.BytesIO(kwargs["body"].encode("utf-8")), "contentType": "application/json"}
+
+    async def scenario():
+        response = await ThreadedClient(Client()).invoke_model(modelId="m", body="{}")
+        return response["contentType"], await _read_body(response["body"])
+
+    assert asyncio.run(scenario()) == ("application/json", b"{}")
+
+
+def test_async_results_match_sync():
+    """测试异步版本的身份检查、前缀检查和预审结果与同步版本一致"""
+    from benchmark_fakes import doctor_folder_prefix
+    from benchmark_preaudit import BenchmarkEnvironment
+
+    with BenchmarkEnvironment(doctors=3, files_per_folder=5) as env:
+        import async_tools
+        tools = env.tools
+        for doctor in env.doctors:
+            submission = env.submission(doctor)
+            expected = tools.run_preaudit(submission)
+            actual = env.run_async(async_tools.run_preaudit(submission))
+            for name in ("verdict", "outcome", "file_count", "extraction", "verification"):
+                assert getattr(actual, name) == getattr(expected, name), name
+
+        doctor = env.doctors[0]
+        identity = env.run_async(async_tools.check_string_content(env.submission(doctor)))
+        assert identity["verification_passed"] and identity["verification_method"] == "exa_search"
+        listing = env.run_async(async_tools.list_s3_files_with_prefix(prefix=doctor_folder_prefix(doctor)))
+        assert listing["success"] and listing["file_count"] == 5
+        report = env.run_async(async_tools.perform_preaudit(env.submission(doctor)))
+        assert isinstance(report, str) and report
+
+
+def test_concurrent_async_duplicates_coalesce():
+    """测试大量并发的相同异步提交只调用一次 Bedrock"""
+    from benchmark_preaudit import BenchmarkEnvironment
+
+    with BenchmarkEnvironment(doctors=2, files_per_folder=5, bedrock_latency=0.05) as env:
+        import async_tools
+        submission = env.submission(env.doctors[0])
+        before = env.call_counts()
+
+        async def scenario():
+            return await asyncio.gather(*(async_tools.run_preaudit(submission) for _ in range(20)))
+
+        results = env.run_async(scenario())
+        assert {result.verdict for result in results} == {"pass"}
+        assert env.call_counts()["bedrock"] - before["bedrock"] == 1
+
+
+def test_insufficient_documents_skip_identity_search():
+    """测试文档不足时不调用EXA，结果类型为“支撑文档不足（讲者身份尚未验证）”"""
+    from benchmark_preaudit import BenchmarkEnvironment
+
+    with BenchmarkEnvironment(doctors=2, files_per_folder=2) as env:
+        import async_tools
+        before = env.call_counts()
+        expected = env.tools.run_preaudit(env.submission(env.doctors[0]))
+        actual = env.run_async(async_tools.run_preaudit(env.submission(env.doctors[1])))
+        for result in (expected, actual):
+            assert result.outcome == "documents_insufficient_identity_unchecked" and result.verdict == "fail"
+            assert result.verification["method"] == "planner_skipped"
+        assert env.call_counts()["exa"] == before["exa"]
+
+
+def test_long_budget_follower_not_given_truncated_result():
+    """测试时间预算较长的重复提交不共享时间预算较短的进行中预审被截断的结果，而是按自身预算重新执行"""
+    from benchmark_preaudit import BenchmarkEnvironment
+    from deadline import Deadline
+
+    with BenchmarkEnvironment(doctors=2, files_per_folder=5, bedrock_latency=0.3, s3_latency=0.2) as env:
+        import async_tools
+        submission = env.submission(env.doctors[0])
+
+        async def scenario():
+            short = asyncio.create_task(async_tools.run_preaudit(submission, deadline=Deadline.from_timeout(0.25)))
+            await asyncio.sleep(0.02)
+            long = asyncio.create_task(async_tools.run_preaudit(submission, deadline=Deadline.from_timeout(20)))
+            return await short, await long
+
+        short, long = env.run_async(scenario())
+        assert short.deadline["skipped_stages"] == ["bedrock_extraction"]
+        assert long.outcome == "exa_verified" and long.verdict == "pass" and not long.deadline
+
+
+def test_different_extractions_not_coalesced():
+    """测试相同文本、不同提取结果的并发身份检查各自按自己的提取结果验证"""
+    import threading
+    from benchmark_preaudit import BenchmarkEnvironment
+
+    with BenchmarkEnvironment(doctors=2, files_per_folder=5, exa_latency=0.2) as env:
+        import async_tools
+        submission = env.submission(env.doctors[0])
+        extractions = [dict(env.doctors[0], hospital=hospital) for hospital in ("长海医院", "华西医院")]
+
+        results = [None, None]
+
+        def check(index):
+            results[index] = env.tools.check_string_content(submission, extracted_info=extractions[index])
+
+        workers = [threading.Thread(target=check, args=(index,)) for index in range(2)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        async def scenario():
+            return await asyncio.gather(*(async_tools.check_string_content(submission, extracted_info=extraction)
+                                          for extraction in extractions))
+
+        for identity, extraction in zip(results + list(env.run_async(scenario())), extractions * 2):
+            assert identity["extracted_info"]["hospital"] == extraction["hospital"]
+            assert extraction["hospital"] in identity["exa_search_results"]["search_query"]
+
+
+def test_cancel_aborts_in_flight_stage():
+    """测试任务取消时进行中的阶段被中止，记录中止阶段和取消的用量"""
+    from benchmark_preaudit import BenchmarkEnvironment
+    from cost_ledger import get_cost_metrics
+    from deadline import Deadline
+
+    with BenchmarkEnvironment(doctors=2, files_per_folder=5, bedrock_latency=0.5) as env:
+        import async_tools
+        deadline = Deadline.from_timeout(10, cancellable=True)
+        cancelled_before = get_cost_metrics()["verdicts"].get("cancelled", 0)
+
+        async def scenario():
+            task = asyncio.create_task(async_tools.run_preaudit(env.submission(env.doctors[0]), deadline=deadline))
+            await asyncio.sleep(0.1)
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                return True
+            return False
+
+        assert env.run_async(scenario())
+        assert deadline.aborted_stage == "bedrock_extraction"
+        assert get_cost_metrics()["verdicts"].get("cancelled", 0) == cancelled_before + 1
+
+
+def main():
+    """主函数"""
+    print("=" * 60)
+    print("异步工具函数测试")
+    print("=" * 60)
+
+    tests = [
+        test_threaded_client_reads_body_in_thread,
+        test_async_results_match_sync,
+        test_concurrent_async_duplicates_coalesce,
+        test_insufficient_documents_skip_identity_search,
+        test_long_budget_follower_not_given_truncated_result,
+        test_different_extractions_not_coalesced,
+        test_cancel_aborts_in_flight_stage
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__doc__}")
+
+    print("\n✨ 测试完成！")
+
+
+if __name__ == "__main__":
+    main()
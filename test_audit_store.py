@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+测试预审审计记录存储模块
+不依赖 AWS 或 EXA，可离线运行
+"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from audit_store import AuditStore, build_row
+from preaudit_result import (
+    OUTCOME_EXA_VERIFIED,
+    OUTCOME_FOLDER_MISSING,
+    FolderInfo,
+    PreauditResult
+)
+
+
+def _result(name, hospital, outcome=OUTCOME_EXA_VERIFIED, exists=True):
+    folder = FolderInfo(prefix=f"{name}-{hospital}/", name=f"{name}-{hospital}", folder_type="讲者专属文件夹",
+                        exists=exists, file_count=3 if exists else 0)
+    return PreauditResult.create(
+        outcome,
+        extraction={"name": name, "hospital": hospital, "department": "心内科", "title": "主任医师"},
+        verification={"verification_passed": True, "match_score": 7},
+        folder=folder,
+        min_file_count=2
+    )
+
+
+def test_batched_writes_and_history_query():
+    """测试后台批量写入，并按讲者、医院、结论和时间倒序查询"""
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, "audit", "history.db")
+        store = AuditStore(enabled=True, path=path, batch_size=2, flush_interval_ms=50)
+        assert store.record(_result("宋智钢", "长海医院"))
+        assert store.record(_result("鲍娜", "长海医院", OUTCOME_FOLDER_MISSING, exists=False))
+        time.sleep(0.01)
+        assert store.record(_result("宋智钢", "瑞金医院", OUTCOME_FOLDER_MISSING, exists=False))
+        assert store.flush()
+
+        history = store.query_history(speaker_name="宋智钢")
+        assert [record["hospital"] for record in history] == ["瑞金医院", "长海医院"]
+        assert history[1]["verdict"] == "pass" and history[1]["file_count"] == 3
+        assert history[1]["verification_passed"] is True
+        assert "result" not in history[0]
+
+        assert len(store.query_history(hospital="长海医院")) == 2
+        assert [r["speaker_name"] for r in store.query_history(verdict="fail")] == ["宋智钢", "鲍娜"]
+        assert store.query_history(folder="鲍娜-长海医院/")[0]["outcome"] == OUTCOME_FOLDER_MISSING
+        assert store.query_history(since="2000-01-01", limit=1)[0]["hospital"] == "瑞金医院"
+        assert store.query_history(until="2000-01-01") == []
+
+        last_pass = store.get_last_result("宋智钢", verdict="pass")
+        assert last_pass["hospital"] == "长海医院"
+        full = store.query_history(speaker_name="鲍娜", include_result=True)[0]
+        assert full["result"]["folder"]["exists"] is False
+
+        metrics = store.get_metrics()
+        assert metrics["written"] == 3 and metrics["dropped"] == 0
+        assert metrics["batches"] >= 2
+
+        conn = sqlite3.connect(path)
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert {"idx_preaudits_speaker", "idx_preaudits_hospital", "idx_preaudits_folder",
+                "idx_preaudits_verdict", "idx_preaudits_created_at"} <= indexes
+        plan = " ".join(str(row[-1]) for row in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM preaudits WHERE speaker_name = ? ORDER BY created_at DESC",
+            ("宋智钢",)))
+        assert "idx_preaudits_speaker" in plan
+        conn.close()
+        store.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def test_record_never_blocks_request_path():
+    """测试写入变慢、队列满时丢弃记录而不阻塞，关闭时写入剩余记录"""
+    directory = tempfile.mkdtemp()
+    try:
+        store = AuditStore(enabled=True, path=os.path.join(directory, "history.db"),
+                           batch_size=1, flush_interval_ms=0, queue_size=1)
+        release = threading.Event()
+        write_batch = store._write_batch
+
+        def slow_write(conn, batch):
+            release.wait(5)
+            write_batch(conn, batch)
+
+        store._write_batch = slow_write
+        assert store.record(_result("张三", "协和医院"))
+        time.sleep(0.05)  # 后台线程取出第一条记录后阻塞在写入中
+
+        started = time.perf_counter()
+        accepted = sum(store.record(_result("张三", "协和医院")) for _ in range(50))
+        assert time.perf_counter() - started < 1.0
+        assert accepted == 1
+        assert store.get_metrics()["dropped"] == 49
+
+        release.set()
+        store.close()
+        assert store.get_metrics()["written"] == 2
+        assert not store.record(_result("张三", "协和医院"))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def test_disabled_store_and_invalid_time():
+    """测试关闭时不写入，无法解析的时间报错"""
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, "history.db")
+        store = AuditStore(enabled=False, path=path)
+        assert not store.record(_result("张三", "协和医院"))
+        assert not os.path.exists(path)
+
+        row = build_row(_result("张三", "协和医院"), created_at=1.0)
+        assert row["folder"] == "张三-协和医院/" and row["created_at"] == 1.0
+
+        try:
+            store.query_history(since="上周")
+            assert False, "无法解析的时间应报错"
+        except ValueError:
+            pass
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    """主函数"""
+    print("=" * 60)
+    print("预审审计记录存储测试")
+    print("=" * 60)
+
+    tests = [
+        test_batched_writes_and_history_query,
+        test_record_never_blocks_request_path,
+        test_disabled_store_and_invalid_time
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__doc__}")
+
+    print("\n✨ 测试完成！")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+测试基准测试替身服务和结果统计
+不依赖 AWS 或 EXA，可离线运行
+"""
+
+import json
+import urllib.error
+import urllib.request
+from benchmark_fakes import (
+    FakeBedrockClient,
+    FakeExaServer,
+    FakeS3Client,
+    FakeS3Error,
+    doctor_folder_prefix,
+    make_doctors,
+    seed_s3_emulator
+)
+from benchmark_preaudit import compare_to_baseline, percentile
+
+
+def test_s3_emulator_prefix_and_pagination():
+    """测试 S3 模拟器的前缀过滤、MaxKeys 和分页"""
+    client = FakeS3Client()
+    doctors = make_doctors(3)
+    seed_s3_emulator(client, "bucket", doctors, files_per_folder=5)
+    prefix = doctor_folder_prefix(doctors[0])
+
+    response = client.list_objects_v2(Bucket="bucket", Prefix=prefix)
+    assert response["KeyCount"] == 6  # 5 个文档 + 文件夹占位对象
+    assert all(obj["Key"].startswith(prefix) for obj in response["Contents"])
+    assert not response["IsTruncated"]
+
+    probe = client.list_objects_v2(Bucket="bucket", Prefix=prefix, MaxKeys=1)
+    assert probe["KeyCount"] == 1 and probe["IsTruncated"]
+    rest = client.list_objects_v2(Bucket="bucket", Prefix=prefix,
+                                  ContinuationToken=probe["NextContinuationToken"])
+    assert rest["KeyCount"] == 5
+
+    missing = client.list_objects_v2(Bucket="bucket", Prefix="不存在的医生-")
+    assert missing["KeyCount"] == 0 and "Contents" not in missing
+
+    try:
+        client.list_objects_v2(Bucket="other")
+        assert False, "应抛出 NoSuchBucket"
+    except FakeS3Error as e:
+        assert e.response["Error"]["Code"] == "NoSuchBucket"
+
+
+def test_fake_bedrock_returns_known_doctor():
+    """测试 Bedrock 替身返回提示词中的讲者信息"""
+    import io
+    doctors = make_doctors(2)
+    client = FakeBedrockClient(doctors)
+    body = {"messages": [{"role": "user", "content": f"文本：{doctors[1]['name']}医生"}]}
+    response = client.invoke_model(modelId="m", body=json.dumps(body))
+    assert isinstance(response["body"], io.BytesIO)
+    payload = json.loads(response["body"].read())
+    assert json.loads(payload["content"][0]["text"]) == doctors[1]
+    assert client.calls == 1
+
+
+def _post(url, payload):
+    request = urllib.request.Request(url, data=json.dumps(payload).encode("utf-8"),
+                                     headers={"content-type": "application/json"})
+    return urllib.request.urlopen(request, timeout=5)
+
+
+def test_fake_exa_server():
+    """测试本地 EXA 服务的搜索响应和错误注入"""
+    with FakeExaServer(num_results=2) as server:
+        response = _post(f"{server.base_url}/search", {"query": "张三 北京协和医院"})
+        assert response.status == 200
+        results = json.loads(response.read())["results"]
+        assert len(results) == 2 and "张三 北京协和医院" in results[0]["text"]
+
+    with FakeExaServer(error_rate=1.0, error_status=429) as server:
+        try:
+            _post(f"{server.base_url}/search", {"query": "x"})
+            assert False, "应返回 429"
+        except urllib.error.HTTPError as e:
+            assert e.code == 429
+        assert server.requests == 1
+
+
+def test_percentile_and_baseline_comparison():
+    """测试百分位数和基线退化判断"""
+    samples = [i / 1000 for i in range(1, 101)]
+    assert percentile(samples, 50) == 0.05
+    assert percentile(samples, 99) == 0.099
+    assert percentile([], 95) == 0.0
+
+    baseline = {"perform_preaudit": {"throughput": 100.0, "p95_ms": 10.0}}
+    current = {"perform_preaudit": {"throughput": 80.0, "p95_ms": 10.5}}
+    comparisons, regressions = compare_to_baseline(current, baseline, threshold=0.1)
+    assert len(comparisons) == 2
+    assert [item["metric"] for item in regressions] == ["throughput"]
+
+
+def main():
+    """主函数"""
+    print("=" * 60)
+    print("基准测试替身服务测试")
+    print("=" * 60)
+
+    tests = [
+        test_s3_emulator_prefix_and_pagination,
+        test_fake_bedrock_returns_known_doctor,
+        test_fake_exa_server,
+        test_percentile_and_baseline_comparison
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__doc__}")
+
+    print("\n✨ 测试完成！")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+测试外部调用录制/回放模块
+使用本地替身客户端，不依赖 AWS 或 EXA，可离线运行
+"""
+
+import json
+import os
+import tempfile
+import time
+from benchmark_fakes import FakeBedrockClient, FakeS3Client, make_doctors, seed_s3_emulator
+from cassette import (
+    MODE_RECORD,
+    MODE_REPLAY,
+    Cassette,
+    CassetteMiss,
+    CassetteTimeout,
+    RecordedError
+)
+from resilience import ThrottlingError, is_throttling_error
+
+
+class _HttpResponse:
+    def __init__(self, status_code, text):
+        self.status_code = status_code
+        self.text = text
+
+
+def _bedrock_body(text):
+    return json.dumps({"messages": [{"role": "user", "content": text}]})
+
+
+def test_record_and_replay_clients():
+    """测试录制 Bedrock 和 S3 调用后离线回放"""
+    doctors = make_doctors(2)
+    s3 = FakeS3Client()
+    seed_s3_emulator(s3, "bucket", doctors, files_per_folder=2)
+    bedrock = FakeBedrockClient(doctors)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "traffic.jsonl.gz")
+        recorder = Cassette(MODE_RECORD, path)
+        recorded_model = recorder.wrap_client("bedrock", bedrock).invoke_model(
+            modelId="m", body=_bedrock_body(doctors[0]["name"]))
+        recorded_text = recorded_model["body"].read()
+        recorded_list = recorder.wrap_client("s3", s3).list_objects_v2(Bucket="bucket", Prefix="")
+        assert recorder.get_metrics()["recorded"] == 2
+
+        player = Cassette(MODE_REPLAY, path)
+        replayed_model = player.wrap_client("bedrock", None).invoke_model(
+            modelId="m", body=_bedrock_body(doctors[0]["name"]))
+        assert replayed_model["body"].read() == recorded_text
+        replayed_list = player.wrap_client("s3", None).list_objects_v2(Bucket="bucket", Prefix="")
+        assert [o["Key"] for o in replayed_list["Contents"]] == [o["Key"] for o in recorded_list["Contents"]]
+
+        try:
+            player.wrap_client("bedrock", None).invoke_model(modelId="m", body=_bedrock_body("未录制"))
+            assert False, "应抛出 CassetteMiss"
+        except CassetteMiss:
+            pass
+        assert player.get_metrics()["misses"] == 1
+
+
+def test_http_replay_order_and_secrets():
+    """测试 HTTP 回放按录制顺序返回，且不录制 API key"""
+    responses = [_HttpResponse(429, '{"error":"rate"}'), _HttpResponse(200, '{"results":[]}')]
+
+    def send(url, json, headers, timeout):
+        return responses.pop(0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "exa.jsonl")
+        recorder = Cassette(MODE_RECORD, path)
+        for _ in range(2):
+            recorder.http_post("exa", "https://api.exa.ai/search", send, {"query": "张三"},
+                               {"x-api-key": "secret-key"}, 5)
+        with open(path, encoding="utf-8") as f:
+            assert "secret-key" not in f.read()
+
+        # 回放与地址无关，只按路径和请求体匹配
+        player = Cassette(MODE_REPLAY, path)
+        first = player.http_post("exa", "http://127.0.0.1:9/search", None, {"query": "张三"}, {}, 5)
+        second = player.http_post("exa", "http://127.0.0.1:9/search", None, {"query": "张三"}, {}, 5)
+        assert (first.status_code, second.status_code) == (429, 200)
+        assert second.json() == {"results": []}
+
+
+def test_recorded_errors_and_latency():
+    """测试录制的异常按错误码回放，并可模拟原始延迟"""
+    class ThrottledClient:
+        def invoke_model(self, **kwargs):
+            time.sleep(0.05)
+            error = ThrottlingError("Rate exceeded")
+            error.response = {"Error": {"Code": "ThrottlingException"}, "ResponseMetadata": {"HTTPStatusCode": 400}}
+            raise error
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "errors.jsonl")
+        try:
+            Cassette(MODE_RECORD, path).wrap_client("bedrock", ThrottledClient()).invoke_model(modelId="m", body="{}")
+        except ThrottlingError:
+            pass
+
+        player = Cassette(MODE_REPLAY, path, simulate_latency=True)
+        started = time.monotonic()
+        try:
+            player.wrap_client("bedrock", None).invoke_model(modelId="m", body="{}")
+            assert False, "应抛出 RecordedError"
+        except RecordedError as e:
+            assert is_throttling_error(e)
+        assert time.monotonic() - started >= 0.04
+
+        try:
+            player.wrap_client("bedrock", None, timeout=0.01).invoke_model(modelId="m", body="{}")
+            assert False, "应抛出 CassetteTimeout"
+        except CassetteTimeout:
+            pass
+
+
+def main():
+    """主函数"""
+    print("=" * 60)
+    print("外部调用录制/回放测试")
+    print("=" * 60)
+
+    tests = [
+        test_record_and_replay_clients,
+        test_http_replay_order_and_secrets,
+        test_recorded_errors_and_latency
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__doc__}")
+
+    print("\n✨ 测试完成！")
+
+
+if __name__ == "__main__":
+    main()
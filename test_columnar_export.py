@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+测试列式导出模块
+不依赖 AWS、EXA 或 pyarrow，可离线运行
+"""
+
+import os
+import shutil
+import tempfile
+import time
+from columnar_export import (
+    ColumnarExporter,
+    JsonColumnarWriter,
+    compact,
+    create_writer,
+    list_part_files,
+    list_partitions,
+    pass_rates,
+    register_writer,
+    scan
+)
+
+DAY_ONE = time.mktime((2024, 5, 1, 10, 0, 0, 0, 0, -1))
+DAY_TWO = time.mktime((2024, 5, 2, 10, 0, 0, 0, 0, -1))
+
+
+def _preaudit(timestamp, hospital, verdict, department="心内科"):
+    return {"event_type": "preaudit", "timestamp": timestamp, "hospital": hospital, "department": department,
+            "verdict": verdict, "file_count": "3", "contains_target": False, "input_length": 40}
+
+
+def test_events_are_partitioned_by_type_and_date():
+    """测试事件按类型和日期分区追加写入，读取时按日期裁剪"""
+    root = tempfile.mkdtemp()
+    try:
+        exporter = ColumnarExporter(root, JsonColumnarWriter(), flush_rows=100, flush_interval_seconds=60)
+        exporter(_preaudit(DAY_ONE, "长海医院", "pass"))
+        exporter(_preaudit(DAY_TWO, "长海医院", "fail"))
+        exporter({"event_type": "mcp_tool_call", "timestamp": DAY_TWO, "tool_name": "perform_preaudit",
+                  "success": True, "execution_time": 1.5})
+        exporter({"event_type": "s3_access", "timestamp": DAY_TWO})
+        assert exporter.flush() == 3
+        exporter(_preaudit(DAY_ONE, "瑞金医院", "pass"))
+        exporter.close()
+
+        assert [day for day, _ in list_partitions(root, "preaudit")] == ["2024-05-01", "2024-05-02"]
+        assert len(list_part_files(list_partitions(root, "preaudit")[0][1])) == 2
+
+        data = scan(root, "preaudit", since="2024-05-01", until="2024-05-02")
+        assert sorted(data["hospital"]) == ["瑞金医院", "长海医院"]
+        assert data["file_count"] == [3, 3] and data["speaker_name"] == [None, None]
+        calls = scan(root, "mcp_tool_call", columns=["tool_name", "execution_time"])
+        assert calls == {"tool_name": ["perform_preaudit"], "execution_time": [1.5]}
+
+        metrics = exporter.get_metrics()
+        assert metrics["rows_written"] == 4 and metrics["ignored"] == 1 and metrics["buffered_rows"] == 0
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def test_flush_on_row_threshold_and_compaction():
+    """测试达到行数阈值时后台写入，合并分片后数据不变"""
+    root = tempfile.mkdtemp()
+    try:
+        exporter = ColumnarExporter(root, JsonColumnarWriter(), flush_rows=2, flush_interval_seconds=60)
+        for index in range(6):
+            exporter(_preaudit(DAY_ONE, "长海医院" if index % 2 else "华山医院", "pass" if index < 4 else "fail"))
+            if index % 2:
+                deadline = time.time() + 2
+                while exporter.get_metrics()["buffered_rows"] and time.time() < deadline:
+                    time.sleep(0.01)
+        exporter.close()
+        partition = list_partitions(root, "preaudit")[0][1]
+        assert len(list_part_files(partition)) == 3
+
+        before = scan(root, "preaudit")
+        stats = compact(root, JsonColumnarWriter())
+        assert stats == {"partitions": 1, "files_merged": 3, "rows": 6}
+        assert [os.path.basename(p).split("-")[0] for p in list_part_files(partition)] == ["compacted"]
+        assert scan(root, "preaudit") == before
+        assert compact(root, JsonColumnarWriter())["partitions"] == 0
+        assert compact(root, JsonColumnarWriter(), before="2024-05-01")["partitions"] == 0
+
+        rates = {item["hospital"]: item for item in pass_rates(root)}
+        assert rates["长海医院"]["total"] == 3 and rates["长海医院"]["passed"] == 2
+        assert rates["华山医院"]["pass_rate"] == round(2 / 3, 4)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def test_pluggable_writer():
+    """测试注册自定义格式，未知格式报错"""
+    class UpperJsonWriter(JsonColumnarWriter):
+        name = "upper-json"
+        extension = ".upper.json.gz"
+
+    register_writer(UpperJsonWriter.name, UpperJsonWriter)
+    assert isinstance(create_writer("upper-json"), UpperJsonWriter)
+    assert create_writer("auto").name in ("parquet", "json")
+    try:
+        create_writer("csv")
+        assert False, "未知格式应报错"
+    except ValueError:
+        pass
+
+    root = tempfile.mkdtemp()
+    try:
+        exporter = ColumnarExporter(root, UpperJsonWriter())
+        exporter(_preaudit(DAY_ONE, "长海医院", "pass"))
+        exporter.close()
+        # 不同格式写入的文件可以在同一分区中读取和合并
+        exporter = ColumnarExporter(root, JsonColumnarWriter())
+        exporter(_preaudit(DAY_ONE, "瑞金医院", "fail"))
+        exporter.close()
+        assert sorted(scan(root, "preaudit")["hospital"]) == ["瑞金医院", "长海医院"]
+        assert compact(root, JsonColumnarWriter())["rows"] == 2
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main():
+    """主函数"""
+    print("=" * 60)
+    print("列式导出模块测试")
+    print("=" * 60)
+
+    tests = [
+        test_events_are_partitioned_by_type_and_date,
+        test_flush_on_row_threshold_and_compaction,
+        test_pluggable_writer
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__doc__}")
+
+    print("\n✨ 测试完成！")
+
+
+if __name__ == "__main__":
+    main()
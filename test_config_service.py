@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+测试配置热加载：快照发布、校验失败保留旧版本、请求固定快照和按配置段通知
+使用临时配置文件，不访问 AWS 或 EXA
+"""
+
+import os
+import tempfile
+import threading
+import time
+
+CONFIG_TEMPLATE = """[AWS]
+ACCESS_KEY_ID = {access_key}
+SECRET_ACCESS_KEY = test-secret
+REGION = us-east-1
+
+[S3]
+BUCKET_NAME = {bucket}
+
+[PREAUDIT]
+TARGET_WORD = 鲍娜
+MIN_FILE_COUNT = {min_file_count}
+"""
+
+
+def _write_config(path, access_key="AKIATEST", bucket="bucket-a", min_file_count=3):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(CONFIG_TEMPLATE.format(access_key=access_key, bucket=bucket, min_file_count=min_file_count))
+    # 保证修改时间变化（部分文件系统的时间精度较低）
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+
+_config_dir = tempfile.mkdtemp(prefix="speaker_validation_config_test_")
+# 全局配置读取器在导入时读取配置文件，未指定时使用临时配置
+if "SPEAKER_VALIDATION_CONFIG" not in os.environ:
+    os.environ["SPEAKER_VALIDATION_CONFIG"] = os.path.join(_config_dir, "global.config")
+    _write_config(os.environ["SPEAKER_VALIDATION_CONFIG"])
+
+import config_service  # noqa: E402
+from cost_ledger import DEFAULT_PRICING  # noqa: E402
+from config_reader import ConfigReader  # noqa: E402
+from config_service import ConfigService, config_section, current_snapshot, pinned_snapshot  # noqa: E402
+
+
+def _service(name):
+    path = os.path.join(_config_dir, name)
+    _write_config(path)
+    return path, ConfigService(ConfigReader(path), poll_interval=0.05)
+
+
+def test_reload_publishes_changed_sections():
+    """测试文件修改后发布新版本快照，只通知变化的配置段"""
+    path, service = _service("reload.config")
+    first = service.current()
+    notified = []
+    service.subscribe(lambda snapshot, changed: notified.append((snapshot.version, changed)))
+
+    assert service.reload() is None  # 文件未变化
+    _write_config(path, min_file_count=5)
+    assert service.reload() == frozenset({"preaudit"})
+
+    second = service.current()
+    assert second.version == first.version + 1
+    assert second.section("preaudit")["min_file_count"] == 5
+    assert first.section("preaudit")["min_file_count"] == 3  # 旧快照不变
+    # 未配置 [COST] 时使用记账模块的默认单价
+    assert dict(first.section("cost")) == DEFAULT_PRICING
+    assert notified == [(second.version, frozenset({"preaudit"}))]
+    try:
+        second.section("preaudit")["min_file_count"] = 1
+        assert False, "快照应为只读"
+    except TypeError:
+        pass
+
+
+def test_invalid_config_keeps_previous_snapshot():
+    """测试新配置未通过校验时继续使用当前快照，文件再次修改后重新尝试"""
+    path, service = _service("invalid.config")
+    before = service.current()
+
+    _write_config(path, access_key="your_access_key_id", bucket="bucket-b")
+    assert service.reload() is None
+    assert service.current() is before
+    metrics = service.get_metrics()
+    assert metrics["rejected"] == 1 and metrics["last_error"]
+    assert service.reload() is None and service.get_metrics()["rejected"] == 1  # 不重复尝试
+
+    _write_config(path, bucket="bucket-b")
+    assert service.reload() == frozenset({"s3"})
+    assert service.current().section("s3")["bucket_name"] == "bucket-b"
+    assert service.get_metrics()["last_error"] is None
+
+
+def test_pinned_snapshot_and_overrides():
+    """测试进行中的请求固定使用开始时的快照，覆盖值在重新加载后保留"""
+    path, service = _service("pinned.config")
+    previous, config_service._service = config_service._service, service
+    preaudit = config_section("preaudit")
+    try:
+        seen = []
+        with pinned_snapshot() as pinned:
+            _write_config(path, min_file_count=7)
+            service.reload()
+            seen.append(preaudit["min_file_count"])
+            with pinned_snapshot() as nested:
+                assert nested is pinned
+            worker = threading.Thread(target=lambda: seen.append(preaudit["min_file_count"]))
+            worker.start()
+            worker.join()
+        seen.append(preaudit["min_file_count"])
+        # 进行中的请求不受影响；普通线程和新请求使用最新快照
+        assert seen == [3, 7, 7]
+
+        service.set_overrides("preaudit", min_file_count=1)
+        _write_config(path, bucket="bucket-c", min_file_count=9)
+        service.reload()
+        assert dict(preaudit)["min_file_count"] == 1
+        assert current_snapshot().section("s3")["bucket_name"] == "bucket-c"
+        assert service.clear_overrides() == frozenset({"preaudit"})
+        assert preaudit["min_file_count"] == 9
+    finally:
+        config_service._service = previous
+
+
+def test_watcher_picks_up_changes():
+    """测试后台监视线程发现配置文件修改"""
+    path, service = _service("watch.config")
+    service.start_watching()
+    try:
+        _write_config(path, bucket="bucket-d")
+        for _ in range(100):
+            if service.current().section("s3")["bucket_name"] == "bucket-d":
+                break
+            time.sleep(0.02)
+        assert service.current().section("s3")["bucket_name"] == "bucket-d"
+        assert service.get_metrics()["watching"]
+    finally:
+        service.stop_watching()
+    assert not service.get_metrics()["watching"]
+
+
+def main():
+    """主函数"""
+    print("=" * 60)
+    print("配置热加载测试")
+    print("=" * 60)
+
+    tests = [
+        test_reload_publishes_changed_sections,
+        test_invalid_config_keeps_previous_snapshot,
+        test_pinned_snapshot_and_overrides,
+        test_watcher_picks_up_changes
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__doc__}")
+
+    print("\n✨ 测试完成！")
+
+
+if __name__ == "__main__":
+    main()
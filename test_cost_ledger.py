@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+测试调用用量记账模块
+不依赖 AWS 或 EXA，可离线运行
+"""
+
+import threading
+from contextvars import copy_context
+from cost_ledger import (
+    DEFAULT_PRICING,
+    CostLedger,
+    Usage,
+    estimate_cost,
+    get_cost_metrics,
+    record_usage,
+    track_usage
+)
+
+
+def test_usage_is_scoped_per_request():
+    """测试用量计入当前记账范围和外层范围，范围外只计入全局累计"""
+    before = get_cost_metrics()["totals"]["s3_list_calls"]
+    with track_usage() as outer:
+        record_usage(s3_list_calls=1, s3_keys_scanned=3)
+        with track_usage() as inner:
+            record_usage(bedrock_calls=1, bedrock_input_tokens=120, bedrock_output_tokens=40)
+        record_usage(s3_list_calls=1, s3_keys_scanned=2)
+    record_usage(s3_list_calls=1)
+
+    assert inner.counters["bedrock_input_tokens"] == 120
+    assert inner.counters["s3_list_calls"] == 0
+    assert outer.counters["s3_list_calls"] == 2
+    assert outer.counters["s3_keys_scanned"] == 5
+    assert outer.counters["bedrock_output_tokens"] == 40
+    assert get_cost_metrics()["totals"]["s3_list_calls"] == before + 3
+
+    try:
+        record_usage(unknown=1)
+        assert False, "未知计量项应报错"
+    except ValueError:
+        pass
+
+
+def test_usage_follows_worker_threads():
+    """测试在复制了上下文的工作线程中记录的用量计入发起请求的范围"""
+    with track_usage() as usage:
+        context = copy_context()
+        worker = threading.Thread(target=context.run, args=(record_usage,), kwargs={"exa_requests": 1, "exa_result_bytes": 2048})
+        worker.start()
+        worker.join()
+    assert usage.counters["exa_requests"] == 1
+    assert usage.counters["exa_result_bytes"] == 2048
+
+
+def test_concurrent_workers_do_not_lose_counts():
+    """测试同一记账范围被多个工作线程同时记账时计数不丢失"""
+    with track_usage() as usage:
+        def worker():
+            for _ in range(2000):
+                record_usage(s3_get_calls=1, s3_bytes_read=3)
+
+        workers = [threading.Thread(target=copy_context().run, args=(worker,)) for _ in range(8)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+    assert usage.counters["s3_get_calls"] == 16000
+    assert usage.to_dict()["s3_bytes_read"] == 48000
+
+
+def test_missing_prices_use_single_defaults():
+    """测试 pricing 中未提供的单价一律使用默认单价"""
+    usage = {"bedrock_input_tokens": 1000, "exa_requests": 1, "s3_get_calls": 1000}
+    expected = estimate_cost(usage, DEFAULT_PRICING)
+    assert estimate_cost(usage, {}) == expected
+    assert estimate_cost(usage, {"exa_per_search": DEFAULT_PRICING["exa_per_search"]}) == expected
+
+
+def test_cost_estimate_and_per_verified_speaker():
+    """测试费用估算和每位通过验证讲者的费用"""
+    pricing = {
+        "bedrock_input_per_1k_tokens": 1.0,
+        "bedrock_output_per_1k_tokens": 2.0,
+        "exa_per_search": 0.5,
+        "s3_list_per_1k_requests": 1.0,
+        "cloudwatch_per_gb": 1.0
+    }
+    costs = estimate_cost({"bedrock_input_tokens": 1000, "bedrock_output_tokens": 500, "exa_requests": 2,
+                           "s3_list_calls": 1000, "cloudwatch_bytes": 1024 ** 3}, pricing)
+    assert costs == {"bedrock": 2.0, "exa": 1.0, "s3": 1.0, "cloudwatch": 1.0, "total": 5.0}
+
+    ledger = CostLedger()
+    ledger.configure_pricing(**pricing, unknown_price=9.0)
+    assert "unknown_price" not in ledger.pricing
+    for verdict, searches in (("pass", 2), ("fail", 2)):
+        usage = Usage()
+        usage.add({"exa_requests": searches})
+        ledger.record_preaudit(verdict, usage)
+    assert usage.to_dict(pricing)["estimated_usd"] == 1.0
+
+    metrics = ledger.get_metrics()
+    assert metrics["preaudits"] == 2
+    assert metrics["verdicts"] == {"pass": 1, "fail": 1}
+    assert metrics["per_preaudit"]["exa_requests"] == 2
+    assert metrics["usd_per_preaudit"] == 1.0
+    # 未通过的预审同样产生费用，分摊到通过验证的讲者上
+    assert metrics["usd_per_verified_speaker"] == 2.0
+
+    assert CostLedger().get_metrics()["usd_per_verified_speaker"] == 0.0
+
+
+def main():
+    """主函数"""
+    print("=" * 60)
+    print("调用用量记账模块测试")
+    print("=" * 60)
+
+    tests = [
+        test_usage_is_scoped_per_request,
+        test_usage_follows_worker_threads,
+        test_concurrent_workers_do_not_lose_counts,
+        test_missing_prices_use_single_defaults,
+        test_cost_estimate_and_per_verified_speaker
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__doc__}")
+
+    print("\n✨ 测试完成！")
+
+
+if __name__ == "__main__":
+    main()
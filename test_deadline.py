@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+测试请求截止时间（deadline）模块
+不依赖 AWS 或 EXA，可离线运行
+"""
+
+import asyncio
+import contextvars
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import deadline as deadline_module
+from deadline import (
+    Deadline,
+    DeadlineExceeded,
+    RequestCancelled,
+    abortable_pool_classes,
+    ensure_deadline,
+    get_cancellation_metrics,
+    run_blocking_call
+)
+from resilience import DependencyGuard
+
+
+def test_unbounded_deadline():
+    """测试不限时的截止时间"""
+    deadline = Deadline.from_timeout(None)
+    assert deadline.remaining() == float('inf')
+    assert not deadline.expired()
+    assert deadline.timeout_for("exa_search", 10) == 10
+    assert Deadline.from_timeout(0).budget_seconds is None
+    assert ensure_deadline(None).budget_seconds is None
+
+
+def test_timeout_for_uses_remaining_budget():
+    """测试阶段超时取上限与剩余预算（扣除保留时间）的较小值"""
+    deadline = Deadline.from_timeout(3)
+    assert deadline.timeout_for("exa_search", 10) <= 3
+    assert deadline.timeout_for("exa_search", 1) == 1
+    assert deadline.timeout_for("exa_search", 10, reserve=1) <= 2
+
+
+def test_expired_deadline_raises():
+    """测试时间预算耗尽后阶段检查抛出 DeadlineExceeded"""
+    deadline = Deadline.from_timeout(0.01)
+    time.sleep(0.02)
+    assert deadline.expired()
+    try:
+        deadline.check("s3_list")
+        assert False, "应抛出 DeadlineExceeded"
+    except DeadlineExceeded as e:
+        assert e.stage == "s3_list"
+    try:
+        deadline.timeout_for("bedrock_extraction", 15)
+        assert False, "应抛出 DeadlineExceeded"
+    except DeadlineExceeded:
+        pass
+
+
+def test_skipped_stages_recorded():
+    """测试被跳过的可选阶段会被记录"""
+    deadline = Deadline.from_timeout(1)
+    assert not deadline.has_time_for(5)
+    deadline.skip("exa_search")
+    assert deadline.skipped_stages == ["exa_search"]
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_cancel_abandons_in_flight_call():
+    """测试取消后立即停止等待；无法中止的调用在后台执行期间计入 abandoned_running，结束后计入 abandoned_calls"""
+    request_id = contextvars.ContextVar("request_id", default=None)
+    request_id.set("req-1")
+    seen = []
+    release = threading.Event()
+    deadline = Deadline.from_timeout(30, cancellable=True)
+
+    def slow_call(wait_for):
+        seen.append((request_id.get(), threading.current_thread().name))
+        wait_for.wait(5)
+        return "late"
+
+    assert deadline.call("exa_search", lambda: threading.current_thread().name) != threading.current_thread().name
+    before = get_cancellation_metrics()
+    threading.Timer(0.1, deadline.cancel, args=("客户端断开",)).start()
+    started = time.perf_counter()
+    try:
+        deadline.call("exa_search", slow_call, release)
+        assert False, "取消后应抛出 RequestCancelled"
+    except Exception:
+        assert False, "RequestCancelled 不应被 except Exception 捕获"
+    except RequestCancelled as e:
+        assert e.stage == "exa_search" and e.reason == "客户端断开"
+    assert time.perf_counter() - started < 1.0
+    assert seen[0][0] == "req-1" and seen[0][1].startswith("external-call")
+    assert get_cancellation_metrics()["abandoned_running"] == before["abandoned_running"] + 1
+
+    grace = deadline_module.ABORT_GRACE_SECONDS
+    deadline_module.ABORT_GRACE_SECONDS = 0
+    try:
+        release.set()
+        _wait_for(lambda: get_cancellation_metrics()["abandoned_running"] == before["abandoned_running"])
+    finally:
+        deadline_module.ABORT_GRACE_SECONDS = grace
+    after = get_cancellation_metrics()
+    assert after["abandoned_calls"]["exa_search"] == before["abandoned_calls"].get("exa_search", 0) + 1
+    assert after["aborted_calls"].get("exa_search", 0) == before["aborted_calls"].get("exa_search", 0)
+
+    # 取消后各阶段检查和后续调用都立即中止
+    for check in (lambda: deadline.check("s3_list"), lambda: deadline.timeout_for("s3_list", 5),
+                  lambda: deadline.call("s3_list", slow_call, 0)):
+        try:
+            check()
+            assert False, "取消后应抛出 RequestCancelled"
+        except RequestCancelled as e:
+            assert e.stage == "s3_list"
+    assert len(seen) == 1
+
+
+def test_non_cancellable_calls_run_inline():
+    """测试不可取消的请求在当前线程直接发起调用"""
+    deadline = Deadline.from_timeout(5)
+    assert deadline.call("s3_list", lambda: threading.current_thread().name) == threading.current_thread().name
+    try:
+        deadline.call("s3_list", lambda: 1 / 0)
+        assert False, "调用异常应原样抛出"
+    except ZeroDivisionError:
+        pass
+
+
+def test_cancelled_call_not_counted_as_dependency_failure():
+    """测试被取消的调用不计入依赖失败，也不重试"""
+    guard = DependencyGuard("cancel-test")
+    deadline = Deadline.from_timeout(None, cancellable=True)
+    attempts = []
+
+    def call():
+        attempts.append(1)
+        time.sleep(1)
+
+    threading.Timer(0.05, deadline.cancel).start()
+    try:
+        guard.call(deadline.call, "bedrock_extraction", call)
+        assert False, "取消后应抛出 RequestCancelled"
+    except RequestCancelled:
+        pass
+    metrics = guard.get_metrics()
+    assert metrics["cancelled"] == 1 and metrics["failures"] == 0 and metrics["retries"] == 0
+    assert metrics["breaker"]["state"] == "closed"
+    assert len(attempts) == 1
+
+
+class _SlowHandler(BaseHTTPRequestHandler):
+    """收到请求后迟迟不响应的本地 HTTP 服务"""
+
+    def do_GET(self):
+        self.server.release.wait(5)
+        try:
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(b"late")
+        except OSError:
+            # 客户端已中止请求并关闭连接
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+def _abortable_session():
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter()
+    adapter.poolmanager.pool_classes_by_scheme = abortable_pool_classes(adapter.poolmanager.pool_classes_by_scheme)
+    session.mount("http://", adapter)
+    return session
+
+
+def test_cancel_closes_in_flight_connection():
+    """测试取消后关闭进行中的 HTTP 请求所用的连接，调用很快结束并计入 aborted_calls（同步和异步调用方）"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _SlowHandler)
+    server.release = threading.Event()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/search"
+    session = _abortable_session()
+    try:
+        before = get_cancellation_metrics()
+        deadline = Deadline.from_timeout(30, cancellable=True)
+        threading.Timer(0.1, deadline.cancel).start()
+        try:
+            deadline.call("exa_search", session.get, url, timeout=10)
+            assert False, "取消后应抛出 RequestCancelled"
+        except RequestCancelled:
+            pass
+
+        async def cancelled_async_call():
+            task = asyncio.create_task(Deadline(None).call_async("s3_list", run_blocking_call, session.get, url,
+                                                                timeout=10))
+            await asyncio.sleep(0.1)
+            task.cancel()
+            try:
+                await task
+                assert False, "任务应被取消"
+            except asyncio.CancelledError:
+                pass
+
+        asyncio.run(cancelled_async_call())
+        _wait_for(lambda: get_cancellation_metrics()["abandoned_running"] == before["abandoned_running"])
+        after = get_cancellation_metrics()
+        for stage in ("exa_search", "s3_list"):
+            assert after["aborted_calls"][stage] == before["aborted_calls"].get(stage, 0) + 1
+            assert after["abandoned_calls"].get(stage, 0) == before["abandoned_calls"].get(stage, 0)
+    finally:
+        server.release.set()
+        server.shutdown()
+        session.close()
+
+
+def main():
+    """主函数"""
+    print("=" * 60)
+    print("截止时间模块测试")
+    print("=" * 60)
+
+    tests = [
+        test_unbounded_deadline,
+        test_timeout_for_uses_remaining_budget,
+        test_expired_deadline_raises,
+        test_skipped_stages_recorded,
+        test_cancel_abandons_in_flight_call,
+        test_cancel_closes_in_flight_connection,
+        test_non_cancellable_calls_run_inline,
+        test_cancelled_call_not_counted_as_dependency_failure
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__doc__}")
+
+    print("\n✨ 测试完成！")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+测试文件夹索引：按 ETag 和大小识别重复文件、分段上传文件按内容 MD5 比较、按列表内容缓存结果，
+以及预审按唯一文档数量判断支撑文档是否充足
+索引测试可离线运行；预审集成测试使用基准测试替身服务（需要安装 boto3）
+"""
+
+import asyncio
+import hashlib
+import io
+from folder_index import METHOD_CONTENT_HASH, METHOD_ETAG, FolderIndex, find_duplicates, md5_stream
+
+PREFIX = "张三-协和医院/"
+CERTIFICATE = b"%PDF-1.7\n certificate"
+CV = b"%PDF-1.7\n curriculum vitae"
+
+
+def _md5(data: bytes) -> str:
+    return hashlib.md5(data).hexdigest()
+
+
+def _object(name: str, etag: str, size: int):
+    return {"key": f"{PREFIX}{name}", "etag": f'"{etag}"', "size": size}
+
+
+def test_duplicates_by_etag_and_size():
+    """测试同一文档重复上传（ETag 和大小相同）只计一次，不需要读取内容"""
+    objects = [
+        _object("证书.pdf", _md5(CERTIFICATE), len(CERTIFICATE)),
+        _object("证书 (1).pdf", _md5(CERTIFICATE), len(CERTIFICATE)),
+        _object("简历.pdf", _md5(CV), len(CV)),
+        _object("简历-副本.pdf", _md5(CV), len(CV)),
+        _object("简历-副本2.pdf", _md5(CV), len(CV)),
+        _object("议程.pdf", _md5(b"agenda"), 6),
+    ]
+    duplicates = find_duplicates(objects)
+    assert duplicates.document_count == 6 and duplicates.unique_count == 3
+    assert duplicates.duplicate_count == 3
+    assert [group.keys for group in duplicates.groups] == [
+        [f"{PREFIX}简历-副本.pdf", f"{PREFIX}简历-副本2.pdf", f"{PREFIX}简历.pdf"],
+        [f"{PREFIX}证书 (1).pdf", f"{PREFIX}证书.pdf"],
+    ]
+    assert all(group.method == METHOD_ETAG for group in duplicates.groups)
+    assert not duplicates.unverified
+
+    fields = duplicates.listing_fields()
+    assert fields["unique_file_count"] == 3 and len(fields["duplicate_groups"]) == 2
+
+
+def test_multipart_duplicates_need_content_hash():
+    """测试分段上传文件的 ETag 不是内容 MD5：只读取大小相同的候选文件，结果按 ETag 缓存"""
+    bodies = {f"{PREFIX}证书.pdf": CERTIFICATE, f"{PREFIX}证书-扫描.pdf": CERTIFICATE}
+    objects = [
+        _object("证书.pdf", _md5(CERTIFICATE), len(CERTIFICATE)),
+        _object("证书-扫描.pdf", "0123456789abcdef0123456789abcdef-2", len(CERTIFICATE)),
+        # 大小不同的分段上传文件不可能与其他文件重复，不读取
+        _object("论文.pdf", "fedcba9876543210fedcba9876543210-3", 999),
+    ]
+    hashed = []
+
+    def hash_object(key):
+        hashed.append(key)
+        return md5_stream(io.BytesIO(bodies[key]), chunk_size=4)
+
+    index = FolderIndex()
+    listed = index.deduplicate("bucket", PREFIX, objects)
+    assert listed.unique_count == 3 and listed.unverified == [f"{PREFIX}证书-扫描.pdf"]
+
+    resolved = index.deduplicate("bucket", PREFIX, objects, hash_object)
+    assert hashed == [f"{PREFIX}证书-扫描.pdf"] and resolved.hashed == 1
+    assert resolved.unique_count == 2 and not resolved.unverified
+    assert resolved.groups[0].method == METHOD_CONTENT_HASH
+
+    # 文件夹内容不变时直接使用缓存结果；其他文件夹中相同 ETag 的文件使用缓存的内容 MD5
+    assert index.deduplicate("bucket", PREFIX, objects, hash_object).hashed == 0
+    other = index.deduplicate("bucket", "李四-华西医院/", objects)
+    assert other.unique_count == 2 and hashed == [f"{PREFIX}证书-扫描.pdf"]
+
+    metrics = index.get_metrics()
+    assert metrics["content_hashes"] == 1 and metrics["cache_hits"] == 1
+
+
+def test_folder_cache_follows_listing_and_size_limit():
+    """测试列表内容变化后重新统计，超过大小上限的分段上传文件不读取"""
+    index = FolderIndex(hash_max_bytes=10)
+    objects = [
+        _object("a.pdf", _md5(CERTIFICATE), len(CERTIFICATE)),
+        _object("b.pdf", "0123456789abcdef0123456789abcdef-2", len(CERTIFICATE)),
+    ]
+
+    def hash_object(key):
+        raise AssertionError("不应读取超过大小上限的文件")
+
+    first = index.deduplicate("bucket", PREFIX, objects, hash_object)
+    assert first.unique_count == 2 and first.unverified == [f"{PREFIX}b.pdf"]
+
+    objects.append(_object("a (1).pdf", _md5(CERTIFICATE), len(CERTIFICATE)))
+    second = index.deduplicate("bucket", PREFIX, objects)
+    assert second.document_count == 3 and second.unique_count == 2
+
+
+def test_async_hash_failure_keeps_etag_result():
+    """测试异步读取失败时按 ETag 判断（文件保留为未确认），不影响其他文件"""
+    index = FolderIndex()
+    objects = [
+        _object("a.pdf", _md5(CERTIFICATE), len(CERTIFICATE)),
+        _object("b.pdf", "0123456789abcdef0123456789abcdef-2", len(CERTIFICATE)),
+        _object("c.pdf", "00000000000000000000000000000000-2", len(CERTIFICATE)),
+    ]
+
+    async def hash_object(key):
+        if key.endswith("b.pdf"):
+            raise IOError("connection reset")
+        return _md5(CERTIFICATE)
+
+    duplicates = asyncio.run(index.deduplicate_async("bucket", PREFIX, objects, hash_object))
+    assert duplicates.unique_count == 2 and duplicates.hashed == 1
+    assert duplicates.groups[0].keys == [f"{PREFIX}a.pdf", f"{PREFIX}c.pdf"]
+    assert duplicates.unverified == [f"{PREFIX}b.pdf"]
+    assert index.get_metrics()["hash_errors"] == 1
+
+
+def test_preaudit_counts_unique_documents():
+    """测试预审按唯一文档数量判断支撑文档是否充足，报告列出重复文件"""
+    from benchmark_fakes import doctor_folder_prefix
+    from benchmark_preaudit import BENCHMARK_BUCKET, BenchmarkEnvironment
+
+    with BenchmarkEnvironment(doctors=2, files_per_folder=3, min_file_count=3) as env:
+        doctor = env.doctors[0]
+        prefix = doctor_folder_prefix(doctor)
+        env.s3.put_object(Bucket=BENCHMARK_BUCKET, Key=f"{prefix}证书.pdf", Body=CERTIFICATE)
+        env.s3.put_object(Bucket=BENCHMARK_BUCKET, Key=f"{prefix}证书 (1).pdf", Body=CERTIFICATE)
+
+        listing = env.tools.list_s3_files_with_prefix(prefix=prefix)
+        assert listing["file_count"] == 5 and listing["unique_file_count"] == 4
+
+        result = env.tools.run_preaudit(env.submission(doctor))
+        assert result.passed and result.file_count == 4
+        assert result.folder.duplicate_count == 1
+
+        env.s3.put_object(Bucket=BENCHMARK_BUCKET, Key=f"{prefix}document_0000.pdf", Body=CERTIFICATE)
+        result = env.tools.run_preaudit(env.submission(doctor))
+        assert not result.passed and result.file_count == 3
+        assert "另有2个重复文件未计入" in result.reasons[0]
+        assert "重复文件（2个，未计入文档数量）" in result.render()
+
+
+def main():
+    """主函数"""
+    print("=" * 60)
+    print("文件夹索引（重复文档检测）测试")
+    print("=" * 60)
+
+    tests = [
+        test_duplicates_by_etag_and_size,
+        test_multipart_duplicates_need_content_hash,
+        test_folder_cache_follows_listing_and_size_limit,
+        test_async_hash_failure_keeps_etag_result,
+        test_preaudit_counts_unique_documents
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__doc__}")
+
+    print("\n✨ 测试完成！")
+
+
+if __name__ == "__main__":
+    main()
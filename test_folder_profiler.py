@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+测试文件夹内容画像：文件头格式识别、文件名类别识别、ETag 缓存、读取失败时按扩展名推断，
+以及预审报告中的各类型文档数量
+画像器测试使用 S3 模拟器，可离线运行；预审集成测试使用基准测试替身服务（需要安装 boto3）
+"""
+
+import asyncio
+from benchmark_fakes import FakeS3Client, FakeS3Error
+from folder_profiler import (
+    FORMAT_DOCX,
+    FORMAT_JPEG,
+    FORMAT_PDF,
+    FORMAT_PNG,
+    FORMAT_UNKNOWN,
+    FolderProfiler,
+    categorize,
+    describe_counts,
+    format_from_name,
+    sniff_format
+)
+
+BUCKET = "bucket"
+PREFIX = "张三-协和医院/"
+
+FOLDER = {
+    f"{PREFIX}医师执业证书.pdf": b"%PDF-1.7\n" + b"\x00" * 100,
+    f"{PREFIX}个人简历.docx": b"PK\x03\x04" + b"\x00" * 26 + b"word/document.xml",
+    f"{PREFIX}微信图片_20240501.jpg": b"\xff\xd8\xff\xe0" + b"\x00" * 100,
+    f"{PREFIX}职称证书.pdf": b"\x89PNG\r\n\x1a\n" + b"\x00" * 100,  # 改名为 .pdf 的截图
+}
+
+
+def make_folder():
+    """写入测试文件夹，返回 S3 模拟器和画像器需要的对象列表"""
+    client = FakeS3Client()
+    for key, body in FOLDER.items():
+        client.put_object(Bucket=BUCKET, Key=key, Body=body)
+    response = client.list_objects_v2(Bucket=BUCKET, Prefix=PREFIX)
+    objects = [{"key": obj["Key"], "etag": obj["ETag"], "size": obj["Size"]} for obj in response["Contents"]]
+    return client, objects
+
+
+def fetcher(client):
+    def fetch_head(key, head_bytes):
+        response = client.get_object(Bucket=BUCKET, Key=key, Range=f"bytes=0-{head_bytes - 1}")
+        return response["Body"].read()
+    return fetch_head
+
+
+def test_sniff_and_categorize():
+    """测试按文件头识别格式、按文件名识别类别"""
+    assert sniff_format(b"%PDF-1.4") == FORMAT_PDF
+    assert sniff_format(b"\xff\xd8\xff\xdb") == FORMAT_JPEG
+    assert sniff_format(b"\x89PNG\r\n\x1a\n") == FORMAT_PNG
+    assert sniff_format(FOLDER[f"{PREFIX}个人简历.docx"]) == FORMAT_DOCX
+    assert sniff_format(b"") == FORMAT_UNKNOWN
+    assert format_from_name("a/b/扫描件.JPEG") == FORMAT_JPEG
+    assert format_from_name("a/b/无扩展名") == FORMAT_UNKNOWN
+
+    assert categorize(f"{PREFIX}医师执业证书.pdf") == "practice_certificate"
+    assert categorize(f"{PREFIX}个人简历.docx") == "cv"
+    assert categorize(f"{PREFIX}zhang_CV_2024.pdf") == "cv"
+    assert categorize(f"{PREFIX}微信图片_20240501.jpg") == "screenshot"
+    assert categorize(f"{PREFIX}会议议程.pdf") == "other"
+
+
+def test_profile_counts_and_etag_cache():
+    """测试画像统计各类型数量、发现扩展名与内容不符，内容未变化时不重复读取"""
+    client, objects = make_folder()
+    profiler = FolderProfiler(head_bytes=64, max_concurrency=2)
+
+    profile = profiler.profile(objects, fetcher(client))
+    assert profile.ranged_gets == 4 and profile.cache_hits == 0
+    assert profile.bytes_read == sum(min(64, len(body)) for body in FOLDER.values())
+    assert profile.formats == {FORMAT_PDF: 1, FORMAT_DOCX: 1, FORMAT_JPEG: 1, FORMAT_PNG: 1}
+    assert profile.categories["screenshot"] == 1 and profile.categories["cv"] == 1
+    assert profile.summary()["mismatched"] == [f"{PREFIX}职称证书.pdf"]
+    assert profile.summary()["images"] == 2
+    assert client.get_calls == 4
+
+    again = profiler.profile(objects, fetcher(client))
+    assert again.ranged_gets == 0 and again.cache_hits == 4
+    assert again.formats == profile.formats
+    assert client.get_calls == 4
+
+    # 内容变化（ETag 变化）的文件重新读取
+    changed_key = f"{PREFIX}职称证书.pdf"
+    client.put_object(Bucket=BUCKET, Key=changed_key, Body=b"%PDF-1.5\n")
+    response = client.list_objects_v2(Bucket=BUCKET, Prefix=PREFIX)
+    objects = [{"key": obj["Key"], "etag": obj["ETag"], "size": obj["Size"]} for obj in response["Contents"]]
+    third = profiler.profile(objects, fetcher(client))
+    assert third.ranged_gets == 1 and third.cache_hits == 3
+    assert third.formats[FORMAT_PDF] == 2 and not third.summary()["mismatched"]
+
+    metrics = profiler.get_metrics()
+    assert metrics["folders"] == 3 and metrics["ranged_gets"] == 5 and metrics["cache_hits"] == 7
+    assert "PDF 2个" in describe_counts(third.summary())
+
+
+def test_unreadable_object_falls_back_to_extension():
+    """测试单个文件读取失败时按扩展名推断格式，不缓存推断结果"""
+    client, objects = make_folder()
+    broken = f"{PREFIX}医师执业证书.pdf"
+    fetch = fetcher(client)
+
+    def flaky_fetch(key, head_bytes):
+        if key == broken:
+            raise FakeS3Error("AccessDenied", "Access Denied")
+        return fetch(key, head_bytes)
+
+    profiler = FolderProfiler()
+    profile = profiler.profile(objects, flaky_fetch)
+    document = next(document for document in profile.documents if document.key == broken)
+    assert document.format == FORMAT_PDF and document.source == "extension" and not document.mismatch
+    assert profile.unreadable == 1
+
+    again = profiler.profile(objects, fetch)
+    assert again.ranged_gets == 1 and again.cache_hits == 3 and again.unreadable == 0
+
+
+def test_profile_async_limits_concurrency():
+    """测试异步画像结果与同步版本一致，同时进行的读取不超过 max_concurrency"""
+    client, objects = make_folder()
+    fetch = fetcher(client)
+    state = {"active": 0, "peak": 0}
+
+    async def fetch_head(key, head_bytes):
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        await asyncio.sleep(0.01)
+        state["active"] -= 1
+        return fetch(key, head_bytes)
+
+    profile = asyncio.run(FolderProfiler(max_concurrency=2).profile_async(objects, fetch_head))
+    expected = FolderProfiler().profile(objects, fetch)
+    assert profile.summary()["formats"] == expected.summary()["formats"]
+    assert state["peak"] == 2
+
+
+def test_preaudit_reports_document_counts():
+    """测试开启 [DOCUMENTS] PROFILE_IN_PREAUDIT 后预审结果和报告包含各类型文档数量"""
+    from benchmark_fakes import doctor_folder_prefix
+    from benchmark_preaudit import BenchmarkEnvironment
+    from config_service import get_config_service
+
+    with BenchmarkEnvironment(doctors=2, files_per_folder=5) as env:
+        tools = env.tools
+        doctor = env.doctors[0]
+        profiled = tools.profile_folder_documents(doctor_folder_prefix(doctor))
+        assert profiled["success"] and profiled["document_count"] == 5
+        assert profiled["formats"] == {FORMAT_PDF: 5}
+
+        get_config_service().set_overrides("documents", profile_in_preaudit=True)
+        result = tools.run_preaudit(env.submission(doctor))
+        assert result.folder.documents["document_count"] == 5
+        assert result.folder.documents["cache_hits"] == 5
+        assert "文档格式: PDF 5个" in tools.perform_preaudit(env.submission(doctor))
+
+
+def main():
+    """主函数"""
+    print("=" * 60)
+    print("文件夹内容画像测试")
+    print("=" * 60)
+
+    tests = [
+        test_sniff_and_categorize,
+        test_profile_counts_and_etag_cache,
+        test_unreadable_object_falls_back_to_extension,
+        test_profile_async_limits_concurrency,
+        test_preaudit_reports_document_counts
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__doc__}")
+
+    print("\n✨ 测试完成！")
+
+
+if __name__ == "__main__":
+    main()
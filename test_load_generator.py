@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+测试 MCP server 负载生成器
+使用内存中的替身会话，不启动服务端，可离线运行
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+from types import SimpleNamespace
+from load_generator import (
+    OUTCOME_INCOMPLETE,
+    OUTCOME_OK,
+    OUTCOME_TIMEOUT,
+    OUTCOME_TOOL_ERROR,
+    LoadRun,
+    ToolStats,
+    classify_result,
+    load_corpus
+)
+
+
+class FakeSession:
+    """模拟 ClientSession：按延迟返回工具结果，并暴露服务端 metrics"""
+
+    def __init__(self, latency=0.01, text="预审通过 - 讲者身份验证成功"):
+        self.latency = latency
+        self.text = text
+        self.calls = 0
+        self.in_flight = 0
+
+    async def call_tool(self, name, arguments):
+        self.calls += 1
+        self.in_flight += 1
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+        return SimpleNamespace(content=[SimpleNamespace(text=self.text)], isError=False)
+
+    async def read_resource(self, uri):
+        server = {"queued": 0, "in_flight": self.in_flight, "running": self.in_flight}
+        return SimpleNamespace(contents=[SimpleNamespace(text=json.dumps({"server": server}))])
+
+
+def test_load_corpus_formats():
+    """测试语料的完整格式和简写格式"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "corpus.jsonl")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write('{"tool": "check_string_content", "arguments": {"input_string": "张三"}}\n')
+            f.write("# 注释行\n\n")
+            f.write('{"user_input": "张三医生，长海医院心内科"}\n')
+        corpus = load_corpus(path)
+    assert corpus == [
+        ("check_string_content", {"input_string": "张三"}),
+        ("perform_preaudit", {"user_input": "张三医生，长海医院心内科"})
+    ]
+
+
+def test_classify_and_histogram():
+    """测试结果分类、错误率和延迟直方图"""
+    assert classify_result("perform_preaudit", "预审通过 - ...", False) == OUTCOME_OK
+    assert classify_result("perform_preaudit", "预审未完成 - 超出时间预算", False) == OUTCOME_INCOMPLETE
+    assert classify_result("list_s3_files", "错误: 未知的工具", False) == OUTCOME_TOOL_ERROR
+
+    stats = ToolStats()
+    stats.record(0.004, OUTCOME_OK)
+    stats.record(0.2, OUTCOME_INCOMPLETE)
+    stats.record(30, OUTCOME_TIMEOUT)
+    histogram = dict(stats.histogram())
+    assert histogram["<= 5ms"] == 1 and histogram["<= 250ms"] == 1 and histogram["> 25000ms"] == 1
+    assert abs(stats.error_rate() - 1 / 3) < 1e-9
+
+
+def test_closed_loop_respects_concurrency():
+    """测试闭环模式的请求数和并发上限"""
+    sessions = [FakeSession(), FakeSession()]
+    run = LoadRun(sessions, [("perform_preaudit", {"user_input": "张三"})], request_timeout=5)
+
+    async def scenario():
+        stop = asyncio.Event()
+        sampler = asyncio.create_task(run.sample_queue_depth(0.005, stop))
+        await run.run_closed_loop(concurrency=4, total=20, duration=None)
+        stop.set()
+        await sampler
+
+    asyncio.run(scenario())
+    assert run.stats["perform_preaudit"].count == 20
+    assert sessions[0].calls + sessions[1].calls == 20
+    assert run.max_client_in_flight == 4
+    assert run.queue_summary()["samples"] > 0
+
+
+def test_open_loop_rate_and_timeouts():
+    """测试开环模式按速率发送且不等待慢请求，超时计入错误"""
+    session = FakeSession(latency=0.2)
+    run = LoadRun([session], [("perform_preaudit", {"user_input": "张三"})], request_timeout=0.05)
+    asyncio.run(run.run_open_loop(rate=100, total=10, duration=None, poisson=False, seed=1))
+    stats = run.stats["perform_preaudit"]
+    assert stats.count == 10
+    assert stats.outcomes == {OUTCOME_TIMEOUT: 10}
+    # 开环模式下慢请求会堆积
+    assert run.max_client_in_flight > 1
+
+
+def main():
+    """主函数"""
+    print("=" * 60)
+    print("负载生成器测试")
+    print("=" * 60)
+
+    tests = [
+        test_load_corpus_formats,
+        test_classify_and_histogram,
+        test_closed_loop_respects_concurrency,
+        test_open_loop_rate_and_timeouts
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__doc__}")
+
+    print("\n✨ 测试完成！")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+测试 MCP HTTP 传输：健康检查、优雅关闭和客户端连接池
+需要安装 mcp 和 uvicorn，不访问 AWS 或 EXA
+"""
+
+import asyncio
+import time
+from starlette.testclient import TestClient
+
+import mcp_server
+import speaker_validation_tools
+from mcp_http_server import McpHttpApp
+
+
+def test_health_endpoint():
+    """测试健康检查返回传输方式、会话数和工具调用统计"""
+    http_app = McpHttpApp(drain_timeout=1)
+    with TestClient(http_app.app) as client:
+        response = client.get("/health")
+    assert response.status_code == 200
+    status = response.json()
+    assert status["status"] == "ok"
+    assert "sse" in status["transports"]
+    assert status["sse_sessions"] == 0
+    assert "in_flight" in status["tools"]
+
+
+def test_drain_waits_for_in_flight_calls():
+    """测试关闭时拒绝新调用和新会话，并等待进行中的调用完成"""
+    http_app = McpHttpApp(drain_timeout=5)
+
+    def slow_tool():
+        time.sleep(0.3)
+        return "done"
+
+    async def scenario():
+        call = asyncio.create_task(mcp_server.run_tool("slow_tool", slow_tool))
+        await asyncio.sleep(0.05)
+        started = time.perf_counter()
+        await http_app.drain()
+        waited = time.perf_counter() - started
+        try:
+            await mcp_server.run_tool("slow_tool", slow_tool)
+            assert False, "关闭过程中应拒绝新的工具调用"
+        except mcp_server.ServerDrainingError:
+            pass
+        return await call, waited
+
+    try:
+        result, waited = asyncio.run(scenario())
+        assert result == "done"
+        assert waited >= 0.2
+
+        with TestClient(http_app.app) as client:
+            assert client.get("/health").status_code == 503
+            response = client.get("/sse")
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "5"
+    finally:
+        mcp_server.server_draining.clear()
+
+
+def test_pooled_clients_reused_per_timeout_bucket():
+    """测试相同服务和相近超时复用同一客户端，超时向下取整不超过截止时间"""
+    speaker_validation_tools.reset_client_pool()
+    try:
+        first = speaker_validation_tools._pooled_client("s3", 2.3)
+        assert speaker_validation_tools._pooled_client("s3", 2.4) is first
+        assert speaker_validation_tools._pooled_client("s3", 2.6) is not first
+        assert first.meta.config.read_timeout <= 2.3
+        assert first.meta.config.max_pool_connections == speaker_validation_tools.CLIENT_MAX_POOL_CONNECTIONS
+        session = speaker_validation_tools._get_http_session()
+        assert speaker_validation_tools._get_http_session() is session
+    finally:
+        speaker_validation_tools.reset_client_pool()
+
+
+def main():
+    """主函数"""
+    print("=" * 60)
+    print("MCP HTTP 传输测试")
+    print("=" * 60)
+
+    tests = [
+        test_health_endpoint,
+        test_drain_waits_for_in_flight_calls,
+        test_pooled_clients_reused_per_timeout_bucket
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__doc__}")
+
+    print("\n✨ 测试完成！")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+测试 PDF 文本流式提取：ToUnicode 中文解码、对象流、按块读取时找到检索词后提前停止、ETag 缓存、解压上限，
+以及身份检查附带的 PDF 文本证据
+提取器测试可离线运行；身份检查集成测试使用基准测试替身服务（需要安装 boto3）
+"""
+
+import zlib
+from benchmark_fakes import make_pdf
+from pdf_text import PdfTextExtractor, extract_content_text, normalize_text, parse_cmap
+
+CERTIFICATE_PAGES = ["医师执业证书\n姓名：张三\n执业地点：北京协和医院", "执业范围：内科专业"]
+
+
+def reader(data: bytes, log: list):
+    def read_range(start, end):
+        log.append((start, end))
+        return data[start:end + 1]
+    return read_range
+
+
+def test_extracts_chinese_text_per_page():
+    """测试按 ToUnicode 映射解码中文，压缩和未压缩的内容流逐页提取"""
+    for compress in (True, False):
+        pdf = make_pdf(CERTIFICATE_PAGES, compress=compress)
+        document, cached = PdfTextExtractor(chunk_bytes=1024).extract("a.pdf", "etag", len(pdf), reader(pdf, []))
+        assert not cached and document.complete and document.is_pdf
+        assert [normalize_text(page) for page in document.pages] == [normalize_text(page) for page in CERTIFICATE_PAGES]
+
+
+def test_content_stream_operators_and_cmap_ranges():
+    """测试字面字符串转义、TJ 数组和 bfrange 映射"""
+    text = extract_content_text(rb"BT /F1 9 Tf (Zhang \(San\)\051) Tj [(Peking) -300 (Union)] TJ ET", {b"F1": None})
+    assert "Zhang (San))" in text and "Peking Union" in text
+
+    cmap = parse_cmap(b"begincmap 1 beginbfrange <0010> <0012> <5F20> endbfrange "
+                      b"1 beginbfrange <0020> <0021> [<4E09> <533B>] endbfrange endcmap")
+    assert cmap[b"\x00\x10"] == "张" and cmap[b"\x00\x12"] == "弢"
+    assert cmap[b"\x00\x20"] == "三" and cmap[b"\x00\x21"] == "医"
+    assert extract_content_text(b"BT /C0 9 Tf <00100020> Tj ET", {b"C0": cmap}).strip() == "张三"
+
+
+def test_object_streams():
+    """测试页面和字体对象压缩存放在对象流（ObjStm）中"""
+    content = zlib.compress(b"BT /F1 12 Tf (Dr. Li Si, West China Hospital) Tj ET")
+    stored = [b"<< /Type /Page /Parent 2 0 R /Resources << /Font << /F1 3 0 R >> >> /Contents 4 0 R >>",
+              b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    header, body = b"", b""
+    for number, obj in zip((5, 3), stored):
+        header += b"%d %d " % (number, len(body))
+        body += obj + b"\n"
+    objstm = zlib.compress(header + body)
+    pdf = (b"%%PDF-1.5\n"
+           b"1 0 obj\n<< /Type /Catalog /Pages 2 0 R >>\nendobj\n"
+           b"2 0 obj\n<< /Type /Pages /Kids [5 0 R] /Count 1 >>\nendobj\n"
+           b"4 0 obj\n<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream\nendobj\n"
+           b"6 0 obj\n<< /Type /ObjStm /N 2 /First %d /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream\nendobj\n"
+           b"%%%%EOF\n") % (len(content), content, len(header), len(objstm), objstm)
+    document, _ = PdfTextExtractor(chunk_bytes=1024).extract("b.pdf", "", len(pdf), reader(pdf, []))
+    assert document.pages == ["Dr. Li Si, West China Hospital\n"]
+
+
+def test_stops_early_and_caches_by_etag():
+    """测试找到全部检索词后停止读取，结果按 ETag 缓存；缓存中找不到的检索词重新读取"""
+    pdf = make_pdf(CERTIFICATE_PAGES + ["第三页：王五"], padding=200000)
+    terms = {"name": "张三", "hospital": "北京协和医院"}
+    extractor = PdfTextExtractor(chunk_bytes=16384, workers=2)
+    log = []
+
+    document, cached = extractor.extract("c.pdf", "etag-c", len(pdf), reader(pdf, log), terms)
+    assert not cached and not document.complete
+    assert document.find(terms) == {"name": 0, "hospital": 0}
+    assert len(log) == 1 and document.bytes_read == 16384 < len(pdf)
+
+    again, cached = extractor.extract("c.pdf", "etag-c", len(pdf), reader(pdf, log), terms)
+    assert cached and again is document and len(log) == 1
+
+    later, cached = extractor.extract("c.pdf", "etag-c", len(pdf), reader(pdf, log), {"name": "王五"})
+    assert not cached and later.find({"name": "王五"}) == {"name": 2}
+    assert extractor.get_metrics()["stopped_early"] == 2
+
+
+def test_find_evidence_prefers_certificates():
+    """测试在多个 PDF 中查找证据：证书优先、非 PDF 跳过、读取失败的文档不影响其他文档"""
+    files = {
+        "张三/会议议程.pdf": make_pdf(["学术会议议程"]),
+        "张三/医师执业证书.pdf": make_pdf(["姓名 张三"]),
+        "张三/工作证明.pdf": make_pdf(["北京协和医院 在职证明"]),
+        "张三/医师资格证书.pdf": None,
+        "张三/照片.jpg": b"\xff\xd8\xff",
+    }
+    objects = [{"key": key, "etag": key, "size": len(data or b"x" * 10)} for key, data in files.items()]
+    reads = []
+
+    def read_range(key, start, end):
+        reads.append(key)
+        if files[key] is None:
+            raise IOError("AccessDenied")
+        return files[key][start:end + 1]
+
+    evidence = PdfTextExtractor().find_evidence(objects, read_range, {"name": "张三", "hospital": "北京协和医院"})
+    assert evidence["all_found"] and evidence["errors"] == 1 and evidence["pdf_count"] == 4
+    assert evidence["found"]["name"] == {"document": "张三/医师执业证书.pdf", "page": 1}
+    assert evidence["found"]["hospital"]["document"] == "张三/工作证明.pdf"
+    assert "张三/会议议程.pdf" not in reads and "张三/照片.jpg" not in reads
+
+
+def test_skips_document_exceeding_decoded_limit():
+    """测试解压后超过上限的文档（压缩炸弹）停止解析并跳过，结果按 ETag 缓存，其他文档照常查找"""
+    bomb = zlib.compress(b"BT /F1 12 Tf (Zhang San) Tj ET\n" + b"\x00" * (16 * 1024 * 1024))
+    pdf = (b"%%PDF-1.5\n"
+           b"1 0 obj\n<< /Type /Catalog /Pages 2 0 R >>\nendobj\n"
+           b"2 0 obj\n<< /Type /Pages /Kids [3 0 R] /Count 1 >>\nendobj\n"
+           b"3 0 obj\n<< /Type /Page /Parent 2 0 R /Resources << >> /Contents 4 0 R >>\nendobj\n"
+           b"4 0 obj\n<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream\nendobj\n"
+           b"%%%%EOF\n") % (len(bomb), bomb)
+    assert len(pdf) < 65536
+    files = {"张三/医师执业证书.pdf": pdf, "张三/工作证明.pdf": make_pdf(["北京协和医院 在职证明 张三"])}
+    objects = [{"key": key, "etag": key, "size": len(data)} for key, data in files.items()]
+    reads = []
+
+    def read_range(key, start, end):
+        reads.append(key)
+        return files[key][start:end + 1]
+
+    extractor = PdfTextExtractor(max_decoded_bytes=1024 * 1024)
+    document, _ = extractor.extract("bomb.pdf", "etag-bomb", len(pdf), reader(pdf, []), {"name": "Zhang San"})
+    assert document.too_large and document.pages == [] and document.complete
+    assert extractor.get_metrics()["too_large"] == 1
+    _, cached = extractor.extract("bomb.pdf", "etag-bomb", len(pdf), reader(pdf, []), {"name": "Zhang San"})
+    assert cached
+
+    evidence = extractor.find_evidence(objects, read_range, {"name": "张三", "hospital": "北京协和医院"})
+    assert evidence["all_found"] and evidence["too_large"] == 1 and evidence["errors"] == 0
+    assert evidence["found"]["name"]["document"] == "张三/工作证明.pdf"
+
+
+def test_identity_check_attaches_pdf_evidence():
+    """测试开启 [PDF_EVIDENCE] 后身份检查和预审报告附带 PDF 文本证据（同步和异步版本）"""
+    from benchmark_fakes import doctor_folder_prefix
+    from benchmark_preaudit import BENCHMARK_BUCKET, BenchmarkEnvironment
+    from config_service import get_config_service
+
+    with BenchmarkEnvironment(doctors=2, files_per_folder=4) as env:
+        import async_tools
+        doctor = env.doctors[0]
+        certificate = make_pdf([f"医师执业证书\n姓名：{doctor['name']}\n执业地点：{doctor['hospital']}"])
+        env.s3.put_object(Bucket=BENCHMARK_BUCKET, Key=f"{doctor_folder_prefix(doctor)}医师执业证书.pdf",
+                          Body=certificate)
+        get_config_service().set_overrides("pdf_evidence", enabled=True)
+
+        result = env.tools.check_string_content(env.submission(doctor))
+        evidence = result["document_evidence"]
+        assert evidence["success"] and evidence["all_found"]
+        assert evidence["found"]["name"]["document"].endswith("医师执业证书.pdf")
+
+        async_result = env.run_async(async_tools.check_string_content(env.submission(doctor) + "。"))
+        assert async_result["document_evidence"]["found"] == evidence["found"]
+        assert async_result["document_evidence"]["cache_hits"] == 1
+
+        report = env.tools.perform_preaudit(env.submission(doctor) + "！")
+        assert "PDF 文本证据: 讲者姓名见 医师执业证书.pdf 第1页" in report
+
+
+def main():
+    """主函数"""
+    print("=" * 60)
+    print("PDF 文本流式提取测试")
+    print("=" * 60)
+
+    tests = [
+        test_extracts_chinese_text_per_page,
+        test_content_stream_operators_and_cmap_ranges,
+        test_object_streams,
+        test_stops_early_and_caches_by_etag,
+        test_find_evidence_prefers_certificates,
+        test_skips_document_exceeding_decoded_limit,
+        test_identity_check_attaches_pdf_evidence
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__doc__}")
+
+    print("\n✨ 测试完成！")
+
+
+if __name__ == "__main__":
+    main()
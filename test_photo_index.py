@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+测试讲者照片感知哈希索引：内置 PNG / JPEG 解码、缩放和重新编码后哈希相近、多索引哈希表近似查找、
+ETag 未变化时不重复读取、后台索引器扫描整个存储桶，以及预审报告中的照片复用提示
+解码和索引测试可离线运行；预审集成测试使用基准测试替身服务（需要安装 boto3）
+"""
+
+import random
+from benchmark_fakes import FakeS3Client, make_jpeg, make_png, photo_pixels
+from photo_index import (
+    MAX_IMAGE_PIXELS,
+    MultiIndexHash,
+    PhotoIndex,
+    PhotoIndexer,
+    decode_jpeg,
+    decode_png,
+    hamming,
+    image_hash
+)
+
+BUCKET = "bucket"
+ZHANG = "张三-北京协和医院-心内科/"
+LI = "李四-华西医院-肿瘤科/"
+WANG = "王五-湘雅医院-呼吸科/"
+
+
+def photo(seed: int, width: int = 160, height: int = 120, jpeg: bool = False) -> bytes:
+    pixels = photo_pixels(seed, width, height)
+    return make_jpeg(width, height, pixels, color=True) if jpeg else make_png(width, height, pixels)
+
+
+def put_photos(client: FakeS3Client, photos: dict):
+    for key, body in photos.items():
+        client.put_object(Bucket=BUCKET, Key=key, Body=body)
+
+
+def list_objects(client: FakeS3Client, prefix: str = ""):
+    response = client.list_objects_v2(Bucket=BUCKET, Prefix=prefix)
+    return [{"key": obj["Key"], "etag": obj["ETag"], "size": obj["Size"]} for obj in response["Contents"]]
+
+
+def fetcher(client: FakeS3Client):
+    return lambda key: client.get_object(Bucket=BUCKET, Key=key)["Body"].read()
+
+
+def test_decoders_and_perceptual_hash():
+    """测试 JPEG 解码出每个 8x8 块的平均亮度；同一照片缩放、换格式后哈希相近，不同照片相差很远"""
+    pixels = photo_pixels(1, 64, 48)
+    width, height, grid = decode_jpeg(make_jpeg(64, 48, pixels, color=True, restart_interval=3))
+    assert (width, height) == (8, 6)
+    block = sum(pixels[y * 64 + x] for y in range(8, 16) for x in range(16, 24)) / 64
+    assert abs(grid[1 * 8 + 2] - block) < 0.1
+
+    original = image_hash(photo(1))
+    assert original is not None
+    assert hamming(original, image_hash(make_png(160, 120, photo_pixels(1, 160, 120), color=True))) == 0
+    assert hamming(original, image_hash(photo(1, 400, 300, jpeg=True))) <= 8
+    assert all(hamming(original, image_hash(photo(seed))) > 16 for seed in range(2, 6))
+
+    # 纯色图片、渐进式 JPEG 和非图片内容不建立索引
+    assert image_hash(make_png(40, 40, [200] * 1600)) is None
+    assert image_hash(b"\xff\xd8\xff\xc2\x00\x11" + b"\x00" * 64) is None
+    assert image_hash(b"%PDF-1.7\n") is None
+
+
+def test_rejects_oversized_images():
+    """测试声明极大尺寸的小 PNG 不解码；IDAT 解压输出不超过按声明尺寸算出的大小"""
+    import struct
+    import zlib
+
+    def png(width: int, height: int, raw: bytes) -> bytes:
+        def chunk(kind: bytes, data: bytes) -> bytes:
+            return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+        header = struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0)
+        return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(raw))
+                + chunk(b"IEND", b""))
+
+    huge = png(65535, 65535, b"\x00" * 65536)
+    assert len(huge) < 1024 and 65535 * 65535 > MAX_IMAGE_PIXELS
+    try:
+        decode_png(huge)
+        assert False, "超过像素上限的 PNG 应报错"
+    except ValueError:
+        pass
+    assert image_hash(huge) is None
+
+    # 声明 64x64，IDAT 解压后有 64 MB：只解出声明尺寸需要的部分
+    width, height, pixels = decode_png(png(64, 64, b"\x00" * (64 * 1024 * 1024)))
+    assert (width, height) == (64, 64) and len(pixels) == 64 * 64
+
+
+def test_multi_index_hash_matches_brute_force():
+    """测试多索引哈希表的近似查找结果与逐一比较一致，且只比较少量候选"""
+    rng = random.Random(3)
+    values = [rng.getrandbits(64) for _ in range(5000)]
+    table = MultiIndexHash()
+    for value in values:
+        table.add(value)
+    for value in values[:20]:
+        query = value ^ (1 << rng.randrange(64)) ^ (1 << rng.randrange(64))
+        expected = sorted((v, hamming(v, query)) for v in values if hamming(v, query) <= 8)
+        assert sorted(table.search(query, 8)) == expected
+    assert table.comparisons < 20 * len(values) // 10
+
+    assert table.remove(values[0]) and not table.remove(values[0])
+    assert values[0] not in [value for value, _ in table.search(values[0], 0)]
+
+
+def test_index_finds_photos_reused_across_folders():
+    """测试同一照片（缩放后重新编码）出现在其他讲者文件夹中时被发现，同一文件夹内不算复用"""
+    client = FakeS3Client()
+    put_photos(client, {
+        f"{ZHANG}头像.png": photo(1),
+        f"{ZHANG}头像-原图.jpg": photo(1, 320, 240, jpeg=True),
+        f"{ZHANG}证书.pdf": b"%PDF-1.7\n",
+        f"{LI}照片.jpg": photo(1, 400, 300, jpeg=True),
+        f"{WANG}照片.png": photo(2),
+    })
+    index = PhotoIndex(max_distance=8)
+    stats = index.index_objects(BUCKET, list_objects(client), fetcher(client), prefix="")
+    assert stats.photos == 4 and stats.hashed == 4 and not stats.unindexed
+    assert client.get_calls == 4
+
+    check = index.check_folder(BUCKET, LI, list_objects(client, LI), fetcher(client))
+    assert check.photos == 1 and check.hashed == 0 and client.get_calls == 4
+    assert sorted(match.other_key for match in check.matches) == [f"{ZHANG}头像-原图.jpg", f"{ZHANG}头像.png"]
+    assert check.to_dict()["reused_elsewhere"]
+    assert not index.check_folder(BUCKET, WANG, list_objects(client, WANG), fetcher(client)).matches
+
+    # 替换照片后 ETag 变化，重新计算哈希；删除的照片从索引中移除
+    client.put_object(Bucket=BUCKET, Key=f"{LI}照片.jpg", Body=photo(7, jpeg=True))
+    check = index.check_folder(BUCKET, LI, list_objects(client, LI), fetcher(client))
+    assert check.hashed == 1 and not check.matches
+    index.remove(BUCKET, f"{ZHANG}头像.png")
+    assert index.get_metrics()["photos"] == 3
+
+
+def test_etag_cache_and_unreadable_photos():
+    """测试相同 ETag 的照片使用缓存哈希；读取失败的照片下次重试，纯色照片记为未索引且不重复读取"""
+    client = FakeS3Client()
+    put_photos(client, {f"{ZHANG}a.png": photo(1), f"{ZHANG}白底.png": make_png(40, 40, [255] * 1600)})
+    index = PhotoIndex()
+    fetch = fetcher(client)
+    failed = []
+
+    def flaky_fetch(key):
+        if key.endswith("a.png") and not failed:
+            failed.append(key)
+            raise IOError("connection reset")
+        return fetch(key)
+
+    first = index.index_objects(BUCKET, list_objects(client), flaky_fetch, prefix=ZHANG)
+    assert first.errors == 1 and first.undecodable == 1
+    assert sorted(first.unindexed) == [f"{ZHANG}a.png", f"{ZHANG}白底.png"]
+
+    second = index.index_objects(BUCKET, list_objects(client), flaky_fetch, prefix=ZHANG)
+    assert second.hashed == 1 and second.unchanged == 1 and second.unindexed == [f"{ZHANG}白底.png"]
+
+    # 复制到其他讲者文件夹：ETag 相同，不读取内容
+    client.put_object(Bucket=BUCKET, Key=f"{LI}a.png", Body=photo(1))
+    calls = client.get_calls
+    check = index.check_folder(BUCKET, LI, list_objects(client, LI), fetch)
+    assert client.get_calls == calls and check.matches[0].distance == 0
+    assert index.get_metrics()["etag_hits"] == 1
+
+
+def test_background_indexer_scans_bucket():
+    """测试后台索引器分页列出整个存储桶，第二次扫描只处理变化的照片，删除的照片从索引中移除"""
+    client = FakeS3Client()
+    photos = {f"讲者{i:02d}-医院-科室/照片.png": photo(i % 3) for i in range(12)}
+    put_photos(client, photos)
+
+    def list_all():
+        token = None
+        while True:
+            kwargs = {"Bucket": BUCKET, "MaxKeys": 5}
+            if token:
+                kwargs["ContinuationToken"] = token
+            response = client.list_objects_v2(**kwargs)
+            for obj in response.get("Contents", []):
+                yield {"key": obj["Key"], "etag": obj["ETag"], "size": obj["Size"]}
+            if not response.get("IsTruncated"):
+                return
+            token = response["NextContinuationToken"]
+
+    index = PhotoIndex()
+    indexer = PhotoIndexer(index, BUCKET, list_all, fetcher(client), interval_seconds=3600)
+    first = indexer.run_once()
+    # 三种不同内容：同一 ETag 只读取一次
+    assert first.photos == 12 and first.hashed == 3 and first.etag_hits == 9
+
+    client._buckets[BUCKET].remove("讲者00-医院-科室/照片.png")
+    second = indexer.run_once()
+    assert second.hashed == 0 and second.unchanged == 11 and second.removed == 1
+    assert len(index.find_reused(BUCKET, ["讲者01-医院-科室/照片.png"])) == 3
+    assert indexer.get_metrics()["runs"] == 2 and not indexer.running
+
+
+def test_preaudit_reports_reused_photo():
+    """测试开启 [PHOTO_INDEX] CHECK_IN_PREAUDIT 后预审报告提示在其他讲者文件夹中出现的照片（同步和异步版本）"""
+    from benchmark_fakes import doctor_folder_prefix
+    from benchmark_preaudit import BENCHMARK_BUCKET, BenchmarkEnvironment
+    from config_service import get_config_service
+    from photo_index import get_photo_index
+
+    with BenchmarkEnvironment(doctors=3, files_per_folder=4) as env:
+        import async_tools
+        first, second = env.doctors[0], env.doctors[1]
+        env.s3.put_object(Bucket=BENCHMARK_BUCKET, Key=f"{doctor_folder_prefix(first)}头像.png", Body=photo(11))
+        env.s3.put_object(Bucket=BENCHMARK_BUCKET, Key=f"{doctor_folder_prefix(second)}照片.jpg",
+                          Body=photo(11, 480, 360, jpeg=True))
+        get_photo_index().clear()
+        indexed = env.tools.index_bucket_photos(BENCHMARK_BUCKET)
+        assert indexed["success"] and indexed["hashed"] == 2
+
+        get_config_service().set_overrides("photo_index", check_in_preaudit=True)
+        result = env.tools.run_preaudit(env.submission(first))
+        reuse = result.folder.photo_reuse
+        assert reuse["reused_elsewhere"] and reuse["hashed"] == 0
+        assert reuse["matches"][0]["other_folder"] == doctor_folder_prefix(second)
+        assert "⚠️ 照片复用: 头像.png 与" in result.render()
+        assert "photo_reuse" in result.stage_timings
+
+        async_result = env.run_async(async_tools.run_preaudit(env.submission(second) + "。"))
+        assert async_result.folder.photo_reuse["matches"][0]["other_folder"] == doctor_folder_prefix(first)
+        get_photo_index().clear()
+
+
+def main():
+    """主函数"""
+    print("=" * 60)
+    print("讲者照片感知哈希索引测试")
+    print("=" * 60)
+
+    tests = [
+        test_decoders_and_perceptual_hash,
+        test_rejects_oversized_images,
+        test_multi_index_hash_matches_brute_force,
+        test_index_finds_photos_reused_across_folders,
+        test_etag_cache_and_unreadable_photos,
+        test_background_indexer_scans_bucket,
+        test_preaudit_reports_reused_photo
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__doc__}")
+
+    print("\n✨ 测试完成！")
+
+
+if __name__ == "__main__":
+    main()
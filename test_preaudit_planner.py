@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+测试预审阶段规划模块
+不依赖 AWS 或 EXA，可离线运行
+"""
+
+from preaudit_planner import Stage, StagePlanner
+
+
+def make_planner():
+    planner = StagePlanner()
+    planner.register("s3_folder_listing", cost=1.0, short_circuit_rate=0.5)
+    planner.register("exa_search", cost=50.0, short_circuit_rate=0.05)
+    return planner
+
+
+def test_cheap_stage_ordered_first():
+    """测试廉价且常短路的阶段排在付费阶段之前"""
+    planner = make_planner()
+    assert planner.order(["exa_search", "s3_folder_listing"]) == ["s3_folder_listing", "exa_search"]
+    assert planner.order(["unknown", "exa_search"]) == ["exa_search", "unknown"]
+
+
+def test_short_circuit_skips_paid_stage():
+    """测试文件夹缺失时跳过EXA搜索并记录跳过次数"""
+    planner = make_planner()
+    calls = []
+
+    def folder_missing():
+        calls.append("s3_folder_listing")
+        return True
+
+    def exa():
+        calls.append("exa_search")
+        return False
+
+    decided_by = planner.execute([Stage("exa_search", exa), Stage("s3_folder_listing", folder_missing)])
+    assert decided_by == "s3_folder_listing"
+    assert calls == ["s3_folder_listing"]
+    metrics = planner.get_metrics()
+    assert metrics["exa_search"]["skipped"] == 1
+    assert metrics["s3_folder_listing"]["short_circuits"] == 1
+
+
+def test_all_stages_run_without_short_circuit():
+    """测试未短路时所有阶段按顺序执行"""
+    planner = make_planner()
+    calls = []
+    decided_by = planner.execute([
+        Stage("exa_search", lambda: calls.append("exa_search") or False),
+        Stage("s3_folder_listing", lambda: calls.append("s3_folder_listing") or False)
+    ])
+    assert decided_by is None
+    assert calls == ["s3_folder_listing", "exa_search"]
+    assert planner.get_metrics()["exa_search"]["runs"] == 1
+
+
+def test_short_circuit_rate_adapts():
+    """测试短路概率随观测结果更新，并影响排序"""
+    planner = StagePlanner(smoothing=0.5)
+    planner.register("a", cost=1.0, short_circuit_rate=0.5)
+    planner.register("b", cost=1.5, short_circuit_rate=0.5)
+    assert planner.order(["a", "b"]) == ["a", "b"]
+    for _ in range(5):
+        planner.record_run("a", False, 0.01)
+        planner.record_run("b", True, 0.01)
+    assert planner.order(["a", "b"]) == ["b", "a"]
+
+
+def main():
+    """主函数"""
+    print("=" * 60)
+    print("预审阶段规划模块测试")
+    print("=" * 60)
+
+    tests = [
+        test_cheap_stage_ordered_first,
+        test_short_circuit_skips_paid_stage,
+        test_all_stages_run_without_short_circuit,
+        test_short_circuit_rate_adapts
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__doc__}")
+
+    print("\n✨ 测试完成！")
+
+
+if __name__ == "__main__":
+    main()
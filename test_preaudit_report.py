@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+测试结构化预审结果和报告渲染模块
+不依赖 AWS 或 EXA，可离线运行
+"""
+
+import json
+from preaudit_result import (
+    OUTCOME_DIRECT_PASS,
+    OUTCOME_DOCUMENTS_INSUFFICIENT_UNVERIFIED,
+    OUTCOME_EXA_FAILED_DOCUMENTS_OK,
+    OUTCOME_EXA_VERIFIED_INSUFFICIENT,
+    OUTCOME_INCOMPLETE,
+    OUTCOME_S3_ERROR,
+    VERDICT_FAIL,
+    VERDICT_PARTIAL_PASS,
+    VERDICT_PASS,
+    FolderInfo,
+    PreauditResult
+)
+from preaudit_report import get_report_styles, register_report_template
+
+
+def _folder(file_count=3, error=None):
+    return FolderInfo(
+        prefix="张三-北京协和医院-心内科/",
+        name="张三-北京协和医院-心内科",
+        folder_type="讲者专属文件夹",
+        exists=error is None,
+        file_count=file_count,
+        files=[f"doc{i}.pdf" for i in range(file_count)],
+        error=error
+    )
+
+
+def test_outcome_determines_verdict_and_headline():
+    """测试结果类型决定结论和标题"""
+    result = PreauditResult.create(OUTCOME_DIRECT_PASS, folder=_folder(), min_file_count=1)
+    assert result.verdict == VERDICT_PASS
+    assert result.passed
+    assert result.file_count == 3
+    assert "预审通过" in result.headline
+
+    partial = PreauditResult.create(OUTCOME_EXA_FAILED_DOCUMENTS_OK, folder=_folder())
+    assert partial.verdict == VERDICT_PARTIAL_PASS
+    assert not partial.passed
+
+    failed = PreauditResult.create(OUTCOME_S3_ERROR, folder=_folder(0, error="AccessDenied"))
+    assert failed.verdict == VERDICT_FAIL
+    assert failed.headline.endswith("AccessDenied")
+
+    # 文档不足且未执行身份验证，与“身份验证通过但文档不足”是不同的结果类型
+    unverified = PreauditResult.create(OUTCOME_DOCUMENTS_INSUFFICIENT_UNVERIFIED, folder=_folder(2),
+                                       min_file_count=3, suggestions=["补充文档"])
+    verified = PreauditResult.create(OUTCOME_EXA_VERIFIED_INSUFFICIENT, folder=_folder(2), min_file_count=3)
+    assert unverified.verdict == verified.verdict == VERDICT_FAIL
+    assert unverified.headline != verified.headline and "尚未验证" in unverified.headline
+    report = unverified.render()
+    assert "当前2个，需要超过3个" in report and "未执行讲者身份网络验证" in report
+
+
+def test_to_dict_is_compact_json():
+    """测试结构化结果可直接序列化且不包含渲染报告"""
+    result = PreauditResult.create(OUTCOME_DIRECT_PASS, folder=_folder(), min_file_count=1,
+                                   extraction={"name": "张三"})
+    result.render()
+    data = result.to_dict()
+    assert "_rendered" not in data
+    assert data["folder"]["file_count"] == 3
+    assert json.loads(json.dumps(data, ensure_ascii=False))["extraction"]["name"] == "张三"
+
+
+def test_render_is_lazy_and_cached():
+    """测试报告只在首次请求时渲染并按样式缓存"""
+    result = PreauditResult.create(OUTCOME_DIRECT_PASS, folder=_folder(), min_file_count=1)
+    assert result._rendered == {}
+    report = result.render()
+    assert report.startswith(result.headline)
+    assert "doc0.pdf" in report
+    assert result.render() is report
+    assert str(result) is report
+
+
+def test_brief_style_and_custom_template():
+    """测试简要样式和自定义模板"""
+    result = PreauditResult.create(OUTCOME_INCOMPLETE, folder=_folder(),
+                                   reasons=["超出时间预算"],
+                                   deadline={"stage": "exa_search", "budget_seconds": 5})
+    brief = result.render("brief")
+    assert brief.splitlines()[0] == result.headline
+    assert "- 超出时间预算" in brief
+    assert "brief" in get_report_styles()
+
+    register_report_template(OUTCOME_INCOMPLETE, lambda r: f"[{r.verdict}] {r.deadline['stage']}", style="test")
+    assert result.render("test") == "[incomplete] exa_search"
+
+    # 未注册的样式回退到默认模板
+    assert result.render("unknown") == result.render("default")
+
+
+def main():
+    """主函数"""
+    print("=" * 60)
+    print("结构化预审结果测试")
+    print("=" * 60)
+
+    tests = [
+        test_outcome_determines_verdict_and_headline,
+        test_to_dict_is_compact_json,
+        test_render_is_lazy_and_cached,
+        test_brief_style_and_custom_template
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__doc__}")
+
+    print("\n✨ 测试完成！")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+测试性能剖析模块
+不依赖 AWS 或 EXA，可离线运行
+"""
+
+import os
+import tempfile
+import time
+from profiling import MODE_CPROFILE, MODE_SAMPLING, Profiler
+
+
+def _busy(seconds):
+    end = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < end:
+        total += 1
+    return total
+
+
+def test_spans_form_request_tree():
+    """测试嵌套 span 组成请求的阶段路径，未剖析的请求不保留结果"""
+    profiler = Profiler()
+    with profiler.request("perform_preaudit"):
+        with profiler.span("extraction"):
+            time.sleep(0.01)
+        with profiler.span("s3_list"):
+            with profiler.span("logging"):
+                pass
+    assert profiler.get_profiles() == []
+
+    spans = profiler.get_metrics()["spans"]
+    assert set(spans) == {"perform_preaudit", "extraction", "s3_list", "logging"}
+    assert spans["extraction"]["avg_ms"] >= 10
+
+
+def test_armed_cprofile_request():
+    """测试按需剖析下一个请求并导出 collapsed-stack"""
+    profiler = Profiler()
+    profiler.configure(mode=MODE_CPROFILE)
+    assert profiler.arm() == 1
+    with profiler.request("perform_preaudit"):
+        with profiler.span("extraction"):
+            _busy(0.02)
+    with profiler.request("perform_preaudit"):
+        pass
+
+    profiles = profiler.get_profiles()
+    assert len(profiles) == 1 and profiler.get_metrics()["armed"] == 0
+    summary = profiles[0]
+    assert summary["mode"] == MODE_CPROFILE
+    assert [span["path"] for span in summary["spans"]] == ["perform_preaudit;extraction", "perform_preaudit"]
+
+    collapsed = profiler.get_profile(summary["id"]).to_collapsed()
+    lines = collapsed.splitlines()
+    assert lines and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any("_busy (test_profiling.py" in line for line in lines)
+
+
+def test_sampling_mode_and_output_dir():
+    """测试栈采样模式和剖析结果文件输出"""
+    with tempfile.TemporaryDirectory() as tmp:
+        profiler = Profiler()
+        profiler.configure(mode=MODE_SAMPLING, sample_rate=1.0, sampling_interval_ms=1, output_dir=tmp)
+        with profiler.request("check_string_content"):
+            _busy(0.05)
+
+        summary = profiler.get_profiles()[0]
+        assert summary["mode"] == MODE_SAMPLING
+        collapsed = profiler.get_profile(summary["id"]).to_collapsed()
+        assert "_busy" in collapsed
+        files = os.listdir(tmp)
+        assert files == [f"check_string_content-{summary['id']}.collapsed"]
+
+
+def test_disabled_profiler_records_nothing():
+    """测试关闭后不记录 span"""
+    profiler = Profiler()
+    profiler.configure(enabled=False, sample_rate=1.0)
+    with profiler.request("perform_preaudit"):
+        with profiler.span("extraction"):
+            pass
+    assert profiler.get_metrics()["spans"] == {}
+    assert profiler.get_profiles() == []
+
+
+def main():
+    """主函数"""
+    print("=" * 60)
+    print("性能剖析模块测试")
+    print("=" * 60)
+
+    tests = [
+        test_spans_form_request_tree,
+        test_armed_cprofile_request,
+        test_sampling_mode_and_output_dir,
+        test_disabled_profiler_records_nothing
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__doc__}")
+
+    print("\n✨ 测试完成！")
+
+
+if __name__ == "__main__":
+    main()
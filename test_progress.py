@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+测试预审进度上报和批量预审的逐条结果通知
+MCP 端到端测试使用基准测试替身服务（需要安装 mcp 和 boto3），不访问 AWS 或 EXA
+"""
+
+import asyncio
+import json
+import threading
+from progress import PREAUDIT_PROGRESS_STAGES, progress_reporting, report_progress
+
+
+def test_reporter_numbering_and_callback_errors():
+    """测试进度按完成顺序编号，回调失败不影响后续上报"""
+    received = []
+
+    def callback(progress, total, message):
+        received.append((progress, total, json.loads(message)))
+        if progress == 1:
+            raise RuntimeError("客户端已断开")
+
+    report_progress("extraction", name="张三")  # 没有上报范围时不做任何事
+    with progress_reporting(callback, total=3) as reporter:
+        report_progress("extraction", name="张三")
+        report_progress("folder_check", file_count=4)
+    report_progress("identity_verification", passed=True)
+
+    assert [(p, t) for p, t, _ in received] == [(1, 3), (2, 3)]
+    assert received[0][2] == {"stage": "extraction", "data": {"name": "张三"}}
+    assert [event["stage"] for event in reporter.events] == ["extraction", "folder_check"]
+
+
+def test_scope_propagates_to_worker_threads():
+    """测试上报范围随 asyncio.to_thread 传递到工作线程，并发请求互不干扰"""
+    async def request(name):
+        events = []
+        with progress_reporting(lambda p, t, m: events.append(json.loads(m)["data"]["name"])):
+            await asyncio.to_thread(report_progress, "extraction", name=name)
+        return events
+
+    async def scenario():
+        return await asyncio.gather(request("张三"), request("李四"))
+
+    assert asyncio.run(scenario()) == [["张三"], ["李四"]]
+
+    # 普通线程不继承上报范围
+    with progress_reporting(lambda p, t, m: None) as reporter:
+        worker = threading.Thread(target=report_progress, args=("extraction",))
+        worker.start()
+        worker.join()
+    assert reporter.events == []
+
+
+def test_preaudit_progress_and_batch_over_mcp():
+    """测试 perform_preaudit 逐阶段发送进度通知，批量预审逐条发送结果"""
+    from benchmark_preaudit import BenchmarkEnvironment
+    from mcp.shared.memory import create_connected_server_and_client_session
+
+    with BenchmarkEnvironment(doctors=3, files_per_folder=5) as env:
+        import mcp_server
+        submissions = [env.submission(doctor) for doctor in env.doctors[:3]]
+
+        async def scenario():
+            stage_events, item_events = [], []
+
+            async def on_stage(progress, total, message):
+                stage_events.append((progress, total, json.loads(message)))
+
+            async def on_item(progress, total, message):
+                item_events.append((progress, total, json.loads(message)))
+
+            async with create_connected_server_and_client_session(mcp_server.server) as client:
+                single = await client.call_tool("perform_preaudit",
+                                                {"user_input": submissions[0], "output_format": "json"},
+                                                progress_callback=on_stage)
+                batch = await client.call_tool("perform_preaudit_batch",
+                                               {"items": submissions, "max_concurrency": 2},
+                                               progress_callback=on_item)
+            return single, stage_events, batch, item_events
+
+        single, stage_events, batch, item_events = env.run_async(scenario())
+
+    assert json.loads(single.content[0].text)["verdict"] == "pass"
+    assert sorted(event["stage"] for _, _, event in stage_events) == sorted(PREAUDIT_PROGRESS_STAGES)
+    assert [progress for progress, _, _ in stage_events] == [1, 2, 3]
+    extraction = next(event["data"] for _, _, event in stage_events if event["stage"] == "extraction")
+    assert extraction["extraction"]["name"] == env.doctors[0]["name"]
+
+    summary = json.loads(batch.content[0].text)
+    assert summary["count"] == 3 and summary["verdicts"] == {"pass": 3}
+    assert [item["index"] for item in summary["results"]] == [0, 1, 2]
+    assert [progress for progress, _, _ in item_events] == [1, 2, 3]
+    assert all(total == 3 for _, total, _ in item_events)
+    assert sorted(event["index"] for _, _, event in item_events) == [0, 1, 2]
+
+
+def main():
+    """主函数"""
+    print("=" * 60)
+    print("预审进度上报测试")
+    print("=" * 60)
+
+    tests = [
+        test_reporter_numbering_and_callback_errors,
+        test_scope_propagates_to_worker_threads,
+        test_preaudit_progress_and_batch_over_mcp
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__doc__}")
+
+    print("\n✨ 测试完成！")
+
+
+if __name__ == "__main__":
+    main()
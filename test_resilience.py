@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+测试外部依赖弹性调用模块（重试退避、熔断器、令牌桶）
+不依赖 AWS 或 EXA，可离线运行
+"""
+
+import asyncio
+import time
+from resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    DependencyGuard,
+    RateLimitExceeded,
+    RetryPolicy,
+    ThrottlingError,
+    TokenBucket,
+    is_dependency_failure,
+    is_throttling_error
+)
+
+
+class FakeClientError(Exception):
+    """模拟 botocore ClientError 的响应结构"""
+
+    def __init__(self, code, status=400):
+        super().__init__(code)
+        self.response = {'Error': {'Code': code}, 'ResponseMetadata': {'HTTPStatusCode': status}}
+
+
+class ReadTimeoutError(Exception):
+    """模拟 botocore 的读取超时"""
+
+
+def test_is_throttling_error():
+    """测试限流错误识别"""
+    assert is_throttling_error(ThrottlingError("429"))
+    assert is_throttling_error(FakeClientError('ThrottlingException'))
+    assert not is_throttling_error(FakeClientError('ValidationException'))
+    assert not is_throttling_error(ValueError("bad input"))
+
+
+def test_retry_on_throttling_then_success():
+    """测试限流错误会退避重试，成功后返回结果"""
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise ThrottlingError("slow down")
+        return "ok"
+
+    guard = DependencyGuard("test", retry_policy=RetryPolicy(max_attempts=3, base_delay=0.001, max_delay=0.002))
+    assert guard.call(flaky) == "ok"
+    metrics = guard.get_metrics()
+    assert metrics["retries"] == 2
+    assert metrics["throttled"] == 2
+    assert metrics["successes"] == 1
+
+
+def test_non_retryable_error_not_retried():
+    """测试非限流错误不重试"""
+    calls = []
+
+    def broken():
+        calls.append(1)
+        raise ValueError("bad request")
+
+    guard = DependencyGuard("test", retry_policy=RetryPolicy(max_attempts=3, base_delay=0.001))
+    try:
+        guard.call(broken)
+        assert False, "应抛出 ValueError"
+    except ValueError:
+        pass
+    assert len(calls) == 1
+
+
+def test_breaker_counts_only_dependency_failures():
+    """测试只有依赖故障计入熔断：客户端错误和被调用方时间预算缩短的超时不打开熔断器"""
+    assert is_dependency_failure(FakeClientError('InternalServerException', 500))
+    assert is_dependency_failure(ReadTimeoutError("read timeout"))
+    assert is_dependency_failure(ConnectionResetError())
+    assert not is_dependency_failure(FakeClientError('ValidationException'))
+    assert not is_dependency_failure(FakeClientError('AccessDeniedException', 403))
+
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=60)
+    guard = DependencyGuard("test", retry_policy=RetryPolicy(max_attempts=3, base_delay=0.001), breaker=breaker)
+
+    def fail_with(error):
+        def func():
+            raise error
+        return func
+
+    for error, budget_limited in ((FakeClientError('ValidationException'), False),
+                                  (FakeClientError('AccessDeniedException', 403), False),
+                                  (ReadTimeoutError("read timeout"), True)):
+        try:
+            guard.call(fail_with(error), budget_limited=budget_limited)
+            assert False, "应抛出原异常"
+        except type(error):
+            pass
+    assert breaker.state == CircuitBreaker.CLOSED
+    metrics = guard.get_metrics()
+    assert metrics["budget_timeouts"] == 1 and metrics["retries"] == 0
+
+    # 依赖自身的超时（未被时间预算缩短）计入熔断
+    try:
+        guard.call(fail_with(ReadTimeoutError("read timeout")))
+    except ReadTimeoutError:
+        pass
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_circuit_breaker_opens_and_recovers():
+    """测试熔断器打开后快速失败，冷却后半开恢复"""
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=0.05)
+    guard = DependencyGuard("test", retry_policy=RetryPolicy(max_attempts=1), breaker=breaker)
+
+    def down():
+        raise ThrottlingError("down")
+
+    for _ in range(2):
+        try:
+            guard.call(down)
+        except ThrottlingError:
+            pass
+
+    assert breaker.state == CircuitBreaker.OPEN
+    try:
+        guard.call(lambda: "never")
+        assert False, "熔断打开时应快速失败"
+    except CircuitOpenError:
+        pass
+    assert guard.get_metrics()["short_circuited"] == 1
+
+    time.sleep(0.06)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert guard.call(lambda: "recovered") == "recovered"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_token_bucket_limits_rate():
+    """测试令牌桶突发容量和等待超时"""
+    bucket = TokenBucket(rate=10, capacity=2)
+    assert bucket.acquire() == 0.0
+    assert bucket.acquire() == 0.0
+    waited = bucket.acquire(timeout=1)
+    assert waited > 0
+
+    slow_bucket = TokenBucket(rate=0.1, capacity=1)
+    slow_bucket.acquire()
+    try:
+        slow_bucket.acquire(timeout=0.01)
+        assert False, "应抛出 RateLimitExceeded"
+    except RateLimitExceeded:
+        pass
+
+
+def test_limiter_wait_reported_in_metrics():
+    """测试限流等待时间计入指标"""
+    guard = DependencyGuard("test", limiter=TokenBucket(rate=50, capacity=1))
+    guard.call(lambda: None)
+    guard.call(lambda: None)
+    metrics = guard.get_metrics()
+    assert metrics["limiter_wait_total"] > 0
+    assert metrics["breaker"]["state"] == CircuitBreaker.CLOSED
+
+
+def test_async_call_retries_and_limits():
+    """测试异步调用的退避重试、熔断计数和令牌等待与同步版本一致"""
+    calls = []
+
+    async def flaky():
+        calls.append(1)
+        if len(calls) < 2:
+            raise ThrottlingError("slow down")
+        return "ok"
+
+    async def broken():
+        raise FakeClientError('InternalServerException', 500)
+
+    guard = DependencyGuard("test", retry_policy=RetryPolicy(max_attempts=3, base_delay=0.001, max_delay=0.002),
+                            breaker=CircuitBreaker(failure_threshold=2, recovery_timeout=60))
+    assert asyncio.run(guard.call_async(flaky)) == "ok"
+    assert guard.get_metrics()["retries"] == 1
+    for _ in range(2):
+        try:
+            asyncio.run(guard.call_async(broken))
+            assert False, "应抛出 FakeClientError"
+        except FakeClientError:
+            pass
+    try:
+        asyncio.run(guard.call_async(flaky))
+        assert False, "熔断器应已打开"
+    except CircuitOpenError:
+        pass
+
+    bucket = TokenBucket(rate=50, capacity=1)
+
+    async def acquire_twice():
+        await bucket.acquire_async()
+        return await bucket.acquire_async()
+
+    assert asyncio.run(acquire_twice()) > 0
+
+
+def main():
+    """主函数"""
+    print("=" * 60)
+    print("弹性调用模块测试")
+    print("=" * 60)
+
+    tests = [
+        test_is_throttling_error,
+        test_retry_on_throttling_then_success,
+        test_non_retryable_error_not_retried,
+        test_breaker_counts_only_dependency_failures,
+        test_circuit_breaker_opens_and_recovers,
+        test_token_bucket_limits_rate,
+        test_limiter_wait_reported_in_metrics,
+        test_async_call_retries_and_limits
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__doc__}")
+
+    print("\n✨ 测试完成！")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+测试 S3 对象事件消费：S3 事件通知 / SNS / EventBridge 消息解析、本地文件事件源的确认和重新投递、
+按对象事件增量更新讲者登记表（文档数量、重复文档、文档类型）、较旧事件忽略、队列处理完后延长有效期，
+以及全量刷新不覆盖刷新期间由事件更新的文件夹
+解析和登记表测试可离线运行；集成测试使用基准测试替身服务（需要安装 boto3）
+"""
+
+import json
+import os
+import tempfile
+import time
+from urllib.parse import quote_plus
+from s3_events import EventConsumer, FileEventSource, MemoryEventSource, SqsEventSource, parse_event_message
+from speaker_registry import SpeakerRegistry
+
+BUCKET = "bucket"
+ZHANG = "张三-北京协和医院-心内科/"
+DAY = 86400.0
+
+
+def s3_notification(key: str, event_name: str = "ObjectCreated:Put", etag: str = "", size: int = 100,
+                    sequencer: str = "0055AED6DCD90281E5", bucket: str = BUCKET) -> dict:
+    obj = {"key": key, "size": size, "sequencer": sequencer}
+    if etag:
+        obj["eTag"] = etag
+    return {"Records": [{"eventName": event_name, "s3": {"bucket": {"name": bucket}, "object": obj}}]}
+
+
+def created(key: str, etag: str, sequencer: str = "0055AED6DCD90281E5") -> dict:
+    return s3_notification(quote_plus(key, safe="/"), etag=etag, sequencer=sequencer)
+
+
+def removed(key: str, sequencer: str = "0055AED6DCD90281F0") -> dict:
+    return s3_notification(quote_plus(key, safe="/"), "ObjectRemoved:Delete", size=0, sequencer=sequencer)
+
+
+def count_by_etag(prefix, objects):
+    """按 ETag 统计唯一文档（与文件夹索引不读取内容时的判断相同）"""
+    groups = {}
+    for obj in objects:
+        groups.setdefault(obj["etag"], []).append(obj["key"])
+    duplicates = [{"keys": sorted(keys)} for keys in groups.values() if len(keys) > 1]
+    return {"unique_file_count": len(groups), "duplicate_groups": duplicates}
+
+
+def registry_in(directory: str, **kwargs) -> SpeakerRegistry:
+    return SpeakerRegistry(enabled=True, path=os.path.join(directory, "registry.db"), **kwargs)
+
+
+def consumer_for(registry: SpeakerRegistry, source, **kwargs) -> EventConsumer:
+    def handle(event):
+        return registry.apply_object_event(event.bucket, event.key, event.removed, etag=event.etag,
+                                           size=event.size, sequencer=event.sequencer,
+                                           count_documents=count_by_etag)
+    return EventConsumer(source, handle, on_drained=lambda: registry.mark_events_drained(BUCKET),
+                         wait_seconds=0, **kwargs)
+
+
+def verified(name, hospital, department):
+    return {"success": True, "verification_passed": True, "match_score": 7, "total_results": 5,
+            "matched_results": []}
+
+
+def test_parse_event_formats():
+    """测试解析 S3 事件通知（对象键 URL 解码）、SNS 转发的通知和 EventBridge 事件，测试事件和无关事件忽略"""
+    events = parse_event_message(json.dumps(s3_notification("%E5%BC%A0%E4%B8%89-a/my+file.pdf", etag="abc")))
+    assert len(events) == 1
+    assert (events[0].key, events[0].kind, events[0].etag) == ("张三-a/my file.pdf", "created", "abc")
+
+    sns = {"Type": "Notification", "Message": json.dumps(s3_notification("a/b.pdf", "ObjectRemoved:Delete"))}
+    assert parse_event_message(json.dumps(sns))[0].removed
+
+    eventbridge = {"detail-type": "Object Created", "source": "aws.s3",
+                   "detail": {"bucket": {"name": BUCKET}, "object": {"key": "a/c.pdf", "size": 5, "etag": "e1",
+                                                                     "sequencer": "01"}}}
+    event = parse_event_message(eventbridge)[0]
+    assert (event.bucket, event.key, event.size, event.sequencer) == (BUCKET, "a/c.pdf", 5, "01")
+
+    assert parse_event_message('{"Service": "Amazon S3", "Event": "s3:TestEvent"}') == []
+    assert parse_event_message(s3_notification("a/d.pdf", "ObjectRestore:Completed")) == []
+    assert parse_event_message(s3_notification("a/e.pdf", "LifecycleExpiration:Delete"))[0].removed
+    try:
+        parse_event_message("not json")
+        assert False, "应抛出 ValueError"
+    except ValueError:
+        pass
+
+
+def test_file_source_redelivers_unacked_messages():
+    """测试本地文件事件源只读取完整的行，确认后才推进读取位置，处理失败的消息下次重新读取"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "events.jsonl")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(created(f"{ZHANG}a.pdf", "e1")) + "\n\n")
+            f.write(json.dumps(created(f"{ZHANG}b.pdf", "e2")) + "\n")
+            f.write('{"Records": [')
+        source = FileEventSource(path)
+        handled, failing = [], {f"{ZHANG}b.pdf"}
+
+        def handle(event):
+            if event.key in failing:
+                raise IOError("database is locked")
+            handled.append(event.key)
+            return "updated"
+
+        consumer = EventConsumer(source, handle, wait_seconds=0)
+        assert consumer.poll_once() == 2 and handled == [f"{ZHANG}a.pdf"]
+        metrics = consumer.get_metrics()
+        assert metrics["failed"] == 1 and metrics["last_drained_at"] is None
+
+        failing.clear()
+        assert consumer.poll_once() == 1 and handled == [f"{ZHANG}a.pdf", f"{ZHANG}b.pdf"]
+        assert consumer.poll_once() == 0
+
+        # 追加完未写完的行后读取；无法解析的消息确认后不再重试
+        with open(path, "a", encoding="utf-8") as f:
+            f.write("]}\nnot json\n")
+        assert consumer.drain() == 2
+        metrics = consumer.get_metrics()
+        assert metrics["malformed"] == 1 and metrics["events"] == 2 and metrics["source"] == "file"
+
+
+class FakeSqsClient:
+    """SQS 客户端替身：按脚本返回接收结果和队列属性"""
+
+    def __init__(self):
+        self.batches = []
+        self.attributes = {"ApproximateNumberOfMessages": "0", "ApproximateNumberOfMessagesNotVisible": "0",
+                           "ApproximateNumberOfMessagesDelayed": "0"}
+        self.deleted = []
+
+    def receive_message(self, **kwargs):
+        return {"Messages": self.batches.pop(0)} if self.batches else {}
+
+    def get_queue_attributes(self, QueueUrl, AttributeNames):
+        return {"Attributes": {name: self.attributes[name] for name in AttributeNames}}
+
+    def delete_message_batch(self, QueueUrl, Entries):
+        self.deleted.extend(entry["ReceiptHandle"] for entry in Entries)
+        return {"Successful": Entries}
+
+
+def test_drained_only_when_queue_empty():
+    """测试只有空的接收、队列中没有可见或处理中的消息、处理失败的消息都已重新处理成功时才认为队列已处理完"""
+    client = FakeSqsClient()
+    source = SqsEventSource(lambda: client, "https://sqs.example/queue")
+    failing = {f"{ZHANG}b.pdf"}
+    drained = []
+
+    def handle(event):
+        if event.key in failing:
+            raise IOError("database is locked")
+        return "updated"
+
+    def message(message_id, key):
+        return {"MessageId": message_id, "ReceiptHandle": f"r-{message_id}", "Body": json.dumps(created(key, "e"))}
+
+    consumer = EventConsumer(source, handle, on_drained=lambda: drained.append(1), wait_seconds=0)
+    # 短批次不代表队列已处理完
+    client.batches = [[message("m1", f"{ZHANG}a.pdf"), message("m2", f"{ZHANG}b.pdf")], []]
+    assert consumer.poll_once() == 2 and drained == []
+    # 处理失败的消息在可见性超时前不可见：接收为空、队列属性中只有处理中的消息
+    client.attributes["ApproximateNumberOfMessagesNotVisible"] = "1"
+    assert consumer.poll_once() == 0 and drained == []
+    client.attributes["ApproximateNumberOfMessagesNotVisible"] = "0"
+    assert consumer.poll_once() == 0 and drained == []
+    assert consumer.get_metrics()["unresolved"] == 1
+
+    failing.clear()
+    client.batches = [[message("m2", f"{ZHANG}b.pdf")]]
+    assert consumer.poll_once() == 1 and drained == []
+    assert consumer.poll_once() == 0 and drained == [1]
+    assert client.deleted == ["r-m1", "r-m2"]
+    assert consumer.get_metrics()["last_drained_at"] is not None
+
+
+def test_events_update_registry_incrementally():
+    """测试对象事件增量更新文件夹的文档数量、重复文档和文档类型；清空的文件夹删除，较旧和重复的事件忽略"""
+    with tempfile.TemporaryDirectory() as directory:
+        registry = registry_in(directory)
+        source = MemoryEventSource()
+        consumer = consumer_for(registry, source)
+        for message in (created(f"{ZHANG}执业证书.pdf", "e1"), created(f"{ZHANG}简历.docx", "e2"),
+                        created(f"{ZHANG}简历 副本.docx", "e2"), created("README.txt", "e9"),
+                        created("张三-北京协和医院-心内科/", "")):
+            source.publish(message)
+        assert consumer.drain() == 5
+        record = registry.get(BUCKET, ZHANG)
+        assert (record.file_count, record.unique_file_count) == (3, 2)
+        assert record.duplicate_groups == [{"keys": [f"{ZHANG}简历 副本.docx", f"{ZHANG}简历.docx"]}]
+        assert record.documents["formats"] == {"pdf": 1, "docx": 2}
+        assert record.verified_at is None and record.objects[0]["etag"] == '"e1"'
+        assert consumer.get_metrics()["outcomes"] == {"created": 1, "updated": 2, "ignored": 2}
+
+        # 较旧的事件（sequencer 较小）和重复投递的事件不生效
+        source.publish(removed(f"{ZHANG}简历 副本.docx", sequencer="0055AED6DCD90281A0"))
+        source.publish(created(f"{ZHANG}执业证书.pdf", "e1"))
+        consumer.drain()
+        assert registry.get(BUCKET, ZHANG).file_count == 3
+
+        source.publish(removed(f"{ZHANG}简历 副本.docx"))
+        consumer.drain()
+        record = registry.get(BUCKET, ZHANG)
+        assert (record.file_count, record.unique_file_count, record.duplicate_groups) == (2, 2, [])
+
+        source.publish(removed(f"{ZHANG}执业证书.pdf"))
+        source.publish(removed(f"{ZHANG}简历.docx"))
+        consumer.drain()
+        assert registry.get(BUCKET, ZHANG) is None and source.acked == 10
+
+
+def test_drained_queue_extends_freshness():
+    """测试队列处理完后登记表记录的有效期从处理完的时间起算；缺少对象列表的旧记录收到事件后标记为过期"""
+    with tempfile.TemporaryDirectory() as directory:
+        registry = registry_in(directory, max_age_seconds=DAY)
+        listing = [{"key": f"{ZHANG}a.pdf", "etag": '"e1"', "size": 100}]
+        start = time.time() - 3 * DAY
+        registry.refresh(BUCKET, listing, verified, count_by_etag, rate_per_second=0, now=start)
+        text = "张三医生，北京协和医院心内科"
+        assert registry.lookup(BUCKET, text) is None
+
+        consumer = consumer_for(registry, MemoryEventSource())
+        consumer.drain()
+        assert registry.lookup(BUCKET, text).folder == ZHANG
+        assert registry.get_metrics()["stale"] == 1
+
+        # 早期版本写入的记录没有对象列表，无法增量更新
+        record = registry.get(BUCKET, ZHANG)
+        record.objects = []
+        registry.upsert([record])
+        assert registry.apply_object_event(BUCKET, f"{ZHANG}b.pdf", False, etag="e2") == "invalidated"
+        assert registry.lookup(BUCKET, text) is None
+
+
+def test_refresh_keeps_newer_event_updates():
+    """测试全量刷新不覆盖刷新开始后由对象事件更新的文件夹，也不删除刷新期间新建的文件夹"""
+    with tempfile.TemporaryDirectory() as directory:
+        registry = registry_in(directory)
+        listing = [{"key": f"{ZHANG}a.pdf", "etag": '"e1"', "size": 100}]
+        registry.refresh(BUCKET, listing, verified, count_by_etag, rate_per_second=0)
+
+        # 刷新开始时列出的内容较旧：在此之后上传的文件由事件更新
+        refresh_started = time.time()
+        registry.apply_object_event(BUCKET, f"{ZHANG}b.pdf", False, etag="e2", count_documents=count_by_etag,
+                                    now=refresh_started + 1)
+        registry.apply_object_event(BUCKET, "李四-华西医院-肿瘤科/a.pdf", False, etag="e3",
+                                    now=refresh_started + 1)
+        stats = registry.refresh(BUCKET, listing, verified, count_by_etag, rate_per_second=0, now=refresh_started)
+        assert stats.removed == 0
+        record = registry.get(BUCKET, ZHANG)
+        assert record.file_count == 2 and record.verification_passed is True
+        assert registry.get(BUCKET, "李四-华西医院-肿瘤科/").file_count == 1
+
+
+def test_event_consumer_updates_preaudit():
+    """测试开启 [EVENTS] 后服务内的消费者读取本地事件文件，预审命中登记表时使用事件更新后的文档数量"""
+    from benchmark_fakes import doctor_folder_prefix
+    from benchmark_preaudit import BENCHMARK_BUCKET, BenchmarkEnvironment
+    from config_service import get_config_service
+    from s3_events import get_event_consumer, stop_event_consumer
+
+    with BenchmarkEnvironment(doctors=2, files_per_folder=4) as env, tempfile.TemporaryDirectory() as directory:
+        doctor = env.doctors[0]
+        prefix = doctor_folder_prefix(doctor)
+        events_path = os.path.join(directory, "events.jsonl")
+        get_config_service().set_overrides("registry", path=os.path.join(directory, "registry.db"), enabled=True)
+        assert env.tools.refresh_speaker_registry(BENCHMARK_BUCKET)["success"]
+        before = env.tools.run_preaudit(env.submission(doctor))
+
+        env.tools.start_event_consumer()
+        assert get_event_consumer() is None
+        get_config_service().set_overrides("events", enabled=True, source="file", file_path=events_path,
+                                           idle_seconds=0.05)
+        try:
+            consumer = get_event_consumer()
+            assert consumer is not None and consumer.running
+            notification = s3_notification(f"{prefix}新增证书.pdf", etag="new", bucket=BENCHMARK_BUCKET)
+            with open(events_path, "w", encoding="utf-8") as f:
+                f.write(json.dumps(notification) + "\n")
+            deadline = time.time() + 5
+            while consumer.get_metrics()["events"] < 1 and time.time() < deadline:
+                time.sleep(0.05)
+
+            calls = env.call_counts()
+            after = env.tools.run_preaudit(f"{doctor['name']}医生，{doctor['hospital']}{doctor['department']}")
+            assert env.call_counts() == calls
+            assert after.file_count == before.file_count + 1
+
+            # 存储桶变化后消费者按新配置重新启动
+            get_config_service().set_overrides("s3", bucket_name="other-bucket")
+            restarted = get_event_consumer()
+            assert restarted is not consumer and restarted.running and not consumer.running
+        finally:
+            get_config_service().set_overrides("s3", bucket_name=BENCHMARK_BUCKET)
+            get_config_service().set_overrides("events", enabled=False)
+            stop_event_consumer()
+
+
+def main():
+    """主函数"""
+    print("=" * 60)
+    print("S3 对象事件消费测试")
+    print("=" * 60)
+
+    tests = [
+        test_parse_event_formats,
+        test_file_source_redelivers_unacked_messages,
+        test_drained_only_when_queue_empty,
+        test_events_update_registry_incrementally,
+        test_drained_queue_extends_freshness,
+        test_refresh_keeps_newer_event_updates,
+        test_event_consumer_updates_preaudit
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__doc__}")
+
+    print("\n✨ 测试完成！")
+
+
+if __name__ == "__main__":
+    main()
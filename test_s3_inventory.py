@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+测试 S3 Inventory 清单导入：查找最新的完整清单、流式分块解析 gzip CSV（URL 编码的对象键、旧版本和删除标记）、
+数据文件校验、清单之后新建和删除的顶层文件夹，以及讲者登记表按清单刷新时的 LIST 调用数量
+清单解析测试可离线运行；刷新集成测试使用基准测试替身服务（需要安装 boto3）
+"""
+
+import csv
+import gzip
+import hashlib
+import io
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timezone
+from urllib.parse import quote_plus
+from benchmark_fakes import FakeS3Client
+from s3_inventory import (
+    PYARROW_AVAILABLE,
+    InventoryError,
+    InventoryReader,
+    InventoryStats,
+    list_top_level_folders
+)
+from speaker_registry import SpeakerRegistry
+
+SOURCE = "speaker-docs"
+DESTINATION = "inventory-reports"
+PREFIX = f"inventory/{SOURCE}/daily"
+SCHEMA = "Bucket, Key, VersionId, IsLatest, IsDeleteMarker, Size, LastModifiedDate, ETag"
+ZHANG = "张三-北京协和医院-心内科/"
+LI = "李四-华西医院-肿瘤科/"
+WANG = "王五-湘雅医院-呼吸科/"
+
+
+def csv_data_file(rows, bucket: str = SOURCE) -> bytes:
+    """rows: (key, size, etag[, is_latest, is_delete_marker])"""
+    text = io.StringIO()
+    writer = csv.writer(text, quoting=csv.QUOTE_ALL)
+    for row in rows:
+        key, size, etag = row[:3]
+        is_latest, is_delete_marker = row[3:] if len(row) > 3 else ("true", "false")
+        writer.writerow([bucket, quote_plus(key, safe="/"), "", is_latest, is_delete_marker, size,
+                         "2024-01-01T00:00:00.000Z", etag])
+    return gzip.compress(text.getvalue().encode("utf-8"))
+
+
+def write_inventory(client: FakeS3Client, created_at: float, data_files, file_format: str = "CSV",
+                    checksum: bool = True, source_bucket: str = SOURCE) -> str:
+    """写入一次清单（数据文件、manifest.json 和 manifest.checksum），返回 manifest.json 的键"""
+    folder = f"{PREFIX}/{datetime.fromtimestamp(created_at, timezone.utc).strftime('%Y-%m-%dT%H-%MZ')}/"
+    files = []
+    for index, body in enumerate(data_files):
+        key = f"{PREFIX}/data/{int(created_at)}-{index}.{file_format.lower()}"
+        client.put_object(Bucket=DESTINATION, Key=key, Body=body)
+        files.append({"key": key, "size": len(body), "MD5checksum": hashlib.md5(body).hexdigest()})
+    manifest = json.dumps({
+        "sourceBucket": source_bucket,
+        "destinationBucket": f"arn:aws:s3:::{DESTINATION}",
+        "version": "2016-11-30",
+        "creationTimestamp": str(int(created_at * 1000)),
+        "fileFormat": file_format,
+        "fileSchema": SCHEMA,
+        "files": files
+    }).encode("utf-8")
+    client.put_object(Bucket=DESTINATION, Key=f"{folder}manifest.json", Body=manifest)
+    if checksum:
+        client.put_object(Bucket=DESTINATION, Key=f"{folder}manifest.checksum",
+                          Body=hashlib.md5(manifest).hexdigest().encode("ascii"))
+    return f"{folder}manifest.json"
+
+
+def reader(**kwargs) -> InventoryReader:
+    return InventoryReader(enabled=True, bucket=DESTINATION, prefix=PREFIX, **kwargs)
+
+
+def test_finds_latest_complete_manifest():
+    """测试按日期文件夹找到最新的完整清单（没有 manifest.checksum 的清单仍在写入，跳过），过期或不属于该存储桶时不使用"""
+    client = FakeS3Client()
+    now = time.time()
+    older = write_inventory(client, now - 2 * 86400, [csv_data_file([])])
+    latest = write_inventory(client, now - 3600, [csv_data_file([])])
+    write_inventory(client, now - 60, [csv_data_file([])], checksum=False)
+
+    manifest = reader().latest_manifest(client)
+    assert manifest.key == latest and manifest.destination_bucket == DESTINATION
+    assert abs(manifest.created_at - (now - 3600)) < 1 and manifest.schema[1] == "Key"
+    assert older < latest
+
+    assert reader(max_age_seconds=600).usable_manifest(client, SOURCE) is None
+    assert reader().usable_manifest(client, "other-bucket") is None
+    assert InventoryReader(enabled=False, bucket=DESTINATION, prefix=PREFIX).usable_manifest(client, SOURCE) is None
+    stale = reader(max_age_seconds=600)
+    stale.usable_manifest(client, SOURCE)
+    assert stale.get_metrics()["fallbacks"] == 1
+    # 没有对象事件补齐已有文件夹内的变化时不使用清单
+    untracked = reader()
+    assert untracked.usable_manifest(client, SOURCE, changes_tracked=False) is None
+    assert untracked.get_metrics()["fallbacks"] == 1
+
+    # manifest.json 与校验和不一致时报错，读取器改为分页列出
+    client.put_object(Bucket=DESTINATION, Key=latest, Body=b'{"truncated": ')
+    try:
+        reader().latest_manifest(client)
+        assert False, "应抛出 InventoryError"
+    except InventoryError:
+        pass
+    assert reader().usable_manifest(client, SOURCE) is None
+
+
+def test_streams_csv_in_chunks():
+    """测试逐个数据文件流式解析 CSV：对象键 URL 解码，ETag 加引号，旧版本、删除标记和文件夹占位对象跳过"""
+    client = FakeS3Client()
+    write_inventory(client, time.time(), [
+        csv_data_file([(f"{ZHANG}执业证书 2024.pdf", 1200, "e1"), (f"{ZHANG}简历.pdf", 800, "e2"), (ZHANG, 0, "d")]),
+        csv_data_file([(f"{LI}a+b.pdf", 10, "e3"), (f"{LI}旧版本.pdf", 5, "e4", "false", "false"),
+                       (f"{LI}已删除.pdf", "", "", "true", "true"), ("README.txt", 3, "e5")]),
+    ])
+    inventory = reader(chunk_size=2)
+    manifest = inventory.latest_manifest(client)
+    stats = InventoryStats()
+    chunks = list(inventory.iter_chunks(client, manifest, stats))
+    assert [len(chunk) for chunk in chunks] == [2, 2]
+    objects = [obj for chunk in chunks for obj in chunk]
+    assert objects[0] == {"key": f"{ZHANG}执业证书 2024.pdf", "etag": '"e1"', "size": 1200}
+    assert [obj["key"] for obj in objects[2:]] == [f"{LI}a+b.pdf", "README.txt"]
+    assert (stats.data_files, stats.objects) == (2, 4)
+    assert stats.data_bytes == sum(file["size"] for file in manifest.files)
+
+    # 数据文件内容与清单中的 MD5 不一致
+    client.put_object(Bucket=DESTINATION, Key=manifest.files[1]["key"], Body=csv_data_file([("x/y", 1, "e")]))
+    try:
+        list(inventory.iter_chunks(client, manifest))
+        assert False, "应抛出 InventoryError"
+    except InventoryError:
+        pass
+
+
+def test_live_delta_covers_new_and_deleted_folders():
+    """测试只按顶层文件夹实时列出：清单之后删除的文件夹去掉，新建的文件夹单独完整列出"""
+    inventory_client, source = FakeS3Client(), FakeS3Client()
+    write_inventory(inventory_client, time.time(), [csv_data_file([
+        (f"{ZHANG}a.pdf", 1, "e1"), (f"{ZHANG}b.pdf", 1, "e2"), (f"{LI}a.pdf", 1, "e3")])])
+    for key in (f"{ZHANG}a.pdf", f"{ZHANG}b.pdf", f"{WANG}a.pdf", f"{WANG}证书/b.pdf"):
+        source.put_object(Bucket=SOURCE, Key=key, Body=b"x")
+
+    live_folders = list_top_level_folders(source, SOURCE)
+    assert live_folders == {ZHANG, WANG} and source.calls == 1
+
+    def list_folder(folder):
+        response = source.list_objects_v2(Bucket=SOURCE, Prefix=folder)
+        return [{"key": obj["Key"], "etag": obj["ETag"], "size": obj["Size"]} for obj in response["Contents"]]
+
+    inventory = reader()
+    stats = InventoryStats()
+    objects = list(inventory.iter_objects(inventory_client, inventory.latest_manifest(inventory_client),
+                                          live_folders, list_folder, stats))
+    assert sorted(obj["key"] for obj in objects) == [
+        f"{ZHANG}a.pdf", f"{ZHANG}b.pdf", f"{WANG}a.pdf", f"{WANG}证书/b.pdf"]
+    assert stats.new_folders == [WANG] and stats.deleted_folders == [LI] and stats.live_objects == 2
+    assert source.calls == 2
+    assert inventory.get_metrics()["last_import"]["objects"] == 3
+
+
+def test_registry_refresh_keeps_events_after_inventory_date():
+    """测试按清单刷新登记表时文档计数截至清单生成时间，清单之后由对象事件更新的文件夹不被覆盖"""
+    with tempfile.TemporaryDirectory() as directory:
+        registry = SpeakerRegistry(enabled=True, path=os.path.join(directory, "registry.db"))
+        created_at = time.time() - 6 * 3600
+        registry.apply_object_event(SOURCE, f"{ZHANG}a.pdf", False, etag="e1", now=created_at - 60)
+        registry.apply_object_event(SOURCE, f"{ZHANG}b.pdf", False, etag="e2", now=created_at + 60)
+
+        def verified(name, hospital, department):
+            return {"success": True, "verification_passed": True, "match_score": 7}
+
+        inventory_objects = [{"key": f"{ZHANG}a.pdf", "etag": '"e1"', "size": 1},
+                             {"key": f"{LI}a.pdf", "etag": '"e3"', "size": 1}]
+        stats = registry.refresh(SOURCE, inventory_objects, verified, rate_per_second=0, listed_at=created_at)
+        assert stats.verified == 2 and stats.removed == 0
+        zhang, li = registry.get(SOURCE, ZHANG), registry.get(SOURCE, LI)
+        assert zhang.file_count == 2 and zhang.listed_at == created_at + 60 and zhang.verified_at > created_at
+        assert li.listed_at == created_at
+
+
+def test_parquet_inventory():
+    """测试安装 pyarrow 时按行组读取 Parquet 格式的清单（未安装时跳过）"""
+    if not PYARROW_AVAILABLE:
+        return
+    import pyarrow
+    import pyarrow.parquet
+    table = pyarrow.table({"bucket": [SOURCE] * 3, "key": [f"{ZHANG}a.pdf", f"{ZHANG}b.pdf", f"{LI}a.pdf"],
+                           "size": [1, 2, 3], "e_tag": ["e1", "e2", "e3"], "is_latest": [True, True, False]})
+    sink = io.BytesIO()
+    pyarrow.parquet.write_table(table, sink, row_group_size=2)
+    client = FakeS3Client()
+    write_inventory(client, time.time(), [sink.getvalue()], file_format="Parquet")
+    inventory = reader()
+    objects = [obj for chunk in inventory.iter_chunks(client, inventory.latest_manifest(client)) for obj in chunk]
+    assert objects == [{"key": f"{ZHANG}a.pdf", "etag": '"e1"', "size": 1},
+                       {"key": f"{ZHANG}b.pdf", "etag": '"e2"', "size": 2}]
+
+
+def test_refresh_from_inventory():
+    """测试开启 [INVENTORY] 和 [EVENTS] 后刷新讲者登记表读取清单，LIST 调用只有顶层文件夹和新文件夹，结果与分页列出一致"""
+    from benchmark_fakes import doctor_folder_prefix
+    from benchmark_preaudit import BENCHMARK_BUCKET, BenchmarkEnvironment
+    from config_service import get_config_service
+
+    with BenchmarkEnvironment(doctors=40, files_per_folder=6) as env, tempfile.TemporaryDirectory() as directory:
+        get_config_service().set_overrides("registry", path=os.path.join(directory, "listed.db"), rate_per_second=0,
+                                           max_concurrency=8)
+        listed = env.tools.refresh_speaker_registry(BENCHMARK_BUCKET)
+        assert listed["listing"] == {"source": "list"}
+
+        # 清单包含除最后一位讲者外的全部对象
+        rows, newest = [], doctor_folder_prefix(env.doctors[-1])
+        for key in env.s3._buckets[BENCHMARK_BUCKET]:
+            if not key.startswith(newest) and not key.endswith("/"):
+                obj = env.s3._object(BENCHMARK_BUCKET, key)
+                rows.append((key, obj["Size"], obj["ETag"].strip('"')))
+        write_inventory(env.s3, time.time() - 3600, [csv_data_file(rows, BENCHMARK_BUCKET)],
+                        source_bucket=BENCHMARK_BUCKET)
+
+        get_config_service().set_overrides("registry", path=os.path.join(directory, "untracked.db"))
+        get_config_service().set_overrides("inventory", enabled=True, bucket=DESTINATION, prefix=PREFIX)
+        # 未开启 [EVENTS] 时已有文件夹内清单之后的变化无法补齐，仍然分页列出
+        assert env.tools.refresh_speaker_registry(BENCHMARK_BUCKET)["listing"] == {"source": "list"}
+
+        get_config_service().set_overrides("registry", path=os.path.join(directory, "inventory.db"))
+        get_config_service().set_overrides("events", enabled=True)
+        calls_before = env.s3.calls
+        refreshed = env.tools.refresh_speaker_registry(BENCHMARK_BUCKET)
+        assert refreshed["listing"]["source"] == "inventory" and refreshed["listing"]["new_folders"] == [newest]
+        assert refreshed["folders"] == listed["folders"]
+        # 清单目录 1 次 + 校验和和清单 2 次 + 数据文件 1 次 + 顶层文件夹 1 次 + 新文件夹 1 次
+        assert env.s3.calls - calls_before == 6
+
+        from speaker_validation_tools import get_speaker_registry
+        for doctor in (env.doctors[0], env.doctors[-1]):
+            prefix = doctor_folder_prefix(doctor)
+            contents = env.s3.list_objects_v2(Bucket=BENCHMARK_BUCKET, Prefix=prefix).get("Contents", [])
+            record = get_speaker_registry().get(BENCHMARK_BUCKET, prefix)
+            assert record.file_count == len([obj for obj in contents if not obj["Key"].endswith("/")])
+
+        # 清单有效期不小于登记表有效期时按登记表有效期的一半使用
+        from s3_inventory import get_inventory_reader
+        get_config_service().set_overrides("registry", max_age_seconds=3600)
+        assert get_inventory_reader().max_age_seconds == 1800
+
+
+def main():
+    """主函数"""
+    print("=" * 60)
+    print("S3 Inventory 清单导入测试")
+    print("=" * 60)
+
+    tests = [
+        test_finds_latest_complete_manifest,
+        test_streams_csv_in_chunks,
+        test_live_delta_covers_new_and_deleted_folders,
+        test_registry_refresh_keeps_events_after_inventory_date,
+        test_parquet_inventory,
+        test_refresh_from_inventory
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__doc__}")
+
+    print("\n✨ 测试完成！")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+测试请求合并（single-flight）模块
+不依赖 AWS 或 EXA，可离线运行
+"""
+
+import asyncio
+import threading
+import time
+from singleflight import SingleFlight, normalize_input
+
+
+def test_normalize_input():
+    """测试合并键规范化"""
+    assert normalize_input("  张三 医生\n北京协和医院  ") == "张三 医生 北京协和医院"
+    assert normalize_input(None) == ""
+
+
+def test_concurrent_duplicates_share_one_execution():
+    """测试并发重复请求只执行一次并共享结果"""
+    group = SingleFlight("test")
+    executions = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_compute(value):
+        executions.append(value)
+        started.set()
+        release.wait(1)
+        return {"value": value}
+
+    results = []
+
+    def worker():
+        results.append(group.do("key", slow_compute, 42))
+
+    leader = threading.Thread(target=worker)
+    leader.start()
+    started.wait(1)
+    followers = [threading.Thread(target=worker) for _ in range(3)]
+    for t in followers:
+        t.start()
+    time.sleep(0.05)
+    release.set()
+    for t in [leader] + followers:
+        t.join(1)
+
+    assert executions == [42]
+    assert results == [{"value": 42}] * 4
+    metrics = group.get_metrics()
+    assert metrics["executions"] == 1
+    assert metrics["coalesced"] == 3
+    assert metrics["in_flight"] == 0
+
+
+def test_errors_propagate_to_followers():
+    """测试领导者的异常传递给所有跟随者"""
+    group = SingleFlight("test")
+    started = threading.Event()
+    errors = []
+
+    def failing():
+        started.set()
+        time.sleep(0.05)
+        raise RuntimeError("boom")
+
+    def worker():
+        try:
+            group.do("key", failing)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    leader = threading.Thread(target=worker)
+    leader.start()
+    started.wait(1)
+    follower = threading.Thread(target=worker)
+    follower.start()
+    leader.join(1)
+    follower.join(1)
+    assert errors == ["boom", "boom"]
+
+
+def test_followers_recompute_when_leader_interrupted():
+    """测试领导者被中断（如请求取消）时跟随者重新执行，而不是收到中断"""
+    class Interrupted(BaseException):
+        pass
+
+    group = SingleFlight("test")
+    started = threading.Event()
+    results = []
+
+    def interrupted():
+        started.set()
+        time.sleep(0.05)
+        raise Interrupted()
+
+    def leader_worker():
+        try:
+            group.do("key", interrupted)
+        except Interrupted:
+            results.append("interrupted")
+
+    def follower_worker():
+        results.append(group.do("key", lambda: "recomputed"))
+
+    leader = threading.Thread(target=leader_worker)
+    leader.start()
+    started.wait(1)
+    follower = threading.Thread(target=follower_worker)
+    follower.start()
+    leader.join(1)
+    follower.join(1)
+    assert sorted(results) == ["interrupted", "recomputed"]
+    metrics = group.get_metrics()
+    assert metrics["leader_aborts"] == 1 and metrics["executions"] == 2
+
+
+def test_followers_recompute_truncated_result():
+    """测试领导者的结果被其较短的时间预算截断时，还有时间的跟随者重新执行，时间不足的跟随者共享部分结果"""
+    group = SingleFlight("test")
+    started = threading.Event()
+    results = {}
+
+    def truncated():
+        started.set()
+        time.sleep(0.05)
+        return {"partial": True}
+
+    def run(name, has_time):
+        results[name] = group.do("key", lambda: {"partial": False}, reusable=lambda r: not r["partial"] or not has_time)
+
+    leader = threading.Thread(target=lambda: results.setdefault("leader", group.do("key", truncated)))
+    leader.start()
+    started.wait(1)
+    followers = [threading.Thread(target=run, args=("long", True)), threading.Thread(target=run, args=("short", False))]
+    for follower in followers:
+        follower.start()
+    for thread in [leader] + followers:
+        thread.join(1)
+    assert results == {"leader": {"partial": True}, "long": {"partial": False}, "short": {"partial": True}}
+    assert group.get_metrics()["truncated_reruns"] == 1
+
+
+def test_follower_wait_timeout():
+    """测试跟随者等待超时"""
+    group = SingleFlight("test")
+    started = threading.Event()
+    release = threading.Event()
+
+    def blocked():
+        started.set()
+        release.wait(1)
+        return "late"
+
+    leader = threading.Thread(target=group.do, args=("key", blocked))
+    leader.start()
+    started.wait(1)
+    try:
+        group.do("key", blocked, wait_timeout=0.01)
+        assert False, "应抛出 TimeoutError"
+    except TimeoutError:
+        pass
+    release.set()
+    leader.join(1)
+    assert group.get_metrics()["wait_timeouts"] == 1
+
+
+def test_sequential_calls_not_coalesced():
+    """测试非并发的重复调用各自执行"""
+    group = SingleFlight("test")
+    assert group.do("key", lambda: 1) == 1
+    assert group.do("key", lambda: 2) == 2
+    assert group.get_metrics()["executions"] == 2
+
+
+def test_async_callers_coalesce_with_sync_leader():
+    """测试异步调用方与同步调用方合并，领导者任务被取消时跟随者重新执行"""
+    group = SingleFlight("test")
+    started = threading.Event()
+    release = threading.Event()
+
+    def blocked():
+        started.set()
+        release.wait(1)
+        return "shared"
+
+    async def compute():
+        return "recomputed"
+
+    async def scenario():
+        leader = threading.Thread(target=group.do, args=("key", blocked))
+        leader.start()
+        started.wait(1)
+        followers = [asyncio.create_task(group.do_async("key", compute)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        release.set()
+        shared = await asyncio.gather(*followers)
+        leader.join(1)
+
+        gate = asyncio.Event()
+
+        async def slow():
+            await gate.wait()
+            return "cancelled"
+
+        async_leader = asyncio.create_task(group.do_async("other", slow))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(group.do_async("other", compute))
+        await asyncio.sleep(0.01)
+        async_leader.cancel()
+        return shared, await follower
+
+    shared, recomputed = asyncio.run(scenario())
+    assert shared == ["shared"] * 3
+    assert recomputed == "recomputed"
+    assert group.get_metrics()["coalesced"] >= 3
+
+
+def main():
+    """主函数"""
+    print("=" * 60)
+    print("请求合并模块测试")
+    print("=" * 60)
+
+    tests = [
+        test_normalize_input,
+        test_concurrent_duplicates_share_one_execution,
+        test_errors_propagate_to_followers,
+        test_followers_recompute_when_leader_interrupted,
+        test_followers_recompute_truncated_result,
+        test_follower_wait_timeout,
+        test_sequential_calls_not_coalesced,
+        test_async_callers_coalesce_with_sync_leader
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__doc__}")
+
+    print("\n✨ 测试完成！")
+
+
+if __name__ == "__main__":
+    main()
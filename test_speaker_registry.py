@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+测试讲者预验证登记表：文件夹名解析、限速批量验证、未过期的验证结果沿用、删除的文件夹移除、
+按提交内容本地查找（命中、过期、同名歧义），以及预审命中登记表时不再调用 Bedrock、EXA 和 S3
+登记表测试可离线运行；预审集成测试使用基准测试替身服务（需要安装 boto3）
+"""
+
+import os
+import tempfile
+import threading
+import time
+from speaker_registry import SpeakerRegistry, get_speaker_registry, parse_folder_name, speaker_folder
+
+BUCKET = "bucket"
+DAY = 86400.0
+
+
+def objects(folders: dict):
+    return [
+        {"key": f"{folder}{name}", "etag": f'"{folder}{name}"', "size": 100}
+        for folder, names in folders.items() for name in names
+    ]
+
+
+class FakeVerifier:
+    """记录调用时间的EXA验证替身"""
+
+    def __init__(self, failing=()):
+        self.calls = []
+        self.failing = set(failing)
+        self._lock = threading.Lock()
+
+    def __call__(self, name, hospital, department):
+        with self._lock:
+            self.calls.append((name, time.monotonic()))
+        if name in self.failing:
+            return {"success": False, "error": "EXA API error: 503"}
+        return {"success": True, "verification_passed": name != "赵六", "match_score": 7, "total_results": 5,
+                "matched_results": []}
+
+
+def registry_in(directory: str, **kwargs) -> SpeakerRegistry:
+    return SpeakerRegistry(enabled=True, path=os.path.join(directory, "registry.db"), **kwargs)
+
+
+def test_parse_folder_names():
+    """测试解析 “姓名-医院-科室/” 文件夹名（医院名称可以包含连字符），不符合格式的文件夹忽略"""
+    assert parse_folder_name("张三-北京协和医院-心内科/") == {
+        "name": "张三", "hospital": "北京协和医院", "department": "心内科"}
+    assert parse_folder_name("李四-中山大学附属第一医院-东院-呼吸科/")["hospital"] == "中山大学附属第一医院-东院"
+    assert parse_folder_name("tinabao/") is None
+    assert parse_folder_name("王五--心内科/") is None
+    assert speaker_folder("张三-北京协和医院-心内科/证书/执业证书.pdf") == "张三-北京协和医院-心内科/"
+    assert speaker_folder("README.txt") == ""
+
+
+def test_refresh_verifies_in_throttled_batch():
+    """测试刷新时按速率上限批量验证，唯一文档按计数函数统计；验证失败保留上次结果，已删除的文件夹移除"""
+    listing = objects({
+        "张三-北京协和医院-心内科/": ["执业证书.pdf", "简历.pdf", "简历-副本.pdf", "照片.jpg"],
+        "李四-华西医院-肿瘤科/": ["执业证书.pdf"],
+        "王五-湘雅医院-呼吸科/": ["简历.pdf", "证书/执业证书.pdf"],
+        "赵六-瑞金医院-内分泌科/": ["简历.pdf"],
+        "tinabao/": ["模板.docx"],
+    })
+
+    def count_documents(prefix, folder_objects):
+        copies = [obj for obj in folder_objects if "副本" in obj["key"]]
+        return {"unique_file_count": len(folder_objects) - len(copies),
+                "duplicate_groups": [{"keys": [obj["key"]]} for obj in copies]}
+
+    with tempfile.TemporaryDirectory() as directory:
+        registry = registry_in(directory)
+        verifier = FakeVerifier(failing={"李四"})
+        stats = registry.refresh(BUCKET, listing, verifier, count_documents, rate_per_second=20, max_concurrency=4)
+        assert (stats.folders, stats.unparsed, stats.verified, stats.verify_errors) == (5, 1, 3, 1)
+        started = sorted(at for _, at in verifier.calls)
+        assert started[-1] - started[0] >= 0.15
+
+        zhang = registry.get(BUCKET, "张三-北京协和医院-心内科/")
+        assert (zhang.file_count, zhang.unique_file_count, zhang.verification_passed) == (4, 3, True)
+        assert registry.get(BUCKET, "王五-湘雅医院-呼吸科/").file_count == 2
+        assert registry.get(BUCKET, "李四-华西医院-肿瘤科/").verified_at is None
+        assert registry.get(BUCKET, "赵六-瑞金医院-内分泌科/").verification_passed is False
+
+        # 第二次刷新：未过期一半的验证结果沿用，只重新验证上次失败的讲者；删除的文件夹移除
+        verifier = FakeVerifier()
+        listing = [obj for obj in listing if not obj["key"].startswith("赵六")]
+        stats = registry.refresh(BUCKET, listing, verifier, rate_per_second=0, now=time.time() + DAY)
+        assert stats.reused == 2 and stats.verified == 1 and stats.removed == 1
+        assert [name for name, _ in verifier.calls] == ["李四"]
+        assert registry.find_by_name(BUCKET, "赵六") == []
+
+        # 超过验证有效期一半后全部重新验证
+        stats = registry.refresh(BUCKET, listing, FakeVerifier(), rate_per_second=0, now=time.time() + 5 * DAY)
+        assert stats.verified == 3 and stats.reused == 0
+
+
+def test_lookup_matches_text_and_checks_freshness():
+    """测试按提交内容查找讲者：姓名和医院都出现时命中，同名讲者按科室区分，过期或无法区分时不命中"""
+    listing = objects({
+        "张三-北京协和医院-心内科/": ["a.pdf", "b.pdf"],
+        "张三-北京协和医院-消化科/": ["a.pdf"],
+        "李四-华西医院-肿瘤科/": ["a.pdf"],
+    })
+    with tempfile.TemporaryDirectory() as directory:
+        registry = registry_in(directory, max_age_seconds=DAY, verify_max_age_seconds=7 * DAY)
+        registry.refresh(BUCKET, listing, FakeVerifier(), rate_per_second=0)
+
+        hit = registry.lookup(BUCKET, "李四 医生，华西医院肿瘤科主任医师，将在会议上分享经验")
+        assert hit is not None and hit.folder == "李四-华西医院-肿瘤科/"
+        assert registry.lookup(BUCKET, "张三医生，北京协和医院心内科").department == "心内科"
+        assert registry.lookup(BUCKET, "张三医生，北京协和医院") is None
+        assert registry.lookup(BUCKET, "李四医生，协和医院肿瘤科") is None
+        assert registry.lookup(BUCKET, "李四医生，华西医院肿瘤科", now=time.time() + 2 * DAY) is None
+        metrics = registry.get_metrics()
+        assert (metrics["hits"], metrics["ambiguous"], metrics["misses"], metrics["stale"]) == (2, 1, 1, 1)
+        assert metrics["speakers"] == 3
+
+        # 除该讲者的姓名、医院、科室和称谓外还有其他文字时，内容可能提到其他人
+        assert hit.only_person_named("李四 医生，华西医院肿瘤科主任医师。")
+        assert not hit.only_person_named("李四 医生，华西医院肿瘤科主任医师，将在会议上分享经验")
+        assert not hit.only_person_named("王五医生，华西医院肿瘤科，李四主任推荐")
+
+        # 其他进程（如 cron 刷新任务）写入后，姓名索引在下次查找时重新加载
+        other = registry_in(directory)
+        other.refresh(BUCKET, listing + objects({"王五-湘雅医院-呼吸科/": ["a.pdf"]}), FakeVerifier(),
+                      rate_per_second=0)
+        assert registry.lookup(BUCKET, "王五医生，湘雅医院呼吸科").folder == "王五-湘雅医院-呼吸科/"
+
+        registry.enabled = False
+        assert registry.lookup(BUCKET, "李四医生，华西医院肿瘤科") is None
+
+
+def _identity_only(doctor):
+    """只包含讲者姓名、医院、科室和职称的提交内容"""
+    return f"{doctor['name']}医生，{doctor['hospital']}{doctor['department']}{doctor['title']}"
+
+
+def test_preaudit_uses_registry():
+    """测试开启 [REGISTRY] 后预审命中登记表时不调用 Bedrock、EXA 和 S3，结论与实时预审一致（同步和异步版本）"""
+    from benchmark_fakes import doctor_folder_prefix
+    from benchmark_preaudit import BENCHMARK_BUCKET, BenchmarkEnvironment
+    from config_service import get_config_service
+
+    with BenchmarkEnvironment(doctors=3, files_per_folder=4) as env, tempfile.TemporaryDirectory() as directory:
+        import async_tools
+        doctor = env.doctors[0]
+        get_config_service().set_overrides("registry", path=os.path.join(directory, "registry.db"))
+        exa_before = env.exa.requests
+        refreshed = env.tools.refresh_speaker_registry(BENCHMARK_BUCKET)
+        assert refreshed["success"] and refreshed["verified"] == refreshed["folders"] - refreshed["unparsed"]
+        assert env.exa.requests - exa_before == refreshed["verified"]
+
+        live = env.tools.run_preaudit(env.submission(doctor))
+        get_config_service().set_overrides("registry", enabled=True)
+        calls = env.call_counts()
+        result = env.tools.run_preaudit(_identity_only(doctor))
+        assert env.call_counts() == calls
+        assert (result.outcome, result.file_count) == (live.outcome, live.file_count)
+        assert result.verification["registry"]["folder"] == doctor_folder_prefix(doctor)
+        assert "registry_lookup" in result.stage_timings and "extraction" not in result.stage_timings
+        assert "讲者登记表: 身份验证和文档数量来自预先验证" in result.render()
+
+        async_result = env.run_async(async_tools.run_preaudit(_identity_only(doctor) + "！"))
+        assert env.call_counts() == calls and async_result.outcome == live.outcome
+
+        # 内容中还有其他文字时用 Bedrock 提取结果确认，确认后仍不调用 EXA 和 S3
+        confirmed = env.tools.run_preaudit(env.submission(doctor) + "。")
+        assert env.call_counts() == dict(calls, bedrock=calls["bedrock"] + 1)
+        assert confirmed.outcome == live.outcome and "registry" in confirmed.verification
+        assert "extraction" in confirmed.stage_timings
+
+        # 未登记的讲者和同院已登记的同事：提取出的讲者不是该记录，使用同一提取结果按实时流程执行
+        calls = env.call_counts()
+        newcomer = dict(doctor, name="王小明")
+        env.bedrock.responder = lambda prompt: newcomer
+        try:
+            for run in (env.tools.run_preaudit,
+                        lambda text: env.run_async(async_tools.run_preaudit(text))):
+                other = run(f"王小明医生，{doctor['hospital']}{doctor['department']}，由{doctor['name']}主任推荐")
+                assert "registry" not in other.verification and other.extraction["name"] == "王小明"
+        finally:
+            env.bedrock.responder = env.bedrock._lookup_doctor
+        assert env.call_counts()["bedrock"] == calls["bedrock"] + 2
+        metrics = get_speaker_registry().get_metrics()
+        assert metrics["confirmed"] >= 1 and metrics["rejected"] >= 2
+
+        # 过期的记录不使用，按实时流程执行
+        get_config_service().set_overrides("registry", max_age_seconds=0)
+        stale = env.tools.run_preaudit(env.submission(doctor) + "？")
+        assert env.call_counts()["bedrock"] > calls["bedrock"] and "registry" not in stale.verification
+
+
+def main():
+    """主函数"""
+    print("=" * 60)
+    print("讲者预验证登记表测试")
+    print("=" * 60)
+
+    tests = [
+        test_parse_folder_names,
+        test_refresh_verifies_in_throttled_batch,
+        test_lookup_matches_text_and_checks_freshness,
+        test_preaudit_uses_registry
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__doc__}")
+
+    print("\n✨ 测试完成！")
+
+
+if __name__ == "__main__":
+    main()
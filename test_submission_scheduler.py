@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+测试提交调度模块（优先级、按提交人轮流、排队上限、Bedrock / EXA 并发名额）
+除最后一项使用本地替身的端到端测试外，不依赖 AWS 或 EXA，可离线运行
+"""
+
+import asyncio
+import threading
+import time
+from resilience import DependencyGuard, RateLimitExceeded, RetryPolicy, ThrottlingError, set_dependency_bulkhead
+from submission_scheduler import (
+    AdmissionRejected,
+    PrioritySemaphore,
+    SubmissionScheduler,
+    current_priority,
+    submission_priority
+)
+
+
+async def _hold(scheduler: SubmissionScheduler, priority: str, submitter: str, release: asyncio.Event,
+                started: list, timeout=None):
+    async with scheduler.slot(priority, submitter, timeout=timeout):
+        started.append((priority, submitter))
+        await release.wait()
+
+
+def test_round_robin_across_submitters():
+    """测试同一优先级内按提交人轮流：大批量提交不挡住其他代表的单条提交"""
+    async def scenario():
+        scheduler = SubmissionScheduler(enabled=True, max_concurrency=1, batch_concurrency=1)
+        started, release = [], asyncio.Event()
+        release.set()
+        blocker = asyncio.Event()
+        tasks = [asyncio.create_task(_hold(scheduler, "batch", "rep-blocker", blocker, started))]
+        tasks += [asyncio.create_task(_hold(scheduler, "batch", "rep-a", release, started)) for _ in range(5)]
+        tasks.append(asyncio.create_task(_hold(scheduler, "batch", "rep-b", release, started)))
+        await asyncio.sleep(0.01)
+        assert scheduler.get_metrics()["classes"]["batch"]["queued"] == 6
+        blocker.set()
+        await asyncio.gather(*tasks)
+        return [submitter for _, submitter in started]
+
+    order = asyncio.run(scenario())
+    assert order[:3] == ["rep-blocker", "rep-a", "rep-b"]
+    assert order.count("rep-a") == 5
+
+
+def test_interactive_not_queued_behind_batch():
+    """测试交互式提交不排在批量任务后面，批量任务不超过自身的并发上限"""
+    async def scenario():
+        scheduler = SubmissionScheduler(enabled=True, max_concurrency=2, batch_concurrency=1)
+        started, release = [], asyncio.Event()
+        tasks = [asyncio.create_task(_hold(scheduler, "batch", "rep-a", release, started)) for _ in range(20)]
+        await asyncio.sleep(0.01)
+        interactive = asyncio.create_task(_hold(scheduler, "interactive", "rep-b", release, started))
+        await asyncio.sleep(0.01)
+        metrics = scheduler.get_metrics()["classes"]
+        release.set()
+        await asyncio.gather(interactive, *tasks)
+        return started, metrics, scheduler.get_metrics()["classes"]
+
+    started, during, after = asyncio.run(scenario())
+    assert started[:2] == [("batch", "rep-a"), ("interactive", "rep-b")]
+    assert during["batch"]["running"] == 1 and during["batch"]["queued"] == 19
+    assert during["interactive"]["running"] == 1 and during["interactive"]["queued"] == 0
+    assert after["batch"]["completed"] == 20 and after["interactive"]["completed"] == 1
+    assert after["interactive"]["wait_p99_ms"] < 50
+
+
+def test_admission_control():
+    """测试排队长度上限、每位提交人排队上限和排队超时"""
+    async def scenario():
+        scheduler = SubmissionScheduler(enabled=True, max_concurrency=1, max_queue_batch=3,
+                                        max_queued_per_submitter=2)
+        started, release = [], asyncio.Event()
+        tasks = [asyncio.create_task(_hold(scheduler, "interactive", "rep-a", release, started))]
+        tasks += [asyncio.create_task(_hold(scheduler, "batch", "rep-a", release, started)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        errors = []
+        for submitter in ("rep-a", "rep-b", "rep-c"):
+            try:
+                async with scheduler.slot("batch", submitter, timeout=0.05):
+                    pass
+            except AdmissionRejected as e:
+                errors.append(str(e))
+        metrics = scheduler.get_metrics()["classes"]
+        release.set()
+        await asyncio.gather(*tasks)
+        return errors, metrics
+
+    errors, metrics = asyncio.run(scenario())
+    # rep-a 超过每人上限，rep-b 排队超时，rep-c 遇到排队已满（超时的 rep-b 已移出队列）
+    assert len(errors) == 3
+    assert "rep-a" in errors[0] and "排队超过" in errors[1] and "排队超过" in errors[2]
+    assert metrics["batch"]["rejected"] == 1 and metrics["batch"]["timed_out"] == 2
+    assert metrics["batch"]["queued"] == 2
+
+
+def test_disabled_scheduler_passes_through():
+    """测试关闭调度时立即执行，并设置外部调用使用的优先级"""
+    async def scenario():
+        scheduler = SubmissionScheduler(enabled=False, max_concurrency=1)
+        async with scheduler.slot("nightly", "rep-a"):
+            async with scheduler.slot("batch", "rep-a", timeout=0):
+                return current_priority()
+
+    assert asyncio.run(scenario()) == "batch"
+    assert current_priority() == "interactive"
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def test_priority_semaphore_order_and_reserved_slots():
+    """测试并发名额按优先级分配，batch 和 nightly 不占用为 interactive 预留的名额"""
+    budget = PrioritySemaphore("bedrock", capacity=2, reserved=1)
+    with submission_priority("batch"):
+        budget.acquire(timeout=0)
+        try:
+            budget.acquire(timeout=0.02)
+            assert False, "batch 不应占用预留名额"
+        except RateLimitExceeded:
+            pass
+    budget.acquire(timeout=0)
+
+    order = []
+
+    def worker(priority):
+        with submission_priority(priority):
+            budget.acquire()
+            order.append(priority)
+            budget.release()
+
+    threads = []
+    for priority in ("nightly", "batch", "interactive"):
+        thread = threading.Thread(target=worker, args=(priority,))
+        thread.start()
+        threads.append(thread)
+        _wait_for(lambda: budget.get_metrics()["waiting"] == len(threads))
+    # 归还 interactive 的名额后只有 interactive 可以使用，归还 batch 的名额后依次轮到 batch 和 nightly
+    budget.release()
+    _wait_for(lambda: order == ["interactive"])
+    budget.release()
+    for thread in threads:
+        thread.join(2)
+    assert order == ["interactive", "batch", "nightly"]
+    metrics = budget.get_metrics()
+    assert metrics["in_use"] == 0 and metrics["timed_out"] == 1 and metrics["max_in_use"] == 2
+
+
+def test_priority_semaphore_async():
+    """测试事件循环中等待并发名额：按优先级获得，取消的等待者不占用名额"""
+    async def scenario():
+        budget = PrioritySemaphore("exa", capacity=1)
+        await budget.acquire_async()
+        order = []
+
+        async def waiter(priority):
+            with submission_priority(priority):
+                await budget.acquire_async()
+                order.append(priority)
+                budget.release()
+
+        cancelled = asyncio.create_task(waiter("interactive"))
+        batch = asyncio.create_task(waiter("batch"))
+        await asyncio.sleep(0.01)
+        interactive = asyncio.create_task(waiter("interactive"))
+        await asyncio.sleep(0.01)
+        cancelled.cancel()
+        await asyncio.sleep(0.01)
+        budget.release()
+        await asyncio.gather(batch, interactive)
+        return order, budget.get_metrics()
+
+    order, metrics = asyncio.run(scenario())
+    assert order == ["interactive", "batch"]
+    assert metrics["in_use"] == 0 and metrics["waiting"] == 0
+
+
+def test_guard_releases_slot_between_retries():
+    """测试依赖保护器在调用期间占用并发名额，退避等待和失败时归还"""
+    budget = PrioritySemaphore("scheduler-test", capacity=1)
+    set_dependency_bulkhead("scheduler-test", budget)
+    try:
+        guard = DependencyGuard("scheduler-test", retry_policy=RetryPolicy(3, 0.01, 0.02))
+        attempts = []
+
+        def flaky():
+            attempts.append(budget.get_metrics()["in_use"])
+            if len(attempts) < 2:
+                raise ThrottlingError("ThrottlingException")
+            return "ok"
+
+        assert guard.call(flaky) == "ok"
+        assert attempts == [1, 1] and budget.get_metrics()["in_use"] == 0
+
+        budget.acquire()
+        try:
+            guard.call(flaky, max_wait=0.02)
+            assert False, "并发名额用完时应等待超时"
+        except RateLimitExceeded:
+            pass
+        budget.release()
+        assert guard.get_metrics()["rate_limited"] == 1
+        assert budget.get_metrics()["acquired"] == 3
+    finally:
+        set_dependency_bulkhead("scheduler-test", None)
+
+
+def test_interactive_latency_under_batch_flood():
+    """测试大量批量预审排队时，交互式预审的耗时与空闲时相当（本地替身端到端）"""
+    from benchmark_preaudit import BenchmarkEnvironment
+    from config_service import get_config_service
+    from deadline import Deadline
+    from submission_scheduler import get_submission_scheduler
+    import async_tools
+
+    with BenchmarkEnvironment(doctors=40, files_per_folder=4, bedrock_latency=0.03, exa_latency=0.03) as env:
+        get_config_service().set_overrides("scheduler", enabled=True, max_concurrency=4, batch_concurrency=2,
+                                           bedrock_concurrency=2, exa_concurrency=2, reserved_interactive=1)
+        scheduler = get_submission_scheduler()
+
+        async def submit(priority, submitter, doctor):
+            started = time.monotonic()
+            async with scheduler.slot(priority, submitter):
+                await async_tools.run_preaudit(env.submission(doctor), None, Deadline.from_timeout(25))
+            return time.monotonic() - started
+
+        async def scenario():
+            idle = [await submit("interactive", "rep-b", doctor) for doctor in env.doctors[:3]]
+            flood = [asyncio.create_task(submit("batch", "rep-a", doctor)) for doctor in env.doctors[3:33]]
+            await asyncio.sleep(0.1)
+            busy = [await submit("interactive", "rep-b", doctor) for doctor in env.doctors[33:38]]
+            flood_seconds = max(await asyncio.gather(*flood))
+            return idle, busy, flood_seconds
+
+        idle, busy, flood_seconds = env.run_async(scenario())
+        metrics = scheduler.get_metrics()["classes"]
+        assert metrics["batch"]["completed"] == 30 and metrics["interactive"]["completed"] == 8
+        # 批量任务整体耗时远大于单条；交互式预审不等待排队的批量任务
+        assert max(busy) < max(4 * max(idle), 0.5) < flood_seconds
+        assert metrics["interactive"]["wait_p99_ms"] < 50
+
+
+def main():
+    """主函数"""
+    print("=" * 60)
+    print("提交调度模块测试")
+    print("=" * 60)
+
+    tests = [
+        test_round_robin_across_submitters,
+        test_interactive_not_queued_behind_batch,
+        test_admission_control,
+        test_disabled_scheduler_passes_through,
+        test_priority_semaphore_order_and_reserved_slots,
+        test_priority_semaphore_async,
+        test_guard_releases_slot_between_retries,
+        test_interactive_latency_under_batch_flood
+    ]
+    for test in tests:
+        test()
+        print(f"✅ {test.__doc__}")
+
+    print("\n✨ 测试完成！")
+
+
+if __name__ == "__main__":
+    main()